@@ -74,6 +74,7 @@ from ganeti.storage import bdev
 from ganeti.storage import drbd
 from ganeti.storage import extstorage
 from ganeti.storage import filestorage
+from ganeti.storage import statecache
 from ganeti import objects
 from ganeti import ssconf
 from ganeti import serializer
@@ -102,6 +103,9 @@ _X509_CERT_FILE = "cert"
 _IES_STATUS_FILE = "status"
 _IES_PID_FILE = "pid"
 _IES_CA_FILE = "ca"
+_WIPE_JOB_FILE = "job"
+_WIPE_STATUS_FILE = "status"
+_WIPE_PID_FILE = "pid"
 
 #: Valid LVS output line regex
 _LVSLINE_REGEX = re.compile(r"^ *([^|]+)\|([^|]+)\|([0-9.]+)\|([^|]{6,})\|?$")
@@ -194,7 +198,7 @@ def _GetConfig():
   @return: a SimpleStore instance
 
   """
-  return ssconf.SimpleStore()
+  return ssconf.SimpleStore(cache=True)
 
 
 def _GetSshRunner(cluster_name):
@@ -1445,6 +1449,61 @@ def _InitSshUpdateData(data, noded_cert_file, ssconf_store):
   data[constants.SSHS_CLUSTER_NAME] = cluster_name
 
 
+def _RunOnNodesInParallel(fn, items,
+                          _max_parallel=constants.SSH_UPDATE_MAX_PARALLEL):
+  """Calls a function doing SSH operations for several nodes concurrently.
+
+  @type fn: callable
+  @param fn: function called with each item
+  @type items: list
+  @param items: the items, usually one per node
+  @rtype: list of tuple of (result, Exception or None)
+  @return: for each item, in the given order, the result of C{fn} and the
+    exception it raised, if any
+
+  """
+  def _Call(item):
+    try:
+      return (fn(item), None)
+    except Exception, err: # pylint: disable=W0703
+      return (None, err)
+
+  return utils.RunInParallel(_Call, items, _max_parallel)
+
+
+def _RunSshUpdateOnNodes(run_cmd_fn, cluster_name, node_data):
+  """Runs the SSH update tool on several nodes concurrently.
+
+  @type run_cmd_fn: callable
+  @param run_cmd_fn: function to run commands on remote nodes via SSH
+  @type cluster_name: string
+  @param cluster_name: the name of the cluster
+  @type node_data: list of tuple of (string, int, dict)
+  @param node_data: for each node its name, its SSH port and the data to
+    pass to the SSH update tool
+  @rtype: list of tuple of (string, Exception or None)
+  @return: for each node, in the given order, its name and the error raised
+    while updating it, if any
+
+  """
+  def _Update((node, ssh_port, data)):
+    run_cmd_fn(cluster_name, node, pathutils.SSH_UPDATE,
+               ssh_port, data,
+               debug=False, verbose=False, use_cluster_key=False,
+               ask_key=False, strict_host_check=False)
+
+  results = _RunOnNodesInParallel(_Update, node_data)
+
+  node_errors = []
+  for ((node, _, _), (_, err)) in zip(node_data, results):
+    if err is not None:
+      logging.warning("Updating the SSH setup of node '%s' failed: %s",
+                      node, err)
+    node_errors.append((node, err))
+
+  return node_errors
+
+
 def AddNodeSshKey(node_uuid, node_name,
                   potential_master_candidates,
                   ssh_port_map,
@@ -1488,7 +1547,7 @@ def AddNodeSshKey(node_uuid, node_name,
   assert (to_authorized_keys or to_public_keys or get_public_keys)
 
   if not ssconf_store:
-    ssconf_store = ssconf.SimpleStore()
+    ssconf_store = ssconf.SimpleStore(cache=True)
 
   # Check and fix sanity of key file
   keys_by_name = ssh.QueryPubKeyFile([node_name], key_file=pub_key_file)
@@ -1544,20 +1603,20 @@ def AddNodeSshKey(node_uuid, node_name,
   all_nodes = ssconf_store.GetNodeList()
   master_node = ssconf_store.GetMasterNode()
 
+  node_data = []
   for node in all_nodes:
     if node == master_node:
       continue
     if node in potential_master_candidates:
-      run_cmd_fn(cluster_name, node, pathutils.SSH_UPDATE,
-                 ssh_port_map.get(node), pot_mc_data,
-                 debug=False, verbose=False, use_cluster_key=False,
-                 ask_key=False, strict_host_check=False)
-    else:
-      if to_authorized_keys:
-        run_cmd_fn(cluster_name, node, pathutils.SSH_UPDATE,
-                   ssh_port_map.get(node), base_data,
-                   debug=False, verbose=False, use_cluster_key=False,
-                   ask_key=False, strict_host_check=False)
+      node_data.append((node, ssh_port_map.get(node), pot_mc_data))
+    elif to_authorized_keys:
+      node_data.append((node, ssh_port_map.get(node), base_data))
+
+  # All nodes are updated, even if some of them fail; the first error is
+  # raised afterwards
+  for (_, err) in _RunSshUpdateOnNodes(run_cmd_fn, cluster_name, node_data):
+    if err is not None:
+      raise err
 
 
 def RemoveNodeSshKey(node_uuid, node_name,
@@ -1620,7 +1679,7 @@ def RemoveNodeSshKey(node_uuid, node_name,
     result_msgs.append("No removal from any key file was requested.")
 
   if not ssconf_store:
-    ssconf_store = ssconf.SimpleStore()
+    ssconf_store = ssconf.SimpleStore(cache=True)
 
   master_node = ssconf_store.GetMasterNode()
 
@@ -1668,6 +1727,7 @@ def RemoveNodeSshKey(node_uuid, node_name,
         ssh.RemovePublicKey(node_uuid, key_file=pub_key_file)
 
       all_nodes = ssconf_store.GetNodeList()
+      node_data = []
       for node in all_nodes:
         if node == master_node:
           continue
@@ -1677,24 +1737,17 @@ def RemoveNodeSshKey(node_uuid, node_name,
                                    " node '%s', map: %s." %
                                    (node, ssh_port_map))
         if node in potential_master_candidates:
-          try:
-            run_cmd_fn(cluster_name, node, pathutils.SSH_UPDATE,
-                       ssh_port, pot_mc_data,
-                       debug=False, verbose=False, use_cluster_key=False,
-                       ask_key=False, strict_host_check=False)
-          except errors.OpExecError as e:
-            result_msgs.append("Warning: the SSH setup of node '%s' could not"
-                               " be adjusted." % node)
-        else:
-          if from_authorized_keys:
-            try:
-              run_cmd_fn(cluster_name, node, pathutils.SSH_UPDATE,
-                         ssh_port, base_data,
-                         debug=False, verbose=False, use_cluster_key=False,
-                         ask_key=False, strict_host_check=False)
-            except errors.OpExecError as e:
-              result_msgs.append("Warning: the SSH setup of node '%s' could"
-                                 " not be adjusted." % node)
+          node_data.append((node, ssh_port, pot_mc_data))
+        elif from_authorized_keys:
+          node_data.append((node, ssh_port, base_data))
+
+      for (node, err) in _RunSshUpdateOnNodes(run_cmd_fn, cluster_name,
+                                              node_data):
+        if isinstance(err, errors.OpExecError):
+          result_msgs.append("Warning: the SSH setup of node '%s' could not"
+                             " be adjusted." % node)
+        elif err is not None:
+          raise err
 
   if clear_authorized_keys or from_public_keys or clear_public_keys:
     data = {}
@@ -1762,7 +1815,7 @@ def _GenerateNodeSshKey(node_uuid, node_name, ssh_port_map,
 
   """
   if not ssconf_store:
-    ssconf_store = ssconf.SimpleStore()
+    ssconf_store = ssconf.SimpleStore(cache=True)
 
   keys_by_uuid = ssh.QueryPubKeyFile([node_uuid], key_file=pub_key_file)
   if not keys_by_uuid or node_uuid not in keys_by_uuid:
@@ -1880,7 +1933,7 @@ def RenewSshKeys(node_uuids, node_names, ssh_port_map,
 
   """
   if not ssconf_store:
-    ssconf_store = ssconf.SimpleStore()
+    ssconf_store = ssconf.SimpleStore(cache=True)
   cluster_name = ssconf_store.GetClusterName()
 
   if not len(node_uuids) == len(node_names):
@@ -1896,18 +1949,19 @@ def RenewSshKeys(node_uuids, node_names, ssh_port_map,
   master_node_uuid = _GetMasterNodeUUID(node_uuid_name_map, master_node_name)
 
   # process non-master nodes
-  for node_uuid, node_name in node_uuid_name_map:
-    if node_name == master_node_name:
-      continue
-    master_candidate = node_uuid in master_candidate_uuids
-    potential_master_candidate = node_name in potential_master_candidates
+  renew_nodes = [(node_uuid, node_name)
+                 for (node_uuid, node_name) in node_uuid_name_map
+                 if node_name != master_node_name]
 
+  for node_uuid, node_name in renew_nodes:
     keys_by_uuid = ssh.QueryPubKeyFile([node_uuid], key_file=pub_key_file)
     if not keys_by_uuid:
       raise errors.SshUpdateError("No public key of node %s (UUID %s) found,"
                                   " not generating a new key."
                                   % (node_name, node_uuid))
 
+  for node_uuid, node_name in renew_nodes:
+    master_candidate = node_uuid in master_candidate_uuids
     if master_candidate:
       RemoveNodeSshKey(node_uuid, node_name,
                        master_candidate_uuids,
@@ -1919,6 +1973,7 @@ def RenewSshKeys(node_uuids, node_names, ssh_port_map,
                        clear_authorized_keys=False,
                        clear_public_keys=False)
 
+  def _RenewNodeKey((node_uuid, node_name)):
     _GenerateNodeSshKey(node_uuid, node_name, ssh_port_map,
                         pub_key_file=pub_key_file,
                         ssconf_store=ssconf_store,
@@ -1927,15 +1982,33 @@ def RenewSshKeys(node_uuids, node_names, ssh_port_map,
 
     try:
       (_, dsa_pub_keyfile) = root_keyfiles[constants.SSHK_DSA]
-      pub_key = ssh.ReadRemoteSshPubKeys(dsa_pub_keyfile,
-                                         node_name, cluster_name,
-                                         ssh_port_map[node_name],
-                                         False, # ask_key
-                                         False) # key_check
+      return ssh.ReadRemoteSshPubKeys(dsa_pub_keyfile,
+                                      node_name, cluster_name,
+                                      ssh_port_map[node_name],
+                                      False, # ask_key
+                                      False) # key_check
     except:
       raise errors.SshUpdateError("Could not fetch key of node %s"
                                   " (UUID %s)" % (node_name, node_uuid))
 
+  # Generating and fetching a new key only involves the node itself, so this
+  # is done for all nodes concurrently; the key files are updated one node
+  # after the other afterwards
+  renew_results = _RunOnNodesInParallel(_RenewNodeKey, renew_nodes)
+
+  renew_error = None
+  for ((node_uuid, node_name), (pub_key, err)) in zip(renew_nodes,
+                                                      renew_results):
+    master_candidate = node_uuid in master_candidate_uuids
+    potential_master_candidate = node_name in potential_master_candidates
+
+    if err is not None:
+      logging.error("Renewing the SSH key of node %s (UUID %s) failed: %s",
+                    node_name, node_uuid, err)
+      if renew_error is None:
+        renew_error = err
+      continue
+
     if potential_master_candidate:
       ssh.RemovePublicKey(node_uuid, key_file=pub_key_file)
       ssh.AddPublicKey(node_uuid, pub_key, key_file=pub_key_file)
@@ -1950,6 +2023,11 @@ def RenewSshKeys(node_uuids, node_names, ssh_port_map,
                   noded_cert_file=noded_cert_file,
                   run_cmd_fn=run_cmd_fn)
 
+  # The new keys of all other nodes have been distributed, don't touch the
+  # master's key if any node failed
+  if renew_error is not None:
+    raise renew_error
+
   # Renewing the master node's key
 
   # Preserve the old keys for now
@@ -3163,6 +3241,174 @@ def BlockdevWipe(disk, offset, size):
   _DumpDevice("/dev/zero", rdev.dev_path, offset, size, True)
 
 
+def BlockdevWipeStart(disks, instance_name, offsets, parallelism):
+  """Starts wiping block devices in the background.
+
+  The disks are wiped by a separate process, up to C{parallelism} of them
+  at the same time. Its progress can be queried with L{BlockdevWipeStatus}.
+
+  @type disks: list of L{objects.Disk}
+  @param disks: the disk objects we want to wipe
+  @type instance_name: string
+  @param instance_name: name of the instance the disks belong to
+  @type offsets: list of int
+  @param offsets: for each disk, the offset in MiB to start wiping at
+  @type parallelism: int
+  @param parallelism: maximum number of disks to wipe at the same time
+  @rtype: string
+  @return: the name of the wipe, i.e. the name of its status directory
+
+  """
+  if len(disks) != len(offsets):
+    _Fail("Number of disks and offsets don't match")
+  if parallelism < 1:
+    _Fail("Invalid parallelism %s", parallelism)
+
+  job_disks = []
+  initial_status = []
+  for (disk, offset) in zip(disks, offsets):
+    try:
+      rdev = _RecursiveFindBD(disk)
+    except errors.BlockDeviceError:
+      rdev = None
+
+    if not rdev:
+      _Fail("Cannot wipe device %s: device not found", disk.iv_name)
+    if offset < 0:
+      _Fail("Negative offset")
+    if offset > rdev.size:
+      _Fail("Wipe offset is bigger than device size")
+
+    job_disks.append({
+      "path": rdev.dev_path,
+      "offset": offset,
+      "size": rdev.size,
+      })
+    initial_status.append(objects.DiskWipeStatus(offset=offset,
+                                                 size=rdev.size,
+                                                 method=None,
+                                                 finished=False,
+                                                 error_message=None))
+
+  status_dir = tempfile.mkdtemp(dir=pathutils.DISK_WIPE_DIR,
+                                prefix=("wipe-%s-" %
+                                        utils.TimestampForFilename()))
+  try:
+    job_file = utils.PathJoin(status_dir, _WIPE_JOB_FILE)
+    status_file = utils.PathJoin(status_dir, _WIPE_STATUS_FILE)
+
+    utils.WriteFile(job_file, data=serializer.DumpJson({
+      "parallelism": parallelism,
+      "disks": job_disks,
+      }))
+    utils.WriteFile(status_file,
+                    data=serializer.DumpJson([status.ToDict()
+                                              for status in initial_status]))
+
+    logfile = _InstanceLogName("wipe", "disks", instance_name, None)
+
+    utils.StartDaemon([pathutils.WIPE_DISKS, job_file, status_file],
+                      pidfile=utils.PathJoin(status_dir, _WIPE_PID_FILE),
+                      output=logfile)
+
+    return os.path.basename(status_dir)
+
+  except Exception:
+    shutil.rmtree(status_dir, ignore_errors=True)
+    raise
+
+
+def BlockdevWipeStatus(name):
+  """Returns the status of a wipe started by L{BlockdevWipeStart}.
+
+  Disks which haven't been wiped completely when the wiping process is no
+  longer running are reported as failed.
+
+  @type name: string
+  @param name: the name of the wipe
+  @rtype: list of dict
+  @return: the L{objects.DiskWipeStatus} of each disk, in dict form
+
+  """
+  status_dir = utils.PathJoin(pathutils.DISK_WIPE_DIR, name)
+
+  # Check the process before reading the status, so that the final status
+  # is always seen for a process that exited normally
+  running = utils.ReadLockedPidFile(utils.PathJoin(status_dir,
+                                                   _WIPE_PID_FILE))
+
+  try:
+    data = utils.ReadFile(utils.PathJoin(status_dir, _WIPE_STATUS_FILE))
+  except EnvironmentError, err:
+    _Fail("Can't read status of disk wipe %s: %s", name, err)
+
+  result = []
+  for status in serializer.LoadJson(data):
+    status = objects.DiskWipeStatus.FromDict(status)
+    if not (status.finished or running):
+      status.finished = True
+      status.error_message = "Wiping process exited unexpectedly"
+    result.append(status.ToDict())
+
+  return result
+
+
+def BlockdevWipeCleanup(name):
+  """Cleans up after a wipe started by L{BlockdevWipeStart}.
+
+  If the wiping process is still running it's killed together with the
+  processes it started. Afterwards the whole status directory is removed.
+
+  @type name: string
+  @param name: the name of the wipe
+
+  """
+  logging.info("Finalizing disk wipe %s", name)
+
+  status_dir = utils.PathJoin(pathutils.DISK_WIPE_DIR, name)
+
+  pid = utils.ReadLockedPidFile(utils.PathJoin(status_dir, _WIPE_PID_FILE))
+
+  if pid:
+    logging.info("Disk wipe %s is still running with PID %s", name, pid)
+    _KillProcessGroup(pid)
+
+  shutil.rmtree(status_dir, ignore_errors=True)
+
+
+def _KillProcessGroup(pid):
+  """Kills a daemon started by L{utils.StartDaemon} and all its children.
+
+  Daemons run in a session of their own, so their process group contains
+  just the processes started by them, e.g. the C{dd} processes of the
+  wiping tool. Killing only the daemon would leave these running and keep
+  the devices busy.
+
+  @type pid: int
+  @param pid: the daemon's process ID
+
+  """
+  try:
+    pgid = os.getpgid(pid)
+  except OSError, err:
+    if err.errno != errno.ESRCH:
+      raise
+    return
+
+  if pgid == os.getpgrp():
+    # Never kill ourselves
+    utils.KillProcess(pid, waitpid=False)
+    return
+
+  utils.IgnoreProcessNotFound(os.killpg, pgid, signal.SIGTERM)
+
+  # Waits for the daemon and kills it if it doesn't exit in time
+  utils.KillProcess(pid, waitpid=False)
+
+  # Children may outlive the daemon
+  utils.IgnoreProcessNotFound(os.killpg, pgid, signal.SIGKILL)
+
+
 def BlockdevImage(disk, image, size):
   """Images a block device either by dumping a local file or
   downloading a URL.
@@ -3466,12 +3712,13 @@ def BlockdevGetmirrorstatus(disks):
 
   """
   stats = []
-  for dsk in disks:
-    rbd = _RecursiveFindBD(dsk)
-    if rbd is None:
-      _Fail("Can't find device %s", dsk)
+  with statecache.Snapshot():
+    for dsk in disks:
+      rbd = _RecursiveFindBD(dsk)
+      if rbd is None:
+        _Fail("Can't find device %s", dsk)
 
-    stats.append(rbd.CombinedSyncStatus())
+      stats.append(rbd.CombinedSyncStatus())
 
   return stats
 
@@ -3488,25 +3735,92 @@ def BlockdevGetmirrorstatusMulti(disks):
 
   """
   result = []
-  for disk in disks:
-    try:
-      rbd = _RecursiveFindBD(disk)
-      if rbd is None:
-        result.append((False, "Can't find device %s" % disk))
-        continue
+  with statecache.Snapshot():
+    for disk in disks:
+      try:
+        rbd = _RecursiveFindBD(disk)
+        if rbd is None:
+          result.append((False, "Can't find device %s" % disk))
+          continue
 
-      status = rbd.CombinedSyncStatus()
-    except errors.BlockDeviceError, err:
-      logging.exception("Error while getting disk status")
-      result.append((False, str(err)))
-    else:
-      result.append((True, status))
+        status = rbd.CombinedSyncStatus()
+      except errors.BlockDeviceError, err:
+        logging.exception("Error while getting disk status")
+        result.append((False, str(err)))
+      else:
+        result.append((True, status))
 
   assert len(disks) == len(result)
 
   return result
 
 
+def _SyncProgressed(old, new, min_progress):
+  """Checks whether the sync of a device progressed noticeably.
+
+  @type old: tuple of (bool, L{objects.BlockDevStatus} or string)
+  @param old: the earlier status, as returned by
+    L{BlockdevGetmirrorstatusMulti}
+  @type new: tuple of (bool, L{objects.BlockDevStatus} or string)
+  @param new: the current status
+  @type min_progress: float
+  @param min_progress: the progress in percent considered noticeable
+
+  """
+  (old_success, old_status) = old
+  (new_success, new_status) = new
+
+  if not (old_success and new_success):
+    return old_success != new_success
+
+  if old_status.sync_percent is None or new_status.sync_percent is None:
+    return old_status.sync_percent != new_status.sync_percent
+
+  return new_status.sync_percent - old_status.sync_percent >= min_progress
+
+
+def BlockdevWatchSync(disks, min_progress, timeout,
+                      _sleep_fn=time.sleep, _time_fn=time.time):
+  """Waits for the sync of a list of devices to progress.
+
+  Returns as soon as the sync of any device progressed by at least
+  C{min_progress} percent, a device finished syncing or its status could
+  not be determined any longer, or after C{timeout} seconds at the latest.
+  If none of the devices is syncing, this returns immediately.
+
+  @type disks: list of L{objects.Disk}
+  @param disks: the list of disks which we should watch
+  @type min_progress: float
+  @param min_progress: the progress in percent to wait for
+  @type timeout: number
+  @param timeout: the maximum time to wait, capped at
+    L{constants.SYNC_WATCH_MAX_TIMEOUT}
+  @rtype: list
+  @return: the current status of each disk, see
+    L{BlockdevGetmirrorstatusMulti}
+
+  """
+  deadline = _time_fn() + min(timeout, constants.SYNC_WATCH_MAX_TIMEOUT)
+
+  initial = BlockdevGetmirrorstatusMulti(disks)
+  if not compat.any(success and status.sync_percent is not None
+                    for (success, status) in initial):
+    return initial
+
+  current = initial
+  while True:
+    remaining = deadline - _time_fn()
+    if remaining <= 0:
+      return current
+
+    _sleep_fn(min(remaining, constants.SYNC_WATCH_INTERVAL))
+
+    current = BlockdevGetmirrorstatusMulti(disks)
+    if compat.any(_SyncProgressed(old, new, min_progress)
+                  for (old, new) in zip(initial, current)):
+      return current
+
+
 def _RecursiveFindBD(disk):
   """Check if a device is activated.
 
@@ -3555,15 +3869,16 @@ def BlockdevFind(disk):
            information
 
   """
-  try:
-    rbd = _RecursiveFindBD(disk)
-  except errors.BlockDeviceError, err:
-    _Fail("Failed to find device: %s", err, exc=True)
+  with statecache.Snapshot():
+    try:
+      rbd = _RecursiveFindBD(disk)
+    except errors.BlockDeviceError, err:
+      _Fail("Failed to find device: %s", err, exc=True)
 
-  if rbd is None:
-    return None
+    if rbd is None:
+      return None
 
-  return rbd.GetSyncStatus()
+    return rbd.GetSyncStatus()
 
 
 def BlockdevGetdimensions(disks):
@@ -3580,16 +3895,17 @@ def BlockdevGetdimensions(disks):
 
   """
   result = []
-  for cf in disks:
-    try:
-      rbd = _RecursiveFindBD(cf)
-    except errors.BlockDeviceError:
-      result.append(None)
-      continue
-    if rbd is None:
-      result.append(None)
-    else:
-      result.append(rbd.GetActualDimensions())
+  with statecache.Snapshot():
+    for cf in disks:
+      try:
+        rbd = _RecursiveFindBD(cf)
+      except errors.BlockDeviceError:
+        result.append(None)
+        continue
+      if rbd is None:
+        result.append(None)
+      else:
+        result.append(rbd.GetActualDimensions())
   return result
 
 
@@ -4469,6 +4785,38 @@ def JobQueueUpdate(file_name, content):
                   gid=getents.daemons_gid, mode=constants.JOB_QUEUE_FILES_PERMS)
 
 
+def JobQueueUpdateMulti(updates):
+  """Updates multiple files in the queue directory.
+
+  @type updates: list of tuples
+  @param updates: tuples of (file name, content, append); if append is true,
+      the content is appended to the existing file instead of replacing it
+  @rtype: list
+  @return: the names of the files which couldn't be appended to because they
+      don't exist; the caller is expected to send their whole content instead
+
+  """
+  missing = []
+
+  for (file_name, content, append) in updates:
+    if not append:
+      JobQueueUpdate(file_name, content)
+      continue
+
+    local_name = vcluster.LocalizeVirtualPath(file_name)
+
+    _EnsureJobQueueFile(local_name)
+
+    try:
+      utils.AppendFile(local_name, _Decompress(content))
+    except EnvironmentError, err:
+      if err.errno != errno.ENOENT:
+        _Fail("Can't append to job queue file '%s': %s", local_name, err)
+      missing.append(file_name)
+
+  return missing
+
+
 def JobQueueRename(old, new):
   """Renames a job queue file.
 
@@ -5617,7 +5965,19 @@ class HooksRunner(object):
       # warning at every operation
       return results
 
-    runparts_results = utils.RunParts(dir_name, env=env, reset_env=True)
+    # Scripts in directories containing the marker file don't depend on each
+    # other and are run concurrently, each with a timeout
+    if os.path.exists(utils.PathJoin(dir_name,
+                                     constants.HOOKS_PARALLEL_MARKER)):
+      runparts_kwargs = {
+        "max_parallel": constants.HOOKS_MAX_PARALLEL,
+        "timeout": constants.HOOKS_SCRIPT_TIMEOUT,
+        }
+    else:
+      runparts_kwargs = {}
+
+    runparts_results = utils.RunParts(dir_name, env=env, reset_env=True,
+                                      **runparts_kwargs)
 
     for (relname, relstatus, runresult) in runparts_results:
       if relstatus == constants.RUNPARTS_SKIP:
@@ -5627,11 +5987,16 @@ class HooksRunner(object):
         rrval = constants.HKR_FAIL
         output = "Hook script execution error: %s" % runresult
       elif relstatus == constants.RUNPARTS_RUN:
-        if runresult.failed:
+        # A script killed for exceeding its timeout fails even if it
+        # handled the signal and exited successfully
+        if runresult.failed or runresult.failed_by_timeout:
           rrval = constants.HKR_FAIL
         else:
           rrval = constants.HKR_SUCCESS
         output = utils.SafeEncode(runresult.output.strip())
+        if runresult.failed_by_timeout:
+          output = ("%s\nHook script timed out after %s seconds" %
+                    (output, constants.HOOKS_SCRIPT_TIMEOUT)).strip()
       results.append(("%s/%s" % (subdir, relname), rrval, output))
 
     return results
@@ -201,7 +201,9 @@ class LUClusterVerifyDisks(NoHooksLU):
     group_names = self.owned_locks(locking.LEVEL_NODEGROUP)
 
     # Submit one instance of L{opcodes.OpGroupVerifyDisks} per node group
-    return ResultWithJobs([[opcodes.OpGroupVerifyDisks(group_name=group)]
+    return ResultWithJobs([[opcodes.OpGroupVerifyDisks(
+                              group_name=group,
+                              wait_for_sync=self.op.wait_for_sync)]
                            for group in group_names])
 
 
@@ -48,6 +48,7 @@ from ganeti.cmdlib.common import MergeAndVerifyHvState, \
   CheckInstancesNodeGroups, LoadNodeEvacResult, MapInstanceLvsToNodes, \
   CheckIpolicyVsDiskTemplates, CheckDiskAccessModeValidity, \
   CheckDiskAccessModeConsistency, ConnectInstanceCommunicationNetworkOp
+from ganeti.cmdlib.instance_storage import WaitForInstancesSync
 
 import ganeti.masterd.instance
 
@@ -966,6 +967,24 @@ class LUGroupVerifyDisks(NoHooksLU):
         if inst_disk_uuids.intersection(faulty_disk_uuids):
           offline_disk_instance_names.add(inst.name)
 
+  def _WaitForSync(self):
+    """Waits for the mirrored disks of all instances to sync.
+
+    """
+    instances = []
+    for inst in self.instances.values():
+      disks = self.cfg.GetInstanceDisks(inst.uuid)
+      if inst.disks_active and \
+         utils.AnyDiskOfType(disks, constants.DTS_INT_MIRROR):
+        instances.append(inst)
+    if not instances:
+      return
+
+    result = WaitForInstancesSync(self, [(inst, None) for inst in instances])
+    for inst in instances:
+      if not result[inst.uuid]:
+        self.LogWarning("Disks of instance %s are degraded", inst.name)
+
   def Exec(self, feedback_fn):
     """Verify integrity of cluster disks.
 
@@ -979,6 +998,9 @@ class LUGroupVerifyDisks(NoHooksLU):
     offline_disk_instance_names = set()
     missing_disks = {}
 
+    if self.op.wait_for_sync:
+      self._WaitForSync()
+
     self._VerifyInstanceLvs(node_errors, offline_disk_instance_names,
                             missing_disks)
     self._VerifyDrbdStates(node_errors, offline_disk_instance_names)
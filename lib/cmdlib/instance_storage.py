@@ -1217,6 +1217,57 @@ def _CalcEta(time_taken, written, total_size):
   return (total_size - written) * avg_time
 
 
+def _WaitForDiskWipe(lu, node_uuid, wipe_name, disks):
+  """Waits for a background disk wipe to finish.
+
+  @type lu: L{LogicalUnit}
+  @param lu: the logical unit on whose behalf we execute
+  @type node_uuid: string
+  @param node_uuid: the node the disks are wiped on
+  @type wipe_name: string
+  @param wipe_name: the name of the wipe, as returned by the start RPC
+  @type disks: list of tuple of (number, number)
+  @param disks: the instance disk index and start offset of each wiped disk
+  @raise errors.OpExecError: if wiping any of the disks failed
+
+  """
+  node_name = lu.cfg.GetNodeName(node_uuid)
+  start_time = time.time()
+  last_output = start_time
+  delay = 1.0
+
+  while True:
+    result = lu.rpc.call_blockdev_wipe_status(node_uuid, wipe_name)
+    result.Raise("Could not get status of disk wipe on node '%s'" % node_name)
+
+    # Even if wiping a disk failed, the others are still being wiped and
+    # must not be used before the wiping process is done with them
+    if compat.all(status.finished for status in result.payload):
+      failed = [(idx, status.error_message)
+                for ((idx, _), status) in zip(disks, result.payload)
+                if status.error_message]
+      for (idx, msg) in failed[1:]:
+        lu.LogWarning("Could not wipe disk %d: %s", idx, msg)
+      if failed:
+        raise errors.OpExecError("Could not wipe disk %d: %s" % failed[0])
+      break
+
+    now = time.time()
+    if now - last_output >= 60:
+      for ((idx, start_offset), status) in zip(disks, result.payload):
+        if status.finished or status.offset <= start_offset:
+          continue
+        eta = _CalcEta(now - start_time, status.offset - start_offset,
+                       status.size - start_offset)
+        lu.LogInfo(" - disk %d done: %.1f%% ETA: %s", idx,
+                   status.offset / float(status.size) * 100,
+                   utils.FormatSeconds(eta))
+      last_output = now
+
+    time.sleep(delay)
+    delay = min(10.0, delay * 1.5)
+
+
 def WipeDisks(lu, instance, disks=None):
   """Wipes instance disks.
 
@@ -1252,47 +1303,36 @@ def WipeDisks(lu, instance, disks=None):
 
   try:
     for (idx, device, offset) in disks:
-      # The wipe size is MIN_WIPE_CHUNK_PERCENT % of the instance disk but
-      # MAX_WIPE_CHUNK at max. Truncating to integer to avoid rounding errors.
-      wipe_chunk_size = \
-        int(min(constants.MAX_WIPE_CHUNK,
-                device.size / 100.0 * constants.MIN_WIPE_CHUNK_PERCENT))
-
-      size = device.size
-      last_output = 0
-      start_time = time.time()
-
       if offset == 0:
         info_text = ""
       else:
         info_text = (" (from %s to %s)" %
                      (utils.FormatUnit(offset, "h"),
-                      utils.FormatUnit(size, "h")))
+                      utils.FormatUnit(device.size, "h")))
 
       lu.LogInfo("* Wiping disk %s%s", idx, info_text)
 
-      logging.info("Wiping disk %d for instance %s on node %s using"
-                   " chunk size %s", idx, instance.name, node_name,
-                   wipe_chunk_size)
-
-      while offset < size:
-        wipe_size = min(wipe_chunk_size, size - offset)
+    logging.info("Wiping %d disk(s) of instance %s on node %s, up to %d at a"
+                 " time", len(disks), instance.name, node_name,
+                 constants.WIPE_DISKS_PARALLELISM)
 
-        logging.debug("Wiping disk %d, offset %s, chunk %s",
-                      idx, offset, wipe_size)
+    offsets = [offset for (_, _, offset) in disks]
+    result = lu.rpc.call_blockdev_wipe_start(node_uuid,
+                                             (map(compat.snd, disks),
+                                              instance),
+                                             instance.name, offsets,
+                                             constants.WIPE_DISKS_PARALLELISM)
+    result.Raise("Could not start wiping disks on node '%s'" % node_name)
+    wipe_name = result.payload
 
-        result = lu.rpc.call_blockdev_wipe(node_uuid, (device, instance),
-                                           offset, wipe_size)
-        result.Raise("Could not wipe disk %d at offset %d for size %d" %
-                     (idx, offset, wipe_size))
-
-        now = time.time()
-        offset += wipe_size
-        if now - last_output >= 60:
-          eta = _CalcEta(now - start_time, offset, size)
-          lu.LogInfo(" - done: %.1f%% ETA: %s",
-                     offset / float(size) * 100, utils.FormatSeconds(eta))
-          last_output = now
+    try:
+      _WaitForDiskWipe(lu, node_uuid, wipe_name,
+                       [(idx, offset) for (idx, _, offset) in disks])
+    finally:
+      result = lu.rpc.call_blockdev_wipe_cleanup(node_uuid, wipe_name)
+      if result.fail_msg:
+        logging.warning("Failed to clean up disk wipe %s on node '%s': %s",
+                        wipe_name, node_name, result.fail_msg)
   finally:
     logging.info("Resuming synchronization of disks for instance '%s'",
                  instance.name)
@@ -1418,81 +1458,173 @@ def ExpandCheckDisks(instance_disks, disks):
     return disks
 
 
-def WaitForSync(lu, instance, disks=None, oneshot=False):
-  """Sleep and poll for an instance's disk to sync.
+def _CheckInstanceSync(lu, node_name, disks, rstats):
+  """Logs and evaluates the sync status of the disks of an instance.
+
+  @type disks: list of L{objects.Disk}
+  @param disks: the disks of the instance
+  @type rstats: list of tuple of (bool, L{objects.BlockDevStatus} or string)
+  @param rstats: the status of each disk as returned by the node
+  @rtype: tuple of (bool, bool, number)
+  @return: whether all disks are in sync, whether any disk is degraded
+    without syncing and the estimated time until the sync is done
 
   """
-  inst_disks = lu.cfg.GetInstanceDisks(instance.uuid)
-  if not inst_disks or disks is not None and not disks:
-    return True
+  max_time = 0
+  done = True
+  cumul_degraded = False
 
-  disks = [d for d in ExpandCheckDisks(inst_disks, disks)
-           if d.dev_type in constants.DTS_INT_MIRROR]
+  for (disk, (success, mstat)) in zip(disks, rstats):
+    if not success:
+      lu.LogWarning("Can't compute data for node %s/%s: %s",
+                    node_name, disk.iv_name, mstat)
+      continue
 
-  if not oneshot:
-    lu.LogInfo("Waiting for instance %s to sync disks", instance.name)
+    cumul_degraded = (cumul_degraded or
+                      (mstat.is_degraded and mstat.sync_percent is None))
+    if mstat.sync_percent is not None:
+      done = False
+      if mstat.estimated_time is not None:
+        rem_time = ("%s remaining (estimated)" %
+                    utils.FormatSeconds(mstat.estimated_time))
+        max_time = max(max_time, mstat.estimated_time)
+      else:
+        rem_time = "no time estimate"
+        max_time = max(max_time, 5) # wait at least a bit between retries
+      lu.LogInfo("- device %s: %5.2f%% done, %s",
+                 disk.iv_name, mstat.sync_percent, rem_time)
 
-  node_uuid = instance.primary_node
-  node_name = lu.cfg.GetNodeName(node_uuid)
+  return (done, cumul_degraded, max_time)
 
-  # TODO: Convert to utils.Retry
 
-  retries = 0
-  degr_retries = 10 # in seconds, as we sleep 1 second each time
-  while True:
-    max_time = 0
-    done = True
-    cumul_degraded = False
-    rstats = lu.rpc.call_blockdev_getmirrorstatus(node_uuid, (disks, instance))
-    msg = rstats.fail_msg
-    if msg:
-      lu.LogWarning("Can't get any data from node %s: %s", node_name, msg)
-      retries += 1
-      if retries >= 10:
-        raise errors.RemoteError("Can't contact node %s for mirror data,"
-                                 " aborting." % node_name)
-      time.sleep(6)
+def WaitForInstancesSync(lu, instances, oneshot=False):
+  """Wait for the disks of several instances to sync.
+
+  The disks of all instances are watched in a single loop, with one
+  C{blockdev_watch_sync} call to all their primary nodes per round. Instead
+  of sleeping for a fixed time, the nodes are asked to wait until the sync
+  of any of their disks progresses noticeably, for at most
+  L{constants.SYNC_WATCH_MAX_TIMEOUT} seconds per round, so waiting for many
+  instances takes about as long as waiting for the slowest of them.
+
+  @type lu: L{LogicalUnit}
+  @param lu: the logical unit on whose behalf we execute
+  @type instances: list of tuple of (L{objects.Instance}, None or list)
+  @param instances: the instances to wait for, each together with the disks
+    to wait for, or C{None} for all of its disks
+  @type oneshot: boolean
+  @param oneshot: whether to check the sync status only once instead of
+    waiting for the sync to finish
+  @rtype: dict
+  @return: for each instance UUID, whether its disks are not degraded
+  @raise errors.RemoteError: if a node can't be contacted repeatedly
+
+  """
+  result = {}
+
+  # node UUID -> list of (instance, disks)
+  pending = {}
+  for (instance, disks) in instances:
+    inst_disks = lu.cfg.GetInstanceDisks(instance.uuid)
+    if not inst_disks or disks is not None and not disks:
+      result[instance.uuid] = True
       continue
-    rstats = rstats.payload
-    retries = 0
-    for i, mstat in enumerate(rstats):
-      if mstat is None:
-        lu.LogWarning("Can't compute data for node %s/%s",
-                      node_name, disks[i].iv_name)
+
+    disks = [d for d in ExpandCheckDisks(inst_disks, disks)
+             if d.dev_type in constants.DTS_INT_MIRROR]
+
+    if not oneshot:
+      lu.LogInfo("Waiting for instance %s to sync disks", instance.name)
+
+    pending.setdefault(instance.primary_node, []).append((instance, disks))
+
+  node_retries = dict.fromkeys(pending, 0)
+  # in seconds, as we sleep 1 second each time
+  degr_retries = dict((instance.uuid, 10)
+                      for insts in pending.values()
+                      for (instance, _) in insts)
+  timeout = 0
+
+  while pending:
+    node_disks = dict((node_uuid, [(disk, instance)
+                                   for (instance, disks) in insts
+                                   for disk in disks])
+                      for (node_uuid, insts) in pending.items())
+    rstats = lu.rpc.call_blockdev_watch_sync(pending.keys(), node_disks,
+                                             constants.SYNC_WATCH_MIN_PROGRESS,
+                                             timeout)
+
+    max_time = 0
+    delay = 0
+
+    for (node_uuid, insts) in pending.items():
+      node_name = lu.cfg.GetNodeName(node_uuid)
+
+      msg = rstats[node_uuid].fail_msg
+      if msg:
+        lu.LogWarning("Can't get any data from node %s: %s", node_name, msg)
+        node_retries[node_uuid] += 1
+        if node_retries[node_uuid] >= 10:
+          raise errors.RemoteError("Can't contact node %s for mirror data,"
+                                   " aborting." % node_name)
+        delay = max(delay, 6)
         continue
 
-      cumul_degraded = (cumul_degraded or
-                        (mstat.is_degraded and mstat.sync_percent is None))
-      if mstat.sync_percent is not None:
-        done = False
-        if mstat.estimated_time is not None:
-          rem_time = ("%s remaining (estimated)" %
-                      utils.FormatSeconds(mstat.estimated_time))
-          max_time = mstat.estimated_time
+      node_retries[node_uuid] = 0
+      payload = rstats[node_uuid].payload
+      remaining = []
+
+      for (instance, disks) in insts:
+        (done, cumul_degraded, inst_time) = \
+          _CheckInstanceSync(lu, node_name, disks, payload[:len(disks)])
+        payload = payload[len(disks):]
+
+        # if we're done but degraded, let's do a few small retries, to
+        # make sure we see a stable and not transient situation; therefore
+        # we force another check of the instance
+        if ((done or oneshot) and cumul_degraded and
+            degr_retries[instance.uuid] > 0):
+          logging.info("Degraded disks found for instance %s, %d retries"
+                       " left", instance.name, degr_retries[instance.uuid])
+          degr_retries[instance.uuid] -= 1
+          delay = max(delay, 1)
+          remaining.append((instance, disks))
+        elif done or oneshot:
+          if done:
+            lu.LogInfo("Instance %s's disks are in sync", instance.name)
+          result[instance.uuid] = not cumul_degraded
         else:
-          rem_time = "no time estimate"
-          max_time = 5 # sleep at least a bit between retries
-        lu.LogInfo("- device %s: %5.2f%% done, %s",
-                   disks[i].iv_name, mstat.sync_percent, rem_time)
-
-    # if we're done but degraded, let's do a few small retries, to
-    # make sure we see a stable and not transient situation; therefore
-    # we force restart of the loop
-    if (done or oneshot) and cumul_degraded and degr_retries > 0:
-      logging.info("Degraded disks found, %d retries left", degr_retries)
-      degr_retries -= 1
-      time.sleep(1)
-      continue
+          max_time = max(max_time, inst_time)
+          remaining.append((instance, disks))
+
+      if remaining:
+        pending[node_uuid] = remaining
+      else:
+        del pending[node_uuid]
 
-    if done or oneshot:
+    if not pending:
       break
 
-    time.sleep(min(60, max_time))
+    if delay:
+      # Errors and degraded disks are checked again after a short fixed
+      # delay, not by waiting for the sync to progress
+      time.sleep(delay)
+      timeout = 0
+    else:
+      # The nodes wait for the sync to progress instead of us sleeping
+      timeout = min(constants.SYNC_WATCH_MAX_TIMEOUT, max_time)
+
+  return result
+
 
-  if done:
-    lu.LogInfo("Instance %s's disks are in sync", instance.name)
+def WaitForSync(lu, instance, disks=None, oneshot=False):
+  """Sleep and poll for an instance's disk to sync.
 
-  return not cumul_degraded
+  @see: L{WaitForInstancesSync}
+
+  """
+  result = WaitForInstancesSync(lu, [(instance, disks)], oneshot=oneshot)
+  return result[instance.uuid]
 
 
 def ShutdownInstanceDisks(lu, instance, disks=None, ignore_primary=False):
@@ -52,7 +52,8 @@ import threading
 import itertools
 
 from ganeti.config.temporary_reservations import TemporaryReservationManager
-from ganeti.config.utils import ConfigSync, ConfigManager
+from ganeti.config.utils import ConfigSync, ConfigManager, ConfigChanges, \
+  ConfigIndex, ApplyConfigDelta
 from ganeti.config.verify import VerifyType, VerifyNic, VerifyIpolicy
 
 from ganeti import errors
@@ -100,13 +101,15 @@ def GetConfig(ec_id, livelock, **kwargs):
   @type livelock: L{ganeti.utils.livelock.LiveLock}
   @param livelock: a livelock object holding the lockfile needed for WConfd
   @type kwargs: dict
-  @param kwargs: Any additional arguments for the ConfigWriter constructor
+  @param kwargs: Any additional arguments for the ConfigWriter constructor;
+      if no C{wconfd} client is given, a new one is created
   @rtype: L{ConfigWriter}
   @return: the ConfigWriter context
 
   """
   kwargs['wconfdcontext'] = GetWConfdContext(ec_id, livelock)
-  kwargs['wconfd'] = wc.Client()
+  if kwargs.get('wconfd') is None:
+    kwargs['wconfd'] = wc.Client()
   return ConfigWriter(**kwargs)
 
 
@@ -204,11 +207,53 @@ class ConfigWriter(object):
     self._lock_count = 0
     self._lock_current_shared = None
     self._lock_forced = False
+    # an unmodified copy of the last version of the configuration seen in
+    # WConfd, never handed out; used to request only the changes since then
+    # and to start over from when our copy is outdated
+    self._delta_base = None
+    # modifications done while holding the configuration lock exclusively
+    self._config_changes = None
+    # the configuration data and its serial number last found to need no
+    # upgrades, see _UpgradeConfig
+    self._upgraded = (None, None)
+    # secondary indexes over the configuration data, see
+    # _UnlockedGetConfigIndex
+    self._config_index = None
 
   def _ConfigData(self):
     return self._config_data
 
+  def _UnlockedGetConfigIndex(self):
+    """Returns the secondary indexes over the configuration data.
+
+    The indexes are rebuilt lazily when the configuration has been reloaded
+    or its serial number has changed. While the configuration is locked
+    exclusively they are also dropped whenever a modification is recorded,
+    and not kept at all if the modifications are not tracked individually.
+
+    @rtype: L{ConfigIndex}
+
+    """
+    data = self._ConfigData()
+    index = self._config_index
+    if index is not None and index.IsCurrent(data):
+      return index
+
+    index = ConfigIndex(data)
+    if self._lock_current_shared or \
+       (self._config_changes is not None and not self._config_changes.full):
+      self._config_index = index
+    else:
+      self._config_index = None
+    return index
+
   def OutDate(self):
+    """Marks our copy of the configuration as outdated.
+
+    Modifications of the copy that have not been written are discarded as
+    well, as the next read starts over from the unmodified copy.
+
+    """
     self._config_data = None
 
   def _SetConfigData(self, cfg):
@@ -334,6 +379,8 @@ class ConfigWriter(object):
     disk.UpgradeConfig()
     self._ConfigData().disks[disk.uuid] = disk
     self._ConfigData().cluster.serial_no += 1
+    self._RecordConfigChange("disks", disk.uuid)
+    self._RecordClusterChange()
     self._UnlockedReleaseDRBDMinors(disk.uuid)
 
   def _UnlockedAttachInstanceDisk(self, inst_uuid, disk_uuid, idx=None):
@@ -375,8 +422,11 @@ class ConfigWriter(object):
     _UpdateIvNames(idx, instance_disks[idx:])
     instance.serial_no += 1
     instance.mtime = time.time()
+    self._RecordConfigChange("instances", inst_uuid)
+    for disk in instance_disks[idx:]:
+      self._RecordConfigChange("disks", disk.uuid)
 
-  @ConfigSync()
+  @ConfigSync(tracked=True)
   def AddInstanceDisk(self, inst_uuid, disk, idx=None, replace=False):
     """Add a disk to the config and attach it to instance.
 
@@ -387,7 +437,7 @@ class ConfigWriter(object):
     self._UnlockedAddDisk(disk, replace=replace)
     self._UnlockedAttachInstanceDisk(inst_uuid, disk.uuid, idx)
 
-  @ConfigSync()
+  @ConfigSync(tracked=True)
   def AttachInstanceDisk(self, inst_uuid, disk_uuid, idx=None):
     """Attach an existing disk to an instance.
 
@@ -423,6 +473,9 @@ class ConfigWriter(object):
     _UpdateIvNames(idx, instance_disks[idx:])
     instance.serial_no += 1
     instance.mtime = time.time()
+    self._RecordConfigChange("instances", inst_uuid)
+    for disk in instance_disks[idx:]:
+      self._RecordConfigChange("disks", disk.uuid)
 
   def _UnlockedRemoveDisk(self, disk_uuid):
     """Remove the disk from the configuration.
@@ -444,8 +497,10 @@ class ConfigWriter(object):
     # Remove disk from config file
     del self._ConfigData().disks[disk_uuid]
     self._ConfigData().cluster.serial_no += 1
+    self._RecordConfigChange("disks", disk_uuid)
+    self._RecordClusterChange()
 
-  @ConfigSync()
+  @ConfigSync(tracked=True)
   def RemoveInstanceDisk(self, inst_uuid, disk_uuid):
     """Detach a disk from an instance and remove it from the config.
 
@@ -456,7 +511,7 @@ class ConfigWriter(object):
     self._UnlockedDetachInstanceDisk(inst_uuid, disk_uuid)
     self._UnlockedRemoveDisk(disk_uuid)
 
-  @ConfigSync()
+  @ConfigSync(tracked=True)
   def DetachInstanceDisk(self, inst_uuid, disk_uuid):
     """Detach a disk from an instance.
 
@@ -501,18 +556,15 @@ class ConfigWriter(object):
     @return: the disk object
 
     """
-    disk = None
-    count = 0
-    for d in self._ConfigData().disks.itervalues():
-      if d.name == disk_name:
-        count += 1
-        disk = d
+    disk_uuids = self._UnlockedGetConfigIndex().LookupName("disks", disk_name)
 
-    if count > 1:
+    if len(disk_uuids) > 1:
       raise errors.ConfigurationError("There are %s disks with this name: %s"
-                                      % (count, disk_name))
+                                      % (len(disk_uuids), disk_name))
+    elif disk_uuids:
+      return self._ConfigData().disks[disk_uuids[0]]
 
-    return disk
+    return None
 
   @ConfigSync(shared=1)
   def GetDiskInfoByName(self, disk_name):
@@ -760,6 +812,7 @@ class ConfigWriter(object):
       pool.Reserve(address)
     elif action == constants.RELEASE_ACTION:
       pool.Release(address)
+    self._RecordConfigChange("networks", net_uuid)
 
   def ReleaseIp(self, net_uuid, address, _ec_id):
     """Give a specific IP address back to an IP pool.
@@ -1305,7 +1358,7 @@ class ConfigWriter(object):
     if not self._offline:
       self._wconfd.ReleaseDRBDMinors(disk_uuid)
 
-  @ConfigSync()
+  @ConfigSync(tracked=True)
   def ReleaseDRBDMinors(self, disk_uuid):
     """Release temporary drbd minors allocated for a given disk.
 
@@ -1660,9 +1713,10 @@ class ConfigWriter(object):
         return self._ConfigData().nodegroups.keys()[0]
     if target in self._ConfigData().nodegroups:
       return target
-    for nodegroup in self._ConfigData().nodegroups.values():
-      if nodegroup.name == target:
-        return nodegroup.uuid
+    group_uuids = self._UnlockedGetConfigIndex().LookupName("nodegroups",
+                                                            target)
+    if group_uuids:
+      return group_uuids[0]
     raise errors.OpPrereqError("Node group '%s' not found" % target,
                                errors.ECODE_NOENT)
 
@@ -1851,9 +1905,10 @@ class ConfigWriter(object):
       instance.admin_state_source = admin_state_source
       instance.serial_no += 1
       instance.mtime = time.time()
+      self._RecordConfigChange("instances", inst_uuid)
     return instance
 
-  @ConfigSync()
+  @ConfigSync(tracked=True)
   def MarkInstanceUp(self, inst_uuid):
     """Mark the instance status to up in the config.
 
@@ -1866,7 +1921,7 @@ class ConfigWriter(object):
     return self._SetInstanceStatus(inst_uuid, constants.ADMINST_UP, True,
                                    constants.ADMIN_SOURCE)
 
-  @ConfigSync()
+  @ConfigSync(tracked=True)
   def MarkInstanceOffline(self, inst_uuid):
     """Mark the instance status to down in the config.
 
@@ -1879,7 +1934,7 @@ class ConfigWriter(object):
     return self._SetInstanceStatus(inst_uuid, constants.ADMINST_OFFLINE, False,
                                    constants.ADMIN_SOURCE)
 
-  @ConfigSync()
+  @ConfigSync(tracked=True)
   def RemoveInstance(self, inst_uuid):
     """Remove the instance from the configuration.
 
@@ -1905,8 +1960,10 @@ class ConfigWriter(object):
 
     del self._ConfigData().instances[inst_uuid]
     self._ConfigData().cluster.serial_no += 1
+    self._RecordConfigChange("instances", inst_uuid)
+    self._RecordClusterChange()
 
-  @ConfigSync()
+  @ConfigSync(tracked=True)
   def RenameInstance(self, inst_uuid, new_name):
     """Rename an instance.
 
@@ -1929,11 +1986,14 @@ class ConfigWriter(object):
         disk.logical_id = (disk.logical_id[0],
                            utils.PathJoin(file_storage_dir, inst.name,
                                           os.path.basename(disk.logical_id[1])))
+        self._RecordConfigChange("disks", disk.uuid)
 
     # Force update of ssconf files
     self._ConfigData().cluster.serial_no += 1
+    self._RecordConfigChange("instances", inst_uuid)
+    self._RecordClusterChange()
 
-  @ConfigSync()
+  @ConfigSync(tracked=True)
   def MarkInstanceDown(self, inst_uuid):
     """Mark the status of an instance to down in the configuration.
 
@@ -1947,7 +2007,7 @@ class ConfigWriter(object):
     return self._SetInstanceStatus(inst_uuid, constants.ADMINST_DOWN, None,
                                    constants.ADMIN_SOURCE)
 
-  @ConfigSync()
+  @ConfigSync(tracked=True)
   def MarkInstanceUserDown(self, inst_uuid):
     """Mark the status of an instance to user down in the configuration.
 
@@ -1959,7 +2019,7 @@ class ConfigWriter(object):
     self._SetInstanceStatus(inst_uuid, constants.ADMINST_DOWN, None,
                             constants.USER_SOURCE)
 
-  @ConfigSync()
+  @ConfigSync(tracked=True)
   def MarkInstanceDisksActive(self, inst_uuid):
     """Mark the status of instance disks active.
 
@@ -1969,7 +2029,7 @@ class ConfigWriter(object):
     """
     return self._SetInstanceStatus(inst_uuid, None, True, None)
 
-  @ConfigSync()
+  @ConfigSync(tracked=True)
   def MarkInstanceDisksInactive(self, inst_uuid):
     """Mark the status of instance disks inactive.
 
@@ -1996,21 +2056,20 @@ class ConfigWriter(object):
     """
     return self._UnlockedGetInstanceList()
 
+  @ConfigSync(shared=1)
   def ExpandInstanceName(self, short_name):
     """Attempt to expand an incomplete instance name.
 
     """
-    # Locking is done in L{ConfigWriter.GetAllInstancesInfo}
-    all_insts = self.GetAllInstancesInfo().values()
     expanded_name = _MatchNameComponentIgnoreCase(
-                      short_name, [inst.name for inst in all_insts])
+      short_name, self._UnlockedGetConfigIndex().names["instances"])
 
     if expanded_name is not None:
-      # there has to be exactly one instance with that name
-      inst = (filter(lambda n: n.name == expanded_name, all_insts)[0])
-      return (inst.uuid, inst.name)
-    else:
-      return (None, None)
+      inst = self._UnlockedGetInstanceInfoByName(expanded_name)
+      if inst is not None:
+        return (inst.uuid, inst.name)
+
+    return (None, None)
 
   def _UnlockedGetInstanceInfo(self, inst_uuid):
     """Returns information about an instance.
@@ -2154,9 +2213,10 @@ class ConfigWriter(object):
     return self._UnlockedGetInstanceInfoByName(inst_name)
 
   def _UnlockedGetInstanceInfoByName(self, inst_name):
-    for inst in self._UnlockedGetAllInstancesInfo().values():
-      if inst.name == inst_name:
-        return inst
+    inst_uuids = self._UnlockedGetConfigIndex().LookupName("instances",
+                                                           inst_name)
+    if inst_uuids:
+      return self._ConfigData().instances[inst_uuids[0]]
     return None
 
   def _UnlockedGetInstanceName(self, inst_uuid):
@@ -2189,7 +2249,7 @@ class ConfigWriter(object):
     """
     return self._UnlockedGetInstanceNames(inst_uuids)
 
-  @ConfigSync()
+  @ConfigSync(tracked=True)
   def SetInstancePrimaryNode(self, inst_uuid, target_node_uuid):
     """Sets the primary node of an existing instance
 
@@ -2200,8 +2260,9 @@ class ConfigWriter(object):
 
     """
     self._UnlockedGetInstanceInfo(inst_uuid).primary_node = target_node_uuid
+    self._RecordConfigChange("instances", inst_uuid)
 
-  @ConfigSync()
+  @ConfigSync(tracked=True)
   def SetDiskNodes(self, disk_uuid, nodes):
     """Sets the nodes of an existing disk
 
@@ -2212,8 +2273,9 @@ class ConfigWriter(object):
 
     """
     self._UnlockedGetDiskInfo(disk_uuid).nodes = nodes
+    self._RecordConfigChange("disks", disk_uuid)
 
-  @ConfigSync()
+  @ConfigSync(tracked=True)
   def SetDiskLogicalID(self, disk_uuid, logical_id):
     """Sets the logical_id of an existing disk
 
@@ -2234,6 +2296,7 @@ class ConfigWriter(object):
                                    logical_id)
 
     disk.logical_id = logical_id
+    self._RecordConfigChange("disks", disk_uuid)
 
   def _UnlockedGetInstanceNames(self, inst_uuids):
     return [self._UnlockedGetInstanceName(uuid) for uuid in inst_uuids]
@@ -2280,21 +2343,20 @@ class ConfigWriter(object):
     del self._ConfigData().nodes[node_uuid]
     self._ConfigData().cluster.serial_no += 1
 
+  @ConfigSync(shared=1)
   def ExpandNodeName(self, short_name):
     """Attempt to expand an incomplete node name into a node UUID.
 
     """
-    # Locking is done in L{ConfigWriter.GetAllNodesInfo}
-    all_nodes = self.GetAllNodesInfo().values()
     expanded_name = _MatchNameComponentIgnoreCase(
-                      short_name, [node.name for node in all_nodes])
+      short_name, self._UnlockedGetConfigIndex().names["nodes"])
 
     if expanded_name is not None:
-      # there has to be exactly one node with that name
-      node = (filter(lambda n: n.name == expanded_name, all_nodes)[0])
-      return (node.uuid, node.name)
-    else:
-      return (None, None)
+      node = self._UnlockedGetNodeInfoByName(expanded_name)
+      if node is not None:
+        return (node.uuid, node.name)
+
+    return (None, None)
 
   def _UnlockedGetNodeInfo(self, node_uuid):
     """Get the configuration of a node, as stored in the config.
@@ -2337,13 +2399,9 @@ class ConfigWriter(object):
     @return: a tuple with two lists: the primary and the secondary instances
 
     """
-    pri = []
-    sec = []
-    for inst in self._ConfigData().instances.values():
-      if inst.primary_node == node_uuid:
-        pri.append(inst.uuid)
-      if node_uuid in self._UnlockedGetInstanceSecondaryNodes(inst.uuid):
-        sec.append(inst.uuid)
+    index = self._UnlockedGetConfigIndex()
+    pri = list(index.primary_instances.get(node_uuid, []))
+    sec = list(index.secondary_instances.get(node_uuid, []))
     return (pri, sec)
 
   @ConfigSync(shared=1)
@@ -2356,15 +2414,15 @@ class ConfigWriter(object):
     @return: List of instance UUIDs in node group
 
     """
-    if primary_only:
-      nodes_fn = lambda inst: [inst.primary_node]
-    else:
-      nodes_fn = lambda inst: self._UnlockedGetInstanceNodes(inst.uuid)
-
-    return frozenset(inst.uuid
-                     for inst in self._ConfigData().instances.values()
-                     for node_uuid in nodes_fn(inst)
-                     if self._UnlockedGetNodeInfo(node_uuid).group == uuid)
+    index = self._UnlockedGetConfigIndex()
+    result = set()
+    for node in self._ConfigData().nodes.itervalues():
+      if node.group != uuid:
+        continue
+      result.update(index.primary_instances.get(node.uuid, []))
+      if not primary_only:
+        result.update(index.secondary_instances.get(node.uuid, []))
+    return frozenset(result)
 
   def _UnlockedGetHvparamsString(self, hvname):
     """Return the string representation of the list of hyervisor parameters of
@@ -2486,9 +2544,9 @@ class ConfigWriter(object):
     return self._UnlockedGetAllNodesInfo()
 
   def _UnlockedGetNodeInfoByName(self, node_name):
-    for node in self._UnlockedGetAllNodesInfo().values():
-      if node.name == node_name:
-        return node
+    node_uuids = self._UnlockedGetConfigIndex().LookupName("nodes", node_name)
+    if node_uuids:
+      return self._ConfigData().nodes[node_uuids[0]]
     return None
 
   @ConfigSync(shared=1)
@@ -2513,9 +2571,10 @@ class ConfigWriter(object):
           information is available
 
     """
-    for nodegroup in self._UnlockedGetAllNodeGroupsInfo().values():
-      if nodegroup.name == nodegroup_name:
-        return nodegroup
+    group_uuids = self._UnlockedGetConfigIndex().LookupName("nodegroups",
+                                                            nodegroup_name)
+    if group_uuids:
+      return self._ConfigData().nodegroups[group_uuids[0]]
     return None
 
   def _UnlockedGetNodeName(self, node_spec):
@@ -2671,6 +2730,22 @@ class ConfigWriter(object):
     if node_uuid not in self._ConfigData().nodegroups[nodegroup_uuid].members:
       self._ConfigData().nodegroups[nodegroup_uuid].members.append(node_uuid)
 
+  def _UnlockedRebuildNodeGroupMembers(self):
+    """Recompute the members of all node groups from the nodes.
+
+    Nodes without a group are assigned to the default one.
+
+    """
+    members = dict((uuid, []) for uuid in self._ConfigData().nodegroups)
+    for node in self._ConfigData().nodes.values():
+      if not node.group:
+        node.group = self._UnlockedLookupNodeGroup(None)
+      if node.group not in members:
+        raise errors.OpExecError("Unknown node group: %s" % node.group)
+      members[node.group].append(node.uuid)
+    for (uuid, nodegroup) in self._ConfigData().nodegroups.items():
+      nodegroup.members = members[uuid]
+
   def _UnlockedRemoveNodeFromGroup(self, node):
     """Remove a given node from its group.
 
@@ -2776,7 +2851,7 @@ class ConfigWriter(object):
             self._AllNICs() +
             [self._ConfigData().cluster])
 
-  def GetConfigManager(self, shared=False, forcelock=False):
+  def GetConfigManager(self, shared=False, forcelock=False, tracked=False):
     """Returns a ConfigManager, which is suitable to perform a synchronized
     block of configuration operations.
 
@@ -2784,7 +2859,39 @@ class ConfigWriter(object):
     runs inside the block should be very fast, preferably not using any IO.
     """
 
-    return ConfigManager(self, shared=shared, forcelock=forcelock)
+    return ConfigManager(self, shared=shared, forcelock=forcelock,
+                         tracked=tracked)
+
+  def _RecordConfigChange(self, kind, uuid):
+    """Records the modification of a top-level configuration object.
+
+    Only the recorded objects are sent to WConfd when the configuration is
+    written, unless L{_RecordFullConfigChange} has been called as well.
+
+    @type kind: string
+    @param kind: the container of the object, e.g. C{"instances"}
+    @type uuid: string
+    @param uuid: the UUID of the added, modified or removed object
+
+    """
+    self._config_index = None
+    if self._config_changes is not None:
+      self._config_changes.Record(kind, uuid)
+
+  def _RecordClusterChange(self):
+    """Records the modification of the cluster object.
+
+    """
+    if self._config_changes is not None:
+      self._config_changes.cluster = True
+
+  def _RecordFullConfigChange(self):
+    """Records modifications that require writing the whole configuration.
+
+    """
+    self._config_index = None
+    if self._config_changes is not None:
+      self._config_changes.full = True
 
   def _AddLockCount(self, count):
     self._lock_count += count
@@ -2807,6 +2914,8 @@ class ConfigWriter(object):
         return # we already have the lock, do nothing
     else:
       self._lock_current_shared = shared
+      if not (shared or self._offline):
+        self._config_changes = ConfigChanges()
     if force:
       self._lock_forced = True
     # Read the configuration data. If offline, read the file directly.
@@ -2849,33 +2958,62 @@ class ConfigWriter(object):
       # Upgrade configuration if needed
       self._UpgradeConfig(saveafter=True)
     else:
+      # If we have an older version of the configuration, only ask WConfd
+      # for the changes since then
+      base = self._delta_base
+      dict_data = None
+      delta = None
+      new_objects = None
       if shared and not force:
         if self._config_data is None:
           logging.debug("Requesting config, as I have no up-to-date copy")
-          dict_data = self._wconfd.ReadConfig()
+          if base is not None:
+            delta = self._wconfd.ReadConfigDelta(base.serial_no)
+          if delta is None:
+            dict_data = self._wconfd.ReadConfig()
         else:
           logging.debug("My config copy is up to date.")
-          dict_data = None
       else:
         # poll until we acquire the lock
         while True:
-          dict_data = \
-              self._wconfd.LockConfig(self._GetWConfdContext(), bool(shared))
+          if base is None:
+            dict_data = \
+                self._wconfd.LockConfig(self._GetWConfdContext(), bool(shared))
+            acquired = dict_data is not None
+          else:
+            (acquired, delta) = \
+                self._wconfd.LockConfigDelta(self._GetWConfdContext(),
+                                             bool(shared), base.serial_no)
           logging.debug("Received config from WConfd.LockConfig [shared=%s]",
                         bool(shared))
-          if dict_data is not None:
+          if acquired:
             break
           time.sleep(random.random())
+        if base is not None and delta is None:
+          logging.debug("WConfd doesn't know my config copy any more,"
+                        " requesting the full config")
+          dict_data = self._wconfd.ReadConfig()
 
+      copied = False
       try:
         if dict_data is not None:
+          self._delta_base = objects.ConfigData.FromDict(dict_data)
           self._SetConfigData(objects.ConfigData.FromDict(dict_data))
+        elif delta is not None:
+          if self._config_data is None:
+            self._SetConfigData(self._CopyDeltaBase())
+            copied = True
+          new_objects = ApplyConfigDelta(self._config_data, delta)
+          ApplyConfigDelta(base, delta)
       except Exception, err:
         raise errors.ConfigurationError(err)
+      if copied:
+        # node group members aren't kept by all copies of the objects
+        self._UnlockedRebuildNodeGroupMembers()
 
       # Transitional fix until ConfigWriter is completely rewritten into
       # Haskell
-      self._UpgradeConfig()
+      self._UpgradeConfig(new_objects=new_objects)
 
   def _CloseConfig(self, save):
     """Release resources relating the config data.
@@ -2890,50 +3028,96 @@ class ConfigWriter(object):
       except Exception, err:
         logging.critical("Can't write the configuration: %s", str(err))
         raise
+      finally:
+        self._config_changes = None
     elif not self._offline and \
          not (self._lock_current_shared and not self._lock_forced):
       logging.debug("Unlocking configuration without writing")
       self._wconfd.UnlockConfig(self._GetWConfdContext())
       self._lock_forced = False
+      if self._config_changes is not None:
+        # the modifications of a failed operation are not written, so our
+        # copy can't be used any more
+        self._config_changes = None
+        self._config_data = None
 
   # TODO: To WConfd
-  def _UpgradeConfig(self, saveafter=False):
+  def _UpgradeConfig(self, saveafter=False, new_objects=None):
     """Run any upgrade steps.
 
     This method performs both in-object upgrades and also update some data
     elements that need uniqueness across the whole configuration or interact
     with other objects.
 
+    When online, a configuration that has already been found not to need any
+    upgrades is not looked at again until its serial number changes, as
+    objects are only modified through this class after that. If only some of
+    its top-level objects have been replaced in the meantime, only those are
+    upgraded.
+
+    @type new_objects: list of L{objects.ConfigObject}
+    @param new_objects: the top-level objects replaced since the previous
+        upgrade of the same configuration data, if known
     @warning: if 'saveafter' is 'True', this function will call
         L{_WriteConfig()} so it needs to be called only from a
         "safe" place.
 
     """
-    # Keep a copy of the persistent part of _config_data to check for changes
-    # Serialization doesn't guarantee order in dictionaries
-    oldconf = copy.deepcopy(self._ConfigData().ToDict())
+    data = self._ConfigData()
+    (upgraded_data, upgraded_serial) = self._upgraded
+    if self._offline or upgraded_data is not data:
+      new_objects = None
+    elif new_objects is None and upgraded_serial == data.serial_no:
+      return
 
-    # In-object upgrades
-    self._ConfigData().UpgradeConfig()
+    if new_objects is None:
+      # Keep a copy of the persistent part of _config_data to check for changes
+      # Serialization doesn't guarantee order in dictionaries
+      oldconf = copy.deepcopy(data.ToDict())
 
-    for item in self._AllUUIDObjects():
+      # In-object upgrades
+      data.UpgradeConfig()
+
+      uuid_objects = self._AllUUIDObjects()
+      regroup = True
+    else:
+      oldconf = [copy.deepcopy(obj.ToDict()) for obj in new_objects]
+
+      uuid_objects = list(new_objects)
+      regroup = False
+      for obj in new_objects:
+        obj.UpgradeConfig()
+        if isinstance(obj, objects.NodeGroup):
+          objects.InstancePolicy.UpgradeDiskTemplates(
+            obj.ipolicy, data.cluster.enabled_disk_templates)
+        elif isinstance(obj, objects.Instance):
+          uuid_objects.extend(obj.nics)
+        regroup = regroup or isinstance(obj, (objects.Node, objects.NodeGroup))
+
+    for item in uuid_objects:
       if item.uuid is None:
         item.uuid = self._GenerateUniqueID(_UPGRADE_CONFIG_JID)
-    if not self._ConfigData().nodegroups:
+    if not data.nodegroups:
       default_nodegroup_name = constants.INITIAL_NODE_GROUP_NAME
       default_nodegroup = objects.NodeGroup(name=default_nodegroup_name,
                                             members=[])
       self._UnlockedAddNodeGroup(default_nodegroup, _UPGRADE_CONFIG_JID, True)
-    for node in self._ConfigData().nodes.values():
-      if not node.group:
-        node.group = self._UnlockedLookupNodeGroup(None)
+      regroup = True
+    if regroup:
       # This is technically *not* an upgrade, but needs to be done both when
       # nodegroups are being added, and upon normally loading the config,
       # because the members list of a node group is discarded upon
       # serializing/deserializing the object.
-      self._UnlockedAddNodeToGroup(node.uuid, node.group)
+      self._UnlockedRebuildNodeGroupMembers()
 
-    modified = (oldconf != self._ConfigData().ToDict())
+    if new_objects is None:
+      modified = (oldconf != data.ToDict())
+    else:
+      modified = (oldconf != [obj.ToDict() for obj in new_objects])
+    if modified:
+      self._RecordFullConfigChange()
+    else:
+      self._upgraded = (data, data.serial_no)
     if modified and saveafter:
       self._WriteConfig()
       self._UnlockedDropECReservations(_UPGRADE_CONFIG_JID)
@@ -2970,24 +3154,94 @@ class ConfigWriter(object):
       finally:
         os.close(fd)
     else:
+      changes = self._config_changes
+      if changes is None or changes.full:
+        data = self._ConfigData().ToDict()
+        write_fn = self._wconfd.WriteConfig
+        write_unlock_fn = self._wconfd.WriteConfigAndUnlock
+      else:
+        logging.debug("Writing only the modified configuration objects")
+        data = changes.ToDelta(self._ConfigData())
+        write_fn = self._wconfd.WriteConfigDelta
+        write_unlock_fn = self._wconfd.WriteConfigDeltaAndUnlock
       try:
         if releaselock:
-          res = self._wconfd.WriteConfigAndUnlock(self._GetWConfdContext(),
-                                                  self._ConfigData().ToDict())
-          if not res:
+          version = write_unlock_fn(self._GetWConfdContext(), data)
+          if version is None:
             logging.warning("WriteConfigAndUnlock indicates we already have"
                             " released the lock; assuming this was just a retry"
                             " and the initial call succeeded")
         else:
-          self._wconfd.WriteConfig(self._GetWConfdContext(),
-                                   self._ConfigData().ToDict())
+          version = write_fn(self._GetWConfdContext(), data)
       except errors.LockError:
         raise errors.ConfigurationError("The configuration file has been"
                                         " modified since the last write, cannot"
                                         " update")
+      self._UpdateDeltaBase(changes, version)
 
     self.write_count += 1
 
+  def _CopyDeltaBase(self):
+    """Returns a copy of the unmodified configuration to work on.
+
+    If the unmodified configuration has been found not to need upgrades,
+    neither does the copy.
+
+    @rtype: L{objects.ConfigData}
+
+    """
+    base = self._delta_base
+    data = copy.deepcopy(base)
+    if self._upgraded[1] == base.serial_no:
+      self._upgraded = (data, base.serial_no)
+    return data
+
+  def _UpdateDeltaBase(self, changes, version):
+    """Brings the unmodified copy of the configuration up to date.
+
+    Called after our copy has been written to WConfd, so that both copies
+    carry the serial number and modification time WConfd has assigned.
+
+    @type changes: L{ConfigChanges} or None
+    @param changes: the recorded modifications, if only they were written
+    @type version: tuple or None
+    @param version: the serial number and the modification time of the
+        written configuration, if returned by WConfd
+
+    """
+    data = self._ConfigData()
+    base = self._delta_base
+    full = changes is None or changes.full
+    if not version or (base is None and not full):
+      # we can't tell which version of the configuration we have, start
+      # over with the next read
+      self._delta_base = None
+      return
+
+    if full:
+      base = copy.deepcopy(data)
+    else:
+      if changes.cluster:
+        base.cluster = copy.deepcopy(data.cluster)
+      for (kind, uuids) in changes.modified.items():
+        container = getattr(data, kind)
+        base_container = getattr(base, kind)
+        for uuid in uuids:
+          obj = container.get(uuid)
+          if obj is None:
+            base_container.pop(uuid, None)
+          else:
+            base_container[uuid] = copy.deepcopy(obj)
+
+    (serial_no, mtime) = version
+    (upgraded_data, upgraded_serial) = self._upgraded
+    if upgraded_data is data and upgraded_serial == data.serial_no:
+      self._upgraded = (data, serial_no)
+    for cfg in (data, base):
+      cfg.serial_no = serial_no
+      cfg.mtime = mtime
+    self._delta_base = base
+
   def _GetAllHvparamsStrings(self, hypervisors):
     """Get the hvparams of all given hypervisors from the config.
 
@@ -3191,6 +3445,9 @@ class ConfigWriter(object):
     that all modified objects will be saved, but the target argument
     is the one the caller wants to ensure that it's saved.
 
+    Callers are free to modify other objects before calling this function,
+    so the whole configuration is written and not just a delta.
+
     @param target: an instance of either L{objects.Cluster},
         L{objects.Node} or L{objects.Instance} which is existing in
         the cluster
@@ -3364,9 +3621,9 @@ class ConfigWriter(object):
       return None
     if target in self._ConfigData().networks:
       return target
-    for net in self._ConfigData().networks.values():
-      if net.name == target:
-        return net.uuid
+    net_uuids = self._UnlockedGetConfigIndex().LookupName("networks", target)
+    if net_uuids:
+      return net_uuids[0]
     raise errors.OpPrereqError("Network '%s' not found" % target,
                                errors.ECODE_NOENT)
 
@@ -3543,9 +3800,7 @@ class ConfigWriter(object):
     @rtype: string
     @return: uuid of instance the disk is attached to.
     """
-    for inst_uuid, inst_info in self._UnlockedGetAllInstancesInfo().items():
-      if disk_uuid in inst_info.disks:
-        return inst_uuid
+    return self._UnlockedGetConfigIndex().disk_instance.get(disk_uuid)
 
 
 class DetachedConfig(ConfigWriter):
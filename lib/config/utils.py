@@ -33,29 +33,225 @@
 
 import logging
 
+from ganeti import objects
+from ganeti import outils
 
-def ConfigSync(shared=0):
+
+#: Top-level containers of L{objects.ConfigData} whose modifications can be
+#: sent to WConfd individually, and the classes of their objects
+DELTA_CONTAINERS = {
+  "nodes": objects.Node,
+  "nodegroups": objects.NodeGroup,
+  "instances": objects.Instance,
+  "networks": objects.Network,
+  "disks": objects.Disk,
+  }
+
+#: Top-level containers of L{objects.ConfigData} indexed by name in
+#: L{ConfigIndex}
+INDEXED_CONTAINERS = frozenset([
+  "nodes",
+  "nodegroups",
+  "instances",
+  "networks",
+  "disks",
+  ])
+
+
+def ConfigSync(shared=0, tracked=False):
   """Configuration synchronization decorator.
 
+  @param tracked: for exclusive operations, whether the decorated function
+      records all the configuration objects it modifies; if not, the whole
+      configuration is written back
+
   """
   def wrap(fn):
     def sync_function(*args, **kwargs):
-      with args[0].GetConfigManager(shared):
+      with args[0].GetConfigManager(shared, tracked=tracked):
         return fn(*args, **kwargs)
     return sync_function
   return wrap
 
 
+class ConfigChanges(object):
+  """Records the configuration objects modified while holding the lock.
+
+  @ivar full: whether modifications have been done that are not recorded
+      individually, so that the whole configuration has to be written
+  @ivar cluster: whether the cluster object has been modified
+  @ivar modified: for each of L{DELTA_CONTAINERS}, the set of UUIDs of
+      added, modified or removed objects
+
+  """
+  def __init__(self):
+    self.full = False
+    self.cluster = False
+    self.modified = dict((kind, set()) for kind in DELTA_CONTAINERS)
+
+  def Record(self, kind, uuid):
+    """Records a modification of a top-level object.
+
+    @type kind: string
+    @param kind: one of L{DELTA_CONTAINERS}
+    @type uuid: string
+    @param uuid: the UUID of the added, modified or removed object
+
+    """
+    self.modified[kind].add(uuid)
+
+  def ToDelta(self, config_data):
+    """Builds the delta to be applied by WConfd.
+
+    @type config_data: L{objects.ConfigData}
+    @param config_data: the modified configuration
+    @rtype: dict
+    @return: the current state of all recorded objects; removed objects map
+        to C{None}
+
+    """
+    assert not self.full, "Full configuration changes can't be sent as delta"
+
+    delta = {
+      "serial_no": config_data.serial_no,
+      }
+    if self.cluster:
+      delta["cluster"] = config_data.cluster.ToDict()
+    for (kind, uuids) in self.modified.items():
+      container = getattr(config_data, kind)
+      objs = {}
+      for uuid in uuids:
+        obj = container.get(uuid)
+        if obj is None:
+          objs[uuid] = None
+        else:
+          objs[uuid] = obj.ToDict()
+      delta[kind] = objs
+    return delta
+
+
+def ApplyConfigDelta(config_data, delta):
+  """Applies a delta received from WConfd to a configuration.
+
+  The objects are replaced rather than updated, so references to the old
+  objects held elsewhere are not affected.
+
+  @type config_data: L{objects.ConfigData}
+  @param config_data: the configuration to update in place
+  @type delta: dict
+  @param delta: the delta, as returned by C{ReadConfigDelta}
+  @rtype: list of L{objects.ConfigObject} or None
+  @return: the new objects, or C{None} if the cluster object has been
+      replaced, which affects the whole configuration
+
+  """
+  new_objects = []
+  for (kind, cls) in DELTA_CONTAINERS.items():
+    container = getattr(config_data, kind)
+    for (uuid, value) in delta[kind].items():
+      if value is None:
+        container.pop(uuid, None)
+      else:
+        obj = cls.FromDict(value)
+        container[uuid] = obj
+        new_objects.append(obj)
+
+  if delta.get("filters") is not None:
+    config_data.filters = outils.ContainerFromDicts(delta["filters"], dict,
+                                                    objects.Filter)
+
+  config_data.serial_no = delta["serial_no"]
+  if delta.get("mtime") is not None:
+    config_data.mtime = delta["mtime"]
+
+  if delta.get("cluster") is not None:
+    config_data.cluster = objects.Cluster.FromDict(delta["cluster"])
+    return None
+
+  return new_objects
+
+
+class ConfigIndex(object):
+  """Secondary indexes over a loaded configuration.
+
+  The indexes reflect the configuration at the time they were built and
+  must be discarded once it has been modified, see L{IsCurrent}.
+
+  @ivar names: for each of L{INDEXED_CONTAINERS}, a dictionary mapping
+      object names to the list of UUIDs of the objects with that name
+  @ivar primary_instances: node UUID to the set of UUIDs of the instances
+      having it as primary node
+  @ivar secondary_instances: node UUID to the set of UUIDs of the instances
+      having it as secondary node
+  @ivar disk_instance: disk UUID to the UUID of the instance it is attached to
+
+  """
+  def __init__(self, config_data):
+    self._config_data = config_data
+    self._serial_no = config_data.serial_no
+
+    self.names = {}
+    for kind in INDEXED_CONTAINERS:
+      names = {}
+      for (uuid, obj) in getattr(config_data, kind).iteritems():
+        names.setdefault(obj.name, []).append(uuid)
+      self.names[kind] = names
+
+    self.primary_instances = {}
+    self.secondary_instances = {}
+    self.disk_instance = {}
+    for (inst_uuid, inst) in config_data.instances.iteritems():
+      self.primary_instances.setdefault(inst.primary_node,
+                                        set()).add(inst_uuid)
+      inst_nodes = set()
+      for disk_uuid in inst.disks:
+        self.disk_instance[disk_uuid] = inst_uuid
+        disk = config_data.disks.get(disk_uuid)
+        if disk is not None:
+          inst_nodes.update(disk.all_nodes)
+      inst_nodes.discard(inst.primary_node)
+      for node_uuid in inst_nodes:
+        self.secondary_instances.setdefault(node_uuid, set()).add(inst_uuid)
+
+  def IsCurrent(self, config_data):
+    """Checks whether the indexes were built for a configuration.
+
+    @type config_data: L{objects.ConfigData}
+    @param config_data: the configuration currently in use
+    @rtype: bool
+
+    """
+    return (self._config_data is config_data and
+            self._serial_no == config_data.serial_no)
+
+  def LookupName(self, kind, name):
+    """Returns the UUIDs of the objects with a given name.
+
+    @type kind: string
+    @param kind: one of L{INDEXED_CONTAINERS}
+    @type name: string
+    @param name: the name to look for
+    @rtype: list of strings
+
+    """
+    container = getattr(self._config_data, kind)
+    # objects renamed in place since the index was built are ignored
+    return [uuid for uuid in self.names[kind].get(name, [])
+            if uuid in container and container[uuid].name == name]
+
+
 class ConfigManager(object):
   """Locks the configuration and exposes it to be read or modified.
 
   """
-  def __init__(self, config_writer, shared=False, forcelock=False):
+  def __init__(self, config_writer, shared=False, forcelock=False,
+               tracked=False):
     assert hasattr(config_writer, '_ConfigData'), \
            "invalid argument: Not a ConfigWriter"
     self._config_writer = config_writer
     self._shared = shared
     self._forcelock = forcelock
+    self._tracked = tracked
 
   def __enter__(self):
     try:
@@ -69,6 +265,8 @@ class ConfigManager(object):
       except Exception: # pylint: disable=W0703
         logging.debug("Closing configuration failed as well")
       raise
+    if not (self._shared or self._tracked):
+      self._config_writer._RecordFullConfigChange() # pylint: disable=W0212
 
   def __exit__(self, exc_type, exc_value, traceback):
     # save the configuration, if this was a write opreration that succeeded
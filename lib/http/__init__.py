@@ -37,6 +37,7 @@ import OpenSSL
 import select
 import socket
 import errno
+import types
 
 from cStringIO import StringIO
 
@@ -67,6 +68,7 @@ HTTP_DATE = "Date"
 HTTP_USER_AGENT = "User-Agent"
 HTTP_CONTENT_TYPE = "Content-Type"
 HTTP_CONTENT_LENGTH = "Content-Length"
+HTTP_TRANSFER_ENCODING = "Transfer-Encoding"
 HTTP_CONNECTION = "Connection"
 HTTP_KEEP_ALIVE = "Keep-Alive"
 HTTP_WWW_AUTHENTICATE = "WWW-Authenticate"
@@ -689,6 +691,15 @@ class HttpServerToClientStartLine(object):
     return "%s %s %s" % (self.version, self.code, self.reason)
 
 
+def IsStreamedBody(body):
+  """Checks whether a message body is generated while being sent.
+
+  Such bodies are generators yielding the body in chunks of strings.
+
+  """
+  return isinstance(body, types.GeneratorType)
+
+
 class HttpMessageWriter(object):
   """Writes an HTTP message to a socket.
 
@@ -696,6 +707,10 @@ class HttpMessageWriter(object):
   def __init__(self, sock, msg, write_timeout):
     """Initializes this class and writes an HTTP message to a socket.
 
+    If the message body is a generator (see L{IsStreamedBody}), it is sent
+    using the chunked transfer coding for HTTP/1.1 messages, without
+    building the whole body in memory.
+
     @type sock: socket
     @param sock: Socket to be written to
     @type msg: http.HttpMessage
@@ -705,28 +720,41 @@ class HttpMessageWriter(object):
 
     """
     self._msg = msg
+    self._chunked = False
 
     self._PrepareMessage()
 
-    buf = self._FormatMessage()
-
-    pos = 0
-    end = len(buf)
-    while pos < end:
-      # Send only SOCK_BUF_SIZE bytes at a time
-      data = buf[pos:(pos + SOCK_BUF_SIZE)]
+    _SendAll(sock, self._FormatMessage(), write_timeout)
 
-      sent = SocketOperation(sock, SOCKOP_SEND, data, write_timeout)
-
-      # Remove sent bytes
-      pos += sent
-
-    assert pos == end, "Message wasn't sent completely"
+    if self._chunked and self.HasMessageBody():
+      try:
+        for chunk in self._msg.body:
+          if chunk:
+            _SendAll(sock, "%x\r\n%s\r\n" % (len(chunk), chunk),
+                     write_timeout)
+      except (HttpError, HttpSocketTimeout, socket.error):
+        raise
+      except Exception, err:
+        # The status line has already been sent, the only way left to signal
+        # the error is to not terminate the body
+        logging.exception("Error while generating message body")
+        raise HttpError("Error while generating message body: %s" % err)
+
+      _SendAll(sock, "0\r\n\r\n", write_timeout)
 
   def _PrepareMessage(self):
     """Prepares the HTTP message by setting mandatory headers.
 
     """
+    if IsStreamedBody(self._msg.body):
+      if self._msg.start_line.version == HTTP_1_1:
+        self._chunked = True
+        self._msg.headers[HTTP_TRANSFER_ENCODING] = "chunked"
+        return
+
+      # Older clients don't support the chunked transfer coding
+      self._msg.body = "".join(self._msg.body)
+
     # RFC2616, section 4.3: "The presence of a message-body in a request is
     # signaled by the inclusion of a Content-Length or Transfer-Encoding header
     # field in the request's message-headers."
@@ -750,9 +778,10 @@ class HttpMessageWriter(object):
 
     buf.write("\r\n")
 
-    # Add message body if needed
+    # Add message body if needed; streamed bodies are sent separately
     if self.HasMessageBody():
-      buf.write(self._msg.body)
+      if not self._chunked:
+        buf.write(self._msg.body)
 
     elif self._msg.body:
       logging.warning("Ignoring message body")
@@ -768,6 +797,31 @@ class HttpMessageWriter(object):
     return bool(self._msg.body)
 
 
+def _SendAll(sock, buf, write_timeout):
+  """Sends a buffer to a socket.
+
+  @type sock: socket
+  @param sock: Socket to be written to
+  @type buf: string
+  @param buf: Data to be sent
+  @type write_timeout: float
+  @param write_timeout: Write timeout for socket
+
+  """
+  pos = 0
+  end = len(buf)
+  while pos < end:
+    # Send only SOCK_BUF_SIZE bytes at a time
+    data = buf[pos:(pos + SOCK_BUF_SIZE)]
+
+    sent = SocketOperation(sock, SOCKOP_SEND, data, write_timeout)
+
+    # Remove sent bytes
+    pos += sent
+
+  assert pos == end, "Message wasn't sent completely"
+
+
 class HttpMessageReader(object):
   """Reads HTTP message from socket.
 
@@ -782,7 +836,7 @@ class HttpMessageReader(object):
   PS_BODY = "entity-body"
   PS_COMPLETE = "complete"
 
-  def __init__(self, sock, msg, read_timeout):
+  def __init__(self, sock, msg, read_timeout, initial_data=None):
     """Reads an HTTP message from a socket.
 
     @type sock: socket
@@ -791,6 +845,8 @@ class HttpMessageReader(object):
     @param msg: Object for the read message
     @type read_timeout: float
     @param read_timeout: Read timeout for socket
+    @type initial_data: string or None
+    @param initial_data: Data of the message already read from the socket
 
     """
     self.sock = sock
@@ -805,6 +861,10 @@ class HttpMessageReader(object):
 
     buf = ""
     eof = False
+
+    if initial_data:
+      buf = self._ContinueParsing(initial_data, eof)
+
     while self.parser_status != self.PS_COMPLETE:
       # TODO: Don't read more than necessary (Content-Length), otherwise
       # data might be lost and/or an error could occur
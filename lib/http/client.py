@@ -32,8 +32,10 @@
 """
 
 import logging
+import os
 import pycurl
 import threading
+import time
 from cStringIO import StringIO
 
 from ganeti import http
@@ -130,13 +132,16 @@ class HttpClientRequest(object):
     return "https://%s%s" % (address, self.path)
 
 
-def _StartRequest(curl, req):
+def _StartRequest(curl, req, ssl_session_cache=False):
   """Starts a request on a cURL object.
 
   @type curl: pycurl.Curl
   @param curl: cURL object
   @type req: L{HttpClientRequest}
   @param req: HTTP request
+  @type ssl_session_cache: bool
+  @param ssl_session_cache: Whether to cache SSL session IDs, which is only
+      useful for cURL objects used for several requests
 
   """
   logging.debug("Starting request %r", req)
@@ -170,9 +175,9 @@ def _StartRequest(curl, req):
   else:
     curl.setopt(pycurl.TIMEOUT, int(req.read_timeout))
 
-  # Disable SSL session ID caching (pycurl >= 7.16.0)
+  # Configure SSL session ID caching (pycurl >= 7.16.0)
   if hasattr(pycurl, "SSL_SESSIONID_CACHE"):
-    curl.setopt(pycurl.SSL_SESSIONID_CACHE, False)
+    curl.setopt(pycurl.SSL_SESSIONID_CACHE, ssl_session_cache)
 
   curl.setopt(pycurl.WRITEFUNCTION, resp_buffer.write)
 
@@ -242,6 +247,161 @@ class _PendingRequest(object):
       req.completion_cb(req)
 
 
+class CurlPool(object):
+  """Pool of reusable cURL objects.
+
+  cURL keeps connections open after a request if the server allows it. By
+  reusing cURL objects for requests to the same destination, further
+  requests avoid setting up a new TCP connection and SSL session.
+
+  Idle cURL objects are closed after a timeout. Objects inherited by a
+  forked child process are never used, as their connections are shared with
+  the parent.
+
+  """
+  #: Default maximum number of idle cURL objects per destination
+  MAX_IDLE_PER_HOST = 4
+
+  #: Default maximum number of idle cURL objects in total
+  MAX_IDLE = 256
+
+  #: Default number of seconds after which idle cURL objects are closed
+  IDLE_TIMEOUT = 10.0
+
+  def __init__(self, max_idle_per_host=MAX_IDLE_PER_HOST, max_idle=MAX_IDLE,
+               idle_timeout=IDLE_TIMEOUT, _curl=pycurl.Curl,
+               _time_fn=time.time, _getpid_fn=os.getpid):
+    """Initializes this class.
+
+    @type max_idle_per_host: int
+    @param max_idle_per_host: Maximum number of idle cURL objects kept for
+        a single destination
+    @type max_idle: int
+    @param max_idle: Maximum number of idle cURL objects kept in total
+    @type idle_timeout: float
+    @param idle_timeout: Number of seconds after which an idle cURL object is
+        closed; should be shorter than the server's keep-alive timeout
+
+    """
+    self._max_idle_per_host = max_idle_per_host
+    self._max_idle = max_idle
+    self._idle_timeout = idle_timeout
+    self._curl = _curl
+    self._time_fn = _time_fn
+    self._getpid_fn = _getpid_fn
+
+    self._lock = threading.Lock()
+    self._pid = _getpid_fn()
+
+    # Destination (host and port) to list of (last use, cURL object)
+    self._idle = {}
+    self._idle_count = 0
+
+    # cURL objects inherited from the parent process, see L{_CheckProcess}
+    self._inherited = []
+
+  def _CheckProcess(self):
+    """Forgets about cURL objects inherited from the parent process.
+
+    Closing them would also shut down the connections used by the parent, so
+    they're just kept referenced.
+
+    """
+    pid = self._getpid_fn()
+    if pid != self._pid:
+      for handles in self._idle.values():
+        self._inherited.extend(curl for (_, curl) in handles)
+      self._idle.clear()
+      self._idle_count = 0
+      self._pid = pid
+
+  def _Expire(self, now):
+    """Closes cURL objects which have been idle for too long.
+
+    """
+    for (key, handles) in self._idle.items():
+      while handles and handles[0][0] + self._idle_timeout < now:
+        (_, curl) = handles.pop(0)
+        self._idle_count -= 1
+        curl.close()
+
+      if not handles:
+        del self._idle[key]
+
+  def Get(self, host, port):
+    """Returns a cURL object for a request.
+
+    @type host: string
+    @param host: Destination host
+    @type port: int
+    @param port: Destination port
+
+    """
+    self._lock.acquire()
+    try:
+      self._CheckProcess()
+      self._Expire(self._time_fn())
+
+      handles = self._idle.get((host, port))
+      if handles:
+        # Use the most recently used object, its connection is the least
+        # likely to have been closed by the server
+        (_, curl) = handles.pop()
+        self._idle_count -= 1
+        return curl
+    finally:
+      self._lock.release()
+
+    return self._curl()
+
+  def Put(self, host, port, curl):
+    """Returns a cURL object to the pool after a request.
+
+    @type host: string
+    @param host: Destination host of the finished request
+    @type port: int
+    @param port: Destination port of the finished request
+    @type curl: pycurl.Curl
+    @param curl: cURL object
+
+    """
+    self._lock.acquire()
+    try:
+      self._CheckProcess()
+
+      now = self._time_fn()
+      self._Expire(now)
+
+      handles = self._idle.setdefault((host, port), [])
+      if (len(handles) < self._max_idle_per_host and
+          self._idle_count < self._max_idle):
+        handles.append((now, curl))
+        self._idle_count += 1
+        return
+
+      if not handles:
+        del self._idle[(host, port)]
+    finally:
+      self._lock.release()
+
+    curl.close()
+
+  def Close(self):
+    """Closes all idle cURL objects.
+
+    """
+    self._lock.acquire()
+    try:
+      self._CheckProcess()
+      for handles in self._idle.values():
+        for (_, curl) in handles:
+          curl.close()
+      self._idle.clear()
+      self._idle_count = 0
+    finally:
+      self._lock.release()
+
+
 class _NoOpRequestMonitor(object): # pylint: disable=W0232
   """No-op request monitor.
 
@@ -352,14 +512,17 @@ def _ProcessCurlRequests(multi, requests):
     multi.select(1.0)
 
 
-def ProcessRequests(requests, lock_monitor_cb=None, _curl=pycurl.Curl,
-                    _curl_multi=pycurl.CurlMulti,
+def ProcessRequests(requests, lock_monitor_cb=None, curl_pool=None,
+                    _curl=pycurl.Curl, _curl_multi=pycurl.CurlMulti,
                     _curl_process=_ProcessCurlRequests):
   """Processes any number of HTTP client requests.
 
   @type requests: list of L{HttpClientRequest}
   @param requests: List of all requests
   @param lock_monitor_cb: Callable for registering with lock monitor
+  @type curl_pool: L{CurlPool} or None
+  @param curl_pool: Pool to take cURL objects from and return them to
+      afterwards, so that connections are reused
 
   """
   assert compat.all((req.error is None and
@@ -369,9 +532,15 @@ def ProcessRequests(requests, lock_monitor_cb=None, _curl=pycurl.Curl,
                     for req in requests)
 
   # Prepare all requests
+  if curl_pool is None:
+    start_fn = lambda req: _StartRequest(_curl(), req)
+  else:
+    start_fn = lambda req: _StartRequest(curl_pool.Get(req.host, req.port),
+                                         req, ssl_session_cache=True)
+
   curl_to_client = \
     dict((client.GetCurlHandle(), client)
-         for client in map(lambda req: _StartRequest(_curl(), req), requests))
+         for client in map(start_fn, requests))
 
   assert len(curl_to_client) == len(requests)
 
@@ -386,10 +555,15 @@ def ProcessRequests(requests, lock_monitor_cb=None, _curl=pycurl.Curl,
   for (curl, msg) in _curl_process(_curl_multi(), curl_to_client.keys()):
     monitor.acquire(shared=0)
     try:
-      curl_to_client.pop(curl).Done(msg)
+      client = curl_to_client.pop(curl)
+      client.Done(msg)
     finally:
       monitor.release()
 
+    if curl_pool is not None:
+      req = client.GetCurrentRequest()
+      curl_pool.Put(req.host, req.port, curl)
+
   assert not curl_to_client, "Not all requests were processed"
 
   # Don't try to read information anymore as all requests have been processed
@@ -33,7 +33,10 @@
 
 import BaseHTTPServer
 import cgi
+import errno
 import logging
+import math
+import mmap
 import os
 import socket
 import time
@@ -68,6 +71,10 @@ DEFAULT_ERROR_MESSAGE = """\
 </html>
 """
 
+# States of pre-forked workers, shared with the parent process
+_WORKER_IDLE = "\0"
+_WORKER_BUSY = "\1"
+
 
 def _DateTimeHeader(gmnow=None):
   """Return the current date and time formatted for a message header.
@@ -253,7 +260,7 @@ def _HandleServerRequestInner(handler, req_msg):
       logging.exception("Unknown exception")
       raise http.HttpInternalServerError(message="Unknown error")
 
-    if not isinstance(result, basestring):
+    if not (isinstance(result, basestring) or http.IsStreamedBody(result)):
       raise http.HttpError("Handler function didn't return string type")
 
     return (http.HTTP_OK, handler_context.resp_headers, result)
@@ -262,6 +269,27 @@ def _HandleServerRequestInner(handler, req_msg):
     handler_context.private = None
 
 
+def _CanKeepAlive(req_msg_reader):
+  """Checks whether a connection can be reused after a request.
+
+  Only HTTP/1.1 requests with a known body length are considered, as the
+  message reader could otherwise have consumed data following the request.
+
+  @type req_msg_reader: L{_HttpClientToServerMessageReader} or None
+  @param req_msg_reader: Reader of the request
+  @rtype: bool
+
+  """
+  if req_msg_reader is None or req_msg_reader.peer_will_close:
+    return False
+
+  msg = req_msg_reader.msg
+
+  return (msg.start_line.version == http.HTTP_1_1 and
+          req_msg_reader.content_length is not None and
+          len(msg.body) == req_msg_reader.content_length)
+
+
 class HttpResponder(object):
   # The default request version.  This only affects responses up until
   # the point where the request line is parsed, so it mainly decides what
@@ -277,13 +305,16 @@ class HttpResponder(object):
     """
     self._handler = handler
 
-  def __call__(self, fn):
+  def __call__(self, fn, keep_alive=False):
     """Handles a request.
 
     @type fn: callable
     @param fn: Callback for retrieving HTTP request, must return a tuple
       containing request message (L{http.HttpMessage}) and C{None} or the
       message reader (L{_HttpClientToServerMessageReader})
+    @type keep_alive: bool
+    @param keep_alive: Whether the connection may be kept open after the
+      response if the client supports it
 
     """
     response_msg = http.HttpMessage()
@@ -315,8 +346,11 @@ class HttpResponder(object):
       # Only wait for client to close if we didn't have any exception.
       force_close = False
 
+    keep_open = (keep_alive and not force_close and
+                 _CanKeepAlive(req_msg_reader))
+
     return (request_msg, req_msg_reader, force_close,
-            self._Finalize(self.responses, response_msg))
+            self._Finalize(self.responses, response_msg, keep_open=keep_open))
 
   @staticmethod
   def _SetError(responses, handler, response_msg, err):
@@ -356,15 +390,19 @@ class HttpResponder(object):
     response_msg.body = body
 
   @staticmethod
-  def _Finalize(responses, msg):
+  def _Finalize(responses, msg, keep_open=False):
     assert msg.start_line.reason is None
 
     if not msg.headers:
       msg.headers = {}
 
+    if keep_open:
+      connection = "keep-alive"
+    else:
+      connection = "close"
+
     msg.headers.update({
-      # TODO: Keep-alive is not supported
-      http.HTTP_CONNECTION: "close",
+      http.HTTP_CONNECTION: connection,
       http.HTTP_DATE: _DateTimeHeader(),
       http.HTTP_SERVER: http.HTTP_GANETI_VERSION,
       })
@@ -387,8 +425,8 @@ class HttpServerRequestExecutor(object):
 
   This class implements the server side of HTTP. It's based on code of
   Python's BaseHTTPServer, from both version 2.4 and 3k. It does not
-  support non-ASCII character encodings. Keep-alive connections are
-  not supported.
+  support non-ASCII character encodings. HTTP/1.1 connections are kept
+  alive if the server allows it, see L{HttpServer.CanKeepAlive}.
 
   """
   # Timeouts in seconds for socket layer
@@ -410,6 +448,10 @@ class HttpServerRequestExecutor(object):
 
     request_msg_reader = None
     force_close = True
+    idle = False
+
+    #: Number of requests handled on this connection
+    self.request_count = 0
 
     logging.debug("Connection from %s:%s", client_addr[0], client_addr[1])
     try:
@@ -424,33 +466,89 @@ class HttpServerRequestExecutor(object):
             # Ignore rest
             return
 
-        (request_msg, request_msg_reader, force_close, response_msg) = \
-          responder(compat.partial(self._ReadRequest, sock, self.READ_TIMEOUT))
-        if response_msg:
-          # HttpMessage.start_line can be of different types
-          # Instance of 'HttpClientToServerStartLine' has no 'code' member
-          # pylint: disable=E1103,E1101
-          logging.info("%s:%s %s %s", client_addr[0], client_addr[1],
-                       request_msg.start_line, response_msg.start_line.code)
-          self._SendResponse(sock, request_msg, response_msg,
-                             self.WRITE_TIMEOUT)
+        keep_alive = server.CanKeepAlive()
+        initial_data = None
+
+        while True:
+          self.request_count += 1
+          if self.request_count >= server.keep_alive_max_requests:
+            keep_alive = False
+
+          # Processes taking too long to handle a request are killed
+          if server.request_timeout:
+            signal.alarm(int(math.ceil(server.request_timeout)))
+
+          (request_msg, request_msg_reader, force_close, response_msg) = \
+            responder(compat.partial(self._ReadRequest, sock,
+                                     self.READ_TIMEOUT, initial_data),
+                      keep_alive=keep_alive)
+          if response_msg:
+            # HttpMessage.start_line can be of different types
+            # Instance of 'HttpClientToServerStartLine' has no 'code' member
+            # pylint: disable=E1103,E1101
+            logging.info("%s:%s %s %s", client_addr[0], client_addr[1],
+                         request_msg.start_line, response_msg.start_line.code)
+            self._SendResponse(sock, request_msg, response_msg,
+                               self.WRITE_TIMEOUT)
+
+          if server.request_timeout:
+            signal.alarm(0)
+
+          if not (keep_alive and not force_close and
+                  _CanKeepAlive(request_msg_reader)):
+            break
+
+          # Wait for the next request on the same connection
+          initial_data = self._WaitForRequest(sock, server.keep_alive_timeout)
+          if not initial_data:
+            # Closed by peer or idle for too long
+            request_msg_reader = None
+            force_close = True
+            idle = True
+            break
       finally:
-        http.ShutdownConnection(sock, self.CLOSE_TIMEOUT, self.WRITE_TIMEOUT,
-                                request_msg_reader, force_close)
+        try:
+          http.ShutdownConnection(sock, self.CLOSE_TIMEOUT, self.WRITE_TIMEOUT,
+                                  request_msg_reader, force_close)
+        except http.HttpError, err:
+          if not idle:
+            raise
+          # The peer may have closed the connection already
+          logging.debug("Error while closing idle connection: %s", err)
 
       sock.close()
     finally:
       logging.debug("Disconnected %s:%s", client_addr[0], client_addr[1])
 
   @staticmethod
-  def _ReadRequest(sock, timeout):
+  def _WaitForRequest(sock, timeout):
+    """Waits for the client to send another request on a connection.
+
+    @rtype: string
+    @return: The beginning of the request or an empty string if the
+      connection has been closed or no request was sent within the timeout
+
+    """
+    try:
+      return http.SocketOperation(sock, http.SOCKOP_RECV, http.SOCK_BUF_SIZE,
+                                  timeout)
+    except http.HttpSocketTimeout:
+      logging.debug("Closing idle connection")
+    except (socket.error, http.HttpError), err:
+      logging.debug("Error while waiting for request: %s", err)
+
+    return ""
+
+  @staticmethod
+  def _ReadRequest(sock, timeout, initial_data=None):
     """Reads a request sent by client.
 
     """
     msg = http.HttpMessage()
 
     try:
-      reader = _HttpClientToServerMessageReader(sock, msg, timeout)
+      reader = _HttpClientToServerMessageReader(sock, msg, timeout,
+                                                initial_data=initial_data)
     except http.HttpSocketTimeout:
       raise http.HttpError("Timeout while reading request")
     except socket.error, err:
@@ -474,12 +572,32 @@ class HttpServerRequestExecutor(object):
 class HttpServer(http.HttpBase, asyncore.dispatcher):
   """Generic HTTP server class
 
+  Connections are either handled by a fixed pool of pre-forked worker
+  processes accepting connections in parallel, or, for compatibility, by a
+  new child process forked for every connection.
+
   """
   MAX_CHILDREN = 20
 
+  #: Maximum number of child processes for which new connections are still
+  #: kept alive; idle connections must not starve new clients
+  MAX_KEEP_ALIVE_CHILDREN = MAX_CHILDREN / 2
+
+  #: Default maximum number of requests served over a single connection
+  KEEP_ALIVE_MAX_REQUESTS = 100
+
+  #: Default number of requests after which a worker process is replaced
+  WORKER_MAX_REQUESTS = 1000
+
+  #: Timeout for accepting connections in worker processes; bounds the time
+  #: until an idle worker notices it was asked to terminate
+  WORKER_ACCEPT_TIMEOUT = 1.0
+
   def __init__(self, mainloop, local_address, port, handler,
                ssl_params=None, ssl_verify_peer=False,
-               request_executor_class=None, ssl_verify_callback=None):
+               request_executor_class=None, ssl_verify_callback=None,
+               keep_alive_timeout=None, keep_alive_max_requests=None,
+               workers=None, worker_max_requests=None, request_timeout=None):
     """Initializes the HTTP server
 
     @type mainloop: ganeti.daemon.Mainloop
@@ -496,6 +614,21 @@ class HttpServer(http.HttpBase, asyncore.dispatcher):
     @type request_executor_class: class
     @param request_executor_class: a class derived from the
         HttpServerRequestExecutor class
+    @type keep_alive_timeout: float or None
+    @param keep_alive_timeout: How long to wait for further requests on an
+        idle HTTP/1.1 connection; C{None} or 0 disables keep-alive
+    @type keep_alive_max_requests: int or None
+    @param keep_alive_max_requests: Maximum number of requests served over
+        a single connection, defaults to L{KEEP_ALIVE_MAX_REQUESTS}
+    @type workers: int or None
+    @param workers: Number of pre-forked worker processes; C{None} or 0 forks
+        a new process for every connection instead
+    @type worker_max_requests: int or None
+    @param worker_max_requests: Number of requests after which a worker is
+        replaced, defaults to L{WORKER_MAX_REQUESTS}
+    @type request_timeout: float or None
+    @param request_timeout: Number of seconds after which a process handling
+        a request is killed; C{None} or 0 disables the timeout
 
     """
     http.HttpBase.__init__(self)
@@ -510,6 +643,16 @@ class HttpServer(http.HttpBase, asyncore.dispatcher):
     self.local_address = local_address
     self.port = port
     self.handler = handler
+    self.keep_alive_timeout = keep_alive_timeout
+    if keep_alive_max_requests is None:
+      self.keep_alive_max_requests = self.KEEP_ALIVE_MAX_REQUESTS
+    else:
+      self.keep_alive_max_requests = keep_alive_max_requests
+    if worker_max_requests is None:
+      self.worker_max_requests = self.WORKER_MAX_REQUESTS
+    else:
+      self.worker_max_requests = worker_max_requests
+    self.request_timeout = request_timeout
     family = netutils.IPAddress.GetAddressFamily(local_address)
     self.socket = self._CreateSocket(ssl_params, ssl_verify_peer, family,
                                      ssl_verify_callback)
@@ -522,19 +665,195 @@ class HttpServer(http.HttpBase, asyncore.dispatcher):
     self.accepting = True
     mainloop.RegisterSignal(self)
 
+    # Pre-forked workers, see L{_StartWorker}
+    self._worker_count = workers or 0
+    self._workers = {}
+    self._worker_states = None
+    self._stopping = False
+
+    # Set in worker processes only
+    self._worker_slot = None
+    self._worker_exit = False
+
   def Start(self):
     self.socket.bind((self.local_address, self.port))
     self.socket.listen(1024)
 
+    if self._worker_count:
+      # Connections are accepted by the workers only, which block in accept()
+      self.accepting = False
+      self.del_channel()
+      self.socket.setblocking(1)
+
+      # Anonymous shared memory, one byte per worker
+      self._worker_states = mmap.mmap(-1, self._worker_count)
+      for slot in range(self._worker_count):
+        self._StartWorker(slot)
+
   def Stop(self):
+    self._stopping = True
+
+    for pid in self._workers.keys():
+      try:
+        os.kill(pid, signal.SIGTERM)
+      except OSError, err:
+        if err.errno != errno.ESRCH:
+          raise
+
     self.socket.close()
 
   def handle_accept(self):
     self._IncomingConnection()
 
+  def CanKeepAlive(self):
+    """Checks whether a new connection may be kept alive.
+
+    Each connection occupies a process while it's open, so connections are
+    only kept alive as long as enough processes remain for new connections.
+
+    @rtype: bool
+
+    """
+    if not self.keep_alive_timeout:
+      return False
+
+    if self._worker_states is None:
+      return len(self._children) < self.MAX_KEEP_ALIVE_CHILDREN
+
+    busy = self._worker_states[:].count(_WORKER_BUSY)
+    return busy * 2 <= self._worker_count
+
   def OnSignal(self, signum):
     if signum == signal.SIGCHLD:
       self._CollectChildren(True)
+      self._CollectWorkers()
+
+  def _StartWorker(self, slot):
+    """Forks a worker process.
+
+    @type slot: int
+    @param slot: Index of the worker's state in the shared memory
+
+    """
+    self._worker_states[slot] = _WORKER_IDLE
+
+    pid = os.fork()
+    if pid == 0:
+      # Worker process
+      try:
+        self._RunWorker(slot)
+      except Exception: # pylint: disable=W0703
+        logging.exception("Error in worker process")
+        os._exit(1) # pylint: disable=W0212
+      os._exit(0) # pylint: disable=W0212
+
+    self._workers[pid] = slot
+
+  def _CollectWorkers(self):
+    """Collects finished workers and replaces them.
+
+    """
+    for (pid, slot) in self._workers.items():
+      try:
+        (result, status) = os.waitpid(pid, os.WNOHANG)
+      except OSError, err:
+        if err.errno != errno.ECHILD:
+          raise
+        (result, status) = (pid, 0)
+
+      if not result:
+        continue
+
+      del self._workers[pid]
+
+      if os.WIFSIGNALED(status):
+        logging.warning("Worker %s was killed by signal %s", pid,
+                        os.WTERMSIG(status))
+      elif os.WEXITSTATUS(status) != 0:
+        logging.warning("Worker %s exited with status %s", pid,
+                        os.WEXITSTATUS(status))
+
+      if not self._stopping:
+        self._StartWorker(slot)
+
+  def _HandleWorkerTermination(self, signum, _):
+    """Signal handler for terminating a worker process.
+
+    The worker only exits at the top of its loop, so a connection accepted
+    just before the signal arrived is still handled.
+
+    """
+    logging.debug("Worker received signal %s", signum)
+    self._worker_exit = True
+
+  def _RunWorker(self, slot):
+    """Main function of a worker process.
+
+    """
+    # The parent's signal handling doesn't apply to workers
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, self._HandleWorkerTermination)
+    try:
+      signal.set_wakeup_fd(-1)
+    except AttributeError:
+      pass
+
+    self._worker_slot = slot
+    self._children = []
+
+    # In case the handler code uses temporary files
+    utils.ResetTempfileModule()
+
+    served = self._ServeWorkerConnections(slot)
+
+    logging.debug("Worker %s exiting after %s requests", os.getpid(), served)
+
+  def _ServeWorkerConnections(self, slot):
+    """Accepts and handles connections until the worker should exit.
+
+    @type slot: int
+    @param slot: Index of the worker's state in the shared memory
+    @rtype: int
+    @return: Number of requests served
+
+    """
+    # A termination signal arriving between checking the flag and blocking in
+    # accept() doesn't interrupt the call, hence the timeout
+    self.socket.settimeout(self.WORKER_ACCEPT_TIMEOUT)
+
+    served = 0
+    while served < self.worker_max_requests and not self._worker_exit:
+      # SIGTERM must interrupt accept(), otherwise the call is restarted
+      # without running the signal handler and idle workers never exit
+      signal.siginterrupt(signal.SIGTERM, True)
+      try:
+        (connection, client_addr) = self.socket.accept()
+      except socket.timeout:
+        continue
+      except socket.error, err:
+        if err.args and err.args[0] in (errno.EINTR, errno.EAGAIN,
+                                        errno.ECONNABORTED):
+          continue
+        raise
+
+      self._worker_states[slot] = _WORKER_BUSY
+      # Don't interrupt system calls of a request being handled
+      signal.siginterrupt(signal.SIGTERM, False)
+      try:
+        try:
+          executor = self.request_executor(self, self.handler, connection,
+                                           client_addr)
+        except Exception: # pylint: disable=W0703
+          logging.exception("Error while handling request from %s:%s",
+                            client_addr[0], client_addr[1])
+          served += 1
+        else:
+          served += max(1, executor.request_count)
+      finally:
+        self._worker_states[slot] = _WORKER_IDLE
+
+    return served
 
   def _CollectChildren(self, quick):
     """Checks whether any child processes are done
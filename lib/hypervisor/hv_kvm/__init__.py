@@ -115,10 +115,12 @@ _MIGRATION_CAPS_DELIM = ":"
 def _with_qmp(fn):
   """Wrapper used on hotplug related methods"""
   def wrapper(self, instance, *args, **kwargs):
-    """Create a QmpConnection and run the wrapped method"""
-    if not getattr(self, "qmp", None):
-      filename = self._InstanceQmpMonitor(instance.name)# pylint: disable=W0212
-      self.qmp = QmpConnection(filename)
+    """Get the instance's QmpConnection and run the wrapped method"""
+    # pylint: disable=W0212
+    self.qmp = self._GetQmpConnection(instance.name)
+    if self.qmp is None:
+      # Without a monitor socket, the wrapped method fails when connecting
+      self.qmp = QmpConnection(self._InstanceQmpMonitor(instance.name))
     return fn(self, instance, *args, **kwargs)
   return wrapper
 
@@ -390,7 +392,10 @@ class KVMHypervisor(hv_base.BaseHypervisor):
 
   _CPU_INFO_RE = re.compile(r"cpu\s+\#(\d+).*thread_id\s*=\s*(\d+)", re.I)
   _CPU_INFO_CMD = "info cpus"
+  _INSTANCE_INFO_MAX_THREADS = 16
+  _INSTANCE_INFO_QMP_TIMEOUT = 2
   _CONT_CMD = "cont"
+  _QMP_HMP_CMD = "human-monitor-command"
 
   _DEFAULT_MACHINE_VERSION_RE = re.compile(r"^(\S+).*\(default\)", re.M)
   _CHECK_MACHINE_VERSION_RE = \
@@ -448,6 +453,8 @@ class KVMHypervisor(hv_base.BaseHypervisor):
     dirs = [(dname, constants.RUN_DIRS_MODE) for dname in self._DIRS]
     utils.EnsureDirs(dirs)
     self.qmp = None
+    # QMP connections by instance name, see _GetQmpConnection
+    self._qmp_connections = {}
 
   @staticmethod
   def VersionsSafeForMigration(src, target):
@@ -769,6 +776,11 @@ class KVMHypervisor(hv_base.BaseHypervisor):
     @return: a dictionary mapping vCPU numbers to thread IDs
 
     """
+    qmp = self._GetQmpConnection(instance_name)
+    if qmp is not None and "query-cpus" in qmp.supported_commands:
+      return dict((cpu["CPU"], cpu["thread_id"])
+                  for cpu in qmp.Execute("query-cpus"))
+
     result = {}
     output = self._CallMonitorCommand(instance_name, self._CPU_INFO_CMD)
     for line in output.stdout.splitlines():
@@ -840,35 +852,120 @@ class KVMHypervisor(hv_base.BaseHypervisor):
     times = 0
 
     try:
-      qmp = QmpConnection(self._InstanceQmpMonitor(instance_name))
-      qmp.connect()
-      vcpus = len(qmp.Execute("query-cpus"))
-      # Will fail if ballooning is not enabled, but we can then just resort to
-      # the value above.
-      mem_bytes = qmp.Execute("query-balloon")[qmp.ACTUAL_KEY]
-      memory = mem_bytes / 1048576
+      qmp = self._GetQmpConnection(instance_name)
+      if qmp is None:
+        raise errors.HypervisorError("No QMP monitor found")
+      (qmp_memory, vcpus) = self._QueryQmpInstanceInfo(qmp)
+      if qmp_memory is not None:
+        memory = qmp_memory
     except errors.HypervisorError:
       pass
 
     return (instance_name, pid, memory, vcpus, istat, times)
 
+  @staticmethod
+  def _QueryQmpInstanceInfo(qmp):
+    """Queries the memory and number of vCPUs of an instance via QMP.
+
+    @type qmp: L{QmpConnection}
+    @param qmp: connection to the instance's QMP monitor
+    @rtype: tuple
+    @return: (memory in MiB, vcpus); memory is C{None} if ballooning is not
+      enabled for the instance
+
+    """
+    if "query-cpus-fast" in qmp.supported_commands:
+      # Unlike query-cpus, this doesn't interrupt the vCPUs
+      vcpus = len(qmp.Execute("query-cpus-fast"))
+    else:
+      vcpus = len(qmp.Execute("query-cpus"))
+
+    try:
+      memory = qmp.Execute("query-balloon")[qmp.ACTUAL_KEY] / 1048576
+    except errors.HypervisorError:
+      memory = None
+
+    return (memory, vcpus)
+
+  def _QueryInstanceInfoForBulk(self, instance_name):
+    """Queries an instance's QMP monitor for L{GetAllInstancesInfo}.
+
+    @rtype: tuple or None
+    @return: see L{_QueryQmpInstanceInfo}; C{None} if the monitor can't be
+      queried
+
+    """
+    try:
+      qmp = self._GetQmpConnection(instance_name,
+                                   timeout=self._INSTANCE_INFO_QMP_TIMEOUT)
+      if qmp is None:
+        return None
+      return self._QueryQmpInstanceInfo(qmp)
+    except errors.HypervisorError, err:
+      logging.debug("Can't query QMP monitor of instance %s: %s",
+                    instance_name, err)
+      return None
+
+  def _GetQmpInstanceInfo(self, names):
+    """Returns the information about running instances queried via QMP.
+
+    The instances are queried in parallel. Nothing is cached, as the node
+    daemon's worker processes wouldn't see each other's changes, e.g. from
+    ballooning.
+
+    @type names: list of string
+    @param names: the names of the running instances
+    @rtype: dict
+    @return: see L{_QueryQmpInstanceInfo}, by instance name; instances
+      whose monitor can't be queried are missing, as are those whose query
+      raised an unexpected exception, which L{utils.RunInParallel} logs
+
+    """
+    queried = utils.RunInParallel(self._QueryInstanceInfoForBulk, names,
+                                  self._INSTANCE_INFO_MAX_THREADS)
+
+    return dict((name, info) for (name, info) in zip(names, queried)
+                if info is not None)
+
   def GetAllInstancesInfo(self, hvparams=None):
     """Get properties of all instances.
 
+    The process of each instance is checked once and the QMP monitors of
+    all running instances are queried in parallel.
+
     @type hvparams: dict of strings
     @param hvparams: hypervisor parameters
     @return: list of tuples (name, id, memory, vcpus, stat, times)
 
     """
     data = []
+    running = {}
+    cmdline_info = {}
     for name in os.listdir(self._PIDS_DIR):
+      pid = utils.ReadPidFile(self._InstancePidFile(name))
       try:
-        info = self.GetInstanceInfo(name)
+        (cmd_instance, memory, vcpus) = self._InstancePidInfo(pid)
       except errors.HypervisorError:
         # Ignore exceptions due to instances being shut down
-        continue
-      if info:
-        data.append(info)
+        cmd_instance = None
+
+      if cmd_instance == name:
+        running[name] = pid
+        cmdline_info[name] = (memory, vcpus)
+      elif self._IsUserShutdown(name):
+        data.append((name, -1, 0, 0, hv_base.HvInstanceState.SHUTDOWN, 0))
+
+    qmp_info = self._GetQmpInstanceInfo(running.keys())
+
+    for (name, pid) in running.items():
+      (memory, vcpus) = cmdline_info[name]
+      if name in qmp_info:
+        (qmp_memory, vcpus) = qmp_info[name]
+        if qmp_memory is not None:
+          memory = qmp_memory
+      data.append((name, pid, memory, vcpus,
+                   hv_base.HvInstanceState.RUNNING, 0))
+
     return data
 
   def _GenerateKVMBlockDevicesOptions(self, up_hvp, kvm_disks,
@@ -1721,7 +1818,8 @@ class KVMHypervisor(hv_base.BaseHypervisor):
 
     if vnc_pwd:
       change_cmd = "change vnc password %s" % vnc_pwd
-      self._CallMonitorCommand(instance.name, change_cmd)
+      self._RunMonitorCommand(instance.name, change_cmd, "set_password",
+                              {"protocol": "vnc", "password": vnc_pwd})
 
     # Setting SPICE password. We are not vulnerable to malicious passwordless
     # connection attempts because SPICE by default does not allow connections
@@ -1737,8 +1835,11 @@ class KVMHypervisor(hv_base.BaseHypervisor):
         raise errors.HypervisorError("Failed to open SPICE password file %s: %s"
                                      % (spice_password_file, err))
 
-      qmp = QmpConnection(self._InstanceQmpMonitor(instance.name))
-      qmp.connect()
+      qmp = self._GetQmpConnection(instance.name)
+      if qmp is None:
+        raise errors.HypervisorError("Can't set the SPICE password of"
+                                     " instance %s, no QMP monitor found" %
+                                     instance.name)
       arguments = {
           "protocol": "spice",
           "password": spice_pwd,
@@ -1760,7 +1861,7 @@ class KVMHypervisor(hv_base.BaseHypervisor):
       # To control CPU pinning, ballooning, and vnc/spice passwords
       # the VM was started in a frozen state. If freezing was not
       # explicitly requested resume the vm status.
-      self._CallMonitorCommand(instance.name, self._CONT_CMD)
+      self._RunMonitorCommand(instance.name, self._CONT_CMD, "cont")
 
   @staticmethod
   def _StartKvmd(hvparams):
@@ -1802,13 +1903,10 @@ class KVMHypervisor(hv_base.BaseHypervisor):
     else:
       timeout_cmd = ""
 
-    # TODO: Replace monitor calls with QMP once KVM >= 0.14 is the minimum
-    # version. The monitor protocol is designed for human consumption, whereas
-    # QMP is made for programmatic usage. In the worst case QMP can also
-    # execute monitor commands. As it is, all calls to socat take at least
-    # 500ms and likely more: socat can't detect the end of the reply and waits
-    # for 500ms of no data received before exiting (500 ms is the default for
-    # the "-t" parameter).
+    # Only used for instances without a QMP monitor, see _RunMonitorCommand.
+    # All calls to socat take at least 500ms and likely more: socat can't
+    # detect the end of the reply and waits for 500ms of no data received
+    # before exiting (500 ms is the default for the "-t" parameter).
     socat = ("echo %s | %s %s STDIO UNIX-CONNECT:%s" %
              (utils.ShellQuote(command),
               timeout_cmd,
@@ -1823,6 +1921,80 @@ class KVMHypervisor(hv_base.BaseHypervisor):
 
     return result
 
+  def _GetQmpConnection(self, instance_name, timeout=None):
+    """Returns a connection to the QMP monitor of an instance.
+
+    Connections are kept open for the lifetime of this object and shared by
+    all monitor commands for the same instance. Before being reused, a
+    connection is checked to still be open and to belong to the current
+    monitor socket, i.e. the instance must not have been restarted.
+
+    @type instance_name: string
+    @param instance_name: the instance name
+    @type timeout: number
+    @param timeout: socket timeout for a new connection, see L{MonitorSocket}
+    @rtype: L{QmpConnection} or None
+    @return: a connected QMP connection, or C{None} if the instance has no
+      QMP monitor (because it's not running or KVM doesn't support QMP)
+
+    """
+    filename = self._InstanceQmpMonitor(instance_name)
+    (qmp, inode) = self._qmp_connections.pop(instance_name, (None, None))
+
+    try:
+      st = os.stat(filename)
+    except EnvironmentError, err:
+      if qmp is not None:
+        qmp.close()
+      if err.errno == errno.ENOENT:
+        return None
+      raise errors.HypervisorError("Error checking QMP monitor socket %s: %s" %
+                                   (filename, utils.ErrnoOrStr(err)))
+
+    if qmp is not None and (st.st_ino != inode or not qmp.is_alive()):
+      logging.debug("Reconnecting to QMP monitor of instance %s",
+                    instance_name)
+      qmp.close()
+      qmp = None
+
+    if qmp is None:
+      qmp = QmpConnection(filename, timeout=timeout)
+      qmp.connect()
+
+    self._qmp_connections[instance_name] = (qmp, st.st_ino)
+
+    return qmp
+
+  def _RunMonitorCommand(self, instance_name, command, qmp_command=None,
+                         qmp_arguments=None, timeout=None):
+    """Runs a command on the monitor of an instance.
+
+    The command is executed via QMP if the instance has a QMP monitor:
+    natively if a supported QMP command is given, as a human monitor
+    command otherwise. Only instances without QMP monitor are sent the
+    command on their human monitor, using L{_CallMonitorCommand}.
+
+    @type command: string
+    @param command: human monitor command
+    @type qmp_command: string
+    @param qmp_command: equivalent QMP command, if any
+    @type qmp_arguments: dict
+    @param qmp_arguments: arguments for C{qmp_command}
+    @type timeout: int
+    @param timeout: timeout for the human monitor command, QMP commands are
+      subject to the monitor's socket timeout instead
+
+    """
+    qmp = self._GetQmpConnection(instance_name)
+    if qmp is not None:
+      if qmp_command is not None and qmp_command in qmp.supported_commands:
+        return qmp.Execute(qmp_command, qmp_arguments)
+      elif self._QMP_HMP_CMD in qmp.supported_commands:
+        return qmp.Execute(self._QMP_HMP_CMD, {"command-line": command})
+
+    return self._CallMonitorCommand(instance_name, command,
+                                    timeout=timeout).stdout
+
   @_with_qmp
   def VerifyHotplugSupport(self, instance, action, dev_type):
     """Verifies that hotplug is supported.
@@ -1848,16 +2020,26 @@ class KVMHypervisor(hv_base.BaseHypervisor):
 
     """
     try:
-      output = self._CallMonitorCommand(instance.name, self._INFO_VERSION_CMD)
+      qmp = self._GetQmpConnection(instance.name)
     except errors.HypervisorError:
       raise errors.HotplugError("Instance is probably down")
 
-    match = self._INFO_VERSION_RE.search(output.stdout)
-    if not match:
-      raise errors.HotplugError("Cannot parse qemu version via monitor")
+    if qmp is not None:
+      (v_major, v_min, _) = qmp.version
+    else:
+      try:
+        output = self._CallMonitorCommand(instance.name,
+                                          self._INFO_VERSION_CMD)
+      except errors.HypervisorError:
+        raise errors.HotplugError("Instance is probably down")
+
+      match = self._INFO_VERSION_RE.search(output.stdout)
+      if not match:
+        raise errors.HotplugError("Cannot parse qemu version via monitor")
+
+      v_major, v_min, _, _ = match.groups()
 
     #TODO: delegate more fine-grained checks to VerifyHotplugSupport
-    v_major, v_min, _, _ = match.groups()
     if (int(v_major), int(v_min)) < (1, 7):
       raise errors.HotplugError("Hotplug not supported for qemu versions < 1.7")
 
@@ -1940,8 +2122,8 @@ class KVMHypervisor(hv_base.BaseHypervisor):
     if dev_type == constants.HOTPLUG_TARGET_DISK:
       self.qmp.HotDelDisk(kvm_devid)
       # drive_del is not implemented yet in qmp
-      command = "drive_del %s\n" % kvm_devid
-      self._CallMonitorCommand(instance.name, command)
+      command = "drive_del %s" % kvm_devid
+      self._RunMonitorCommand(instance.name, command)
     elif dev_type == constants.HOTPLUG_TARGET_NIC:
       self.qmp.HotDelNic(kvm_devid)
       utils.RemoveFile(self._InstanceNICFile(instance.name, seq))
@@ -2031,8 +2213,7 @@ class KVMHypervisor(hv_base.BaseHypervisor):
     else:
       return "pc"
 
-  @classmethod
-  def _StopInstance(cls, instance, force=False, name=None, timeout=None):
+  def _StopInstance(self, instance, force=False, name=None, timeout=None):
     """Stop an instance.
 
     """
@@ -2045,13 +2226,14 @@ class KVMHypervisor(hv_base.BaseHypervisor):
       acpi = instance.hvparams[constants.HV_ACPI]
     else:
       acpi = False
-    _, pid, alive = cls._InstancePidAlive(name)
+    _, pid, alive = self._InstancePidAlive(name)
     if pid > 0 and alive:
       if force or not acpi:
         utils.KillProcess(pid)
       else:
-        cls._CallMonitorCommand(name, "system_powerdown", timeout)
-    cls._ClearUserShutdown(instance.name)
+        self._RunMonitorCommand(name, "system_powerdown", "system_powerdown",
+                                timeout=timeout)
+    self._ClearUserShutdown(instance.name)
 
   def StopInstance(self, instance, force=False, retry=False, name=None,
                    timeout=None):
@@ -2177,24 +2359,33 @@ class KVMHypervisor(hv_base.BaseHypervisor):
       raise errors.HypervisorError("Instance not running, cannot migrate")
 
     if not live:
-      self._CallMonitorCommand(instance_name, "stop")
+      self._RunMonitorCommand(instance_name, "stop", "stop")
 
-    migrate_command = ("migrate_set_speed %dm" %
-                       instance.hvparams[constants.HV_MIGRATION_BANDWIDTH])
-    self._CallMonitorCommand(instance_name, migrate_command)
+    bandwidth = instance.hvparams[constants.HV_MIGRATION_BANDWIDTH]
+    migrate_command = "migrate_set_speed %dm" % bandwidth
+    self._RunMonitorCommand(instance_name, migrate_command,
+                            "migrate_set_speed",
+                            {"value": bandwidth * 1024 * 1024})
 
-    migrate_command = ("migrate_set_downtime %dms" %
-                       instance.hvparams[constants.HV_MIGRATION_DOWNTIME])
-    self._CallMonitorCommand(instance_name, migrate_command)
+    downtime = instance.hvparams[constants.HV_MIGRATION_DOWNTIME]
+    migrate_command = "migrate_set_downtime %dms" % downtime
+    self._RunMonitorCommand(instance_name, migrate_command,
+                            "migrate_set_downtime",
+                            {"value": downtime / 1000.0})
 
     migration_caps = instance.hvparams[constants.HV_KVM_MIGRATION_CAPS]
     if migration_caps:
       for c in migration_caps.split(_MIGRATION_CAPS_DELIM):
         migrate_command = ("migrate_set_capability %s on" % c)
-        self._CallMonitorCommand(instance_name, migrate_command)
+        self._RunMonitorCommand(instance_name, migrate_command,
+                                "migrate-set-capabilities",
+                                {"capabilities": [{"capability": c,
+                                                   "state": True}]})
 
-    migrate_command = "migrate -d tcp:%s:%s" % (target, port)
-    self._CallMonitorCommand(instance_name, migrate_command)
+    # Migrations started via QMP always run in the background
+    uri = "tcp:%s:%s" % (target, port)
+    self._RunMonitorCommand(instance_name, "migrate -d %s" % uri, "migrate",
+                            {"uri": uri})
 
   def FinalizeMigrationSource(self, instance, success, live):
     """Finalize the instance migration on the source node.
@@ -2212,7 +2403,7 @@ class KVMHypervisor(hv_base.BaseHypervisor):
       utils.KillProcess(pid)
       self._RemoveInstanceRuntimeFiles(pidfile, instance.name)
     elif live:
-      self._CallMonitorCommand(instance.name, self._CONT_CMD)
+      self._RunMonitorCommand(instance.name, self._CONT_CMD, "cont")
     self._ClearUserShutdown(instance.name)
 
   def GetMigrationStatus(self, instance):
@@ -2226,6 +2417,10 @@ class KVMHypervisor(hv_base.BaseHypervisor):
              progress info that can be retrieved from the hypervisor
 
     """
+    qmp = self._GetQmpConnection(instance.name)
+    if qmp is not None and "query-migrate" in qmp.supported_commands:
+      return self._GetQmpMigrationStatus(qmp)
+
     info_command = "info migrate"
     for _ in range(self._MIGRATION_INFO_MAX_BAD_ANSWERS):
       result = self._CallMonitorCommand(instance.name, info_command)
@@ -2253,6 +2448,35 @@ class KVMHypervisor(hv_base.BaseHypervisor):
 
     return objects.MigrationStatus(status=constants.HV_MIGRATION_FAILED)
 
+  def _GetQmpMigrationStatus(self, qmp):
+    """Get the migration status using QMP.
+
+    @type qmp: L{QmpConnection}
+    @param qmp: connection to the monitor of the migrated instance
+    @see: L{GetMigrationStatus}
+
+    """
+    for _ in range(self._MIGRATION_INFO_MAX_BAD_ANSWERS):
+      info = qmp.Execute("query-migrate")
+      status = info.get("status")
+      if status is None:
+        logging.info("KVM: no migration status in 'query-migrate' result")
+      elif status in constants.HV_KVM_MIGRATION_VALID_STATUSES:
+        migration_status = objects.MigrationStatus(status=status)
+        ram = info.get("ram")
+        if ram:
+          # Report the values in kbytes, like the human monitor does
+          migration_status.transferred_ram = ram["transferred"] / 1024
+          migration_status.total_ram = ram["total"] / 1024
+
+        return migration_status
+      else:
+        logging.warning("KVM: unknown migration status '%s'", status)
+
+      time.sleep(self._MIGRATION_INFO_RETRY_DELAY)
+
+    return objects.MigrationStatus(status=constants.HV_MIGRATION_FAILED)
+
   def BalloonInstanceMemory(self, instance, mem):
     """Balloon an instance memory to a certain value.
 
@@ -2262,7 +2486,8 @@ class KVMHypervisor(hv_base.BaseHypervisor):
     @param mem: actual memory size to use for instance runtime
 
     """
-    self._CallMonitorCommand(instance.name, "balloon %d" % mem)
+    self._RunMonitorCommand(instance.name, "balloon %d" % mem, "balloon",
+                            {"value": mem * 1024 * 1024})
 
   def GetNodeInfo(self, hvparams=None):
     """Return information about the node.
@@ -36,8 +36,8 @@
 import os
 import stat
 import errno
+import select
 import socket
-import StringIO
 import logging
 try:
   import fdsend   # pylint: disable=F0401
@@ -133,15 +133,21 @@ class QmpMessage(object):
 class MonitorSocket(object):
   _SOCKET_TIMEOUT = 5
 
-  def __init__(self, monitor_filename):
+  def __init__(self, monitor_filename, timeout=None):
     """Instantiates the MonitorSocket object.
 
     @type monitor_filename: string
     @param monitor_filename: the filename of the UNIX raw socket on which the
                              monitor (QMP or simple one) is listening
+    @type timeout: number
+    @param timeout: socket timeout in seconds, defaults to L{_SOCKET_TIMEOUT}
 
     """
     self.monitor_filename = monitor_filename
+    if timeout is None:
+      self._timeout = self._SOCKET_TIMEOUT
+    else:
+      self._timeout = timeout
     self._connected = False
 
   def _check_socket(self):
@@ -178,6 +184,26 @@ class MonitorSocket(object):
     """
     return self._connected
 
+  def is_alive(self):
+    """Return whether the connection is still open on the other end.
+
+    Pending data is left untouched, so this can be used to check a
+    connection before reusing it.
+
+    """
+    if not self._connected:
+      return False
+
+    try:
+      (readable, _, _) = select.select([self.sock], [], [], 0)
+      # A closed connection is readable, but returns no data
+      if readable and not self.sock.recv(1, socket.MSG_PEEK):
+        return False
+    except (select.error, socket.error):
+      return False
+
+    return True
+
   def _connect(self):
     """Connects to the monitor.
 
@@ -196,7 +222,7 @@ class MonitorSocket(object):
       self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
       # We want to fail if the server doesn't send a complete message
       # in a reasonable amount of time
-      self.sock.settimeout(self._SOCKET_TIMEOUT)
+      self.sock.settimeout(self._timeout)
       self.sock.connect(self.monitor_filename)
     except EnvironmentError:
       raise errors.HypervisorError("Can't connect to qmp socket")
@@ -222,7 +248,10 @@ def _ensure_connection(fn):
     """Ensure proper connect/close and exception propagation"""
     mon = args[0]
     already_connected = mon.is_connected()
-    mon.connect()
+    # Connections shared between commands are already set up, connecting
+    # again would wait for a greeting that was received long ago
+    if not already_connected:
+      mon.connect()
     try:
       ret = fn(*args, **kwargs)
     finally:
@@ -254,12 +283,15 @@ class QmpConnection(MonitorSocket):
   _QEMU_KEY = "qemu"
   _CAPABILITIES_COMMAND = "qmp_capabilities"
   _QUERY_COMMANDS = "query-commands"
+  # Commands whose arguments must not be logged
+  _SECRET_COMMANDS = frozenset(["set_password"])
   _MESSAGE_END_TOKEN = "\r\n"
+  _RECV_SIZE = 65536
   _QEMU_PCI_SLOTS = 32 # The number of PCI slots QEMU exposes by default
 
-  def __init__(self, monitor_filename):
-    super(QmpConnection, self).__init__(monitor_filename)
-    self._buf = ""
+  def __init__(self, monitor_filename, timeout=None):
+    super(QmpConnection, self).__init__(monitor_filename, timeout=timeout)
+    self._msgbuf = utils.MessageBuffer(self._MESSAGE_END_TOKEN)
     self.supported_commands = None
 
   def __enter__(self):
@@ -299,7 +331,7 @@ class QmpConnection(MonitorSocket):
 
     # This is needed because QMP can return more than one greetings
     # see https://groups.google.com/d/msg/ganeti-devel/gZYcvHKDooU/SnukC8dgS5AJ
-    self._buf = ""
+    self._msgbuf.Clear()
 
     # Let's put the monitor in command mode using the qmp_capabilities
     # command, or else no command will be executable.
@@ -307,28 +339,17 @@ class QmpConnection(MonitorSocket):
     self.Execute(self._CAPABILITIES_COMMAND)
     self.supported_commands = self._GetSupportedCommands()
 
-  def _ParseMessage(self, buf):
-    """Extract and parse a QMP message from the given buffer.
-
-    Seeks for a QMP message in the given buf. If found, it parses it and
-    returns it together with the rest of the characters in the buf.
-    If no message is found, returns None and the whole buffer.
+  @staticmethod
+  def _ParseMessage(data):
+    """Parses a QMP message received without its end token.
 
     @raise errors.ProgrammerError: when there are data serialization errors
 
     """
-    message = None
-    # Check if we got the message end token (CRLF, as per the QEMU Protocol
-    # Specification 0.1 - Section 2.1.1)
-    pos = buf.find(self._MESSAGE_END_TOKEN)
-    if pos >= 0:
-      try:
-        message = QmpMessage.BuildFromJsonString(buf[:pos + 1])
-      except Exception, err:
-        raise errors.ProgrammerError("QMP data serialization error: %s" % err)
-      buf = buf[pos + 1:]
-
-    return (message, buf)
+    try:
+      return QmpMessage.BuildFromJsonString(data)
+    except Exception, err:
+      raise errors.ProgrammerError("QMP data serialization error: %s" % err)
 
   def _Recv(self):
     """Receives a message from QMP and decodes the received JSON object.
@@ -341,23 +362,17 @@ class QmpConnection(MonitorSocket):
     """
     self._check_connection()
 
-    # Check if there is already a message in the buffer
-    (message, self._buf) = self._ParseMessage(self._buf)
-    if message:
-      return message
-
-    recv_buffer = StringIO.StringIO(self._buf)
-    recv_buffer.seek(len(self._buf))
     try:
       while True:
-        data = self.sock.recv(4096)
+        # Check if there is already a message in the buffer
+        data = self._msgbuf.PopMessage()
+        if data is not None:
+          return self._ParseMessage(data)
+
+        data = self.sock.recv(self._RECV_SIZE)
         if not data:
           break
-        recv_buffer.write(data)
-
-        (message, self._buf) = self._ParseMessage(recv_buffer.getvalue())
-        if message:
-          return message
+        self._msgbuf.Feed(data)
 
     except socket.timeout, err:
       raise errors.HypervisorError("Timeout while receiving a QMP message: "
@@ -426,7 +441,9 @@ class QmpConnection(MonitorSocket):
 
     ret = self._GetResponse(command)
     # log important qmp commands..
-    if command not in [self._QUERY_COMMANDS, self._CAPABILITIES_COMMAND]:
+    if command in self._SECRET_COMMANDS:
+      logging.debug("QMP %s: %s\n", command, ret)
+    elif command not in [self._QUERY_COMMANDS, self._CAPABILITIES_COMMAND]:
       logging.debug("QMP %s %s: %s\n", command, arguments, ret)
     return ret
 
@@ -159,6 +159,12 @@ class LXCHypervisor(hv_base.BaseHypervisor):
     "devices",
     "cpuacct",
     ]
+  # Subsystems of the cgroup parameters read by _GetRunningInstanceInfo
+  _INFO_CGROUP_SUBSYSTEMS = [
+    "cpuset",
+    "memory",
+    "cpuacct",
+    ]
 
   def __init__(self):
     hv_base.BaseHypervisor.__init__(self)
@@ -300,16 +306,21 @@ class LXCHypervisor(hv_base.BaseHypervisor):
     return cls._CGROUP_ROOT_DIR
 
   @classmethod
-  def _GetOrPrepareCgroupSubsysMountPoint(cls, subsystem):
+  def _GetOrPrepareCgroupSubsysMountPoint(cls, subsystem, mounts=None):
     """Prepare cgroup subsystem mount point.
 
     @type subsystem: string
     @param subsystem: cgroup subsystem name to mount
+    @type mounts: list
+    @param mounts: the result of L{utils.GetMounts}, read if not given
     @rtype string
     @return path of subsystem mount point
 
     """
-    for _, mpoint, fstype, options in utils.GetMounts():
+    if mounts is None:
+      mounts = utils.GetMounts()
+
+    for _, mpoint, fstype, options in mounts:
       if fstype == "cgroup" and subsystem in options.split(","):
         return mpoint
 
@@ -348,42 +359,75 @@ class LXCHypervisor(hv_base.BaseHypervisor):
     @return: path of the hierarchy directory for the subsystem
 
     """
-    subsys_dir = cls._GetOrPrepareCgroupSubsysMountPoint(subsystem)
-    base_group = cls._GetCurrentCgroupSubsysGroups().get(subsystem, "")
+    return cls._GetCgroupSubsysDirs([subsystem])[subsystem]
+
+  @classmethod
+  def _GetCgroupSubsysDirs(cls, subsystems):
+    """Return the directories of multiple cgroup subsystems we use.
+
+    Like L{_GetCgroupSubsysDir}, but the mounts and the cgroups of this
+    process are only read once.
+
+    @type subsystems: list of strings
+    @param subsystems: cgroup subsystem names
+    @rtype: dict
+    @return: path of the hierarchy directory by subsystem
+
+    """
+    mounts = utils.GetMounts()
+    groups = cls._GetCurrentCgroupSubsysGroups()
+
+    result = {}
+    for subsystem in subsystems:
+      subsys_dir = cls._GetOrPrepareCgroupSubsysMountPoint(subsystem,
+                                                           mounts=mounts)
+      result[subsystem] = utils.PathJoin(subsys_dir,
+                                         groups.get(subsystem, ""), "lxc")
 
-    return utils.PathJoin(subsys_dir, base_group, "lxc")
+    return result
 
   @classmethod
-  def _GetCgroupParamPath(cls, param_name, instance_name=None):
+  def _GetCgroupParamPath(cls, param_name, instance_name=None,
+                          subsys_dirs=None):
     """Return the path of the specified cgroup parameter file.
 
     @type param_name: string
     @param param_name: cgroup subsystem parameter name
+    @type subsys_dirs: dict
+    @param subsys_dirs: the result of L{_GetCgroupSubsysDirs} for the
+      parameter's subsystem, looked up if not given
     @rtype: string
     @return: path of the cgroup subsystem parameter file
 
     """
     subsystem = param_name.split(".", 1)[0]
-    subsys_dir = cls._GetCgroupSubsysDir(subsystem)
+    if subsys_dirs is None:
+      subsys_dir = cls._GetCgroupSubsysDir(subsystem)
+    else:
+      subsys_dir = subsys_dirs[subsystem]
     if instance_name is not None:
       return utils.PathJoin(subsys_dir, instance_name, param_name)
     else:
       return utils.PathJoin(subsys_dir, param_name)
 
   @classmethod
-  def _GetCgroupInstanceValue(cls, instance_name, param_name):
+  def _GetCgroupInstanceValue(cls, instance_name, param_name,
+                              subsys_dirs=None):
     """Return the value of the specified cgroup parameter.
 
     @type instance_name: string
     @param instance_name: instance name
     @type param_name: string
     @param param_name: cgroup subsystem parameter name
+    @type subsys_dirs: dict
+    @param subsys_dirs: see L{_GetCgroupParamPath}
     @rtype string
     @return value read from cgroup subsystem fs
 
     """
     param_path = cls._GetCgroupParamPath(param_name,
-                                         instance_name=instance_name)
+                                         instance_name=instance_name,
+                                         subsys_dirs=subsys_dirs)
     return utils.ReadFile(param_path).rstrip("\n")
 
   @classmethod
@@ -434,12 +478,13 @@ class LXCHypervisor(hv_base.BaseHypervisor):
     return os.path.exists(param_path)
 
   @classmethod
-  def _GetCgroupCpuList(cls, instance_name):
+  def _GetCgroupCpuList(cls, instance_name, subsys_dirs=None):
     """Return the list of CPU ids for an instance.
 
     """
     try:
-      cpumask = cls._GetCgroupInstanceValue(instance_name, "cpuset.cpus")
+      cpumask = cls._GetCgroupInstanceValue(instance_name, "cpuset.cpus",
+                                            subsys_dirs=subsys_dirs)
     except EnvironmentError, err:
       raise errors.HypervisorError("Getting CPU list for instance"
                                    " %s failed: %s" % (instance_name, err))
@@ -447,12 +492,13 @@ class LXCHypervisor(hv_base.BaseHypervisor):
     return utils.ParseCpuMask(cpumask)
 
   @classmethod
-  def _GetCgroupCpuUsage(cls, instance_name):
+  def _GetCgroupCpuUsage(cls, instance_name, subsys_dirs=None):
     """Return the CPU usage of an instance.
 
     """
     try:
-      cputime_ns = cls._GetCgroupInstanceValue(instance_name, "cpuacct.usage")
+      cputime_ns = cls._GetCgroupInstanceValue(instance_name, "cpuacct.usage",
+                                               subsys_dirs=subsys_dirs)
     except EnvironmentError, err:
       raise HypervisorError("Failed to get the cpu usage of %s: %s" %
                             (instance_name, err))
@@ -460,13 +506,14 @@ class LXCHypervisor(hv_base.BaseHypervisor):
     return float(cputime_ns) / 10 ** 9 # nano secs to float secs
 
   @classmethod
-  def _GetCgroupMemoryLimit(cls, instance_name):
+  def _GetCgroupMemoryLimit(cls, instance_name, subsys_dirs=None):
     """Return the memory limit for an instance
 
     """
     try:
       mem_limit = cls._GetCgroupInstanceValue(instance_name,
-                                              "memory.limit_in_bytes")
+                                              "memory.limit_in_bytes",
+                                              subsys_dirs=subsys_dirs)
       return int(mem_limit)
     except EnvironmentError, err:
       raise HypervisorError("Can't get instance memory limit of %s: %s" %
@@ -479,8 +526,8 @@ class LXCHypervisor(hv_base.BaseHypervisor):
     return [iinfo[0] for iinfo in self.GetAllInstancesInfo()]
 
   @classmethod
-  def _IsInstanceAlive(cls, instance_name):
-    """Return True if instance is alive.
+  def _GetRunningInstances(cls):
+    """Return the set of names of all running containers.
 
     """
     result = utils.RunCmd(["lxc-ls", "--running"])
@@ -488,7 +535,31 @@ class LXCHypervisor(hv_base.BaseHypervisor):
       raise HypervisorError("Failed to get running LXC containers list: %s" %
                             result.output)
 
-    return instance_name in result.stdout.split()
+    return frozenset(result.stdout.split())
+
+  @classmethod
+  def _IsInstanceAlive(cls, instance_name):
+    """Return True if instance is alive.
+
+    """
+    return instance_name in cls._GetRunningInstances()
+
+  def _GetRunningInstanceInfo(self, instance_name, subsys_dirs=None):
+    """Get the properties of a running instance from its cgroups.
+
+    @type subsys_dirs: dict
+    @param subsys_dirs: the result of L{_GetCgroupSubsysDirs} for
+      L{_INFO_CGROUP_SUBSYSTEMS}, looked up for each value if not given
+    @rtype: tuple
+    @return: (name, id, memory, vcpus, stat, times)
+
+    """
+    cpu_list = self._GetCgroupCpuList(instance_name, subsys_dirs=subsys_dirs)
+    memory = self._GetCgroupMemoryLimit(instance_name,
+                                        subsys_dirs=subsys_dirs) / (1024 ** 2)
+    cputime = self._GetCgroupCpuUsage(instance_name, subsys_dirs=subsys_dirs)
+    return (instance_name, 0, memory, len(cpu_list),
+            hv_base.HvInstanceState.RUNNING, cputime)
 
   def GetInstanceInfo(self, instance_name, hvparams=None):
     """Get instance properties.
@@ -504,29 +575,45 @@ class LXCHypervisor(hv_base.BaseHypervisor):
     if not self._IsInstanceAlive(instance_name):
       return None
 
-    cpu_list = self._GetCgroupCpuList(instance_name)
-    memory = self._GetCgroupMemoryLimit(instance_name) / (1024 ** 2)
-    cputime = self._GetCgroupCpuUsage(instance_name)
-    return (instance_name, 0, memory, len(cpu_list),
-            hv_base.HvInstanceState.RUNNING, cputime)
+    return self._GetRunningInstanceInfo(instance_name)
 
   def GetAllInstancesInfo(self, hvparams=None):
     """Get properties of all instances.
 
+    The running containers and the cgroup directories are only looked up
+    once for all instances.
+
     @type hvparams: dict of strings
     @param hvparams: hypervisor parameter
     @return: [(name, id, memory, vcpus, stat, times),...]
 
     """
+    try:
+      running = self._GetRunningInstances()
+    except errors.HypervisorError, err:
+      logging.warning("Can't list running instances: %s", err)
+      return []
+
+    filter_fn = lambda x: (x in running and
+                           os.path.isdir(utils.PathJoin(self._INSTANCE_DIR,
+                                                        x)))
+    instance_names = filter(filter_fn, os.listdir(self._INSTANCE_DIR))
+    if not instance_names:
+      return []
+
+    try:
+      subsys_dirs = self._GetCgroupSubsysDirs(self._INFO_CGROUP_SUBSYSTEMS)
+    except errors.HypervisorError, err:
+      logging.warning("Can't find the cgroups of running instances: %s", err)
+      return []
+
     data = []
-    filter_fn = lambda x: os.path.isdir(utils.PathJoin(self._INSTANCE_DIR, x))
-    for dirname in filter(filter_fn, os.listdir(self._INSTANCE_DIR)):
+    for instance_name in instance_names:
       try:
-        info = self.GetInstanceInfo(dirname)
+        data.append(self._GetRunningInstanceInfo(instance_name,
+                                                 subsys_dirs=subsys_dirs))
       except errors.HypervisorError:
         continue
-      if info:
-        data.append(info)
     return data
 
   @classmethod
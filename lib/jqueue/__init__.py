@@ -167,24 +167,34 @@ class _QueuedOpCode(object):
     obj.priority = state.get("priority", constants.OP_PRIO_DEFAULT)
     return obj
 
-  def Serialize(self):
-    """Serializes this _QueuedOpCode.
+  def SerializeState(self):
+    """Serializes the fields changing while this opcode is processed.
 
     @rtype: dict
-    @return: the dictionary holding the serialized state
+    @return: the serialized state, without the input and the log
 
     """
     return {
-      "input": self.input.__getstate__(),
       "status": self.status,
       "result": self.result,
-      "log": self.log,
       "start_timestamp": self.start_timestamp,
       "exec_timestamp": self.exec_timestamp,
       "end_timestamp": self.end_timestamp,
       "priority": self.priority,
       }
 
+  def Serialize(self):
+    """Serializes this _QueuedOpCode.
+
+    @rtype: dict
+    @return: the dictionary holding the serialized state
+
+    """
+    state = self.SerializeState()
+    state["input"] = self.input.__getstate__()
+    state["log"] = self.log
+    return state
+
 
 class _QueuedJob(object):
   """In-memory job representation.
@@ -203,13 +213,17 @@ class _QueuedJob(object):
   @ivar start_timestmap: the timestamp for start of execution
   @ivar end_timestamp: the timestamp for end of execution
   @ivar writable: Whether the job is allowed to be modified
+  @ivar disk_state: the state last written to the job file, see
+      L{SerializeChanges}; C{None} if the file wasn't written yet
+  @ivar unreplicated: the segments appended to the job file which weren't
+      replicated yet; C{None} if the whole file needs to be replicated
 
   """
   # pylint: disable=W0212
   __slots__ = ["queue", "id", "ops", "log_serial", "ops_iter", "cur_opctx",
                "received_timestamp", "start_timestamp", "end_timestamp",
                "processor_lock", "writable", "archived",
-               "livelock", "process_id",
+               "livelock", "process_id", "disk_state", "unreplicated",
                "__weakref__"]
 
   def AddReasons(self, pickup=False):
@@ -274,6 +288,8 @@ class _QueuedJob(object):
     obj.writable = writable
     obj.ops_iter = None
     obj.cur_opctx = None
+    obj.disk_state = None
+    obj.unreplicated = None
 
     # Read-only jobs are not processed and therefore don't need a lock
     if writable:
@@ -328,23 +344,98 @@ class _QueuedJob(object):
 
     return obj
 
-  def Serialize(self):
-    """Serialize the _JobQueue instance.
+  def _SerializeState(self):
+    """Serializes the fields changing while this job is processed.
 
     @rtype: dict
-    @return: the serialized state
+    @return: the serialized state, without the opcodes
 
     """
     return {
-      "id": self.id,
-      "ops": [op.Serialize() for op in self.ops],
       "start_timestamp": self.start_timestamp,
       "end_timestamp": self.end_timestamp,
-      "received_timestamp": self.received_timestamp,
       "livelock": self.livelock,
       "process_id": self.process_id,
       }
 
+  def Serialize(self):
+    """Serialize the _JobQueue instance.
+
+    @rtype: dict
+    @return: the serialized state
+
+    """
+    state = self._SerializeState()
+    state["id"] = self.id
+    state["ops"] = [op.Serialize() for op in self.ops]
+    state["received_timestamp"] = self.received_timestamp
+    return state
+
+  def MarkWritten(self):
+    """Records the current state as written to the job file.
+
+    """
+    self.disk_state = (self._SerializeState(),
+                       [op.SerializeState() for op in self.ops],
+                       self.log_serial)
+
+  def SerializeChanges(self):
+    """Serializes the changes since the job file was last written.
+
+    The result is a segment to be appended to the job file, see
+    L{jstore.ParseJobFile}. The current state is recorded as written.
+
+    @rtype: dict or None
+    @return: the changes, or C{None} if nothing changed
+
+    """
+    assert self.disk_state is not None, "Job file wasn't written yet"
+
+    (old_job_state, old_op_states, old_log_serial) = self.disk_state
+
+    def _Diff(old, new):
+      return dict((key, value) for (key, value) in new.items()
+                  if old.get(key) != value)
+
+    segment = {}
+
+    job_state = self._SerializeState()
+    changes = _Diff(old_job_state, job_state)
+    if changes:
+      segment["job"] = changes
+
+    op_states = []
+    op_changes = []
+    log = []
+    for (idx, (op, old_op_state)) in enumerate(zip(self.ops, old_op_states)):
+      op_state = op.SerializeState()
+      op_states.append(op_state)
+
+      changes = _Diff(old_op_state, op_state)
+      if changes:
+        op_changes.append((idx, changes))
+
+      # Log entries are only ever appended, so looking at the tail suffices
+      new_entries = []
+      for entry in reversed(op.log):
+        if entry[0] <= old_log_serial:
+          break
+        new_entries.append((idx, entry))
+      new_entries.reverse()
+      log.extend(new_entries)
+
+    if op_changes:
+      segment["ops"] = op_changes
+    if log:
+      segment["log"] = log
+
+    self.disk_state = (job_state, op_states, self.log_serial)
+
+    if not segment:
+      return None
+
+    return segment
+
   def CalcStatus(self):
     """Compute the status of this job.
 
@@ -1391,6 +1482,112 @@ class _JobDependencyManager:
       self._enqueue_fn(jobs)
 
 
+class _JobFileReplicator(object):
+  """Replicates job files to the master candidates in batches.
+
+  Callers block until their update has been replicated, so the order of
+  status transitions seen by the master candidates is preserved. Updates
+  arriving while a batch is being sent are coalesced per file and sent
+  together afterwards; an update arriving while nothing is being sent is
+  replicated right away. If sending a batch fails, all callers whose updates
+  were part of it get the exception.
+
+  """
+  def __init__(self, send_fn):
+    """Initializes this class.
+
+    @type send_fn: callable
+    @param send_fn: Function sending a batch of updates, receiving a
+      dictionary mapping file names to tuples of (append, content)
+
+    """
+    self._send_fn = send_fn
+
+    self._lock = threading.Lock()
+    self._cond = threading.Condition(self._lock)
+
+    # Updates for the next batch
+    self._pending = {}
+
+    self._next_batch = 1
+    self._done_batch = 0
+    self._sending = False
+
+    # Number of callers waiting for each batch, and the exceptions raised
+    # while sending batches, kept until all their callers have seen them
+    self._waiting = {}
+    self._errors = {}
+
+  def _AddUnlocked(self, file_name, content, append):
+    """Adds an update to the next batch.
+
+    """
+    if append and file_name in self._pending:
+      (prev_append, prev_content) = self._pending[file_name]
+      self._pending[file_name] = (prev_append, prev_content + content)
+    else:
+      self._pending[file_name] = (append, content)
+
+  def Replicate(self, file_name, content, append):
+    """Replicates an update of a job file.
+
+    @type file_name: str
+    @param file_name: the path of the file
+    @type content: str
+    @param content: the new contents, or the data to append, see C{append}
+    @type append: bool
+    @param append: whether to append the content to the file instead of
+      replacing it
+
+    """
+    self._lock.acquire()
+    try:
+      self._AddUnlocked(file_name, content, append)
+      batch = self._next_batch
+      self._waiting[batch] = self._waiting.get(batch, 0) + 1
+
+      try:
+        while self._done_batch < batch:
+          if self._sending:
+            self._cond.wait()
+            continue
+
+          # Send the next batch on behalf of all waiting callers
+          self._sending = True
+          updates = self._pending
+          self._pending = {}
+          current = self._next_batch
+          self._next_batch += 1
+
+          self._lock.release()
+          error = None
+          try:
+            try:
+              self._send_fn(updates)
+            except Exception, err:
+              error = err
+              raise
+          finally:
+            self._lock.acquire()
+            if error is not None:
+              self._errors[current] = error
+            self._sending = False
+            self._done_batch = current
+            self._cond.notifyAll()
+
+        error = self._errors.get(batch)
+        if error is not None:
+          # Another caller failed to send our update
+          raise error
+      finally:
+        self._waiting[batch] -= 1
+        if not self._waiting[batch]:
+          del self._waiting[batch]
+          self._errors.pop(batch, None)
+    finally:
+      self._lock.release()
+
+
 class JobQueue(object):
   """Queue used to manage the jobs.
 
@@ -1446,6 +1643,11 @@ class JobQueue(object):
     self.depmgr = _JobDependencyManager(self._GetJobStatusForDependencies,
                                         self._EnqueueJobs)
 
+    self._replicator = _JobFileReplicator(self._SendJobFileUpdates)
+
+    # Called whenever a job has been finalized
+    self._finalized_fn = None
+
     # Setup worker pool
     self._wpool = _JobQueueWorkerPool(self)
 
@@ -1629,9 +1831,72 @@ class JobQueue(object):
                     mode=constants.JOB_QUEUE_FILES_PERMS)
 
     if replicate:
-      names, addrs = self._GetNodeIp()
-      result = _CallJqUpdate(self._GetRpc(addrs), names, file_name, data)
-      self._CheckRpcResult(result, self._nodes, "Updating %s" % file_name)
+      self._replicator.Replicate(file_name, data, False)
+
+  def _SendJobFileUpdates(self, updates):
+    """Sends a batch of job file updates to all nodes.
+
+    Nodes which can't append to a file, e.g. because they don't have it yet,
+    receive the whole file instead.
+
+    @type updates: dict
+    @param updates: file names mapped to tuples of (append, content)
+
+    """
+    names, addrs = self._GetNodeIp()
+    if not names:
+      return
+
+    entries = [(vcluster.MakeVirtualPath(file_name), content, append)
+               for (file_name, (append, content)) in updates.items()]
+    file_names = dict((vcluster.MakeVirtualPath(file_name), file_name)
+                      for file_name in updates.keys())
+
+    result = self._GetRpc(addrs).call_jobqueue_update_multi(names, entries)
+    self._CheckRpcResult(result, names,
+                         "Updating %s job files" % len(entries))
+
+    for name in names:
+      node_result = result[name]
+      if node_result.fail_msg or not node_result.payload:
+        continue
+
+      retry = []
+      for virt_file_name in node_result.payload:
+        file_name = file_names[virt_file_name]
+        logging.debug("Node %s doesn't have %s, sending the whole file",
+                      name, file_name)
+        try:
+          retry.append((virt_file_name, utils.ReadFile(file_name), False))
+        except EnvironmentError, err:
+          if err.errno != errno.ENOENT:
+            raise
+
+      if retry:
+        retry_result = \
+          self._GetRpc([self._nodes[name]]).call_jobqueue_update_multi([name],
+                                                                       retry)
+        self._CheckRpcResult(retry_result, [name],
+                             "Updating %s job files" % len(retry))
+
+  def _ReplicateJobChanges(self, job, file_name):
+    """Replicates the changes appended to a job file to all nodes.
+
+    Only the segments appended since the last replication are sent, unless
+    the job file was rewritten without being replicated.
+
+    @type job: L{_QueuedJob}
+    @param job: the job whose changes to replicate
+    @type file_name: str
+    @param file_name: the path of the job file
+
+    """
+    if job.unreplicated is None:
+      self._replicator.Replicate(file_name, utils.ReadFile(file_name), False)
+    elif job.unreplicated:
+      self._replicator.Replicate(file_name, "".join(job.unreplicated), True)
+
+    job.unreplicated = []
 
   def _RenameFilesUnlocked(self, rename):
     """Renames a file locally and then replicate the change.
@@ -1814,7 +2079,7 @@ class JobQueue(object):
       writable = not archived
 
     try:
-      data = serializer.LoadJson(raw_data)
+      data = jstore.ParseJobFile(raw_data)
       job = _QueuedJob.Restore(self, data, writable, archived)
     except Exception, err: # pylint: disable=W0703
       raise errors.JobFileCorrupted(err)
@@ -1944,6 +2209,11 @@ class JobQueue(object):
     order to write the changes to disk and replicate them to the other
     nodes.
 
+    While the job is being processed, only the changes are appended to the
+    job file (see L{jstore.ParseJobFile}) and replicated. The whole file is
+    rewritten, and thereby compacted, when the job is written for the first
+    time and once it has been finalized.
+
     @type job: L{_QueuedJob}
     @param job: the changed job
     @type replicate: boolean
@@ -1957,9 +2227,50 @@ class JobQueue(object):
       assert not job.archived, "Can't update archived job"
 
     filename = self._GetJobPath(job.id)
+
+    if (job.disk_state is not None and
+        job.CalcStatus() not in constants.JOBS_FINALIZED):
+      segment = job.SerializeChanges()
+      try:
+        if segment:
+          data = serializer.DumpJson(segment)
+          logging.debug("Appending changes of job %s to %s", job.id, filename)
+          utils.AppendFile(filename, data)
+          if job.unreplicated is not None:
+            job.unreplicated.append(data)
+      except EnvironmentError, err:
+        if err.errno != errno.ENOENT:
+          raise
+        logging.warning("Job file %s disappeared, rewriting it", filename)
+      else:
+        if replicate:
+          self._ReplicateJobChanges(job, filename)
+        return
+
+    # Rewriting the whole file also compacts the appended segments
     data = serializer.DumpJson(job.Serialize())
     logging.debug("Writing job %s to %s", job.id, filename)
     self._UpdateJobQueueFile(filename, data, replicate)
+    job.MarkWritten()
+    if replicate:
+      job.unreplicated = []
+    else:
+      job.unreplicated = None
+
+    if job.end_timestamp is not None and self._finalized_fn:
+      self._finalized_fn()
+
+  def SetFinalizedFn(self, fn):
+    """Sets a function to be called whenever a job has been finalized.
+
+    The function is called by the thread finalizing the job, once the job
+    has been written to disk.
+
+    @type fn: callable or None
+    @param fn: Function without arguments
+
+    """
+    self._finalized_fn = fn
 
   def HasJobBeenFinalized(self, job_id):
     """Checks if a job has been finalized.
@@ -2166,6 +2477,12 @@ class JobQueue(object):
     """
     return self._wpool.HasRunningTasks()
 
+  def WaitForTasks(self):
+    """Waits until there are no more pending or running jobs.
+
+    """
+    self._wpool.Quiesce()
+
   @locking.ssynchronized(_LOCK)
   def Shutdown(self):
     """Stops the job queue.
@@ -35,11 +35,12 @@ module Ganeti.Query.Exec
 """
 
 import contextlib
+import errno
 import logging
 import os
+import select
 import signal
 import sys
-import time
 
 from ganeti import mcpu
 from ganeti.server import masterd
@@ -49,23 +50,63 @@ from ganeti import pathutils
 from ganeti.utils import livelock
 
 
+#: Maximum number of seconds to wait for a notification before checking the
+#: job's status again
+_MAX_WAIT = 10.0
+
+
 def _GetMasterInfo():
-  """Retrieves the job id and lock file name from the master process
+  """Retrieves the lock file name and job id from the master process
+
+  The lock file name is sent right after the process has been started, while
+  the job id might only arrive much later, if the process has been started
+  ahead of time as part of the pool of warm job processes. As all modules are
+  already imported at this point, the job can start right away then.
 
   This also closes standard input/output
 
   """
   logging.debug("Opening transport over stdin/out")
   with contextlib.closing(transport.FdTransport((0, 1))) as trans:
-    logging.debug("Reading job id from the master process")
-    job_id = int(trans.Call(""))
-    logging.debug("Got job id %d", job_id)
     logging.debug("Reading the livelock name from the master process")
     livelock_name = livelock.LiveLockName(trans.Call(""))
     logging.debug("Got livelock %s", livelock_name)
+    logging.debug("Waiting for a job id from the master process")
+    try:
+      job_id = int(trans.Call(""))
+    except Exception:
+      # The master process went away before handing over a job
+      logging.debug("No job received, removing livelock file %s",
+                    livelock_name.GetPath())
+      livelock_name.close()
+      raise
+    logging.debug("Got job id %d", job_id)
   return (job_id, livelock_name)
 
 
+def _WaitForNotification(wakeup, timeout):
+  """Waits for a notification on a wakeup file descriptor.
+
+  Signals are also written to the file descriptor, so the wait ends as soon as
+  either a signal or a notification arrives.
+
+  @type wakeup: L{utils.SignalWakeupFd}
+  @param wakeup: the file descriptor to wait on
+  @type timeout: float
+  @param timeout: the maximum number of seconds to wait
+
+  """
+  try:
+    (readable, _, _) = select.select([wakeup], [], [], timeout)
+  except select.error, err:
+    if err.args[0] != errno.EINTR:
+      raise
+  else:
+    if readable:
+      # Consume all pending notifications at once
+      os.read(wakeup.fileno(), 4096)
+
+
 def main():
 
   debug = int(os.environ["GNT_DEBUG"])
@@ -84,6 +125,10 @@ def main():
 
     logging.debug("Registering signal handlers")
 
+    # Woken up by signals and whenever a job has been finalized
+    wakeup = utils.SignalWakeupFd()
+    context.jobqueue.SetFinalizedFn(wakeup.Notify)
+
     cancel = [False]
     prio_change = [False]
 
@@ -92,10 +137,12 @@ def main():
       cancel[0] = True
     signal.signal(signal.SIGTERM, _TermHandler)
 
+    lock_notification = mcpu.GetLockNotification()
+
     def _HupHandler(signum, _frame):
-      logging.debug("Received signal %d, old flag was %s, will set to True",
-                    signum, mcpu.sighupReceived)
-      mcpu.sighupReceived[0] = True
+      logging.debug("Received signal %d, notifying about granted locks",
+                    signum)
+      lock_notification.Notify()
     signal.signal(signal.SIGHUP, _HupHandler)
 
     def _User1Handler(signum, _frame):
@@ -107,7 +154,6 @@ def main():
     context.jobqueue.PickupJob(job_id)
 
     # waiting for the job to finish
-    time.sleep(1)
     while not context.jobqueue.HasJobBeenFinalized(job_id):
       if cancel[0]:
         logging.debug("Got cancel request, cancelling job %d", job_id)
@@ -128,12 +174,11 @@ def main():
           logging.warning("Informed of priority change, but could not"
                           " read new priority")
         prio_change[0] = False
-      time.sleep(1)
+      _WaitForNotification(wakeup, _MAX_WAIT)
 
     # wait until the queue finishes
     logging.debug("Waiting for the queue to finish")
-    while context.jobqueue.PrepareShutdown():
-      time.sleep(1)
+    context.jobqueue.WaitForTasks()
     logging.debug("Shutting the queue down")
     context.jobqueue.Shutdown()
     exit_code = 0
@@ -36,6 +36,7 @@ import os
 from ganeti import constants
 from ganeti import errors
 from ganeti import runtime
+from ganeti import serializer
 from ganeti import utils
 from ganeti import pathutils
 
@@ -233,3 +234,53 @@ def ParseJobId(job_id):
     return int(job_id)
   except (ValueError, TypeError):
     raise errors.ParameterError("Invalid job ID '%s'" % job_id)
+
+
+def _ApplyJobSegment(state, segment):
+  """Applies a segment of a job file to the serialized job.
+
+  @type state: dict
+  @param state: the serialized job, modified in place
+  @type segment: dict
+  @param segment: the changes to apply
+
+  """
+  state.update(segment.get("job", {}))
+
+  ops = state["ops"]
+  for (idx, changes) in segment.get("ops", []):
+    ops[idx].update(changes)
+  for (idx, entry) in segment.get("log", []):
+    ops[idx]["log"].append(entry)
+
+
+def ParseJobFile(data):
+  """Parses the contents of a job file.
+
+  The first line of a job file holds the serialized job. While the job is
+  being processed, segments with changes are appended, one per line, instead
+  of rewriting the whole file. A segment is a dictionary with the following
+  optional keys:
+
+    - C{job}: dictionary of changed job fields
+    - C{ops}: list of (opcode index, dictionary of changed opcode fields)
+    - C{log}: list of (opcode index, log entry) for new log entries
+
+  A segment which is still being written isn't terminated by a newline yet
+  and is ignored.
+
+  @type data: str
+  @param data: the contents of the job file
+  @rtype: dict
+  @return: the serialized job with all segments applied
+
+  """
+  lines = data.split("\n")
+
+  state = serializer.LoadJson(lines[0])
+
+  for segment in lines[1:-1]:
+    if segment:
+      _ApplyJobSegment(state, serializer.LoadJson(segment))
+
+  return state
@@ -61,6 +61,7 @@ REQ_CHANGE_JOB_PRIORITY = constants.LUXI_REQ_CHANGE_JOB_PRIORITY
 REQ_AUTO_ARCHIVE_JOBS = constants.LUXI_REQ_AUTO_ARCHIVE_JOBS
 REQ_QUERY = constants.LUXI_REQ_QUERY
 REQ_QUERY_FIELDS = constants.LUXI_REQ_QUERY_FIELDS
+REQ_QUERY_PAGE = constants.LUXI_REQ_QUERY_PAGE
 REQ_QUERY_JOBS = constants.LUXI_REQ_QUERY_JOBS
 REQ_QUERY_FILTERS = constants.LUXI_REQ_QUERY_FILTERS
 REQ_REPLACE_FILTER = constants.LUXI_REQ_REPLACE_FILTER
@@ -202,6 +203,29 @@ class Client(cl.AbstractClient):
     result = self.CallMethod(REQ_QUERY, (what, fields, qfilter))
     return objects.QueryResponse.FromDict(result)
 
+  def QueryPage(self, what, fields, qfilter, limit, resume=None):
+    """Query for one page of resources/items.
+
+    Pages are returned in the same order as the items of a L{Query}
+    call; the C{next} attribute of a page is the token to pass as
+    C{resume} for retrieving the next one.
+
+    @param what: One of L{constants.QR_VIA_LUXI}
+    @type fields: List of strings
+    @param fields: List of requested fields
+    @type qfilter: None or list
+    @param qfilter: Query filter
+    @type limit: int
+    @param limit: Maximum number of items to return
+    @type resume: None or string
+    @param resume: Token returned with the previous page
+    @rtype: L{objects.QueryPageResponse}
+
+    """
+    result = self.CallMethod(REQ_QUERY_PAGE,
+                             (what, fields, qfilter, limit, resume))
+    return objects.QueryPageResponse.FromDict(result)
+
   def QueryFields(self, what, fields):
     """Query for available fields.
 
@@ -37,6 +37,9 @@ are two kinds of classes defined:
 
 """
 
+import errno
+import os
+import select
 import sys
 import logging
 import random
@@ -56,7 +59,6 @@ from ganeti import compat
 from ganeti import wconfd
 
 
-sighupReceived = [False]
 lusExecuting = [0]
 
 _OP_PREFIX = "Op"
@@ -69,6 +71,97 @@ class LockAcquireTimeout(Exception):
   """
 
 
+class LockNotification(object):
+  """Notification that pending lock requests might have been granted.
+
+  WConfD informs a job about changes to the locks it is waiting for by sending
+  it SIGHUP. The signal handler calls L{Notify}, which wakes up the thread
+  waiting in L{Wait} through a pipe, so that waiting for locks doesn't need
+  any polling.
+
+  """
+  def __init__(self):
+    """Initializes this class.
+
+    """
+    (self._read_fd, self._write_fd) = os.pipe()
+    for fd in (self._read_fd, self._write_fd):
+      utils.SetNonblockFlag(fd, True)
+      utils.SetCloseOnExecFlag(fd, True)
+
+  def Notify(self):
+    """Notifies a waiting thread; safe to be called from signal handlers.
+
+    """
+    try:
+      os.write(self._write_fd, chr(0))
+    except OSError, err:
+      # A full pipe already wakes up the waiting thread
+      if err.errno != errno.EAGAIN:
+        raise
+
+  def Clear(self):
+    """Discards all pending notifications.
+
+    @rtype: bool
+    @return: whether there have been any pending notifications
+
+    """
+    notified = False
+    while True:
+      try:
+        data = os.read(self._read_fd, 4096)
+      except OSError, err:
+        if err.errno == errno.EAGAIN:
+          return notified
+        raise
+      if not data:
+        return notified
+      notified = True
+
+  def Wait(self, timeout):
+    """Waits for a notification.
+
+    @type timeout: float
+    @param timeout: the maximum number of seconds to wait
+    @rtype: bool
+    @return: whether a notification arrived; all pending notifications are
+        consumed
+
+    """
+    end_time = time.time() + timeout
+    while True:
+      try:
+        select.select([self._read_fd], [], [], max(0, end_time - time.time()))
+      except select.error, err:
+        if err.args[0] != errno.EINTR:
+          raise
+        if time.time() < end_time:
+          continue
+      return self.Clear()
+
+
+#: Notification of granted locks, see L{GetLockNotification}
+_lockNotification = None
+
+
+def GetLockNotification():
+  """Returns the notification of granted locks.
+
+  The notification is triggered by the job executor on SIGHUP. Its pipe is
+  only opened on first use, so that merely importing this module doesn't
+  consume file descriptors; the job executor creates it before installing
+  the signal handler and starting any threads.
+
+  @rtype: L{LockNotification}
+
+  """
+  global _lockNotification # pylint: disable=W0603
+  if _lockNotification is None:
+    _lockNotification = LockNotification()
+  return _lockNotification
+
+
 def _CalculateLockAttemptTimeouts():
   """Calculate timeouts for lock attempts.
 
@@ -296,7 +389,9 @@ class Processor(object):
     self.rpc = context.GetRpc(self.cfg)
     self.hmclass = hooksmaster.HooksMaster
     self._enable_locks = enable_locks
-    self.wconfd = wconfd # Indirection to allow testing
+    # Indirection to allow testing; all clients share the connection of the
+    # context
+    self.wconfd = wconfd.SharedClient(context.GetWConfdClient())
     self._wconfdcontext = context.GetWConfdContext(ec_id)
 
   def _CheckLocksEnabled(self):
@@ -330,33 +425,28 @@ class Processor(object):
     if priority is None:
       priority = constants.OP_PRIO_DEFAULT
 
-    ## Expect a signal
-    if sighupReceived[0]:
+    ## Expect a notification
+    if GetLockNotification().Clear():
       logging.warning("Ignoring unexpected SIGHUP")
-    sighupReceived[0] = False
-
-    # Request locks
-    self.wconfd.Client().UpdateLocksWaiting(self._wconfdcontext, priority,
-                                            request)
-    pending = self.wconfd.Client().HasPendingRequest(self._wconfdcontext)
-
-    if pending:
-      def _HasPending():
-        if sighupReceived[0]:
-          return self.wconfd.Client().HasPendingRequest(self._wconfdcontext)
-        else:
-          return True
 
-      pending = utils.SimpleRetry(False, _HasPending, 0.05, timeout)
-
-      signal = sighupReceived[0]
-
-      if pending:
+    # Request locks, checking for the result in the same round trip
+    (_, pending) = self.wconfd.Client().Pipeline([
+      ("UpdateLocksWaiting", [self._wconfdcontext, priority, request]),
+      ("HasPendingRequest", [self._wconfdcontext]),
+      ])
+
+    # Only ask WConfD again once it has notified us of a change
+    end_time = time.time() + timeout
+    while pending:
+      remaining = end_time - time.time()
+      if remaining <= 0:
+        break
+      if GetLockNotification().Wait(remaining):
         pending = self.wconfd.Client().HasPendingRequest(self._wconfdcontext)
 
-      if pending and signal:
-        logging.warning("Ignoring unexpected SIGHUP")
-      sighupReceived[0] = False
+    if pending:
+      # A notification might have been missed
+      pending = self.wconfd.Client().HasPendingRequest(self._wconfdcontext)
 
     logging.debug("Finished trying. Pending: %s", pending)
     if pending:
@@ -442,13 +532,13 @@ class Processor(object):
       ## acquire the locks one by one (in lock order).
       for r in request:
         logging.debug("Definite request %s for %s", r, self._wconfdcontext)
-        self.wconfd.Client().UpdateLocksWaiting(self._wconfdcontext, priority,
-                                                [r])
-        while True:
+        (_, pending) = self.wconfd.Client().Pipeline([
+          ("UpdateLocksWaiting", [self._wconfdcontext, priority, [r]]),
+          ("HasPendingRequest", [self._wconfdcontext]),
+          ])
+        while pending:
+          GetLockNotification().Wait(10.0 * random.random())
           pending = self.wconfd.Client().HasPendingRequest(self._wconfdcontext)
-          if not pending:
-            break
-          time.sleep(10.0 * random.random())
 
     elif opportunistic:
       logging.debug("For %ss trying to opportunistically acquire"
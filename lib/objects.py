@@ -2154,6 +2154,25 @@ class ImportExportStatus(ConfigObject):
     ] + _TIMESTAMPS
 
 
+class DiskWipeStatus(ConfigObject):
+  """Config object representing the wipe status of a disk.
+
+  @ivar offset: Offset in MiB up to which the disk has been wiped
+  @ivar size: Size of the disk in MiB
+  @ivar method: How the disk is wiped, one of L{constants.WIPE_METHODS}
+  @ivar finished: Whether wiping the disk has ended, successfully or not
+  @ivar error_message: Error message if wiping the disk failed
+
+  """
+  __slots__ = [
+    "offset",
+    "size",
+    "method",
+    "finished",
+    "error_message",
+    ]
+
+
 class ImportExportOptions(ConfigObject):
   """Options for import/export daemon
 
@@ -2262,6 +2281,28 @@ class QueryResponse(_QueryResponseBase):
     ]
 
 
+class QueryPageResponse(QueryResponse):
+  """Object holding one page of the response to a query.
+
+  @ivar next: Token for requesting the next page, C{None} if this is the
+    last one
+
+  """
+  __slots__ = [
+    "next",
+    ]
+
+  def ToDict(self, _with_private=False):
+    """Custom function for serializing.
+
+    The token is always included, C{None} signals the last page.
+
+    """
+    mydict = super(QueryPageResponse, self).ToDict()
+    mydict["next"] = getattr(self, "next", None)
+    return mydict
+
+
 class QueryFieldsRequest(ConfigObject):
   """Object holding a request for querying available fields.
 
@@ -65,6 +65,7 @@ KVM_CONSOLE_WRAPPER = _constants.PKGLIBDIR + "/tools/kvm-console-wrapper"
 KVM_IFUP = _constants.PKGLIBDIR + "/kvm-ifup"
 PREPARE_NODE_JOIN = _constants.PKGLIBDIR + "/prepare-node-join"
 SSH_UPDATE = _constants.PKGLIBDIR + "/ssh-update"
+WIPE_DISKS = _constants.PKGLIBDIR + "/wipe-disks"
 NODE_DAEMON_SETUP = _constants.PKGLIBDIR + "/node-daemon-setup"
 XEN_CONSOLE_WRAPPER = _constants.PKGLIBDIR + "/tools/xen-console-wrapper"
 CFGUPGRADE = _constants.PKGLIBDIR + "/tools/cfgupgrade"
@@ -94,6 +95,7 @@ DISK_LINKS_DIR = RUN_DIR + "/instance-disks"
 SOCKET_DIR = RUN_DIR + "/socket"
 CRYPTO_KEYS_DIR = RUN_DIR + "/crypto"
 IMPORT_EXPORT_DIR = RUN_DIR + "/import-export"
+DISK_WIPE_DIR = RUN_DIR + "/disk-wipe"
 INSTANCE_STATUS_FILE = RUN_DIR + "/instance-status"
 INSTANCE_REASON_DIR = RUN_DIR + "/instance-reason"
 #: User-id pool lock directory (used user IDs have a corresponding lock file in
@@ -2422,7 +2422,8 @@ class GanetiRapiClient(object): # pylint: disable=R0904
                              ("/%s/groups/%s/tags" %
                               (GANETI_RAPI_VERSION, group)), query, None)
 
-  def Query(self, what, fields, qfilter=None, reason=None):
+  def Query(self, what, fields, qfilter=None, reason=None, limit=None,
+            resume=None):
     """Retrieves information about resources.
 
     @type what: string
@@ -2433,6 +2434,11 @@ class GanetiRapiClient(object): # pylint: disable=R0904
     @param qfilter: Query filter
     @type reason: string
     @param reason: the reason for executing this operation
+    @type limit: int
+    @param limit: Maximum number of items to return; if given, the result
+      contains the token for retrieving the next page in C{next}
+    @type resume: string
+    @param resume: Token returned with the previous page
 
     @rtype: string
     @return: job id
@@ -2440,6 +2446,8 @@ class GanetiRapiClient(object): # pylint: disable=R0904
     """
     query = []
     _AppendReason(query, reason)
+    _AppendIf(query, limit, ("limit", limit))
+    _AppendIf(query, resume is not None, ("resume", resume))
 
     body = {
       "fields": fields,
@@ -2453,6 +2461,41 @@ class GanetiRapiClient(object): # pylint: disable=R0904
                              ("/%s/query/%s" %
                               (GANETI_RAPI_VERSION, what)), query, body)
 
+  def QueryIter(self, what, fields, qfilter=None, reason=None,
+                page_size=1000):
+    """Retrieves information about resources, one page at a time.
+
+    Unlike L{Query}, this uses a separate request for every C{page_size}
+    items, so that the whole result never needs to be held in memory.
+
+    @type what: string
+    @param what: Resource name, one of L{constants.QR_VIA_RAPI}
+    @type fields: list of string
+    @param fields: Requested fields
+    @type qfilter: None or list
+    @param qfilter: Query filter
+    @type reason: string
+    @param reason: the reason for executing this operation
+    @type page_size: int
+    @param page_size: Number of items to retrieve per request
+
+    @rtype: generator
+    @return: Yields the rows of the result
+
+    """
+    resume = None
+    while True:
+      page = self.Query(what, fields, qfilter=qfilter, reason=reason,
+                        limit=page_size, resume=resume)
+
+      for row in page["data"]:
+        yield row
+
+      # Servers leaving out the token don't have any further pages
+      resume = page.get("next")
+      if resume is None:
+        break
+
   def QueryFields(self, what, fields=None, reason=None):
     """Retrieves available fields for a resource.
 
@@ -72,6 +72,7 @@ from ganeti import cli
 from ganeti import rapi
 from ganeti import ht
 from ganeti import compat
+from ganeti import serializer
 from ganeti.rapi import baserlib
 
 
@@ -1583,6 +1584,38 @@ def _SplitQueryFields(fields):
   return [i.strip() for i in fields.split(",")]
 
 
+#: Number of items fetched at once when streaming query results
+_QUERY_STREAM_PAGE_SIZE = 1000
+
+
+def _StreamQueryResult(client, what, fields, qfilter, limit, page):
+  """Generates the serialized result of a query, one page at a time.
+
+  The generated text is a serialized L{objects.QueryResponse}, but only
+  one page of the result is held in memory at any time.
+
+  @type page: L{objects.QueryPageResponse}
+  @param page: The first page of the result
+
+  """
+  yield "{\"fields\": %s, \"data\": [" % \
+    serializer.DumpJson(page.ToDict()["fields"]).rstrip()
+
+  sep = ""
+  while True:
+    if page.data:
+      # Serialize all rows at once and remove the list's brackets
+      yield sep + serializer.DumpJson(page.data).rstrip()[1:-1]
+      sep = ", "
+
+    if page.next is None:
+      break
+
+    page = client.QueryPage(what, fields, qfilter, limit, page.next)
+
+  yield "]}\n"
+
+
 class R_2_query(baserlib.ResourceBase):
   """/2/query/[resource] resource.
 
@@ -1594,13 +1627,37 @@ class R_2_query(baserlib.ResourceBase):
   PUT_OPCODE = opcodes.OpQuery
 
   def _Query(self, fields, qfilter):
+    what = self.items[0]
+    limit = self._checkIntVariable("limit")
+    resume = self._checkStringVariable("resume")
+
+    if limit < 0:
+      raise http.HttpBadRequest("Invalid value for the 'limit' parameter")
+
     client = self.GetClient()
-    return client.Query(self.items[0], fields, qfilter).ToDict()
+
+    if self._checkIntVariable("stream"):
+      if not limit:
+        limit = _QUERY_STREAM_PAGE_SIZE
+      # The first page is retrieved right away to report errors properly
+      page = client.QueryPage(what, fields, qfilter, limit, resume)
+      return _StreamQueryResult(client, what, fields, qfilter, limit, page)
+
+    if limit or resume is not None:
+      if not limit:
+        raise http.HttpBadRequest("The 'resume' parameter requires a limit")
+      return client.QueryPage(what, fields, qfilter, limit, resume).ToDict()
+
+    return client.Query(what, fields, qfilter).ToDict()
 
   def GET(self):
     """Returns resource information.
 
-    @return: Query result, see L{objects.QueryResponse}
+    Results can be requested one page at a time using the C{limit} and
+    C{resume} parameters, or streamed using C{stream}.
+
+    @return: Query result, see L{objects.QueryResponse} and
+      L{objects.QueryPageResponse}
 
     """
     return self._Query(_GetQueryFields(self.queryargs), None)
@@ -1608,7 +1665,8 @@ class R_2_query(baserlib.ResourceBase):
   def PUT(self):
     """Submits job querying for resources.
 
-    @return: Query result, see L{objects.QueryResponse}
+    @return: Query result, see L{objects.QueryResponse} and
+      L{objects.QueryPageResponse}
 
     """
     body = self.request_body
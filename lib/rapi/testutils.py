@@ -256,7 +256,11 @@ class _RapiMock(object):
     (_, _, _, resp_msg) = \
       http.server.HttpResponder(self.handler)(lambda: (req_msg, None))
 
-    return (resp_msg.start_line.code, resp_msg.headers, resp_msg.body)
+    resp_body = resp_msg.body
+    if http.IsStreamedBody(resp_body):
+      resp_body = "".join(resp_body)
+
+    return (resp_msg.start_line.code, resp_msg.headers, resp_body)
 
 
 class _TestLuxiTransport(object):
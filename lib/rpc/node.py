@@ -76,6 +76,10 @@ _RPC_CLIENT_HEADERS = [
 #: Special value to describe an offline host
 _OFFLINE = object()
 
+#: Pool of cURL objects keeping connections to node daemons open, set up by
+#: L{Init}
+_curl_pool = None
+
 
 def Init():
   """Initializes the module-global HTTP client manager.
@@ -94,6 +98,9 @@ def Init():
 
   pycurl.global_init(pycurl.GLOBAL_ALL)
 
+  global _curl_pool # pylint: disable=W0603
+  _curl_pool = http.client.CurlPool()
+
 
 def Shutdown():
   """Stops the module-global HTTP client manager.
@@ -102,6 +109,11 @@ def Shutdown():
   running.
 
   """
+  global _curl_pool # pylint: disable=W0603
+  if _curl_pool is not None:
+    _curl_pool.Close()
+    _curl_pool = None
+
   pycurl.global_cleanup()
 
 
@@ -164,6 +176,27 @@ def _Compress(_, data):
           base64.b64encode(zlib.compress(data, 3)))
 
 
+def _CompressFileUpdates(node, updates):
+  """Compresses the contents of file updates for transport over RPC.
+
+  @type updates: list of tuples
+  @param updates: tuples of (file name, content, append)
+  @rtype: list of tuples
+  @return: the updates with their contents encoded by L{_Compress}
+
+  """
+  return [(file_name, _Compress(node, content), append)
+          for (file_name, content, append) in updates]
+
+
+def _DumpJson(data):
+  """Serialises an RPC request body.
+
+  """
+  return serializer.DumpJson(data,
+                             private_encoder=serializer.EncodeWithPrivateFields)
+
+
 class RpcResult(object):
   """RPC Result class.
 
@@ -267,7 +300,7 @@ class RpcResult(object):
 
 
 def _SsconfResolver(ssconf_ips, node_list, _,
-                    ssc=ssconf.SimpleStore,
+                    ssc=compat.partial(ssconf.SimpleStore, cache=True),
                     nslookup_fn=netutils.Hostname.GetIP):
   """Return addresses for given node names.
 
@@ -275,8 +308,9 @@ def _SsconfResolver(ssconf_ips, node_list, _,
   @param ssconf_ips: Use the ssconf IPs
   @type node_list: list
   @param node_list: List of node names
-  @type ssc: class
-  @param ssc: SimpleStore class that is used to obtain node->ip mappings
+  @type ssc: callable
+  @param ssc: Returns the L{ssconf.SimpleStore} that is used to obtain
+    node->ip mappings
   @type nslookup_fn: callable
   @param nslookup_fn: function use to do NS lookup
   @rtype: list of tuple; (string, string)
@@ -456,7 +490,8 @@ class _RpcProcessor:
       "Missing RPC read timeout for procedure '%s'" % procedure
 
     if _req_process_fn is None:
-      _req_process_fn = http.client.ProcessRequests
+      _req_process_fn = compat.partial(http.client.ProcessRequests,
+                                       curl_pool=_curl_pool)
 
     (results, requests) = \
       self._PrepareRequests(self._resolver(nodes, resolver_opts), self._port,
@@ -511,20 +546,37 @@ class _RpcClientBase:
     if len(args) != len(argdefs):
       raise errors.ProgrammerError("Number of passed arguments doesn't match")
 
-    if prep_fn is None:
-      prep_fn = lambda _, args: args
-    assert callable(prep_fn)
-
-    # encode the arguments for each node individually, pass them and the node
-    # name to the prep_fn, and serialise its return value
-    encode_args_fn = lambda node: map(compat.partial(self._encoder, node),
-                                      zip(map(compat.snd, argdefs), args))
-    pnbody = dict(
-      (n,
-       serializer.DumpJson(prep_fn(n, encode_args_fn(n)),
-                           private_encoder=serializer.EncodeWithPrivateFields))
-      for n in node_list
-    )
+    argkinds = map(compat.snd, argdefs)
+    node_independent = [argkind is None or
+                        argkind in rpc_defs.ED_NODE_INDEPENDENT
+                        for argkind in argkinds]
+
+    if not node_list:
+      pnbody = {}
+    elif prep_fn is None and compat.all(node_independent):
+      # the body is the same for all nodes, serialise it only once
+      body = _DumpJson(map(compat.partial(self._encoder, None),
+                           zip(argkinds, args)))
+      pnbody = dict.fromkeys(node_list, body)
+    else:
+      if prep_fn is None:
+        prep_fn = lambda _, args: args
+      assert callable(prep_fn)
+
+      # encode the node-independent arguments once, the remaining ones for
+      # each node individually; pass them and the node name to the prep_fn,
+      # and serialise its return value
+      shared_args = [self._encoder(None, (argkind, value)) if indep else None
+                     for (indep, argkind, value)
+                     in zip(node_independent, argkinds, args)]
+
+      def _EncodeArgs(node):
+        return [shared if indep else self._encoder(node, (argkind, value))
+                for (indep, shared, argkind, value)
+                in zip(node_independent, shared_args, argkinds, args)]
+
+      pnbody = dict((n, _DumpJson(prep_fn(n, _EncodeArgs(n))))
+                    for n in node_list)
 
     result = self._proc(node_list, procedure, pnbody, read_timeout,
                         req_resolver_opts)
@@ -784,6 +836,7 @@ _ENCODERS = {
   rpc_defs.ED_OBJECT_DICT: _ObjectToDict,
   rpc_defs.ED_OBJECT_DICT_LIST: _ObjectListToDict,
   rpc_defs.ED_COMPRESS: _Compress,
+  rpc_defs.ED_FILE_UPDATES: _CompressFileUpdates,
   rpc_defs.ED_FINALIZE_EXPORT_DISKS: _PrepareFinalizeExportDisks,
   rpc_defs.ED_BLOCKDEV_RENAME: _EncodeBlockdevRename,
   }
@@ -34,7 +34,6 @@ A transport can send to and receive messages from some endpoint.
 
 """
 
-import collections
 import errno
 import io
 import logging
@@ -51,6 +50,29 @@ from ganeti.rpc import errors
 DEF_CTMO = constants.LUXI_DEF_CTMO
 DEF_RWTO = constants.LUXI_DEF_RWTO
 
+#: Bounds for the number of bytes requested by a single read; the size adapts
+#: to the amount of data actually received, so that large messages are read
+#: in few system calls
+_MIN_READ_SIZE = 4096
+_MAX_READ_SIZE = 1024 * 1024
+
+
+def _NextReadSize(size, received):
+  """Computes the size of the next read from the result of the last one.
+
+  @type size: int
+  @param size: the number of bytes requested by the last read
+  @type received: int
+  @param received: the number of bytes actually received
+  @rtype: int
+
+  """
+  if received >= size:
+    return min(size * 2, _MAX_READ_SIZE)
+  elif received < size / 2:
+    return max(size / 2, _MIN_READ_SIZE)
+  return size
+
 
 class Transport:
   """Low-level transport class.
@@ -89,8 +111,8 @@ class Transport:
       self._ctimeout, self._rwtimeout = timeouts
 
     self.socket = None
-    self._buffer = ""
-    self._msgs = collections.deque()
+    self._msgbuf = utils.MessageBuffer(constants.LUXI_EOM)
+    self._read_size = _MIN_READ_SIZE
 
     try:
       self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
@@ -170,12 +192,15 @@ class Transport:
     """
     self._CheckSocket()
     etime = time.time() + self._rwtimeout
-    while not self._msgs:
+    while True:
+      msg = self._msgbuf.PopMessage()
+      if msg is not None:
+        return msg
       if time.time() > etime:
         raise errors.TimeoutError("Extended receive timeout")
       while True:
         try:
-          data = self.socket.recv(4096)
+          data = self.socket.recv(self._read_size)
         except socket.timeout, err:
           raise errors.TimeoutError("Receive timeout: %s" % str(err))
         except socket.error, err:
@@ -185,10 +210,8 @@ class Transport:
         break
       if not data:
         raise errors.ConnectionClosedError("Connection closed while reading")
-      new_msgs = (self._buffer + data).split(constants.LUXI_EOM)
-      self._buffer = new_msgs.pop()
-      self._msgs.extend(new_msgs)
-    return self._msgs.popleft()
+      self._read_size = _NextReadSize(self._read_size, len(data))
+      self._msgbuf.Feed(data)
 
   def Call(self, msg):
     """Send a message and wait for the response.
@@ -257,8 +280,8 @@ class FdTransport:
     self._rstream = io.open(fds[0], 'rb', 0)
     self._wstream = io.open(fds[1], 'wb', 0)
 
-    self._buffer = ""
-    self._msgs = collections.deque()
+    self._msgbuf = utils.MessageBuffer(constants.LUXI_EOM)
+    self._read_size = _MIN_READ_SIZE
 
   def _CheckSocket(self):
     """Make sure we are connected.
@@ -288,14 +311,15 @@ class FdTransport:
 
     """
     self._CheckSocket()
-    while not self._msgs:
-      data = self._rstream.read(4096)
+    while True:
+      msg = self._msgbuf.PopMessage()
+      if msg is not None:
+        return msg
+      data = self._rstream.read(self._read_size)
       if not data:
         raise errors.ConnectionClosedError("Connection closed while reading")
-      new_msgs = (self._buffer + data).split(constants.LUXI_EOM)
-      self._buffer = new_msgs.pop()
-      self._msgs.extend(new_msgs)
-    return self._msgs.popleft()
+      self._read_size = _NextReadSize(self._read_size, len(data))
+      self._msgbuf.Feed(data)
 
   def Call(self, msg):
     """Send a message and wait for the response.
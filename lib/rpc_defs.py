@@ -48,6 +48,7 @@ RPC definition fields:
 
 """
 
+from ganeti import compat
 from ganeti import constants
 from ganeti import utils
 from ganeti import objects
@@ -82,7 +83,22 @@ ACCEPT_OFFLINE_NODE = object()
  ED_MULTI_DISKS_DICT_DP,
  ED_SINGLE_DISK_DICT_DP,
  ED_NIC_DICT,
- ED_DEVICE_DICT) = range(1, 17)
+ ED_DEVICE_DICT,
+ ED_FILE_UPDATES) = range(1, 18)
+
+#: Argument kinds whose encoding doesn't depend on the destination node; for
+#: multi-node calls, these arguments (and those without a kind) are encoded
+#: only once and shared by all requests
+ED_NODE_INDEPENDENT = compat.UniqueFrozenset([
+  ED_OBJECT_DICT,
+  ED_OBJECT_DICT_LIST,
+  ED_FILE_DETAILS,
+  ED_FINALIZE_EXPORT_DISKS,
+  ED_COMPRESS,
+  ED_BLOCKDEV_RENAME,
+  ED_NIC_DICT,
+  ED_FILE_UPDATES,
+  ])
 
 
 def _Prepare(calls):
@@ -142,6 +158,24 @@ def _BlockdevGetMirrorStatusMultiPostProc(result):
   return result
 
 
+def _BlockdevWatchSyncPreProc(node, args):
+  """Prepares the appropriate node values for blockdev_watch_sync.
+
+  """
+  # the first argument is a node->disks dictionary, only the value for the
+  # current node is sent
+  assert len(args) == 3
+  return [args[0][node]] + args[1:]
+
+
+def _BlockdevWatchSyncTimeout((_, __, timeout)):
+  """Calculate timeout for "blockdev_watch_sync" RPC.
+
+  """
+  return int(min(timeout, constants.SYNC_WATCH_MAX_TIMEOUT) +
+             constants.RPC_TMO_URGENT)
+
+
 def _NodeInfoPreProc(node, args):
   """Prepare the storage_units argument for node_info calls."""
   assert len(args) == 2
@@ -175,6 +209,19 @@ def _ImpExpStatusPostProc(result):
   return result
 
 
+def _DiskWipeStatusPostProc(result):
+  """Post-processor for disk wipe status.
+
+  @rtype: Payload containing list of L{objects.DiskWipeStatus} instances
+
+  """
+  if not result.fail_msg:
+    result.payload = [objects.DiskWipeStatus.FromDict(i)
+                      for i in result.payload]
+
+  return result
+
+
 def _TestDelayTimeout((duration, )):
   """Calculate timeout for "test_delay" RPC.
 
@@ -387,6 +434,18 @@ _BLOCKDEV_CALLS = [
     ("size", None, None),
     ], None, None,
     "Request wipe at given offset with given size of a block device"),
+  ("blockdev_wipe_start", SINGLE, None, constants.RPC_TMO_NORMAL, [
+    ("disks", ED_DISKS_DICT_DP, None),
+    ("instance_name", None, None),
+    ("offsets", None, None),
+    ("parallelism", None, None),
+    ], None, None, "Starts wiping block devices in the background"),
+  ("blockdev_wipe_status", SINGLE, None, constants.RPC_TMO_FAST, [
+    ("name", None, "Disk wipe name"),
+    ], None, _DiskWipeStatusPostProc, "Gets the status of a disk wipe"),
+  ("blockdev_wipe_cleanup", SINGLE, None, constants.RPC_TMO_NORMAL, [
+    ("name", None, "Disk wipe name"),
+    ], None, None, "Cleans up after a disk wipe"),
   ("blockdev_remove", SINGLE, None, constants.RPC_TMO_NORMAL, [
     ("bdev", ED_SINGLE_DISK_DICT_DP, None),
     ], None, None, "Request removal of a given block device"),
@@ -470,6 +529,13 @@ _BLOCKDEV_CALLS = [
     ], _BlockdevGetMirrorStatusMultiPreProc,
    _BlockdevGetMirrorStatusMultiPostProc,
     "Request status of (mirroring) devices from multiple nodes"),
+  ("blockdev_watch_sync", MULTI, None, _BlockdevWatchSyncTimeout, [
+    ("node_disks", ED_NODE_TO_DISK_DICT_DP, None),
+    ("min_progress", None, "Sync progress in percent to wait for"),
+    ("timeout", None, "Maximum time to wait in seconds"),
+    ], _BlockdevWatchSyncPreProc, _BlockdevGetMirrorStatusMultiPostProc,
+    "Wait for the sync of (mirroring) devices on multiple nodes to"
+    " progress"),
   ("blockdev_setinfo", SINGLE, None, constants.RPC_TMO_NORMAL, [
     ("disk", ED_SINGLE_DISK_DICT_DP, None),
     ("info", None, None),
@@ -637,6 +703,9 @@ CALLS = {
       ("file_name", None, None),
       ("content", ED_COMPRESS, None),
       ], None, None, "Update job queue file"),
+    ("jobqueue_update_multi", MULTI, None, constants.RPC_TMO_FAST, [
+      ("updates", ED_FILE_UPDATES, None),
+      ], None, None, "Update or append to multiple job queue files"),
     ("jobqueue_purge", SINGLE, None, constants.RPC_TMO_NORMAL, [], None, None,
      "Purge job queue"),
     ("jobqueue_rename", MULTI, None, constants.RPC_TMO_URGENT, [
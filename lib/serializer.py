@@ -40,19 +40,39 @@ backend (currently json).
 
 import re
 
-# Python 2.6 and above contain a JSON module based on simplejson. Unfortunately
-# the standard library version is significantly slower than the external
-# module. While it should be better from at least Python 3.2 on (see Python
-# issue 7451), for now Ganeti needs to work well with older Python versions
-# too.
-import simplejson
-
 from ganeti import errors
 from ganeti import utils
 from ganeti import constants
 
+
+def _SelectJsonBackend():
+  """Selects the module used for encoding and decoding JSON.
+
+  Python 2.6 and above contain a JSON module based on simplejson.
+  Unfortunately the standard library version is significantly slower than the
+  external module. While it should be better from at least Python 3.2 on (see
+  Python issue 7451), for now Ganeti needs to work well with older Python
+  versions too. Therefore simplejson is used if it is available, and the
+  standard library module otherwise.
+
+  @return: the JSON module
+
+  """
+  try:
+    import simplejson # pylint: disable=F0401
+    return simplejson
+  except ImportError:
+    import json
+    return json
+
+
+_json = _SelectJsonBackend()
+
 _RE_EOLSP = re.compile("[ \t]+$", re.MULTILINE)
 
+#: The fields whose values are wrapped in L{Private} on decoding
+_PRIVATE_FIELDS = frozenset(constants.PRIVATE_PARAMETERS_BLACKLIST)
+
 
 def DumpJson(data, private_encoder=None):
   """Serialize a given object.
@@ -67,34 +87,82 @@ def DumpJson(data, private_encoder=None):
   if private_encoder is None:
     # Do not leak private fields by default.
     private_encoder = EncodeWithoutPrivateFields
-  encoded = simplejson.dumps(data, default=private_encoder)
+  txt = _json.dumps(data, default=private_encoder)
+
+  # Without indentation, the encoder produces a single line without trailing
+  # whitespace, so the whole text only needs to be scanned if it's not
+  if "\n" in txt:
+    txt = _RE_EOLSP.sub("", txt)
+    if txt.endswith("\n"):
+      return txt
 
-  txt = _RE_EOLSP.sub("", encoded)
-  if not txt.endswith("\n"):
-    txt += "\n"
+  return txt + "\n"
 
-  return txt
+
+def DumpJsonToFile(data, fileobj, private_encoder=None):
+  """Serialize a given object into a file.
+
+  The data is written incrementally as it is encoded, so that the whole
+  serialized form is never held in memory; the file object should be
+  buffered.
+
+  @param data: the data to serialize
+  @param fileobj: a file-like object to write to
+  @param private_encoder: see L{DumpJson}
+
+  """
+  if private_encoder is None:
+    # Do not leak private fields by default.
+    private_encoder = EncodeWithoutPrivateFields
+  _json.dump(data, fileobj, default=private_encoder)
+  fileobj.write("\n")
 
 
 def LoadJson(txt):
   """Unserialize data from a string.
 
+  Private fields are wrapped while decoding, see L{WrapPrivateValues}.
+
   @param txt: the json-encoded form
   @return: the original data
   @raise JSONDecodeError: if L{txt} is not a valid JSON document
 
   """
-  values = simplejson.loads(txt)
+  return _json.loads(txt, object_hook=_WrapPrivateFields)
+
 
-  # Hunt and seek for Private fields and wrap them.
-  WrapPrivateValues(values)
+def _WrapPrivateFields(data):
+  """Wraps the values of private fields of a decoded JSON object.
 
-  return values
+  This is called by the decoder for each object, after the objects nested in
+  it have been decoded.
+
+  @type data: dict
+  @param data: the decoded object, which is modified in place
+  @return: the object itself
+
+  """
+  # This is kind of a kludge, but the only place where we know what should
+  # be protected is in ganeti.opcodes, and not in a way that is helpful to
+  # us, especially in such a high traffic method; on the other hand, the
+  # Haskell `py_compat_fields` test should complain whenever this check
+  # does not protect fields properly.
+  for field in _PRIVATE_FIELDS:
+    if field in data:
+      value = data[field]
+      if not field.endswith("_cluster"):
+        data[field] = PrivateDict(value)
+      elif value is not None:
+        for os in value:
+          value[os] = PrivateDict(value[os])
+  return data
 
 
 def WrapPrivateValues(json):
   """Crawl a JSON decoded structure for private values and wrap them.
 
+  Data decoded by L{LoadJson} is already wrapped.
+
   @param json: the json-decoded value to protect.
 
   """
@@ -109,15 +177,9 @@ def WrapPrivateValues(json):
       for item in data:
         todo.append(item)
     elif isinstance(data, dict): # Object
-
-      # This is kind of a kludge, but the only place where we know what should
-      # be protected is in ganeti.opcodes, and not in a way that is helpful to
-      # us, especially in such a high traffic method; on the other hand, the
-      # Haskell `py_compat_fields` test should complain whenever this check
-      # does not protect fields properly.
       for field in data:
         value = data[field]
-        if field in constants.PRIVATE_PARAMETERS_BLACKLIST:
+        if field in _PRIVATE_FIELDS:
           if not field.endswith("_cluster"):
             data[field] = PrivateDict(value)
           elif data[field] is not None:
@@ -173,8 +235,6 @@ def LoadSignedJson(txt, key):
   """
   signed_dict = LoadJson(txt)
 
-  WrapPrivateValues(signed_dict)
-
   if not isinstance(signed_dict, dict):
     raise errors.SignatureError("Invalid external message")
   try:
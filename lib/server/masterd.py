@@ -55,6 +55,7 @@ import ganeti.rpc.errors as rpcerr
 from ganeti import utils
 from ganeti import errors
 from ganeti import workerpool
+from ganeti import wconfd
 import ganeti.rpc.node as rpc
 import ganeti.rpc.client as rpccl
 from ganeti import ht
@@ -333,6 +334,9 @@ class GanetiContext(object):
     else:
       self.livelock = livelock
 
+    # Connection to WConfD shared by the configuration and the processors
+    self._wconfd = wconfd.PersistentClient()
+
     # Job queue
     cfg = self.GetConfig(None)
     logging.debug("Creating the job queue")
@@ -351,8 +355,11 @@ class GanetiContext(object):
   def GetWConfdContext(self, ec_id):
     return config.GetWConfdContext(ec_id, self.livelock)
 
+  def GetWConfdClient(self):
+    return self._wconfd
+
   def GetConfig(self, ec_id):
-    return config.GetConfig(ec_id, self.livelock)
+    return config.GetConfig(ec_id, self.livelock, wconfd=self._wconfd)
 
   # pylint: disable=R0201
   # method could be a function, but keep interface backwards compatible
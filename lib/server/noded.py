@@ -65,6 +65,11 @@ import ganeti.http.server # pylint: disable=W0611
 
 queue_lock = None
 
+#: Default number of seconds idle RPC connections are kept open, must be
+#: longer than the idle timeout of the master's connection pool
+_KEEP_ALIVE_TIMEOUT = 15
+_WORKERS = 16
+
 
 def _extendReasonTrail(trail, source, reason=""):
   """Extend the reason trail with noded information
@@ -260,6 +265,32 @@ class NodeRequestHandler(http.server.HttpServerHandler):
     bdev = objects.Disk.FromDict(bdev_s)
     return backend.BlockdevWipe(bdev, offset, size)
 
+  @staticmethod
+  def perspective_blockdev_wipe_start(params):
+    """Start wiping block devices in the background.
+
+    """
+    (disks_s, instance_name, offsets, parallelism) = params
+    disks = [objects.Disk.FromDict(dsk_s) for dsk_s in disks_s]
+    return backend.BlockdevWipeStart(disks, instance_name, offsets,
+                                     parallelism)
+
+  @staticmethod
+  def perspective_blockdev_wipe_status(params):
+    """Query the status of a disk wipe.
+
+    """
+    (name, ) = params
+    return backend.BlockdevWipeStatus(name)
+
+  @staticmethod
+  def perspective_blockdev_wipe_cleanup(params):
+    """Clean up after a disk wipe.
+
+    """
+    (name, ) = params
+    return backend.BlockdevWipeCleanup(name)
+
   @staticmethod
   def perspective_blockdev_remove(params):
     """Remove a block device.
@@ -359,6 +390,26 @@ class NodeRequestHandler(http.server.HttpServerHandler):
 
     return result
 
+  @staticmethod
+  def perspective_blockdev_watch_sync(params):
+    """Wait for the sync of a list of disks to progress.
+
+    """
+    (node_disks, min_progress, timeout) = params
+
+    disks = [objects.Disk.FromDict(dsk_s) for dsk_s in node_disks]
+
+    result = []
+
+    for (success, status) in backend.BlockdevWatchSync(disks, min_progress,
+                                                       timeout):
+      if success:
+        result.append((success, status.ToDict()))
+      else:
+        result.append((success, status))
+
+    return result
+
   @staticmethod
   def perspective_blockdev_find(params):
     """Expose the FindBlockDevice functionality for a disk.
@@ -1172,6 +1223,15 @@ class NodeRequestHandler(http.server.HttpServerHandler):
     (file_name, content) = params
     return backend.JobQueueUpdate(file_name, content)
 
+  @staticmethod
+  @_RequireJobQueueLock
+  def perspective_jobqueue_update_multi(params):
+    """Update multiple job queue files.
+
+    """
+    (updates, ) = params
+    return backend.JobQueueUpdateMulti(updates)
+
   @staticmethod
   @_RequireJobQueueLock
   def perspective_jobqueue_purge(params):
@@ -1283,10 +1343,17 @@ class NodeRequestHandler(http.server.HttpServerHandler):
     return backend.CleanupImportExport(params[0])
 
 
-def CheckNoded(_, args):
+def CheckNoded(options, args):
   """Initial checks whether to run or exit with a failure.
 
   """
+  if options.keep_alive_timeout < 0 or options.keep_alive_max_requests < 1:
+    print >> sys.stderr, "Invalid keep-alive settings"
+    sys.exit(constants.EXIT_FAILURE)
+  if (options.workers < 0 or options.worker_max_requests < 1 or
+      options.request_timeout < 0):
+    print >> sys.stderr, "Invalid worker settings"
+    sys.exit(constants.EXIT_FAILURE)
   if args: # noded doesn't take any arguments
     print >> sys.stderr, ("Usage: %s [-f] [-d] [-p port] [-b ADDRESS]" %
                           sys.argv[0])
@@ -1332,7 +1399,7 @@ def SSLVerifyPeer(conn, cert, errnum, errdepth, ok):
   # some parameters are unused, but this is the API
   # pylint: disable=W0613
   _BOOTSTRAP = "bootstrap"
-  sstore = ssconf.SimpleStore()
+  sstore = ssconf.SimpleStore(cache=True)
   try:
     candidate_certs = sstore.GetMasterCandidatesCertMap()
   except errors.ConfigurationError:
@@ -1382,7 +1449,13 @@ def PrepNoded(options, _):
     http.server.HttpServer(mainloop, options.bind_address, options.port,
                            handler, ssl_params=ssl_params, ssl_verify_peer=True,
                            request_executor_class=request_executor_class,
-                           ssl_verify_callback=SSLVerifyPeer)
+                           ssl_verify_callback=SSLVerifyPeer,
+                           keep_alive_timeout=options.keep_alive_timeout,
+                           keep_alive_max_requests=
+                             options.keep_alive_max_requests,
+                           workers=options.workers,
+                           worker_max_requests=options.worker_max_requests,
+                           request_timeout=options.request_timeout)
   server.Start()
 
   return (mainloop, server)
@@ -1411,6 +1484,28 @@ def Main():
   parser.add_option("--no-mlock", dest="mlock",
                     help="Do not mlock the node memory in ram",
                     default=True, action="store_false")
+  parser.add_option("--keep-alive-timeout", dest="keep_alive_timeout",
+                    help=("Number of seconds idle connections are kept open"
+                          " for further requests, 0 to disable keep-alive"),
+                    default=_KEEP_ALIVE_TIMEOUT, type="float",
+                    metavar="SECONDS")
+  parser.add_option("--keep-alive-max-requests",
+                    dest="keep_alive_max_requests",
+                    help="Maximum number of requests served per connection",
+                    default=http.server.HttpServer.KEEP_ALIVE_MAX_REQUESTS,
+                    type="int", metavar="NUM")
+  parser.add_option("--workers", dest="workers",
+                    help=("Number of pre-forked worker processes, 0 to fork"
+                          " a new process for every connection"),
+                    default=_WORKERS, type="int", metavar="NUM")
+  parser.add_option("--worker-max-requests", dest="worker_max_requests",
+                    help="Number of requests after which a worker is replaced",
+                    default=http.server.HttpServer.WORKER_MAX_REQUESTS,
+                    type="int", metavar="NUM")
+  parser.add_option("--request-timeout", dest="request_timeout",
+                    help=("Number of seconds after which a process handling"
+                          " a request is killed, 0 to disable"),
+                    default=0, type="float", metavar="SECONDS")
 
   daemon.GenericMain(constants.NODED, parser, CheckNoded, PrepNoded, ExecNoded,
                      default_ssl_cert=pathutils.NODED_CERT_FILE,
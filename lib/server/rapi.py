@@ -211,6 +211,10 @@ class RemoteApiHandler(http.auth.HttpServerRequestAuthentication,
 
     req.resp_headers[http.HTTP_CONTENT_TYPE] = http.HTTP_APP_JSON
 
+    if http.IsStreamedBody(result):
+      # Streamed results are serialized by the handler
+      return result
+
     return serializer.DumpJson(result)
 
 
@@ -35,6 +35,7 @@ configuration data, which is mostly static and available to all nodes.
 
 """
 
+import os
 import sys
 import errno
 import logging
@@ -99,6 +100,18 @@ def ReadSsconfFile(filename):
   @return: File contents without newlines at the end
   @raise RuntimeError: When the file size exceeds L{_MAX_SIZE}
 
+  """
+  return _ReadSsconfFileWithStat(filename)[0]
+
+
+def _ReadSsconfFileWithStat(filename):
+  """Reads an ssconf file and returns its contents and status.
+
+  @see: L{ReadSsconfFile}
+  @rtype: tuple; (string, C{os.stat_result})
+  @return: File contents without newlines at the end and the status of
+    the file the contents were read from
+
   """
   statcb = utils.FileStatHelper()
 
@@ -109,7 +122,62 @@ def ReadSsconfFile(filename):
            (filename, statcb.st.st_size, _MAX_SIZE))
     raise RuntimeError(msg)
 
-  return data.rstrip("\n")
+  return (data.rstrip("\n"), statcb.st)
+
+
+def _FileSignature(st):
+  """Returns the values identifying a version of a file.
+
+  @type st: C{os.stat_result}
+
+  """
+  return (st.st_dev, st.st_ino, st.st_size, st.st_mtime)
+
+
+class _SsconfCache(object):
+  """Cache for the contents of ssconf files.
+
+  Entries are checked against the status of their file on every access.
+  Since ssconf files are replaced by renaming a new file over them, a
+  modified file always has a different inode, even if its modification
+  time didn't change.
+
+  """
+  def __init__(self):
+    """Initializes this class.
+
+    """
+    self._entries = {}
+
+  def Read(self, filename):
+    """Returns the contents of an ssconf file.
+
+    @type filename: string
+    @param filename: Path to file
+    @see: L{ReadSsconfFile}
+
+    """
+    try:
+      st = os.stat(filename)
+    except EnvironmentError:
+      self._entries.pop(filename, None)
+      raise
+
+    entry = self._entries.get(filename, None)
+    if entry is not None and entry[0] == _FileSignature(st):
+      return entry[1]
+
+    (data, st) = _ReadSsconfFileWithStat(filename)
+
+    # Use the status of the file actually read, which may already have been
+    # replaced since the check above
+    self._entries[filename] = (_FileSignature(st), data)
+
+    return data
+
+
+#: Cache shared by all L{SimpleStore} instances using caching
+_CACHE = _SsconfCache()
 
 
 class SimpleStore(object):
@@ -122,8 +190,13 @@ class SimpleStore(object):
   Other particularities of the datastore:
     - keys are restricted to predefined values
 
+  With C{cache} enabled, the contents of each file are only read again
+  once the file has been replaced. This is meant for processes querying
+  ssconf values repeatedly, such as the node daemon.
+
   """
-  def __init__(self, cfg_location=None, _lockfile=pathutils.SSCONF_LOCK_FILE):
+  def __init__(self, cfg_location=None, _lockfile=pathutils.SSCONF_LOCK_FILE,
+               cache=False):
     if cfg_location is None:
       self._cfg_dir = pathutils.DATA_DIR
     else:
@@ -131,6 +204,11 @@ class SimpleStore(object):
 
     self._lockfile = _lockfile
 
+    if cache:
+      self._read_fn = _CACHE.Read
+    else:
+      self._read_fn = ReadSsconfFile
+
   def KeyToFilename(self, key):
     """Convert a given key into filename.
 
@@ -151,7 +229,7 @@ class SimpleStore(object):
     """
     filename = self.KeyToFilename(key)
     try:
-      return ReadSsconfFile(filename)
+      return self._read_fn(filename)
     except EnvironmentError, err:
       if err.errno == errno.ENOENT and default is not None:
         return default
@@ -161,20 +239,29 @@ class SimpleStore(object):
   def ReadAll(self):
     """Reads all keys and returns their values.
 
+    The files are read while holding the ssconf lock, so the result is
+    consistent with regard to L{WriteFiles}.
+
     @rtype: dict
     @return: Dictionary, ssconf key as key, value as value
 
     """
     result = []
 
-    for key in _VALID_KEYS:
-      try:
-        value = self._ReadFile(key)
-      except errors.ConfigurationError:
-        # Ignore non-existing files
-        pass
-      else:
-        result.append((key, value))
+    ssconf_lock = utils.FileLock.Open(self._lockfile)
+
+    ssconf_lock.Shared(blocking=True, timeout=SSCONF_LOCK_TIMEOUT)
+    try:
+      for key in _VALID_KEYS:
+        try:
+          value = self._ReadFile(key)
+        except errors.ConfigurationError:
+          # Ignore non-existing files
+          pass
+        else:
+          result.append((key, value))
+    finally:
+      ssconf_lock.Unlock()
 
     return dict(result)
 
@@ -1053,7 +1053,7 @@ def RunSshCmdWithStdin(cluster_name, node, basecmd, port, data,
 
   tempfh = tempfile.TemporaryFile()
   try:
-    tempfh.write(serializer.DumpJson(data))
+    serializer.DumpJsonToFile(data, tempfh)
     tempfh.seek(0)
 
     result = utils.RunCmd(scmd, interactive=True, input_fd=tempfh)
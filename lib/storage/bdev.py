@@ -46,6 +46,7 @@ from ganeti import compat
 from ganeti import serializer
 from ganeti.storage import base
 from ganeti.storage import drbd
+from ganeti.storage import statecache
 from ganeti.storage.filestorage import FileStorage
 from ganeti.storage.gluster import GlusterStorage
 from ganeti.storage.extstorage import ExtStorageDevice
@@ -483,11 +484,58 @@ class LogicalVolume(base.BlockDev):
 
     return (status, major, minor, pe_size, stripes, pv_names)
 
+  @classmethod
+  def _GetAllLvInfo(cls, _run_cmd=utils.RunCmd):
+    """Get info about all LVs of all volume groups.
+
+    @rtype: dict or None
+    @return: the result of L{_GetLvInfo} by LV device path, or C{None} if
+      the information can't be read or parsed
+
+    """
+    sep = "|"
+    result = _run_cmd(["lvs", "--noheadings", "--separator=%s" % sep,
+                       "--units=k", "--nosuffix",
+                       "-ovg_name,lv_name,lv_attr,lv_kernel_major,"
+                       "lv_kernel_minor,vg_extent_size,stripes,devices"])
+    if result.failed:
+      logging.warning("Can't list LVs: %s, %s",
+                      result.fail_reason, result.output)
+      return None
+
+    all_info = {}
+    try:
+      for line in result.stdout.splitlines():
+        (vg_name, lv_name, rest) = line.strip().split(sep, 2)
+        (status, major, minor, pe_size, stripes, more_pvs) = \
+          cls._ParseLvInfoLine(rest, sep)
+        dev_path = utils.PathJoin("/dev", vg_name, lv_name)
+        # As in _GetLvInfo, multi-segment LVs have multiple lines
+        pv_names = all_info.get(dev_path, (None, ) * 5 + (set(), ))[5]
+        pv_names.update(more_pvs)
+        all_info[dev_path] = (status, major, minor, pe_size, stripes, pv_names)
+    except (ValueError, errors.BlockDeviceError), err:
+      logging.warning("Can't parse LVS output: %s", err)
+      return None
+
+    return all_info
+
   @classmethod
   def _GetLvInfo(cls, dev_path, _run_cmd=utils.RunCmd):
     """Get info about the given existing LV to be used.
 
+    If a storage snapshot is in use, the information about all LVs is read
+    once and used for all LVs, see L{statecache}.
+
     """
+    if statecache.IsActive():
+      all_info = statecache.GetCached("lvs",
+                                      lambda: cls._GetAllLvInfo(_run_cmd))
+      if all_info is not None:
+        if dev_path not in all_info:
+          base.ThrowError("Can't find LV %s", dev_path)
+        return all_info[dev_path]
+
     sep = "|"
     result = _run_cmd(["lvs", "--noheadings", "--separator=%s" % sep,
                        "--units=k", "--nosuffix",
@@ -43,6 +43,7 @@ from ganeti.storage import base
 from ganeti.storage.drbd_info import DRBD8Info
 from ganeti.storage import drbd_info
 from ganeti.storage import drbd_cmdgen
+from ganeti.storage import statecache
 
 
 # Size of reads in _CanReadDevice
@@ -88,11 +89,14 @@ class DRBD8(object):
   def GetProcInfo():
     """Reads and parses information from /proc/drbd.
 
+    If a storage snapshot is in use, the file is only read once, see
+    L{statecache}.
+
     @rtype: DRBD8Info
     @return: a L{DRBD8Info} instance containing the current /proc/drbd info
 
     """
-    return DRBD8Info.CreateFromFile()
+    return statecache.GetCached("drbd_proc", DRBD8Info.CreateFromFile)
 
   @staticmethod
   def GetUsedDevs():
@@ -0,0 +1,120 @@
+#
+#
+
+# Copyright (C) 2015 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Snapshots of the storage state of a node
+
+While a snapshot is in use, information about the node's storage which
+would otherwise be read for each block device, such as the output of
+C{lvs} or the contents of C{/proc/drbd}, is only read once. This is meant
+for requests which only query the state of many block devices and don't
+modify them.
+
+"""
+
+
+class StorageStateCache(object):
+  """Storage state read at most once.
+
+  """
+  def __init__(self):
+    """Initializes this class.
+
+    """
+    self._data = {}
+
+  def Get(self, key, fn):
+    """Returns a cached value, computing it if necessary.
+
+    @type key: string
+    @param key: the name of the value
+    @type fn: callable
+    @param fn: function computing the value
+
+    """
+    try:
+      return self._data[key]
+    except KeyError:
+      value = self._data[key] = fn()
+      return value
+
+
+#: Cache in use, if any
+_current = None
+
+
+class Snapshot(object):
+  """Context manager making the functions in this module use a cache.
+
+  Nested snapshots use the cache of the outermost one.
+
+  """
+  def __init__(self):
+    """Initializes this class.
+
+    """
+    self._cache = None
+
+  def __enter__(self):
+    global _current # pylint: disable=W0603
+
+    if _current is None:
+      self._cache = _current = StorageStateCache()
+
+    return self
+
+  def __exit__(self, exc_type, exc_value, tb):
+    global _current # pylint: disable=W0603
+
+    if self._cache is not None:
+      assert _current is self._cache
+      _current = self._cache = None
+
+
+def IsActive():
+  """Returns whether a snapshot is in use.
+
+  """
+  return _current is not None
+
+
+def GetCached(key, fn):
+  """Returns a value from the current snapshot.
+
+  @type key: string
+  @param key: the name of the value
+  @type fn: callable
+  @param fn: function computing the value; called directly if no snapshot
+    is in use
+
+  """
+  if _current is None:
+    return fn()
+
+  return _current.Get(key, fn)
@@ -204,6 +204,8 @@ def GetPaths():
      getent.noded_uid, getent.masterd_gid),
     (pathutils.IMPORT_EXPORT_DIR, DIR, 0755,
      getent.noded_uid, getent.masterd_gid),
+    (pathutils.DISK_WIPE_DIR, DIR, 0755,
+     getent.noded_uid, getent.masterd_gid),
     (pathutils.LOG_DIR, DIR, 0770, getent.masterd_uid, getent.daemons_gid),
     (masterd_log, FILE, 0600, getent.masterd_uid, getent.masterd_gid, False),
     (confd_log, FILE, 0600, getent.confd_uid, getent.masterd_gid, False),
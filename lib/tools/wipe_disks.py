@@ -0,0 +1,317 @@
+#
+#
+
+# Copyright (C) 2015 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Script to wipe block devices in the background.
+
+This script is started by the node daemon, see
+L{backend.BlockdevWipeStart}. It wipes the disks described in a job file
+and keeps the wipe status of each disk in a status file, where the node
+daemon reads it from.
+
+"""
+
+import fcntl
+import os
+import optparse
+import struct
+import sys
+import threading
+import logging
+
+from ganeti import cli
+from ganeti import compat
+from ganeti import constants
+from ganeti import errors
+from ganeti import ht
+from ganeti import objects
+from ganeti import serializer
+from ganeti import utils
+
+
+_DATA_CHECK = ht.TStrictDict(True, True, {
+  "parallelism": ht.TPositiveInt,
+  "disks": ht.TListOf(ht.TStrictDict(True, True, {
+    "path": ht.TNonEmptyString,
+    "offset": ht.TNonNegativeInt,
+    "size": ht.TNonNegativeInt,
+    })),
+  })
+
+#: Linux ioctl zeroing a byte range of a block device, C{_IO(0x12, 127)}
+_BLKZEROOUT = 0x127f
+
+_MIB = 1024 * 1024
+
+
+class WipeError(errors.GenericError):
+  """Local class for reporting errors.
+
+  """
+
+
+def ParseOptions():
+  """Parses the options passed to the program.
+
+  @return: Options and arguments
+
+  """
+  program = os.path.basename(sys.argv[0])
+
+  parser = optparse.OptionParser(
+    usage="%prog [--verbose] [--debug] <job-file> <status-file>",
+    prog=program)
+  parser.add_option(cli.DEBUG_OPT)
+  parser.add_option(cli.VERBOSE_OPT)
+
+  (opts, args) = parser.parse_args()
+
+  if len(args) != 2:
+    parser.error("Expected the job file and the status file as arguments")
+
+  return (opts, args)
+
+
+def _SupportsWriteZeroes(path, _sysfs_dir="/sys/class/block"):
+  """Returns whether a block device can zero data without writing it.
+
+  @type path: string
+  @param path: path to the block device, may be a symlink
+
+  """
+  name = os.path.basename(os.path.realpath(path))
+  max_bytes_file = utils.PathJoin(_sysfs_dir, name, "queue",
+                                  "write_zeroes_max_bytes")
+  try:
+    return int(utils.ReadFile(max_bytes_file)) > 0
+  except (EnvironmentError, ValueError), err:
+    logging.debug("Can't read %s: %s", max_bytes_file, err)
+    return False
+
+
+def _ZeroOut(fd, offset, size):
+  """Zeroes a range of a block device with the BLKZEROOUT ioctl.
+
+  @type offset: int
+  @param offset: offset in MiB
+  @type size: int
+  @param size: size in MiB
+
+  """
+  fcntl.ioctl(fd, _BLKZEROOUT, struct.pack("QQ", offset * _MIB, size * _MIB))
+
+
+def _WriteZeroes(path, offset, size):
+  """Writes zeroes to a range of a block device using dd.
+
+  @type offset: int
+  @param offset: offset in MiB
+  @type size: int
+  @param size: size in MiB
+
+  """
+  # Sizes are always in Mebibytes, see backend._DumpDevice
+  cmd = [constants.DD_CMD, "if=/dev/zero", "seek=%d" % offset,
+         "bs=%s" % constants.DD_BLOCK_SIZE, "oflag=direct", "of=%s" % path,
+         "count=%d" % size]
+
+  result = utils.RunCmd(cmd)
+  if result.failed:
+    raise WipeError("Command '%s' exited with error: %s; output: %s" %
+                    (result.cmd, result.fail_reason, result.output))
+
+
+def GetChunkSize(size):
+  """Returns the size of the chunks in which a disk is wiped.
+
+  Chunks are L{constants.MIN_WIPE_CHUNK_PERCENT} percent of the disk, but
+  at most L{constants.MAX_WIPE_CHUNK}.
+
+  @type size: int
+  @param size: size of the disk in MiB
+
+  """
+  # Truncating to integer to avoid rounding errors
+  return max(1, int(min(constants.MAX_WIPE_CHUNK,
+                        size / 100.0 * constants.MIN_WIPE_CHUNK_PERCENT)))
+
+
+def WipeDisk(path, offset, size, report_fn,
+             _supports_zeroes_fn=_SupportsWriteZeroes,
+             _zero_out_fn=_ZeroOut, _write_zeroes_fn=_WriteZeroes):
+  """Wipes a block device from an offset to its end.
+
+  Devices supporting write zeroes are zeroed with the BLKZEROOUT ioctl,
+  which doesn't transfer any data. If that fails, or for other devices,
+  zeroes are written with dd.
+
+  @type path: string
+  @param path: path to the block device
+  @type offset: int
+  @param offset: offset in MiB to start at
+  @type size: int
+  @param size: size of the device in MiB
+  @type report_fn: callable
+  @param report_fn: called with the new offset and the wipe method used
+    after each chunk
+
+  """
+  chunk_size = GetChunkSize(size)
+
+  fd = None
+  if _supports_zeroes_fn(path):
+    fd = os.open(path, os.O_WRONLY)
+
+  try:
+    while offset < size:
+      wipe_size = min(chunk_size, size - offset)
+
+      if fd is not None:
+        try:
+          _zero_out_fn(fd, offset, wipe_size)
+        except EnvironmentError, err:
+          logging.warning("Zeroing %s failed, writing zeroes instead: %s",
+                          path, err)
+          os.close(fd)
+          fd = None
+          continue
+        method = constants.WIPE_METHOD_ZEROOUT
+      else:
+        _write_zeroes_fn(path, offset, wipe_size)
+        method = constants.WIPE_METHOD_DD
+
+      offset += wipe_size
+      report_fn(offset, method)
+  finally:
+    if fd is not None:
+      os.close(fd)
+
+
+class _StatusFile(object):
+  """Keeps the wipe status of all disks in a file.
+
+  """
+  def __init__(self, path, disks):
+    """Initializes this class.
+
+    @type path: string
+    @param path: path of the status file
+    @type disks: list of dict
+    @param disks: disks as described in the job file
+
+    """
+    self._path = path
+    self._lock = threading.Lock()
+    self._status = [objects.DiskWipeStatus(offset=disk["offset"],
+                                           size=disk["size"],
+                                           method=None, finished=False,
+                                           error_message=None)
+                    for disk in disks]
+
+  def Update(self, idx, **kwargs):
+    """Updates the status of a disk and writes the status file.
+
+    @type idx: int
+    @param idx: index of the disk
+
+    """
+    self._lock.acquire()
+    try:
+      for (name, value) in kwargs.items():
+        setattr(self._status[idx], name, value)
+
+      data = serializer.DumpJson([status.ToDict() for status in self._status])
+      utils.WriteFile(self._path, data=data)
+    finally:
+      self._lock.release()
+
+
+def WipeDisks(data, status_file):
+  """Wipes disks concurrently.
+
+  @type data: dict
+  @param data: contents of the job file
+  @type status_file: string
+  @param status_file: path of the status file
+  @rtype: bool
+  @return: whether all disks were wiped
+
+  """
+  disks = data["disks"]
+  status = _StatusFile(status_file, disks)
+
+  def _Wipe(idx):
+    disk = disks[idx]
+
+    def _Report(offset, method):
+      status.Update(idx, offset=offset, method=method)
+
+    logging.info("Wiping %s from %s MiB to %s MiB", disk["path"],
+                 disk["offset"], disk["size"])
+    try:
+      WipeDisk(disk["path"], disk["offset"], disk["size"], _Report)
+    except (EnvironmentError, errors.GenericError), err:
+      logging.exception("Wiping %s failed", disk["path"])
+      status.Update(idx, finished=True, error_message=str(err))
+      return False
+
+    logging.info("Finished wiping %s", disk["path"])
+    status.Update(idx, finished=True)
+    return True
+
+  results = utils.RunInParallel(_Wipe, range(len(disks)),
+                                data["parallelism"])
+
+  return compat.all(results)
+
+
+def Main():
+  """Main routine.
+
+  """
+  (opts, (job_file, status_file)) = ParseOptions()
+
+  utils.SetupToolLogging(opts.debug, opts.verbose)
+
+  try:
+    data = serializer.LoadJson(utils.ReadFile(job_file))
+    if not _DATA_CHECK(data):
+      raise WipeError("Invalid job data in %s" % job_file)
+
+    if WipeDisks(data, status_file):
+      return constants.EXIT_SUCCESS
+    else:
+      return constants.EXIT_FAILURE
+  except Exception, err: # pylint: disable=W0703
+    logging.debug("Caught unhandled exception", exc_info=True)
+
+    (retcode, message) = cli.FormatError(err)
+    logging.error(message)
+
+    return retcode
@@ -100,6 +100,28 @@ class FileStatHelper(object):
     self.st = os.fstat(fh.fileno())
 
 
+def AppendFile(file_name, data):
+  """Appends data to an existing file.
+
+  Unlike L{WriteFile}, this is not atomic. Readers may see partially
+  written data.
+
+  @type file_name: str
+  @param file_name: the target filename, which must exist
+  @type data: str
+  @param data: the data to append
+  @raise EnvironmentError: if the file can't be opened or written
+
+  """
+  fd = os.open(file_name, os.O_WRONLY | os.O_APPEND)
+  try:
+    while data:
+      written = os.write(fd, data)
+      data = data[written:]
+  finally:
+    os.close(fd)
+
+
 def ReadFile(file_name, size=-1, preread=None):
   """Reads a file.
 
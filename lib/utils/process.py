@@ -40,6 +40,7 @@ import select
 import logging
 import signal
 import resource
+import threading
 
 from cStringIO import StringIO
 
@@ -712,7 +713,8 @@ def _RunCmdFile(cmd, env, via_shell, output, cwd, noclose_fds):
   return status
 
 
-def RunParts(dir_name, env=None, reset_env=False):
+def RunParts(dir_name, env=None, reset_env=False, max_parallel=1,
+             timeout=None):
   """Run Scripts or programs in a directory
 
   @type dir_name: string
@@ -721,32 +723,82 @@ def RunParts(dir_name, env=None, reset_env=False):
   @param env: The environment to use
   @type reset_env: boolean
   @param reset_env: whether to reset or keep the default os environment
+  @type max_parallel: int
+  @param max_parallel: maximum number of scripts to run at the same time;
+      the results are always in the order of the script names
+  @type timeout: int
+  @param timeout: if not None, timeout in seconds for each script
   @rtype: list of tuples
   @return: list of (name, (one of RUNDIR_STATUS), RunResult)
 
   """
-  rr = []
-
   try:
     dir_contents = utils_io.ListVisibleFiles(dir_name)
   except OSError, err:
     logging.warning("RunParts: skipping %s (cannot list: %s)", dir_name, err)
-    return rr
+    return []
 
-  for relname in sorted(dir_contents):
+  def _RunPart(relname):
     fname = utils_io.PathJoin(dir_name, relname)
     if not (constants.EXT_PLUGIN_MASK.match(relname) is not None and
             utils_wrapper.IsExecutable(fname)):
-      rr.append((relname, constants.RUNPARTS_SKIP, None))
-    else:
-      try:
-        result = RunCmd([fname], env=env, reset_env=reset_env)
-      except Exception, err: # pylint: disable=W0703
-        rr.append((relname, constants.RUNPARTS_ERR, str(err)))
-      else:
-        rr.append((relname, constants.RUNPARTS_RUN, result))
+      return (relname, constants.RUNPARTS_SKIP, None)
+
+    try:
+      result = RunCmd([fname], env=env, reset_env=reset_env, timeout=timeout)
+    except Exception, err: # pylint: disable=W0703
+      return (relname, constants.RUNPARTS_ERR, str(err))
+
+    return (relname, constants.RUNPARTS_RUN, result)
+
+  relnames = sorted(dir_contents)
+
+  if max_parallel > 1:
+    return RunInParallel(_RunPart, relnames, max_parallel)
+  else:
+    return map(_RunPart, relnames)
 
-  return rr
+
+def RunInParallel(fn, items, max_threads):
+  """Calls a function for each item using a bounded number of threads.
+
+  The function should handle its own errors; exceptions are logged and
+  leave C{None} as result for the item.
+
+  @type fn: callable
+  @param fn: function called with each item
+  @type items: list
+  @param max_threads: maximum number of threads to use
+  @rtype: list
+  @return: the results, in the same order as C{items}
+
+  """
+  results = [None] * len(items)
+  pending = list(enumerate(items))
+  lock = threading.Lock()
+
+  def _Worker():
+    while True:
+      lock.acquire()
+      try:
+        if not pending:
+          return
+        (idx, item) = pending.pop()
+      finally:
+        lock.release()
+      try:
+        results[idx] = fn(item)
+      except Exception: # pylint: disable=W0703
+        logging.exception("Error while processing item %r", item)
+
+  threads = [threading.Thread(target=_Worker)
+             for _ in range(min(max_threads, len(items)))]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+
+  return results
 
 
 def _GetProcStatusPath(pid):
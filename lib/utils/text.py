@@ -587,6 +587,77 @@ class LineSplitter(object):
       self._line_fn(self._buffer)
 
 
+class MessageBuffer(object):
+  """Splits received data chunks into messages separated by a terminator.
+
+  Each chunk is scanned for terminators only once and the parts of an
+  incomplete message are only joined once it is complete, so that receiving
+  a message takes time linear in its size, no matter how many chunks it
+  arrives in.
+
+  """
+  def __init__(self, terminator):
+    """Initializes this class.
+
+    @type terminator: string
+    @param terminator: the string terminating each message
+
+    """
+    assert terminator
+
+    self._terminator = terminator
+    self._parts = []
+    self._messages = collections.deque()
+
+  def Feed(self, data):
+    """Adds a chunk of received data.
+
+    """
+    term = self._terminator
+    overlap = len(term) - 1
+    if overlap and self._parts:
+      # A terminator might have started at the end of the previous chunks
+      tail = ""
+      while self._parts and len(tail) < overlap:
+        tail = self._parts.pop() + tail
+      if len(tail) > overlap:
+        self._parts.append(tail[:-overlap])
+        tail = tail[-overlap:]
+      data = tail + data
+
+    start = 0
+    while True:
+      pos = data.find(term, start)
+      if pos < 0:
+        break
+      self._parts.append(data[start:pos])
+      self._messages.append("".join(self._parts))
+      self._parts = []
+      start = pos + len(term)
+
+    if start < len(data):
+      self._parts.append(data[start:])
+
+  def PopMessage(self):
+    """Returns the oldest complete message.
+
+    @rtype: string or None
+    @return: the message without its terminator, or C{None} if no message
+        is complete yet
+
+    """
+    if self._messages:
+      return self._messages.popleft()
+    return None
+
+  def Clear(self):
+    """Discards all buffered data.
+
+    """
+    self._parts = []
+    self._messages.clear()
+
+
 def IsValidShellParam(word):
   """Verifies is the given word is safe from the shell's p.o.v.
 
@@ -34,6 +34,7 @@
 
 import logging
 import random
+import threading
 import time
 
 import ganeti.rpc.client as cl
@@ -42,6 +43,11 @@ from ganeti.rpc.transport import Transport
 from ganeti.rpc import errors
 
 
+#: Number of seconds after which an unused connection is re-established
+#: before sending a request; WConfD closes connections idle for a minute
+_MAX_IDLE_TIME = 30.0
+
+
 class Client(cl.AbstractStubClient, stub.ClientRpcStub):
   """High-level WConfD client implementation.
 
@@ -69,3 +75,92 @@ class Client(cl.AbstractStubClient, stub.ClientRpcStub):
           raise
         logging.debug("Will retry")
         time.sleep(try_no * 10 + 10 * random.random())
+
+
+class PersistentClient(Client):
+  """WConfD client keeping its connection open between requests.
+
+  A single instance is meant to be shared by everybody within a process
+  talking to WConfD, so that the connection doesn't have to be set up for
+  each request. Requests are serialized, and the connection is
+  re-established if it has been idle for too long or got lost.
+
+  """
+  def __init__(self, timeouts=None, transport=Transport):
+    """Constructor for the PersistentClient class.
+
+    Arguments are the same as for L{Client}.
+
+    """
+    Client.__init__(self, timeouts=timeouts, transport=transport)
+    self._lock = threading.Lock()
+    self._last_use = time.time()
+
+  def _Exchange(self, msgs):
+    """Sends several messages at once and receives all the responses.
+
+    @type msgs: list of strings
+    @param msgs: the messages to send
+    @rtype: list of strings
+    @return: the response messages, in the order of the requests
+
+    """
+    def send(try_no):
+      if try_no:
+        logging.debug("WConfD disconnected, retrying")
+      self._InitTransport()
+      for msg in msgs:
+        self.transport.Send(msg)
+      return [self.transport.Recv() for _ in msgs]
+
+    self._lock.acquire()
+    try:
+      if (self.transport is not None and
+          time.time() - self._last_use > _MAX_IDLE_TIME):
+        logging.debug("Re-establishing the idle connection to WConfD")
+        self._CloseTransport()
+      try:
+        return Transport.RetryOnNetworkError(send,
+                                             lambda _: self._CloseTransport())
+      finally:
+        self._last_use = time.time()
+    finally:
+      self._lock.release()
+
+  def _SendMethodCall(self, data):
+    return self._Exchange([data])[0]
+
+  def Pipeline(self, calls):
+    """Sends several requests at once and waits for all their results.
+
+    This saves the round trips between the requests; the requests are
+    still processed by WConfD one after another, in the given order.
+
+    @type calls: list of tuples
+    @param calls: pairs of the name of a client method, such as
+        C{"HasPendingRequest"}, and the list of its arguments
+    @rtype: list
+    @return: the results of the requests, in the given order
+    @raise errors.RequestError: for the first request that failed, once all
+        responses have been received
+
+    """
+    msgs = [cl.FormatRequest(method[:1].lower() + method[1:], list(args),
+                             version=self.version)
+            for (method, args) in calls]
+    return [cl.CheckResponse(response, version=self.version)
+            for response in self._Exchange(msgs)]
+
+
+class SharedClient(object):
+  """Hands out the same client to everybody asking for a new one.
+
+  This can be used in place of this module by code creating clients with
+  L{Client}, so that all its requests go through one L{PersistentClient}.
+
+  """
+  def __init__(self, client):
+    self._client = client
+
+  def Client(self):
+    return self._client
@@ -269,6 +269,10 @@ sshLoginUser = AutoConf.sshLoginUser
 sshConsoleUser :: String
 sshConsoleUser = AutoConf.sshConsoleUser
 
+-- | Maximum number of nodes whose SSH setup is updated concurrently
+sshUpdateMaxParallel :: Int
+sshUpdateMaxParallel = 16
+
 -- * Cpu pinning separators and constants
 
 cpuPinningSep :: String
@@ -318,6 +322,35 @@ maxWipeChunk = 1024
 minWipeChunkPercent :: Int
 minWipeChunkPercent = 10
 
+-- | Maximum number of disks of an instance wiped concurrently on a node
+wipeDisksParallelism :: Int
+wipeDisksParallelism = 4
+
+-- | Wiping by writing zeroes with 'dd'
+wipeMethodDd :: String
+wipeMethodDd = "dd"
+
+-- | Wiping with the BLKZEROOUT ioctl, for devices supporting write zeroes
+wipeMethodZeroout :: String
+wipeMethodZeroout = "zeroout"
+
+wipeMethods :: [String]
+wipeMethods = [wipeMethodDd, wipeMethodZeroout]
+
+-- | Maximum time in seconds a node waits for the sync of disks to progress
+-- before reporting their status; kept short as the wait occupies one of the
+-- node daemon's worker processes
+syncWatchMaxTimeout :: Int
+syncWatchMaxTimeout = 10
+
+-- | Interval in seconds in which a node checks the sync status of disks
+syncWatchInterval :: Int
+syncWatchInterval = 1
+
+-- | Progress in percent after which a node reports the sync status of disks
+syncWatchMinProgress :: Double
+syncWatchMinProgress = 5.0
+
 -- * Directories
 
 runDirsMode :: Int
@@ -708,6 +741,19 @@ hooksPhasePre = "pre"
 hooksVersion :: Int
 hooksVersion = 2
 
+-- | Marker file in a hooks directory making its scripts run concurrently;
+-- as a hidden file it's never run itself
+hooksParallelMarker :: String
+hooksParallelMarker = ".parallel"
+
+-- | Maximum number of hook scripts run concurrently
+hooksMaxParallel :: Int
+hooksMaxParallel = 8
+
+-- | Timeout in seconds for a single hook script run concurrently
+hooksScriptTimeout :: Int
+hooksScriptTimeout = 300
+
 -- * Hooks subject type (what object type does the LU deal with)
 
 htypeCluster :: String
@@ -4261,6 +4307,12 @@ luxidRetryForkCount = 5
 luxidRetryForkStepUS :: Int
 luxidRetryForkStepUS = 500000
 
+-- | The default number of job processes luxid starts ahead of time, so that
+-- new jobs don't have to wait for the Python job executor to load. A value
+-- of @0@ disables starting job processes ahead of time.
+luxidJobProcessesDefault :: Int
+luxidJobProcessesDefault = 2
+
 -- * Luxid job death testing
 
 -- | The number of attempts to prove that a job is dead after sending it a
@@ -4930,6 +4982,9 @@ luxiReqQuery = "Query"
 luxiReqQueryFields :: String
 luxiReqQueryFields = "QueryFields"
 
+luxiReqQueryPage :: String
+luxiReqQueryPage = "QueryPage"
+
 luxiReqQueryJobs :: String
 luxiReqQueryJobs = "QueryJobs"
 
@@ -4989,6 +5044,7 @@ luxiReqAll =
   , luxiReqQueryJobs
   , luxiReqQueryNodes
   , luxiReqQueryNetworks
+  , luxiReqQueryPage
   , luxiReqQueryTags
   , luxiReqSetDrainFlag
   , luxiReqSetWatcherPause
@@ -50,6 +50,7 @@ module Ganeti.Daemon
   , oForceNode
   , oNoVoting
   , oYesDoIt
+  , oJobProcesses
   , parseArgs
   , parseAddress
   , cleanupSocket
@@ -115,6 +116,8 @@ data DaemonOptions = DaemonOptions
   , optForceNode    :: Bool           -- ^ Ignore node checks
   , optNoVoting     :: Bool           -- ^ skip voting for master
   , optYesDoIt      :: Bool           -- ^ force dangerous options
+  , optJobProcesses :: Maybe Int      -- ^ number of job processes to
+                                      -- start ahead of time
   }
 
 -- | Default values for the command line options.
@@ -132,6 +135,7 @@ defaultOptions  = DaemonOptions
   , optForceNode    = False
   , optNoVoting     = False
   , optYesDoIt      = False
+  , optJobProcesses = Nothing
   }
 
 instance StandardOptions DaemonOptions where
@@ -225,6 +229,17 @@ oYesDoIt =
    "Force a dangerous operation",
    OptComplNone)
 
+oJobProcesses :: OptType
+oJobProcesses =
+  (Option "" ["job-processes"]
+   (reqWithConversion (tryRead "reading number of job processes")
+    (\n opts -> if n < 0
+                  then Bad "The number of job processes can't be negative"
+                  else Ok opts { optJobProcesses = Just n }) "N")
+   ("Number of job processes to start ahead of time (default: "
+    ++ show C.luxidJobProcessesDefault ++ ")"),
+   OptComplInteger)
+
 -- | Generic options.
 genericOpts :: [OptType]
 genericOpts = [ oShowHelp
@@ -55,7 +55,6 @@ import Control.Exception
 import Control.Monad
 import Control.Monad.IO.Class
 import Data.Function (on)
-import Data.Functor ((<$))
 import Data.IORef
 import Data.List
 import Data.Maybe
@@ -77,6 +76,7 @@ import Ganeti.Lens hiding (chosen)
 import Ganeti.Logging
 import Ganeti.Objects
 import Ganeti.Path
+import Ganeti.Query.Exec (ProcessPool, newProcessPool, fillProcessPool)
 import Ganeti.Types
 import Ganeti.Utils
 import Ganeti.Utils.Livelock
@@ -98,16 +98,20 @@ data JQStatus = JQStatus
   , jqConfig :: IORef (Result ConfigData)
   , jqLivelock :: Livelock
   , jqForkLock :: Lock
+  , jqProcessPool :: ProcessPool
   }
 
 
-emptyJQStatus :: IORef (Result ConfigData) -> IO JQStatus
-emptyJQStatus config = do
+emptyJQStatus :: IORef (Result ConfigData)
+              -> Int -- ^ the number of job processes to start ahead of time
+              -> IO JQStatus
+emptyJQStatus config poolSize = do
   jqJ <- newIORef Queue { qEnqueued = [], qRunning = [], qManipulated = [] }
   (_, livelock) <- mkLivelockFile C.luxiLivelockPrefix
   forkLock <- newLock
+  pool <- newProcessPool poolSize
   return JQStatus { jqJobs = jqJ, jqConfig = config, jqLivelock = livelock
-                  , jqForkLock = forkLock }
+                  , jqForkLock = forkLock, jqProcessPool = pool }
 
 -- | Apply a function on the running jobs.
 onRunningJobs :: ([JobWithStat] -> [JobWithStat]) -> Queue -> Queue
@@ -342,16 +346,13 @@ failJobs cfg qstate jobs = do
   let rmJobs = filter ((`S.notMember` jids) . qjId . jJob)
   logWarning $ "Failing jobs " ++ sjobs
   modifyJobs qstate $ onRunningJobs rmJobs
-  let trySaveJob :: JobWithStat -> ResultT String IO ()
-      trySaveJob = (() <$) . writeAndReplicateJob cfg qdir . jJob
-      reason jid msg =
+  let reason jid msg =
         ( "gnt:daemon:luxid:startjobs"
         , "job " ++ show (fromJobId jid) ++ " failed to start: " ++ msg
         , reasonTrailTimestamp now )
       failJob err job = failQueuedJob (reason (qjId job) (show err)) now job
-      failAndSaveJobWithStat (jws, err) =
-        trySaveJob . over jJobL (failJob err) $ jws
-  mapM_ (runResultT . failAndSaveJobWithStat) jobs
+  writeAndReplicateManyJobs cfg qdir
+    $ map (\(jws, err) -> failJob err $ jJob jws) jobs
   logDebug $ "Failed jobs " ++ sjobs
 
 
@@ -367,29 +368,27 @@ cancelRejectedJobs qstate cfg filters = do
                     , Just fr <- [applyingFilter filters job]
                     , frAction fr == Reject ]
 
-  -- Cancel them.
+  -- Cancel them; the job files of all dequeued jobs are replicated
+  -- together.
   qDir <- queueDir
-  forM_ jobsToCancel $ \(job, fr) -> do
+  now <- currentTimestamp
+  cancelled <- liftM catMaybes . forM jobsToCancel $ \(job, fr) -> do
     let jid = qjId job
     logDebug $ "Cancelling job " ++ show (fromJobId jid)
                ++ " because it was REJECTed by filter rule " ++ frUuid fr
     -- First dequeue, then cancel.
     dequeueResult <- dequeueJob qstate jid
     case dequeueResult of
-      Ok True -> do
-        now <- currentTimestamp
-        r <- runResultT
-               $ writeAndReplicateJob cfg qDir (cancelQueuedJob now job)
-        case r of
-          Ok _ -> return ()
-          Bad err -> logError $
-            "Failed to write config when cancelling job: " ++ err
+      Ok True -> return . Just $ cancelQueuedJob now job
       Ok False -> do
         logDebug $ "Job " ++ show (fromJobId jid)
                    ++ " not queued; trying to cancel directly"
         _ <- cancelJob False (jqLivelock qstate) jid  -- sigTERM-kill only
-        return ()
-      Bad s -> logError s -- passing a nonexistent job ID is an error here
+        return Nothing
+      Bad s -> do
+        logError s -- passing a nonexistent job ID is an error here
+        return Nothing
+  writeAndReplicateManyJobs cfg qDir cancelled
 
 
 -- | Schedule jobs to be run. This is the IO wrapper around the
@@ -419,7 +418,8 @@ scheduleSomeJobs qstate = do
       mapM_ (attachWatcher qstate) chosen
 
       -- Start the jobs.
-      result <- JQ.startJobs cfg (jqLivelock qstate) (jqForkLock qstate) jobs
+      result <- JQ.startJobs cfg (jqLivelock qstate) (jqForkLock qstate)
+                             (jqProcessPool qstate) jobs
       let badWith (x, Bad y) = Just (x, y)
           badWith _          = Nothing
       let failed = mapMaybe badWith $ zip chosen result
@@ -522,6 +522,8 @@ initJQScheduler qstate = do
   jqjobs <- readIORef (jqJobs qstate)
   logInfo $ showQueue jqjobs
   scheduleSomeJobs qstate
+  logInfo "Starting job processes ahead of time"
+  fillProcessPool (jqForkLock qstate) (jqProcessPool qstate)
   logInfo "Starting time-based job queue watcher"
   _ <- forkIO $ onTimeWatcher qstate
   return ()
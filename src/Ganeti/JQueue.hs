@@ -60,6 +60,7 @@ module Ganeti.JQueue
     , determineJobDirectories
     , getJobIDs
     , sortJobIDs
+    , parseJobFile
     , loadJobFromDisk
     , noSuchJob
     , readSerialFromDisk
@@ -68,6 +69,7 @@ module Ganeti.JQueue
     , writeJobToDisk
     , replicateManyJobs
     , writeAndReplicateJob
+    , writeAndReplicateManyJobs
     , isQueueOpen
     , startJobs
     , cancelJob
@@ -122,7 +124,8 @@ import Ganeti.OpCodes.Lens (metaParamsL, opReasonL)
 import Ganeti.Path
 import Ganeti.Query.Exec as Exec
 import Ganeti.Rpc (executeRpcCall, ERpcError, logRpcErrors,
-                   RpcCallJobqueueUpdate(..), RpcCallJobqueueRename(..))
+                   RpcCallJobqueueUpdate(..), RpcCallJobqueueUpdateMulti(..),
+                   RpcCallJobqueueRename(..))
 import Ganeti.Types
 import Ganeti.Utils
 import Ganeti.Utils.Atomic
@@ -443,6 +446,63 @@ readJobDataFromDisk rootdir archived jid = do
 noSuchJob :: Result (QueuedJob, Bool)
 noSuchJob = Bad "Can't load job file"
 
+-- | Sets a field of a JSON object, replacing any previous value.
+setJSField :: String -> JSValue -> [(String, JSValue)] -> [(String, JSValue)]
+setJSField k v = ((k, v) :) . filter ((/= k) . fst)
+
+-- | Applies a segment of changes, as appended to the job file while the
+-- job is being processed, to the serialized job. See 'parseJobFile' for
+-- the format of the segments.
+applyJobSegment :: [(String, JSValue)] -> JSObject JSValue
+                -> Text.JSON.Result [(String, JSValue)]
+applyJobSegment job segment = do
+  let getList :: (Text.JSON.JSON a) => String -> [(String, JSValue)]
+              -> Text.JSON.Result [a]
+      getList k = maybe (return []) Text.JSON.readJSON . lookup k
+      seg = fromJSObject segment
+  jobChanges <- maybe (return []) (liftM fromJSObject . Text.JSON.readJSON)
+                  $ lookup "job" seg
+  opChanges <- getList "ops" seg :: Text.JSON.Result [(Int, JSObject JSValue)]
+  logEntries <- getList "log" seg :: Text.JSON.Result [(Int, JSValue)]
+  ops <- getList "ops" job :: Text.JSON.Result [JSObject JSValue]
+  let applyOp idx op =
+        let changes = concat [fromJSObject c | (i, c) <- opChanges, i == idx]
+            entries = [e | (i, e) <- logEntries, i == idx]
+            fields = foldl (flip $ uncurry setJSField) (fromJSObject op)
+                       changes
+            addEntries (Just (JSArray old)) = JSArray (old ++ entries)
+            addEntries _ = JSArray entries
+            fields' = if null entries
+                        then fields
+                        else setJSField "log"
+                               (addEntries $ lookup "log" fields) fields
+        in toJSObject fields'
+      ops' = zipWith applyOp [0..] ops
+  return . setJSField "ops" (Text.JSON.showJSON ops')
+    $ foldl (flip $ uncurry setJSField) job jobChanges
+
+-- | Parses the contents of a job file.
+--
+-- The first line holds the serialized job. While the job is being
+-- processed, segments with changes are appended, one per line. A segment
+-- is an object with the optional keys @job@ (changed job fields), @ops@
+-- (pairs of opcode index and changed opcode fields) and @log@ (pairs of
+-- opcode index and new log entry). A segment which is still being written
+-- isn't terminated by a newline yet and is ignored.
+parseJobFile :: String -> Text.JSON.Result QueuedJob
+parseJobFile str =
+  case lines str of
+    [] -> Text.JSON.Error "Empty job file"
+    [header] -> Text.JSON.decode header
+    header:rest -> do
+      let segments = if "\n" `isSuffixOf` str
+                       then rest
+                       else reverse . drop 1 $ reverse rest
+      job <- Text.JSON.decode header
+      segments' <- mapM Text.JSON.decode $ filter (not . null) segments
+      merged <- foldM applyJobSegment (fromJSObject job) segments'
+      Text.JSON.readJSON . JSObject $ toJSObject merged
+
 -- | Loads a job from disk.
 loadJobFromDisk :: FilePath -> Bool -> JobId -> IO (Result (QueuedJob, Bool))
 loadJobFromDisk rootdir archived jid = do
@@ -454,13 +514,14 @@ loadJobFromDisk rootdir archived jid = do
              Nothing -> noSuchJob
              Just (str, arch) ->
                liftM (\qj -> (qj, arch)) .
-               fromJResult "Parsing job file" $ Text.JSON.decode str
+               fromJResult "Parsing job file" $ parseJobFile str
 
 -- | Write a job to disk.
 writeJobToDisk :: FilePath -> QueuedJob -> IO (Result ())
 writeJobToDisk rootdir job = do
   let filename = liveJobFile rootdir . qjId $ job
-      content = Text.JSON.encode . Text.JSON.showJSON $ job
+      -- terminated by a newline, so that segments can be appended
+      content = (++ "\n") . Text.JSON.encode . Text.JSON.showJSON $ job
   tryAndLogIOError (atomicWriteFile filename content)
                    ("Failed to write " ++ filename) Ok
 
@@ -468,7 +529,7 @@ writeJobToDisk rootdir job = do
 replicateJob :: FilePath -> [Node] -> QueuedJob -> IO [(Node, ERpcError ())]
 replicateJob rootdir mastercandidates job = do
   let filename = liveJobFile rootdir . qjId $ job
-      content = Text.JSON.encode . Text.JSON.showJSON $ job
+      content = (++ "\n") . Text.JSON.encode . Text.JSON.showJSON $ job
   filename' <- makeVirtualPath filename
   callresult <- executeRpcCall mastercandidates
                   $ RpcCallJobqueueUpdate filename' content
@@ -476,10 +537,20 @@ replicateJob rootdir mastercandidates job = do
   _ <- logRpcErrors result
   return result
 
--- | Replicate many jobs to all master candidates.
+-- | Replicate many jobs to all master candidates, using a single RPC call.
 replicateManyJobs :: FilePath -> [Node] -> [QueuedJob] -> IO ()
-replicateManyJobs rootdir mastercandidates =
-  mapM_ (replicateJob rootdir mastercandidates)
+replicateManyJobs _ _ [] = return ()
+replicateManyJobs rootdir mastercandidates jobs = do
+  updates <- forM jobs $ \job -> do
+    let filename = liveJobFile rootdir . qjId $ job
+        content = (++ "\n") . Text.JSON.encode . Text.JSON.showJSON $ job
+    filename' <- makeVirtualPath filename
+    return (filename', content, False)
+  callresult <- executeRpcCall mastercandidates
+                  $ RpcCallJobqueueUpdateMulti updates
+  let result = map (second (() <$)) callresult
+  _ <- logRpcErrors result
+  return ()
 
 -- | Writes a job to a file and replicates it to master candidates.
 writeAndReplicateJob :: (Error e)
@@ -489,6 +560,13 @@ writeAndReplicateJob cfg rootdir job = do
   mkResultT $ writeJobToDisk rootdir job
   liftIO $ replicateJob rootdir (Config.getMasterCandidates cfg) job
 
+-- | Writes jobs to files and replicates the ones successfully written to
+-- master candidates, using a single RPC call.
+writeAndReplicateManyJobs :: ConfigData -> FilePath -> [QueuedJob] -> IO ()
+writeAndReplicateManyJobs cfg rootdir jobs = do
+  written <- filterM (liftM isOk . writeJobToDisk rootdir) jobs
+  replicateManyJobs rootdir (Config.getMasterCandidates cfg) written
+
 -- | Read the job serial number from disk.
 readSerialFromDisk :: IO (Result JobId)
 readSerialFromDisk = do
@@ -538,17 +616,21 @@ isQueueOpen = liftM not (jobQueueDrainFile >>= doesFileExist)
 startJobs :: ConfigData
           -> Livelock -- ^ Luxi's livelock path
           -> Lock -- ^ lock for forking new processes
+          -> Exec.ProcessPool -- ^ the pool of job processes started ahead
           -> [QueuedJob] -- ^ the list of jobs to start
           -> IO [ErrorResult QueuedJob]
-startJobs cfg luxiLivelock forkLock jobs = do
+startJobs cfg luxiLivelock forkLock pool jobs = do
   qdir <- queueDir
   let updateJob job llfile =
         void . writeAndReplicateJob cfg qdir $ job { qjLivelock = Just llfile }
   let runJob job = withLock forkLock $ do
-        (llfile, _) <- Exec.forkJobProcess (qjId job) luxiLivelock
+        (llfile, _) <- Exec.forkJobProcess pool (qjId job) luxiLivelock
                                            (updateJob job)
         return $ job { qjLivelock = Just llfile }
-  mapM (runResultT . runJob) jobs
+  result <- mapM (runResultT . runJob) jobs
+  -- replace the processes used for the jobs
+  unless (null jobs) $ Exec.fillProcessPool forkLock pool
+  return result
 
 -- | Try to prove that a queued job is dead. This function needs to know
 -- the livelock of the caller (i.e., luxid) to avoid considering a job dead
@@ -91,6 +91,13 @@ $(genLuxiOp "LuxiOp"
     , simpleField "fields"  [t| [String]  |]
     , simpleField "qfilter" [t| Qlang.Filter Qlang.FilterField |]
     ])
+  , (luxiReqQueryPage,
+    [ simpleField "what"    [t| Qlang.ItemType |]
+    , simpleField "fields"  [t| [String]  |]
+    , simpleField "qfilter" [t| Qlang.Filter Qlang.FilterField |]
+    , simpleField "limit"   [t| Int |]
+    , simpleField "resume"  [t| Maybe String |]
+    ])
   , (luxiReqQueryFields,
     [ simpleField "what"    [t| Qlang.ItemType |]
     , simpleField "fields"  [t| [String]  |]
@@ -264,6 +271,19 @@ decodeLuxiCall method args = do
     ReqQuery -> do
               (what, fields, qfilter) <- fromJVal args
               return $ Query what fields qfilter
+    ReqQueryPage -> do
+              (what, fields, qfilter, limit, resume) <-
+                fromJResult "Parsing QueryPage message" $
+                case args of
+                  JSArray [a, b, c, d, e] ->
+                    (,,,,) `fmap`
+                    J.readJSON a `ap`
+                    J.readJSON b `ap`
+                    J.readJSON c `ap`
+                    J.readJSON d `ap`
+                    J.readJSON e
+                  _ -> J.Error "Not enough values"
+              return $ QueryPage what fields qfilter limit resume
     ReqQueryFields -> do
               (what, fields) <- fromJVal args
               fields' <- case fields of
@@ -186,12 +186,14 @@ $(genOpCode "OpCode"
   , ("OpClusterVerifyDisks",
      [t| JobIdListOnly |],
      OpDoc.opClusterVerifyDisks,
-     [],
+     [ pWaitForSyncFalse
+     ],
      [])
   , ("OpGroupVerifyDisks",
      [t| (Map String String, [String], Map String [[String]]) |],
      OpDoc.opGroupVerifyDisks,
      [ pGroupName
+     , pWaitForSyncFalse
      ],
      "group_name")
   , ("OpClusterRepairDiskSizes",
@@ -14,15 +14,22 @@ The protocol works as follows (MP = master process, FP = forked process):
 * FP sends an empty message to the MP to signal it's ready to receive
   the necessary information.
 
-* MP sends the FP its job ID.
+* MP sends the FP its live lock file name (since it was known only to the
+  Haskell process, but not the Python process).
 
 * FP sends an empty message to the MP again.
 
-* MP sends the FP its live lock file name (since it was known only to the
-  Haskell process, but not the Python process).
+* MP sends the FP its job ID.
 
 * Both MP and FP close the communication channel.
 
+Job processes can also be started ahead of time, before the job they are
+going to process is known. Such a warm process goes through the same
+protocol, except that the MP doesn't update any job file with its lock file
+name. It then loads the job executor and waits for its job ID, which
+the MP only sends once it picks the process for a job from the pool, after
+updating the job file with the process' lock file name.
+
  -}
 
 {-
@@ -57,14 +64,19 @@ SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 module Ganeti.Query.Exec
   ( isForkSupported
+  , ProcessPool
+  , newProcessPool
+  , fillProcessPool
   , forkJobProcess
   ) where
 
-import Control.Concurrent (rtsSupportsBoundThreads)
+import Control.Concurrent (forkIO, rtsSupportsBoundThreads)
+import qualified Control.Exception as E
 import Control.Concurrent.Lifted (threadDelay)
 import Control.Monad
 import Control.Monad.Error
 import Data.Functor
+import Data.IORef
 import qualified Data.Map as M
 import Data.Maybe (listToMaybe, mapMaybe)
 import System.Directory (getDirectoryContents)
@@ -72,7 +84,8 @@ import System.Environment
 import System.IO.Error (tryIOError, annotateIOError, modifyIOError)
 import System.Posix.Process
 import System.Posix.IO
-import System.Posix.Signals (sigABRT, sigKILL, sigTERM, signalProcess)
+import System.Posix.Signals ( Signal, sigABRT, sigKILL, sigTERM
+                            , signalProcess )
 import System.Posix.Types (Fd, ProcessID)
 import System.Time
 import Text.Printf
@@ -86,7 +99,9 @@ import qualified Ganeti.Path as P
 import Ganeti.Types
 import Ganeti.UDSServer
 import Ganeti.Utils
+import Ganeti.Utils.Livelock (isDead)
 import Ganeti.Utils.Monad
+import Ganeti.Utils.MVarLock
 import Ganeti.Utils.Random (delayRandom)
 
 isForkSupported :: IO Bool
@@ -122,9 +137,11 @@ rethrowAnnotateIOError desc =
   modifyIOError (\e -> annotateIOError e desc Nothing Nothing)
 
 -- Code that is executed in a @fork@-ed process and that the replaces iteself
--- with the actual job process
-runJobProcess :: JobId -> Client -> IO ()
-runJobProcess jid s = withErrorLogAt CRITICAL (show jid) $
+-- with the actual job process. If no job id is given, the process is started
+-- as a warm process, which waits for its job id after the executor has
+-- loaded.
+runJobProcess :: Maybe JobId -> Client -> IO ()
+runJobProcess mjid s = withErrorLogAt CRITICAL (maybe "warm" show mjid) $
   do
     -- Close the standard error to prevent anything being written there
     -- (for example by exceptions when closing unneeded FDs).
@@ -136,11 +153,15 @@ runJobProcess jid s = withErrorLogAt CRITICAL (show jid) $
     -- Later we might direct them to an appropriate file.
     let logLater _ = return ()
 
-    logLater $ "Forking a new process for job " ++ show (fromJobId jid)
+    logLater $ "Forking a new process for job " ++ maybe "warm" show mjid
 
-    -- Create a livelock file for the job
+    -- Create a livelock file for the job; as the job id of a warm process
+    -- isn't known yet, its process id is used instead
     (TOD ts _) <- getClockTime
-    lockfile <- P.livelockFile $ printf "job_%06d_%d" (fromJobId jid) ts
+    pid <- getProcessID
+    lockfile <- P.livelockFile $ case mjid of
+      Just jid -> printf "job_%06d_%d" (fromJobId jid) ts
+      Nothing -> printf "job_warm_%d_%d" (fromIntegral pid :: Int) ts
 
     -- Lock the livelock file
     logLater $ "Locking livelock file " ++ show lockfile
@@ -168,7 +189,7 @@ runJobProcess jid s = withErrorLogAt CRITICAL (show jid) $
     logLater $ "Closing every superfluous file descriptor: " ++ show fds
     mapM_ (tryIOError . closeFd) fds
 
-    -- the master process will send the job id and the livelock file name
+    -- the master process will send the livelock file name and the job id
     -- using the same protocol to the job process
     -- we pass the job id as the first argument to the process;
     -- while the process never uses it, it's very convenient when listing
@@ -181,7 +202,8 @@ runJobProcess jid s = withErrorLogAt CRITICAL (show jid) $
     execPy <- P.jqueueExecutorPy
     logLater $ "Executing " ++ AC.pythonPath ++ " " ++ execPy
                ++ " with PYTHONPATH=" ++ AC.versionedsharedir
-    () <- executeFile AC.pythonPath True [execPy, show (fromJobId jid)]
+    () <- executeFile AC.pythonPath True
+                      [execPy, maybe "warm" (show . fromJobId) mjid]
                       (Just $ M.toList env)
 
     failError $ "Failed to execute " ++ AC.pythonPath ++ " " ++ execPy
@@ -198,22 +220,95 @@ forkWithPipe conf childAction = do
   closeClient child
   return (pid, master)
 
--- | Forks the job process and starts processing of the given job.
--- Returns the livelock of the job and its process ID.
-forkJobProcess :: (Error e, Show e)
-               => JobId -- ^ a job to process
-               -> FilePath  -- ^ the daemons own livelock file
-               -> (FilePath -> ResultT e IO ())
-                  -- ^ a callback function to update the livelock file
-                  -- and process id in the job file
-               -> ResultT e IO (FilePath, ProcessID)
-forkJobProcess jid luxiLivelock update = do
-  let jidStr = show . fromJobId $ jid
-
-  logDebug $ "Setting the lockfile temporarily to " ++ luxiLivelock
-             ++ " for job " ++ jidStr
-  update luxiLivelock
-
+-- | A job process that has been forked and has received its livelock file
+-- name. Once its executor has loaded, it waits for the job id.
+data WarmProcess = WarmProcess
+  { wpPid :: ProcessID       -- ^ the process id of the job process
+  , wpClient :: Client       -- ^ the communication channel to the process
+  , wpLivelock :: FilePath   -- ^ the livelock file of the process
+  }
+
+-- | A pool of job processes started ahead of time, so that starting a job
+-- doesn't have to wait for the Python interpreter and the job executor
+-- to load.
+data ProcessPool = ProcessPool
+  { ppSize :: Int                       -- ^ the number of processes to keep
+  , ppProcesses :: IORef [WarmProcess]  -- ^ the processes ready for a job
+  , ppFilling :: IORef Bool             -- ^ whether the pool is being filled
+  }
+
+-- | Creates a new, empty pool of warm job processes of the given size.
+-- A size of 0 disables the pool.
+newProcessPool :: Int -> IO ProcessPool
+newProcessPool size = do
+  procs <- newIORef []
+  filling <- newIORef False
+  return ProcessPool { ppSize = max 0 size
+                     , ppProcesses = procs
+                     , ppFilling = filling
+                     }
+
+-- | The prefix of log messages about a job process.
+processLogPrefix :: String -> Maybe JobId -> ProcessID -> String
+processLogPrefix stage mjid pid =
+  "[" ++ stage ++ ":" ++ maybe "warm" (("job-" ++) . show . fromJobId) mjid
+  ++ ",pid=" ++ show pid ++ "] "
+
+-- | Kills a process, if it's still running, trying the given signals one
+-- after another.
+killIfAlive :: (Error e, Show e, MonadIO m, MonadLog m)
+            => String -> ProcessID -> [Signal] -> ResultT e m ()
+killIfAlive _ _ [] = return ()
+killIfAlive logPrefix pid (sig : sigs) = do
+  let logDebugJob = logDebug . (logPrefix ++)
+  logDebugJob "Getting the status of the process"
+  status <- tryError . liftIO $ getProcessStatus False True pid
+  case status of
+    Left e -> logDebugJob $ "Job process already gone: " ++ show e
+    Right (Just s) -> logDebugJob $ "Child process status: " ++ show s
+    Right Nothing -> do
+        logDebugJob $ "Child process running, killing by " ++ show sig
+        liftIO $ signalProcess sig pid
+        unless (null sigs) $ do
+          liftIO $ threadDelay 100000 -- wait for 0.1s and check again
+          killIfAlive logPrefix pid sigs
+
+-- | Runs an action communicating with a job process. If the action fails,
+-- the communication channel is closed and the process is killed.
+onProcessError :: (Error e, Show e, MonadIO m, MonadLog m)
+               => String -> ProcessID -> Client
+               -> ResultT e m a -> ResultT e m a
+onProcessError logPrefix pid master = flip catchError $ \e -> do
+  logDebug $ logPrefix ++ "Closing the pipe to the client"
+  withErrorLogAt WARNING "Closing the communication pipe failed"
+      (liftIO (closeClient master)) `orElse` return ()
+  killIfAlive logPrefix pid [sigTERM, sigABRT, sigKILL]
+  throwError e
+
+-- | Receives a message from a job process.
+recvFrom :: (Error e, MonadIO m, MonadLog m)
+         => String -> Client -> String -> ResultT e m String
+recvFrom logPrefix master msg = do
+  logDebug $ logPrefix ++ msg
+  liftIO . rethrowAnnotateIOError (logPrefix ++ msg) $ recvMsg master
+
+-- | Sends a message to a job process.
+sendTo :: (Error e, MonadIO m, MonadLog m)
+       => String -> Client -> String -> String -> ResultT e m ()
+sendTo logPrefix master msg x = do
+  logDebug $ logPrefix ++ msg
+  liftIO . rethrowAnnotateIOError (logPrefix ++ msg) $ sendMsg master x
+
+-- | Forks a new job process and waits for it to lock its livelock file.
+-- The callback is called with the livelock file before the process is
+-- confirmed it can start the job executor.
+spawnJobProcess :: (Error e, Show e)
+                => Maybe JobId -- ^ the job to process, if already known
+                -> (FilePath -> ResultT e IO ())
+                   -- ^ a callback function to update the livelock file
+                   -- and process id in the job file
+                -> ResultT e IO WarmProcess
+spawnJobProcess mjid update = do
   -- Due to a bug in GHC forking process, we want to retry,
   -- if the forked process fails to start.
   -- If it fails later on, the failure is handled by 'ResultT'
@@ -224,53 +319,128 @@ forkJobProcess jid luxiLivelock update = do
     let maxWaitUS = 2^(tryNo - 1) * C.luxidRetryForkStepUS
     when (tryNo >= 2) . liftIO $ delayRandom (0, maxWaitUS)
 
-    (pid, master) <- liftIO $ forkWithPipe connectConfig (runJobProcess jid)
-
-    let jobLogPrefix = "[start:job-" ++ jidStr ++ ",pid=" ++ show pid ++ "] "
-        logDebugJob = logDebug . (jobLogPrefix ++)
-
-    logDebugJob "Forked a new process"
-
-    let killIfAlive [] = return ()
-        killIfAlive (sig : sigs) = do
-          logDebugJob "Getting the status of the process"
-          status <- tryError . liftIO $ getProcessStatus False True pid
-          case status of
-            Left e -> logDebugJob $ "Job process already gone: " ++ show e
-            Right (Just s) -> logDebugJob $ "Child process status: " ++ show s
-            Right Nothing -> do
-                logDebugJob $ "Child process running, killing by " ++ show sig
-                liftIO $ signalProcess sig pid
-                unless (null sigs) $ do
-                  threadDelay 100000 -- wait for 0.1s and check again
-                  killIfAlive sigs
-
-    let onError = do
-          logDebugJob "Closing the pipe to the client"
-          withErrorLogAt WARNING "Closing the communication pipe failed"
-              (liftIO (closeClient master)) `orElse` return ()
-          killIfAlive [sigTERM, sigABRT, sigKILL]
-
-    flip catchError (\e -> onError >> throwError e)
-      $ do
-      let annotatedIO msg k = do
-            logDebugJob msg
-            liftIO $ rethrowAnnotateIOError (jobLogPrefix ++ msg) k
-      let recv msg = annotatedIO msg (recvMsg master)
-          send msg x = annotatedIO msg (sendMsg master x)
-
-      lockfile <- recv "Getting the lockfile of the client"
-
-      logDebugJob $ "Setting the lockfile to the final " ++ lockfile
-      toErrorBase $ update lockfile
-      send "Confirming the client it can start" ""
+    (pid, master) <- liftIO $ forkWithPipe connectConfig (runJobProcess mjid)
 
-      -- from now on, we communicate with the job's Python process
+    let jobLogPrefix = processLogPrefix "start" mjid pid
 
-      _ <- recv "Waiting for the job to ask for the job id"
-      send "Writing job id to the client" jidStr
+    logDebug $ jobLogPrefix ++ "Forked a new process"
 
-      _ <- recv "Waiting for the job to ask for the lock file name"
-      send "Writing the lock file name to the client" lockfile
+    onProcessError jobLogPrefix pid master $ do
+      lockfile <- recvFrom jobLogPrefix master
+                    "Getting the lockfile of the client"
+
+      logDebug $ jobLogPrefix ++ "Setting the lockfile to the final "
+                 ++ lockfile
+      toErrorBase $ update lockfile
+      sendTo jobLogPrefix master "Confirming the client it can start" ""
+
+      return WarmProcess { wpPid = pid
+                         , wpClient = master
+                         , wpLivelock = lockfile
+                         }
+
+-- | Sends the livelock file name to the Python process of a job process,
+-- after which it waits for its job id.
+sendLivelock :: (Error e) => String -> WarmProcess -> ResultT e IO ()
+sendLivelock logPrefix wp = do
+  -- from now on, we communicate with the job's Python process
+  _ <- recvFrom logPrefix (wpClient wp)
+         "Waiting for the job to ask for the lock file name"
+  sendTo logPrefix (wpClient wp)
+    "Writing the lock file name to the client" (wpLivelock wp)
+
+-- | Sends the job id to a job process, which starts processing the job.
+sendJobId :: (Error e) => String -> JobId -> WarmProcess -> ResultT e IO ()
+sendJobId logPrefix jid wp = do
+  _ <- recvFrom logPrefix (wpClient wp)
+         "Waiting for the job to ask for the job id"
+  sendTo logPrefix (wpClient wp)
+    "Writing job id to the client" (show $ fromJobId jid)
+
+-- | Takes a warm process out of the pool. Processes that have died in
+-- the meantime are discarded.
+takeWarmProcess :: ProcessPool -> IO (Maybe WarmProcess)
+takeWarmProcess pool = do
+  next <- atomicModifyIORef (ppProcesses pool) $ \ps -> case ps of
+            [] -> ([], Nothing)
+            (wp : wps) -> (wps, Just wp)
+  case next of
+    Nothing -> return Nothing
+    Just wp -> do
+      dead <- isDead (wpLivelock wp)
+      if dead
+        then do
+          logDebug $ "Warm job process " ++ show (wpPid wp)
+                     ++ " is gone, discarding it"
+          _ <- tryIOError . closeClient $ wpClient wp
+          takeWarmProcess pool
+        else return $ Just wp
+
+-- | Starts warm job processes in the background until the pool is full.
+-- The fork lock is only held while forking each process, not while its
+-- executor is loading, so that it doesn't delay starting jobs.
+fillProcessPool :: Lock -- ^ lock for forking new processes
+                -> ProcessPool -> IO ()
+fillProcessPool forkLock pool = when (ppSize pool > 0) $ do
+  start <- atomicModifyIORef (ppFilling pool) $ \filling -> (True, not filling)
+  let spawnWarm = do
+        wp <- withLock forkLock $ spawnJobProcess Nothing (const $ return ())
+        let logPrefix = processLogPrefix "warm" Nothing (wpPid wp)
+        onProcessError logPrefix (wpPid wp) (wpClient wp)
+          $ sendLivelock logPrefix wp
+        return wp
+      fill = do
+        count <- length <$> readIORef (ppProcesses pool)
+        when (count < ppSize pool) $ do
+          result <- runResultT spawnWarm
+          case result of
+            Ok wp -> do
+              atomicModifyIORef (ppProcesses pool) $ \wps -> (wps ++ [wp], ())
+              fill
+            Bad msg -> logWarning $ "Failed to start a warm job process: "
+                                    ++ msg
+  when start . void . forkIO
+    $ fill `E.finally` atomicModifyIORef (ppFilling pool) (const (False, ()))
+
+-- | Starts processing of the given job, either in a process from the pool
+-- of warm processes, or, if there is none, in a newly forked process.
+-- Returns the livelock of the job and its process ID.
+forkJobProcess :: (Error e, Show e)
+               => ProcessPool -- ^ the pool of warm job processes
+               -> JobId -- ^ a job to process
+               -> FilePath  -- ^ the daemons own livelock file
+               -> (FilePath -> ResultT e IO ())
+                  -- ^ a callback function to update the livelock file
+                  -- and process id in the job file
+               -> ResultT e IO (FilePath, ProcessID)
+forkJobProcess pool jid luxiLivelock update = do
+  let jidStr = show . fromJobId $ jid
 
-      return (lockfile, pid)
+      fromWarm wp = do
+        let jobLogPrefix = processLogPrefix "start" (Just jid) (wpPid wp)
+        logDebug $ jobLogPrefix ++ "Using a warm process with the lockfile "
+                   ++ wpLivelock wp
+        onProcessError jobLogPrefix (wpPid wp) (wpClient wp) $ do
+          update $ wpLivelock wp
+          sendJobId jobLogPrefix jid wp
+        return (wpLivelock wp, wpPid wp)
+
+      cold = do
+        logDebug $ "Setting the lockfile temporarily to " ++ luxiLivelock
+                   ++ " for job " ++ jidStr
+        update luxiLivelock
+
+        wp <- spawnJobProcess (Just jid) update
+        let jobLogPrefix = processLogPrefix "start" (Just jid) (wpPid wp)
+        onProcessError jobLogPrefix (wpPid wp) (wpClient wp) $ do
+          sendLivelock jobLogPrefix wp
+          sendJobId jobLogPrefix jid wp
+        return (wpLivelock wp, wpPid wp)
+
+  warm <- liftIO $ takeWarmProcess pool
+  case warm of
+    Nothing -> cold
+    Just wp -> fromWarm wp `catchError` \e -> do
+      logWarning $ "Failed to start job " ++ jidStr
+                   ++ " in a warm process, forking a new one: " ++ show e
+      cold
@@ -0,0 +1,271 @@
+{-| Indexes over the configuration for the query implementation.
+
+The objects of each kind are kept in their natural (nice-sorted)
+order, together with value indexes of some commonly filtered fields.
+These allow selective filters (e.g. all instances on a given primary
+node) to only look at the objects that can possibly match, instead
+of evaluating the filter against every object in the configuration.
+
+ -}
+
+{-
+
+Copyright (C) 2015 Google Inc.
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are
+met:
+
+1. Redistributions of source code must retain the above copyright notice,
+this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright
+notice, this list of conditions and the following disclaimer in the
+documentation and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+-}
+
+module Ganeti.Query.Index
+  ( ObjectIndex
+  , mkObjectIndex
+  , indexedObjects
+  , indexedName
+  , indexKey
+  , indexCandidates
+  , ConfigIndex(..)
+  , buildConfigIndex
+  , IndexCache
+  , newIndexCache
+  , getConfigIndex
+  ) where
+
+import Control.Applicative ((<$>))
+import Data.IORef
+import Data.List (sortBy)
+import Data.Ord (comparing)
+import qualified Data.IntMap as IntMap
+import qualified Data.IntSet as IntSet
+import qualified Data.Map as Map
+import Data.Maybe (fromMaybe, mapMaybe)
+import System.Time (ClockTime)
+import Text.JSON (JSValue(..), fromJSString)
+
+import Ganeti.JSON
+import Ganeti.Objects
+import qualified Ganeti.Query.FilterRules as FilterRules
+import qualified Ganeti.Query.Group as Group
+import qualified Ganeti.Query.Instance as Instance
+import Ganeti.Query.Language
+import qualified Ganeti.Query.Network as Network
+import qualified Ganeti.Query.Node as Node
+import Ganeti.Query.Types
+import Ganeti.Types
+import Ganeti.Utils (niceKey)
+
+-- * Field indexes
+
+-- | Positions of objects, indexed by a key derived from a field
+-- value. The 'Nothing' key holds the objects that must always be
+-- evaluated, since their value can't be decided upon from the index
+-- (missing data, or a value of a different type).
+type ValueIndex = Map.Map (Maybe String) IntSet.IntSet
+
+-- | The index of a single field.
+data FieldIndex = FieldIndex
+  { fiMode     :: QffMode    -- ^ How equality is checked for the field
+  , fiEqual    :: ValueIndex -- ^ Objects by their (string) value
+  , fiContains :: ValueIndex -- ^ Objects by the members of their list value
+  }
+
+-- | Computes the key under which a value is indexed; host names are
+-- indexed by their first component, so that the index can be used
+-- for the partial matching done by 'QffHostname' fields.
+valueKey :: QffMode -> String -> String
+valueKey QffHostname = takeWhile (/= '.')
+valueKey _           = id
+
+-- | Computes the equality and containment keys of a field value.
+valueKeys :: QffMode -> ResultEntry -> ([Maybe String], [Maybe String])
+valueKeys qff (ResultEntry RSNormal (Just (JSString s))) =
+  ([Just . valueKey qff $ fromJSString s], [Nothing])
+valueKeys _ (ResultEntry RSNormal (Just (JSArray xs))) =
+  ([Nothing], map elemKey xs)
+    where elemKey (JSString s) = Just $ fromJSString s
+          elemKey _            = Nothing
+valueKeys _ _ = ([Nothing], [Nothing])
+
+-- | Returns the getter of a field, if it only needs the configuration.
+configGetter :: ConfigData -> FieldGetter a b -> Maybe (a -> ResultEntry)
+configGetter _   (FieldSimple getter) = Just getter
+configGetter cfg (FieldConfig getter) = Just $ getter cfg
+configGetter _   _                    = Nothing
+
+-- | Builds the index of a field over a list of numbered objects. The
+-- index itself is only computed on first use.
+mkFieldIndex :: ConfigData -> [(Int, a)] -> FieldData a b -> Maybe FieldIndex
+mkFieldIndex cfg objs (_, getter, qff) = do
+  get <- configGetter cfg getter
+  let keyed = map (\(pos, obj) -> (pos, valueKeys qff $ get obj)) objs
+      build sel = Map.fromListWith IntSet.union
+                    [ (key, IntSet.singleton pos)
+                    | (pos, keys) <- keyed, key <- sel keys ]
+  return FieldIndex { fiMode = qff
+                    , fiEqual = build fst
+                    , fiContains = build snd
+                    }
+
+-- | Looks up the positions of the objects that may have a given key.
+lookupValue :: String -> ValueIndex -> IntSet.IntSet
+lookupValue key vindex =
+  IntSet.union (find $ Just key) (find Nothing)
+    where find k = Map.findWithDefault IntSet.empty k vindex
+
+-- * Object indexes
+
+-- | The objects of one kind, in their natural order, together with
+-- the indexes of some of their fields.
+data ObjectIndex a = ObjectIndex
+  { oiObjects :: IntMap.IntMap a
+  , oiName    :: a -> String
+  , oiFields  :: Map.Map FilterField FieldIndex
+  }
+
+-- | Builds the index over a list of objects.
+mkObjectIndex :: FieldMap a b   -- ^ The fields of the objects
+              -> [FilterField]  -- ^ The fields to build indexes for
+              -> (a -> String)  -- ^ Object to name function
+              -> ConfigData     -- ^ The configuration
+              -> [a]            -- ^ The objects to index
+              -> ObjectIndex a
+mkObjectIndex fieldsMap indexed nameFn cfg objs =
+  let numbered = zip [0..] $ sortBy (comparing $ indexKey . nameFn) objs
+      fields = [ (name, findex)
+               | name <- indexed
+               , Just fdata <- [name `Map.lookup` fieldsMap]
+               , Just findex <- [mkFieldIndex cfg numbered fdata] ]
+  in ObjectIndex { oiObjects = IntMap.fromDistinctAscList numbered
+                 , oiName = nameFn
+                 , oiFields = Map.fromList fields
+                 }
+
+-- | Returns all the indexed objects, in their natural order.
+indexedObjects :: ObjectIndex a -> [a]
+indexedObjects = IntMap.elems . oiObjects
+
+-- | Returns the name of an object, as used for sorting the index.
+indexedName :: ObjectIndex a -> a -> String
+indexedName = oiName
+
+-- | The key objects are sorted by, given their name. Names are
+-- nice-sorted, and names with the same nice-sort key (such as @a1@
+-- and @a01@) are ordered by the names themselves.
+indexKey :: String -> ([Either Integer String], String)
+indexKey name = (niceKey name, name)
+
+-- | Computes the positions of the objects that may pass a filter,
+-- based on its equality and containment tests on indexed fields.
+-- Returns 'Nothing' if the filter can't be restricted this way, in
+-- which case all objects need to be evaluated.
+planFilter :: Map.Map FilterField FieldIndex -> Filter FilterField
+           -> Maybe IntSet.IntSet
+planFilter fields flt =
+  case flt of
+    EQFilter field (QuotedString val) ->
+      withField field $ \fi -> lookupValue (valueKey (fiMode fi) val)
+                                           (fiEqual fi)
+    ContainsFilter field (QuotedString val) ->
+      withField field $ lookupValue val . fiContains
+    OrFilter flts -> IntSet.unions <$> mapM recurse flts
+    AndFilter flts ->
+      case mapMaybe recurse flts of
+        [] -> Nothing
+        sets -> Just $ foldr1 IntSet.intersection sets
+    _ -> Nothing
+  where recurse = planFilter fields
+        withField field fn = fn <$> field `Map.lookup` fields
+
+-- | Returns the objects that may pass a filter, in their natural
+-- order. The filter still needs to be evaluated on the result, as
+-- this is only a (cheap) superset of the matching objects.
+indexCandidates :: ObjectIndex a -> Filter FilterField -> [a]
+indexCandidates oindex flt =
+  case planFilter (oiFields oindex) flt of
+    Nothing -> indexedObjects oindex
+    Just positions ->
+      mapMaybe (`IntMap.lookup` oiObjects oindex) $ IntSet.toAscList positions
+
+-- * Configuration indexes
+
+-- | The indexes over a given version of the configuration. All
+-- fields are lazy, so only the indexes that are actually used by
+-- queries are ever computed.
+data ConfigIndex = ConfigIndex
+  { ciSerial    :: Int                      -- ^ Serial of the config
+  , ciMtime     :: ClockTime                -- ^ Modification time
+  , ciNodes     :: ObjectIndex Node
+  , ciInstances :: ObjectIndex Instance
+  , ciGroups    :: ObjectIndex NodeGroup
+  , ciNetworks  :: ObjectIndex Network
+  , ciExports   :: ObjectIndex Node         -- ^ Nodes, without field indexes
+  , ciFilters   :: ObjectIndex FilterRule
+  }
+
+-- | Builds the indexes over a configuration.
+buildConfigIndex :: ConfigData -> ConfigIndex
+buildConfigIndex cfg =
+  let elems = Map.elems . fromContainer
+      nodes = mkObjectIndex Node.fieldsMap
+                [ "name", "group", "group.uuid", "tags" ]
+                nodeName cfg . elems $ configNodes cfg
+  in ConfigIndex
+       { ciSerial = serialOf cfg
+       , ciMtime = mTimeOf cfg
+       , ciNodes = nodes
+       , ciInstances =
+           mkObjectIndex Instance.fieldsMap
+             [ "name", "pnode", "pnode.group", "pnode.group.uuid"
+             , "snodes", "snodes.group", "snodes.group.uuid"
+             , "admin_state", "os", "hypervisor", "tags" ]
+             (fromMaybe "" . instName) cfg . elems $ configInstances cfg
+       , ciGroups = mkObjectIndex Group.fieldsMap [ "name", "tags" ]
+                      groupName cfg . elems $ configNodegroups cfg
+       , ciNetworks = mkObjectIndex Network.fieldsMap [ "name", "tags" ]
+                        (fromNonEmpty . networkName) cfg . elems
+                        $ configNetworks cfg
+       , ciExports = nodes { oiFields = Map.empty }
+       , ciFilters = mkObjectIndex FilterRules.fieldsMap [] frUuid cfg
+                       . elems $ configFilters cfg
+       }
+
+-- | A cache holding the indexes of the most recent configuration.
+type IndexCache = IORef (Maybe ConfigIndex)
+
+-- | Creates an empty index cache.
+newIndexCache :: IO IndexCache
+newIndexCache = newIORef Nothing
+
+-- | Returns the indexes for a configuration, reusing the cached ones
+-- if they were built for the same version of the configuration.
+getConfigIndex :: IndexCache -> ConfigData -> IO ConfigIndex
+getConfigIndex cache cfg = do
+  cached <- readIORef cache
+  case cached of
+    Just cindex | ciSerial cindex == serialOf cfg
+                  && ciMtime cindex == mTimeOf cfg -> return cindex
+    _ -> do
+      let cindex = buildConfigIndex cfg
+      writeIORef cache (Just cindex)
+      return cindex
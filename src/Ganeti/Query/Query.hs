@@ -57,6 +57,9 @@ too.
 
 module Ganeti.Query.Query
     ( query
+    , queryIndexed
+    , Paging(..)
+    , queryPaged
     , queryFields
     , queryCompat
     , getRequestedNames
@@ -65,7 +68,6 @@ module Ganeti.Query.Query
     , uuidField
     ) where
 
-import Control.Arrow ((&&&))
 import Control.DeepSeq
 import Control.Monad (filterM, foldM, liftM, unless)
 import Control.Monad.IO.Class
@@ -81,7 +83,6 @@ import Ganeti.BasicTypes
 import Ganeti.Config
 import Ganeti.Errors
 import Ganeti.JQueue
-import Ganeti.JSON
 import Ganeti.Locking.Allocation (OwnerState, LockRequest(..), OwnerState(..))
 import Ganeti.Locking.Locks (GanetiLocks, ClientId, lockName)
 import Ganeti.Logging
@@ -90,6 +91,7 @@ import Ganeti.Query.Common
 import qualified Ganeti.Query.Export as Export
 import qualified Ganeti.Query.FilterRules as FilterRules
 import Ganeti.Query.Filter
+import Ganeti.Query.Index
 import qualified Ganeti.Query.Instance as Instance
 import qualified Ganeti.Query.Job as Query.Job
 import qualified Ganeti.Query.Group as Group
@@ -109,6 +111,12 @@ data CollectorType a b
   = CollectorSimple     (Bool -> ConfigData -> [a] -> IO [(a, b)])
   | CollectorFieldAware (Bool -> ConfigData -> [String] -> [a] -> IO [(a, b)])
 
+-- | Paging of query results.
+data Paging = Paging
+  { pagingLimit  :: Int          -- ^ Maximum number of results
+  , pagingResume :: Maybe String -- ^ Token returned with the previous page
+  } deriving (Show)
+
 -- * Helper functions
 
 -- | Builds an unknown field definition.
@@ -189,6 +197,42 @@ getRequestedJobIDs qfilter =
                     NumericValue i -> makeJobId $ fromIntegral i
            ) vals
 
+-- | Skips the items up to and including the one a page resumes
+-- after. Items listed in their natural order are compared by their
+-- sort key (see 'indexKey'), so that pages stay consistent even if
+-- items are added or removed in between; explicitly requested items
+-- are skipped by position.
+resumeAfter :: (a -> String) -- ^ Item to name function
+            -> Bool          -- ^ Whether the items were requested by name
+            -> String        -- ^ The resume token
+            -> [a]
+            -> [a]
+resumeAfter nameFn True token = drop 1 . dropWhile ((/= token) . nameFn)
+resumeAfter nameFn False token =
+  let key = indexKey token
+  in dropWhile ((<= key) . indexKey . nameFn)
+
+-- | Runs the first pass of the filter, restricted to one page if
+-- requested. Items are only evaluated until enough of them passed;
+-- the resume token for the next page is returned if items remain.
+filterPage :: (Monad m)
+           => (a -> String)    -- ^ Item to name function
+           -> Bool             -- ^ Whether the items were requested by name
+           -> (a -> m Bool)    -- ^ The filter
+           -> Maybe Paging     -- ^ The page to compute, if any
+           -> [a]              -- ^ The candidate items
+           -> m ([a], Maybe String)
+filterPage _ _ fn Nothing items = liftM (\l -> (l, Nothing)) $ filterM fn items
+filterPage nameFn byName fn (Just (Paging limit resume)) items =
+  go limit [] $ maybe id (resumeAfter nameFn byName) resume items
+  where go _ acc [] = return (reverse acc, Nothing)
+        go 0 acc@(lastItem:_) _ = return (reverse acc, Just $ nameFn lastItem)
+        go n acc (x:xs) = do
+          ok <- fn x
+          if ok
+            then go (n - 1) (x:acc) xs
+            else go n acc xs
+
 -- | Generic query implementation for resources that are backed by
 -- some configuration objects.
 --
@@ -204,32 +248,37 @@ getRequestedJobIDs qfilter =
 -- The gathered data, or the failure to get it, is expressed through a runtime
 -- object. The type of a runtime object is determined by every query type for
 -- itself, and used exclusively by that query.
+--
+-- If no names are requested, the candidate objects are taken from the
+-- object index, which restricts them based on the filter if possible.
+-- If a page is requested, live data is only collected for the objects
+-- of that page.
 genericQuery :: FieldMap a b       -- ^ Maps field names to field definitions
              -> CollectorType a b  -- ^ Collector of live data
-             -> (a -> String)      -- ^ Object to name function
-             -> (ConfigData -> Container a) -- ^ Get all objects from config
+             -> ObjectIndex a      -- ^ All objects, sorted and indexed
              -> (ConfigData -> String -> ErrorResult a) -- ^ Lookup object
              -> ConfigData         -- ^ The config to run the query against
              -> Bool               -- ^ Whether the query should be run live
              -> [String]           -- ^ List of requested fields
              -> Filter FilterField -- ^ Filter field
              -> [String]           -- ^ List of requested names
-             -> IO (ErrorResult QueryResult)
-genericQuery fieldsMap collector nameFn configFn getFn cfg
-             live fields qfilter wanted =
+             -> Maybe Paging       -- ^ The page to compute, if any
+             -> IO (ErrorResult (QueryResult, Maybe String))
+genericQuery fieldsMap collector oindex getFn cfg
+             live fields qfilter wanted paging =
   runResultT $ do
   cfilter <- toError $ compileFilter fieldsMap qfilter
   let selected = getSelectedFields fieldsMap fields
       (fdefs, fgetters, _) = unzip3 selected
       live' = live && needsLiveData fgetters
   objects <- toError $ case wanted of
-             [] -> Ok . niceSortKey nameFn .
-                   Foldable.toList $ configFn cfg
+             [] -> Ok $ indexCandidates oindex qfilter
              _  -> mapM (getFn cfg) wanted
   -- Run the first pass of the filter, without a runtime context; this will
   -- limit the objects that we'll contact for exports
-  fobjects <- toError $
-    filterM (\n -> evaluateQueryFilter cfg Nothing n cfilter) objects
+  (fobjects, next) <- toError $
+    filterPage (indexedName oindex) (not $ null wanted)
+               (\n -> evaluateQueryFilter cfg Nothing n cfilter) paging objects
   -- Gather the runtime data
   runtimes <- case collector of
     CollectorSimple     collFn -> lift $ collFn live' cfg fobjects
@@ -238,7 +287,7 @@ genericQuery fieldsMap collector nameFn configFn getFn cfg
   let fdata = map (\(obj, runtime) ->
                      map (execGetter cfg runtime obj) fgetters)
               runtimes
-  return QueryResult { qresFields = fdefs, qresData = fdata }
+  return (QueryResult { qresFields = fdefs, qresData = fdata }, next)
 
 -- | Dummy recollection of the data for a lock from the prefected
 -- data for all locks.
@@ -268,9 +317,32 @@ query :: ConfigData   -- ^ The current configuration
       -> Bool         -- ^ Whether to collect live data
       -> Query        -- ^ The query (item, fields, filter)
       -> IO (ErrorResult QueryResult) -- ^ Result
-query cfg live (Query (ItemTypeLuxi QRJob) fields qfilter) =
-  queryJobs cfg live fields qfilter
-query cfg live (Query (ItemTypeLuxi QRLock) fields qfilter) = runResultT $ do
+query cfg = queryIndexed (buildConfigIndex cfg) cfg
+
+-- | Query execution function, using the (possibly cached) indexes of
+-- the configuration.
+queryIndexed :: ConfigIndex  -- ^ The indexes of the configuration
+             -> ConfigData   -- ^ The current configuration
+             -> Bool         -- ^ Whether to collect live data
+             -> Query        -- ^ The query (item, fields, filter)
+             -> IO (ErrorResult QueryResult) -- ^ Result
+queryIndexed cindex cfg live qry =
+  liftM (liftM fst) $ queryPaged cindex cfg live qry Nothing
+
+-- | Query execution function returning a single page of the results,
+-- together with the token to pass for the next page (if any).
+queryPaged :: ConfigIndex  -- ^ The indexes of the configuration
+           -> ConfigData   -- ^ The current configuration
+           -> Bool         -- ^ Whether to collect live data
+           -> Query        -- ^ The query (item, fields, filter)
+           -> Maybe Paging -- ^ The page to compute, if any
+           -> IO (ErrorResult (QueryResult, Maybe String)) -- ^ Result
+queryPaged _ _ _ _ (Just (Paging limit _)) | limit <= 0 =
+  return . Bad . ParameterError $ "Invalid page size " ++ show limit
+queryPaged _ cfg live (Query (ItemTypeLuxi QRJob) fields qfilter) paging =
+  queryJobs cfg live fields qfilter paging
+queryPaged _ cfg live (Query (ItemTypeLuxi QRLock) fields qfilter) paging =
+  runResultT $ do
   unless live (failError "Locks can only be queried live")
   cl <- liftIO $ do
      socketpath <- defaultWConfdSocket
@@ -284,14 +356,14 @@ query cfg live (Query (ItemTypeLuxi QRLock) fields qfilter) = runResultT $ do
   answer <- liftIO $ genericQuery
              Locks.fieldsMap
              (CollectorSimple $ recollectLocksData livedata)
-             id
-             (const . GenericContainer . Map.fromList
-              . map ((id &&& id) . lockName) $ allLocks)
+             (mkObjectIndex Locks.fieldsMap [] id cfg . Set.toList
+              . Set.fromList $ map lockName allLocks)
              (const Ok)
-             cfg live fields qfilter []
+             cfg live fields qfilter [] paging
   toError answer
 
-query cfg live qry = queryInner cfg live qry $ getRequestedNames qry
+queryPaged cindex cfg live qry paging =
+  queryInner cindex cfg live qry (getRequestedNames qry) paging
 
 
 -- | Dummy data collection fuction
@@ -299,40 +371,51 @@ dummyCollectLiveData :: Bool -> ConfigData -> [a] -> IO [(a, NoDataRuntime)]
 dummyCollectLiveData _ _ = return . map (, NoDataRuntime)
 
 -- | Inner query execution function.
-queryInner :: ConfigData   -- ^ The current configuration
+queryInner :: ConfigIndex  -- ^ The indexes of the configuration
+           -> ConfigData   -- ^ The current configuration
            -> Bool         -- ^ Whether to collect live data
            -> Query        -- ^ The query (item, fields, filter)
            -> [String]     -- ^ Requested names
-           -> IO (ErrorResult QueryResult) -- ^ Result
+           -> Maybe Paging -- ^ The page to compute, if any
+           -> IO (ErrorResult (QueryResult, Maybe String)) -- ^ Result
 
-queryInner cfg live (Query (ItemTypeOpCode QRNode) fields qfilter) wanted =
+queryInner cindex cfg live (Query (ItemTypeOpCode QRNode) fields qfilter)
+           wanted paging =
   genericQuery Node.fieldsMap (CollectorFieldAware Node.collectLiveData)
-               nodeName configNodes getNode cfg live fields qfilter wanted
+               (ciNodes cindex) getNode cfg live fields qfilter wanted
+               paging
 
-queryInner cfg live (Query (ItemTypeOpCode QRInstance) fields qfilter) wanted =
+queryInner cindex cfg live (Query (ItemTypeOpCode QRInstance) fields qfilter)
+           wanted paging =
   genericQuery Instance.fieldsMap (CollectorFieldAware Instance.collectLiveData)
-               (fromMaybe "" . instName) configInstances getInstance cfg live
-               fields qfilter
-               wanted
+               (ciInstances cindex) getInstance cfg live fields qfilter wanted
+               paging
 
-queryInner cfg live (Query (ItemTypeOpCode QRGroup) fields qfilter) wanted =
-  genericQuery Group.fieldsMap (CollectorSimple dummyCollectLiveData) groupName
-               configNodegroups getGroup cfg live fields qfilter wanted
+queryInner cindex cfg live (Query (ItemTypeOpCode QRGroup) fields qfilter)
+           wanted paging =
+  genericQuery Group.fieldsMap (CollectorSimple dummyCollectLiveData)
+               (ciGroups cindex) getGroup cfg live fields qfilter wanted
+               paging
 
-queryInner cfg live (Query (ItemTypeOpCode QRNetwork) fields qfilter) wanted =
+queryInner cindex cfg live (Query (ItemTypeOpCode QRNetwork) fields qfilter)
+           wanted paging =
   genericQuery Network.fieldsMap (CollectorSimple dummyCollectLiveData)
-               (fromNonEmpty . networkName)
-               configNetworks getNetwork cfg live fields qfilter wanted
+               (ciNetworks cindex) getNetwork cfg live fields qfilter wanted
+               paging
 
-queryInner cfg live (Query (ItemTypeOpCode QRExport) fields qfilter) wanted =
+queryInner cindex cfg live (Query (ItemTypeOpCode QRExport) fields qfilter)
+           wanted paging =
   genericQuery Export.fieldsMap (CollectorSimple Export.collectLiveData)
-               nodeName configNodes getNode cfg live fields qfilter wanted
+               (ciExports cindex) getNode cfg live fields qfilter wanted
+               paging
 
-queryInner cfg live (Query (ItemTypeLuxi QRFilter) fields qfilter) wanted =
+queryInner cindex cfg live (Query (ItemTypeLuxi QRFilter) fields qfilter)
+           wanted paging =
   genericQuery FilterRules.fieldsMap (CollectorSimple dummyCollectLiveData)
-               frUuid configFilters getFilterRule cfg live fields qfilter wanted
+               (ciFilters cindex) getFilterRule cfg live fields qfilter wanted
+               paging
 
-queryInner _ _ (Query qkind _ _) _ =
+queryInner _ _ _ (Query qkind _ _) _ _ =
   return . Bad . GenericError $ "Query '" ++ show qkind ++ "' not supported"
 
 -- | Query jobs specific query function, needed as we need to accept
@@ -341,8 +424,9 @@ queryJobs :: ConfigData                   -- ^ The current configuration
           -> Bool                         -- ^ Whether to collect live data
           -> [FilterField]                -- ^ Item
           -> Filter FilterField           -- ^ Filter
-          -> IO (ErrorResult QueryResult) -- ^ Result
-queryJobs cfg live fields qfilter = runResultT $ do
+          -> Maybe Paging                 -- ^ The page to compute, if any
+          -> IO (ErrorResult (QueryResult, Maybe String)) -- ^ Result
+queryJobs cfg live fields qfilter paging = runResultT $ do
   rootdir <- lift queueDir
   wanted_names <- toErrorStr $ getRequestedJobIDs qfilter
   rjids <- case wanted_names of
@@ -364,9 +448,13 @@ queryJobs cfg live fields qfilter = runResultT $ do
       live' = live && needsLiveData (fgetters ++ filtergetters)
       disabled_data = Bad "live data disabled"
   -- runs first pass of the filter, without a runtime context; this
-  -- will limit the jobs that we'll load from disk
-  jids <- toError $
-    filterM (\jid -> evaluateQueryFilter cfg Nothing jid cfilter) rjids
+  -- will limit the jobs that we'll load from disk; note that a page
+  -- can hold fewer jobs than requested, if the second pass filters
+  -- some of them out
+  (jids, next) <- toError $
+    filterPage (show . fromJobId) (not $ null wanted_names)
+               (\jid -> evaluateQueryFilter cfg Nothing jid cfilter)
+               paging rjids
   -- here we run the runtime data gathering, filtering and evaluation,
   -- all in the same step, so that we don't keep jobs in memory longer
   -- than we need; we can't be fully lazy due to the multiple monad
@@ -386,7 +474,7 @@ queryJobs cfg live fields qfilter = runResultT $ do
               -- evaluate nlst (to WHNF), otherwise we're too lazy
               return $! nlst
            ) [] jids
-  return QueryResult { qresFields = fdefs, qresData = reverse fdata }
+  return (QueryResult { qresFields = fdefs, qresData = reverse fdata }, next)
 
 -- | Helper for 'queryFields'.
 fieldsExtractor :: FieldMap a b -> [FilterField] -> QueryFieldsResult
@@ -86,6 +86,8 @@ import Ganeti.Rpc
 import qualified Ganeti.Query.Exec as Exec
 import Ganeti.Query.Query
 import Ganeti.Query.Filter (makeSimpleFilter)
+import Ganeti.Query.Index ( ConfigIndex, IndexCache, newIndexCache
+                          , getConfigIndex )
 import Ganeti.THH.HsRPC (runRpcClient, RpcClientMonad)
 import Ganeti.Types
 import qualified Ganeti.UDSServer as U (Handler(..), listener)
@@ -173,18 +175,20 @@ handleUuidQuery :: ConfigData      -- ^ Cluster config
 handleUuidQuery = handleQuery [uuidField]
 
 -- | Minimal wrapper to handle the missing config case.
-handleCallWrapper :: Lock -> JQStatus ->  Result ConfigData
+handleCallWrapper :: Lock -> JQStatus -> IndexCache -> Result ConfigData
                      -> LuxiOp -> IO (ErrorResult JSValue)
-handleCallWrapper _ _ (Bad msg) _ =
+handleCallWrapper _ _ _ (Bad msg) _ =
   return . Bad . ConfigurationError $
            "I do not have access to a valid configuration, cannot\
            \ process queries: " ++ msg
-handleCallWrapper qlock qstat (Ok config) op = handleCall qlock qstat config op
+handleCallWrapper qlock qstat icache (Ok config) op = do
+  cindex <- getConfigIndex icache config
+  handleCall qlock qstat cindex config op
 
 -- | Actual luxi operation handler.
-handleCall :: Lock -> JQStatus
+handleCall :: Lock -> JQStatus -> ConfigIndex
               -> ConfigData -> LuxiOp -> IO (ErrorResult JSValue)
-handleCall _ _ cdata QueryClusterInfo =
+handleCall _ _ _ cdata QueryClusterInfo =
   let cluster = configCluster cdata
       master = QCluster.clusterMasterNodeName cdata
       hypervisors = clusterEnabledHypervisors cluster
@@ -276,7 +280,7 @@ handleCall _ _ cdata QueryClusterInfo =
     Ok _ -> return . Ok . J.makeObj $ obj
     Bad ex -> return $ Bad ex
 
-handleCall _ _ cfg (QueryTags kind name) = do
+handleCall _ _ _ cfg (QueryTags kind name) = do
   let tags = case kind of
                TagKindCluster  -> Ok . clusterTags $ configCluster cfg
                TagKindGroup    -> groupTags   <$> Config.getGroup    cfg name
@@ -285,35 +289,44 @@ handleCall _ _ cfg (QueryTags kind name) = do
                TagKindNetwork  -> networkTags <$> Config.getNetwork  cfg name
   return (J.showJSON <$> tags)
 
-handleCall _ _ cfg (Query qkind qfields qfilter) = do
-  result <- query cfg True (Qlang.Query qkind qfields qfilter)
+handleCall _ _ cindex cfg (Query qkind qfields qfilter) = do
+  result <- queryIndexed cindex cfg True (Qlang.Query qkind qfields qfilter)
   return $ J.showJSON <$> result
 
-handleCall _ _ _ (QueryFields qkind qfields) = do
+handleCall _ _ cindex cfg (QueryPage qkind qfields qfilter limit resume) = do
+  result <- queryPaged cindex cfg True (Qlang.Query qkind qfields qfilter)
+              (Just $ Paging limit resume)
+  return $ (\(qres, next) ->
+              J.makeObj [ ("fields", showJSON $ Qlang.qresFields qres)
+                        , ("data", showJSON $ Qlang.qresData qres)
+                        , ("next", showJSON next)
+                        ]) <$> result
+
+handleCall _ _ _ _ (QueryFields qkind qfields) = do
   let result = queryFields (Qlang.QueryFields qkind qfields)
   return $ J.showJSON <$> result
 
-handleCall _ _ cfg (QueryNodes names fields lock) =
+handleCall _ _ _ cfg (QueryNodes names fields lock) =
   handleClassicQuery cfg (Qlang.ItemTypeOpCode Qlang.QRNode)
     (map Left names) fields lock
 
-handleCall _ _ cfg (QueryInstances names fields lock) =
+handleCall _ _ _ cfg (QueryInstances names fields lock) =
   handleClassicQuery cfg (Qlang.ItemTypeOpCode Qlang.QRInstance)
     (map Left names) fields lock
 
-handleCall _ _ cfg (QueryGroups names fields lock) =
+handleCall _ _ _ cfg (QueryGroups names fields lock) =
   handleClassicQuery cfg (Qlang.ItemTypeOpCode Qlang.QRGroup)
     (map Left names) fields lock
 
-handleCall _ _ cfg (QueryJobs names fields) =
+handleCall _ _ _ cfg (QueryJobs names fields) =
   handleClassicQuery cfg (Qlang.ItemTypeLuxi Qlang.QRJob)
     (map (Right . fromIntegral . fromJobId) names)  fields False
 
-handleCall _ _ cfg (QueryFilters uuids fields) =
+handleCall _ _ _ cfg (QueryFilters uuids fields) =
   handleUuidQuery cfg (Qlang.ItemTypeLuxi Qlang.QRFilter)
     (map Left uuids) fields False
 
-handleCall _ status _ (ReplaceFilter mUuid priority predicates action
+handleCall _ status _ _ (ReplaceFilter mUuid priority predicates action
                                      reason) =
   -- Handles both adding new filter and changing existing ones.
   runResultT $ do
@@ -351,7 +364,7 @@ handleCall _ status _ (ReplaceFilter mUuid priority predicates action
     -- Return UUID of added/replaced filter.
     return $ showJSON uuid
 
-handleCall _ status cfg (DeleteFilter uuid) = runResultT $ do
+handleCall _ status _ cfg (DeleteFilter uuid) = runResultT $ do
   -- Check if filter exists.
   _ <- lookupContainer
     (failError $ "Filter rule with UUID " ++ uuid ++ " does not exist")
@@ -367,11 +380,11 @@ handleCall _ status cfg (DeleteFilter uuid) = runResultT $ do
 
   return JSNull
 
-handleCall _ _ cfg (QueryNetworks names fields lock) =
+handleCall _ _ _ cfg (QueryNetworks names fields lock) =
   handleClassicQuery cfg (Qlang.ItemTypeOpCode Qlang.QRNetwork)
     (map Left names) fields lock
 
-handleCall _ _ cfg (QueryConfigValues fields) = do
+handleCall _ _ _ cfg (QueryConfigValues fields) = do
   let params = [ ("cluster_name", return . showJSON . clusterClusterName
                                     . configCluster $ cfg)
                , ("watcher_pause", liftM (maybe JSNull showJSON)
@@ -384,11 +397,11 @@ handleCall _ _ cfg (QueryConfigValues fields) = do
   answerEval <- sequence answer
   return . Ok . showJSON $ answerEval
 
-handleCall _ _ cfg (QueryExports nodes lock) =
+handleCall _ _ _ cfg (QueryExports nodes lock) =
   handleClassicQuery cfg (Qlang.ItemTypeOpCode Qlang.QRExport)
     (map Left nodes) ["node", "export"] lock
 
-handleCall qlock qstat cfg (SubmitJobToDrainedQueue ops) = runResultT $ do
+handleCall qlock qstat _ cfg (SubmitJobToDrainedQueue ops) = runResultT $ do
     jid <- mkResultT $ allocateJobId (Config.getMasterCandidates cfg) qlock
     ts <- liftIO currentTimestamp
     job <- liftM (extendJobReasonTrail . setReceivedTimestamp ts)
@@ -398,14 +411,14 @@ handleCall qlock qstat cfg (SubmitJobToDrainedQueue ops) = runResultT $ do
     _ <- liftIO . forkIO $ enqueueNewJobs qstat [job]
     return . showJSON . fromJobId $ jid
 
-handleCall qlock qstat cfg (SubmitJob ops) =
+handleCall qlock qstat cindex cfg (SubmitJob ops) =
   do
     open <- isQueueOpen
     if not open
        then return . Bad . GenericError $ "Queue drained"
-       else handleCall qlock qstat cfg (SubmitJobToDrainedQueue ops)
+       else handleCall qlock qstat cindex cfg (SubmitJobToDrainedQueue ops)
 
-handleCall qlock qstat cfg (SubmitManyJobs lops) =
+handleCall qlock qstat _ cfg (SubmitManyJobs lops) =
   do
     open <- isQueueOpen
     if not open
@@ -434,7 +447,7 @@ handleCall qlock qstat cfg (SubmitManyJobs lops) =
                         else showJSON (False, genericResult id (const "") res))
               $ annotated_results
 
-handleCall _ _ cfg (WaitForJobChange jid fields prev_job prev_log tmout) = do
+handleCall _ _ _ cfg (WaitForJobChange jid fields prev_job prev_log tmout) = do
   let compute_fn = computeJobUpdate cfg jid fields prev_log
   qDir <- queueDir
   -- verify if the job is finalized, and return immediately in this case
@@ -448,12 +461,12 @@ handleCall _ _ cfg (WaitForJobChange jid fields prev_job prev_log tmout) = do
       return . Ok $ showJSON answer
     _ -> liftM (Ok . showJSON) compute_fn
 
-handleCall _ _ cfg (SetWatcherPause time) = do
+handleCall _ _ _ cfg (SetWatcherPause time) = do
   let mcs = Config.getMasterOrCandidates cfg
   _ <- executeRpcCall mcs $ RpcCallSetWatcherPause time
   return . Ok . maybe JSNull showJSON $ fmap TimeAsDoubleJSON time
 
-handleCall _ _ cfg (SetDrainFlag value) = do
+handleCall _ _ _ cfg (SetDrainFlag value) = do
   let mcs = Config.getMasterCandidates cfg
   fpath <- jobQueueDrainFile
   if value
@@ -462,7 +475,7 @@ handleCall _ _ cfg (SetDrainFlag value) = do
   _ <- executeRpcCall mcs $ RpcCallSetDrainFlag value
   return . Ok . showJSON $ True
 
-handleCall _ qstat cfg (ChangeJobPriority jid prio) = do
+handleCall _ qstat _ cfg (ChangeJobPriority jid prio) = do
   let jName = (++) "job " . show $ fromJobId jid
   maybeJob <- setJobPriority qstat jid prio
   case maybeJob of
@@ -478,7 +491,7 @@ handleCall _ qstat cfg (ChangeJobPriority jid prio) = do
       logDebug $ jName ++ " started, will signal"
       fmap showJSON <$> tellJobPriority (jqLivelock qstat) jid prio
 
-handleCall _ qstat  cfg (CancelJob jid kill) = do
+handleCall _ qstat  _ cfg (CancelJob jid kill) = do
   let jName = (++) "job " . show $ fromJobId jid
   dequeueResult <- dequeueJob qstat jid
   case dequeueResult of
@@ -509,7 +522,7 @@ handleCall _ qstat  cfg (CancelJob jid kill) = do
       return result
     Bad s -> return . Ok . showJSON $ (False, s)
 
-handleCall qlock _ cfg (ArchiveJob jid) =
+handleCall qlock _ _ cfg (ArchiveJob jid) =
   -- By adding a layer of MaybeT, we can prematurely end a computation
   -- using 'mzero' or other 'MonadPlus' primitive and return 'Ok False'.
   runResultT . liftM (showJSON . fromMaybe False) . runMaybeT $ do
@@ -528,7 +541,7 @@ handleCall qlock _ cfg (ArchiveJob jid) =
                 $ RpcCallJobqueueRename [(live, archive)]
     return True
 
-handleCall qlock _ cfg (AutoArchiveJobs age timeout) = do
+handleCall qlock _ _ cfg (AutoArchiveJobs age timeout) = do
   qDir <- queueDir
   resultJids <- getJobIDs [qDir]
   case resultJids of
@@ -539,7 +552,7 @@ handleCall qlock _ cfg (AutoArchiveJobs age timeout) = do
                   $ sortJobIDs jids
       return . Ok $ showJSON result
 
-handleCall _ _ _ (PickupJob _) =
+handleCall _ _ _ _ (PickupJob _) =
   return . Bad
     $ GenericError "Luxi call 'PickupJob' is for internal use only"
 
@@ -568,15 +581,15 @@ computeJobUpdate cfg jid fields prev_log = do
   return (JSArray rfields, rlogs)
 
 
-type LuxiConfig = (Lock, JQStatus, ConfigReader)
+type LuxiConfig = (Lock, JQStatus, IndexCache, ConfigReader)
 
 luxiExec
     :: LuxiConfig
     -> LuxiOp
     -> IO (Bool, GenericResult GanetiException JSValue)
-luxiExec (qlock, qstat, creader) args = do
+luxiExec (qlock, qstat, icache, creader) args = do
   cfg <- creader
-  result <- handleCallWrapper qlock qstat cfg args
+  result <- handleCallWrapper qlock qstat icache cfg args
   return (True, result)
 
 luxiHandler :: LuxiConfig -> U.Handler LuxiOp IO JSValue
@@ -610,7 +623,7 @@ checkMain = handleMasterVerificationOptions
 
 -- | Prepare function for luxid.
 prepMain :: PrepFn () PrepResult
-prepMain _ _ = do
+prepMain opts _ = do
   Exec.isForkSupported
     >>= flip exitUnless "The daemon must be compiled without -threaded"
 
@@ -620,6 +633,7 @@ prepMain _ _ = do
          Nothing (Just socket_path) $ getLuxiServer True socket_path
   cref <- newIORef (Bad "Configuration not yet loaded")
   jq <- emptyJQStatus cref
+          $ fromMaybe C.luxidJobProcessesDefault (optJobProcesses opts)
   return (s, cref, jq)
 
 -- | Main function.
@@ -641,6 +655,7 @@ main _ _ (server, cref, jq) = do
   qlockFile <- jobQueueLockFile
   _ <- lockFile qlockFile >>= exitIfBad "Failed to obtain the job-queue lock"
   qlock <- newLock
+  icache <- newIndexCache
 
   _ <- P.installHandler P.sigCHLD P.Ignore Nothing
 
@@ -649,5 +664,5 @@ main _ _ (server, cref, jq) = do
   initJQScheduler jq
 
   finally
-    (forever $ U.listener (luxiHandler (qlock, jq, creader)) server)
+    (forever $ U.listener (luxiHandler (qlock, jq, icache, creader)) server)
     (closeServer server >> removeFile qlockFile)
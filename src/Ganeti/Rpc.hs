@@ -98,6 +98,7 @@ module Ganeti.Rpc
   , RpcResultExportList(..)
 
   , RpcCallJobqueueUpdate(..)
+  , RpcCallJobqueueUpdateMulti(..)
   , RpcCallJobqueueRename(..)
   , RpcCallSetWatcherPause(..)
   , RpcCallSetDrainFlag(..)
@@ -676,6 +677,28 @@ instance Rpc RpcCallJobqueueUpdate RpcResultJobQueueUpdate where
       _ -> Left $ JsonDecodeError
            ("Expected JSNull, got " ++ show (pp_value res))
 
+-- | Update or append to multiple job queue files
+
+$(buildObject "RpcCallJobqueueUpdateMulti" "rpcCallJobqueueUpdateMulti"
+  [ simpleField "updates" [t| [(String, String, Bool)] |]
+  ])
+
+$(buildObject "RpcResultJobqueueUpdateMulti" "rpcResultJobqueueUpdateMulti"
+  [ simpleField "missing" [t| [String] |]
+  ])
+
+instance RpcCall RpcCallJobqueueUpdateMulti where
+  rpcCallName _          = "jobqueue_update_multi"
+  rpcCallTimeout _       = rpcTimeoutToRaw Fast
+  rpcCallAcceptOffline _ = False
+  rpcCallData _ call     = J.encode
+    [ map (\(name, content, append) -> (name, toCompressed content, append))
+        $ rpcCallJobqueueUpdateMultiUpdates call
+    ]
+
+instance Rpc RpcCallJobqueueUpdateMulti RpcResultJobqueueUpdateMulti where
+  rpcResultFill _ res = fromJSValueToRes res RpcResultJobqueueUpdateMulti
+
 -- | Rename a file in the job queue
 
 $(buildObject "RpcCallJobqueueRename" "rpcCallJobqueueRename"
@@ -53,6 +53,7 @@ module Ganeti.Utils
   , plural
   , niceSort
   , niceSortKey
+  , niceKey
   , exitIfBad
   , exitErr
   , exitWhen
@@ -409,7 +410,11 @@ niceSort = niceSortKey id
 niceSortKey :: (a -> String) -> [a] -> [a]
 niceSortKey keyfn =
   map snd . sortBy (compare `on` fst) .
-  map (\s -> (fst . extractKey [] $ keyfn s, s))
+  map (\s -> (niceKey $ keyfn s, s))
+
+-- | Computes the key 'niceSort' orders strings by.
+niceKey :: String -> [Either Integer String]
+niceKey = fst . extractKey []
 
 -- | Strip space characthers (including newline). As this is
 -- expensive, should only be run on small strings.
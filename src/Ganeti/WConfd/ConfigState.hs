@@ -41,30 +41,61 @@ module Ganeti.WConfd.ConfigState
   , mkConfigState
   , bumpSerial
   , needsFullDist
+  , recordHistory
+  , ConfigDelta(..)
+  , ConfigVersion
+  , configVersion
+  , configDeltaSince
+  , applyConfigDelta
   ) where
 
 import Control.Applicative
+import Control.Arrow ((&&&))
 import Data.Function (on)
+import Data.List (find)
+import qualified Data.Map as M
+import Data.Maybe (fromMaybe)
 import System.Time (ClockTime(..))
 
 import Ganeti.Config
+import Ganeti.JSON ( Container, GenericContainer(..), MaybeForJSON(..)
+                   , TimeAsDoubleJSON(..), emptyContainer )
 import Ganeti.Lens
 import Ganeti.Objects
 import Ganeti.Objects.Lens
+import Ganeti.THH
+import Ganeti.THH.Field (timeAsDoubleField)
+
+-- | The number of previous versions of the configuration kept in memory,
+-- so that clients holding one of them can be sent just the differences.
+historySize :: Int
+historySize = 16
 
 -- | In future this data type will include the current configuration
 -- ('ConfigData') and the last 'FStat' of its file.
 data ConfigState = ConfigState
   { csConfigData :: ConfigData
+  , csHistory :: [ConfigData] -- ^ previous versions, the newest first
   }
-  deriving (Eq, Show)
+  deriving (Show)
+
+-- | Two states are considered equal if their current configuration is; the
+-- history is just a cache of the previous versions.
+instance Eq ConfigState where
+  (==) = (==) `on` csConfigData
 
 $(makeCustomLenses ''ConfigState)
 
 -- | Creates a new configuration state.
 -- This method will expand as more fields are added to 'ConfigState'.
 mkConfigState :: ConfigData -> ConfigState
-mkConfigState = ConfigState
+mkConfigState cd = ConfigState cd []
+
+-- | Given the old and the new configuration state, keep the current
+-- configuration of the old one in the history of the new one.
+recordHistory :: ConfigState -> ConfigState -> ConfigState
+recordHistory old new =
+  new { csHistory = take historySize $ csConfigData old : csHistory old }
 
 bumpSerial :: (SerialNoObjectL a, TimeStampObjectL a) => ClockTime -> a -> a
 bumpSerial now = set mTimeL now . over serialL succ
@@ -84,3 +115,109 @@ needsFullDist = on (/=) (watched . csConfigData)
               <*> clusterEnabledUserShutdown . configCluster
               <*> clusterEnabledHypervisors . configCluster
               <*> fmap nodeVmCapable . configNodes
+
+-- * Configuration deltas
+
+-- | A set of changes to the top-level objects of the configuration.
+-- In the containers, 'Nothing' denotes an object that has been removed.
+-- The filters, which are rarely modified, are only included as a whole.
+-- Deltas sent by WConfd always carry the modification time of the
+-- resulting configuration.
+$(buildObject "ConfigDelta" "cdelta"
+  [ renameField "Serial" $ simpleField "serial_no" [t| Int |]
+  , optionalField $ timeAsDoubleField "mtime"
+  , optionalField $ simpleField "cluster" [t| Cluster |]
+  , simpleField "nodes"      [t| Container (MaybeForJSON Node)      |]
+  , simpleField "nodegroups" [t| Container (MaybeForJSON NodeGroup) |]
+  , simpleField "instances"  [t| Container (MaybeForJSON Instance)  |]
+  , simpleField "networks"   [t| Container (MaybeForJSON Network)   |]
+  , simpleField "disks"      [t| Container (MaybeForJSON Disk)      |]
+  , optionalField $ simpleField "filters" [t| Container FilterRule |]
+  ])
+
+-- | The serial number and the modification time identifying a version of
+-- the configuration.
+type ConfigVersion = (Int, TimeAsDoubleJSON)
+
+-- | Returns the version of a configuration.
+configVersion :: ConfigData -> ConfigVersion
+configVersion = configSerial &&& TimeAsDoubleJSON . configMtime
+
+-- | Returns a delta not changing any objects, only setting the version
+-- of the given configuration.
+emptyConfigDelta :: ConfigData -> ConfigDelta
+emptyConfigDelta cd =
+  ConfigDelta { cdeltaSerial = configSerial cd
+              , cdeltaMtime = Just $ configMtime cd
+              , cdeltaCluster = Nothing
+              , cdeltaNodes = emptyContainer
+              , cdeltaNodegroups = emptyContainer
+              , cdeltaInstances = emptyContainer
+              , cdeltaNetworks = emptyContainer
+              , cdeltaDisks = emptyContainer
+              , cdeltaFilters = Nothing
+              }
+
+-- | Computes the changes between two versions of the configuration.
+-- The serial number of the result is the one of the new version.
+diffConfig :: ConfigData -> ConfigData -> ConfigDelta
+diffConfig old new =
+  ConfigDelta { cdeltaSerial = configSerial new
+              , cdeltaMtime = Just $ configMtime new
+              , cdeltaCluster = if configCluster old == configCluster new
+                                  then Nothing
+                                  else Just $ configCluster new
+              , cdeltaNodes = diffOn configNodes
+              , cdeltaNodegroups = diffOn configNodegroups
+              , cdeltaInstances = diffOn configInstances
+              , cdeltaNetworks = diffOn configNetworks
+              , cdeltaDisks = diffOn configDisks
+              , cdeltaFilters = if configFilters old == configFilters new
+                                  then Nothing
+                                  else Just $ configFilters new
+              }
+  where
+    diffOn :: (Eq a) => (ConfigData -> Container a)
+           -> Container (MaybeForJSON a)
+    diffOn f = diffContainers (fromContainer $ f old) (fromContainer $ f new)
+    diffContainers o n =
+      let changed = M.differenceWith (\x y -> if x == y then Nothing
+                                                       else Just x) n o
+          removed = M.difference o n
+      in GenericContainer $ M.union (M.map (MaybeForJSON . Just) changed)
+                                    (M.map (const $ MaybeForJSON Nothing)
+                                           removed)
+
+-- | Computes the changes of the configuration since its version with
+-- the given serial number, if that version is still known.
+configDeltaSince :: Int -> ConfigState -> Maybe ConfigDelta
+configDeltaSince serial cs =
+  let current = csConfigData cs
+  in if configSerial current == serial
+       then Just $ emptyConfigDelta current
+       else (`diffConfig` current) <$>
+              find ((==) serial . configSerial) (csHistory cs)
+
+-- | Applies a set of changes to the configuration of a state.
+applyConfigDelta :: ConfigDelta -> ConfigState -> ConfigState
+applyConfigDelta d = over csConfigDataL patch
+  where
+    patch cd = cd { configCluster = fromMaybe (configCluster cd)
+                                              (cdeltaCluster d)
+                  , configNodes = patchOn cdeltaNodes configNodes cd
+                  , configNodegroups = patchOn cdeltaNodegroups
+                                               configNodegroups cd
+                  , configInstances = patchOn cdeltaInstances
+                                              configInstances cd
+                  , configNetworks = patchOn cdeltaNetworks configNetworks cd
+                  , configDisks = patchOn cdeltaDisks configDisks cd
+                  , configFilters = fromMaybe (configFilters cd)
+                                              (cdeltaFilters d)
+                  }
+    patchOn :: (ConfigDelta -> Container (MaybeForJSON a))
+            -> (ConfigData -> Container a) -> ConfigData -> Container a
+    patchOn fd fc cd =
+      GenericContainer
+      . M.foldrWithKey (\k v -> M.alter (const $ unMaybeForJSON v) k)
+                       (fromContainer $ fc cd)
+      . fromContainer $ fd d
@@ -39,6 +39,8 @@ module Ganeti.WConfd.ConfigWriter
   , readConfig
   , writeConfig
   , writeConfigWithImmediate
+  , writeConfigDelta
+  , writeConfigDeltaWithImmediate
   , saveConfigAsyncTask
   , distMCsAsyncTask
   , distSSConfAsyncTask
@@ -54,6 +56,7 @@ import Data.Monoid
 import Ganeti.BasicTypes
 import Ganeti.Errors
 import Ganeti.Config
+import Ganeti.Lens
 import Ganeti.Logging
 import Ganeti.Objects
 import Ganeti.Rpc
@@ -98,15 +101,33 @@ readConfig :: WConfdMonad ConfigData
 readConfig = csConfigData <$> readConfigState
 
 -- Replaces the current configuration state within the 'WConfdMonad'.
+-- The replaced configuration is kept in the history, so that clients
+-- can still request just the changes since then.
 writeConfig :: ConfigData -> WConfdMonad ()
-writeConfig cd = modifyConfigState $ const ((), mkConfigState cd)
+writeConfig cd = modifyConfigState $ (,) () . set csConfigDataL cd
 
 -- Replaces the current configuration state within the 'WConfdMonad',
 -- immediately followed by another action (while config writeout is
--- still happening).
-writeConfigWithImmediate :: ConfigData -> WConfdMonad () -> WConfdMonad ()
+-- still happening). Returns the resulting configuration.
+writeConfigWithImmediate :: ConfigData -> WConfdMonad ()
+                         -> WConfdMonad ConfigData
 writeConfigWithImmediate cd act =
-  flip modifyConfigStateWithImmediate act $ const ((), mkConfigState cd)
+  liftM snd . flip modifyConfigStateWithImmediateResult act
+    $ (,) () . set csConfigDataL cd
+
+-- Applies a set of changes to the current configuration state within
+-- the 'WConfdMonad'. Returns the resulting configuration.
+writeConfigDelta :: ConfigDelta -> WConfdMonad ConfigData
+writeConfigDelta d = writeConfigDeltaWithImmediate d (return ())
+
+-- Applies a set of changes to the current configuration state within
+-- the 'WConfdMonad', immediately followed by another action (while config
+-- writeout is still happening). Returns the resulting configuration.
+writeConfigDeltaWithImmediate :: ConfigDelta -> WConfdMonad ()
+                              -> WConfdMonad ConfigData
+writeConfigDeltaWithImmediate d act =
+  liftM snd . flip modifyConfigStateWithImmediateResult act
+    $ (,) () . applyConfigDelta d
 
 -- * Asynchronous tasks
 
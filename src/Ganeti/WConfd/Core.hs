@@ -63,7 +63,9 @@ import Ganeti.Locking.Locks ( GanetiLocks(ConfigLock, BGL)
 import qualified Ganeti.Locking.Waiting as LW
 import Ganeti.Objects (ConfigData, DRBDSecret, LogicalVolume, Ip4Address)
 import Ganeti.Objects.Lens (configClusterL, clusterMasterNodeL)
-import Ganeti.WConfd.ConfigState (csConfigDataL)
+import Ganeti.WConfd.ConfigState ( csConfigDataL, ConfigDelta(..)
+                                 , ConfigVersion, configVersion
+                                 , configDeltaSince )
 import qualified Ganeti.WConfd.ConfigVerify as V
 import Ganeti.WConfd.DeathDetection (cleanupLocks)
 import Ganeti.WConfd.Language
@@ -99,6 +101,23 @@ writeConfig ident cdata = do
   -- V.verifyConfigErr cdata
   CW.writeConfig cdata
 
+-- | Read the changes to the configuration since its version with the given
+-- serial number. If that version is no longer known, 'Nothing' is returned
+-- and the caller has to read the full configuration.
+readConfigDelta :: Int -> WConfdMonad (J.MaybeForJSON ConfigDelta)
+readConfigDelta serial =
+  liftM (J.MaybeForJSON . configDeltaSince serial) readConfigState
+
+-- | Apply a set of changes to the configuration, checking that an exclusive
+-- lock is held. If not, the call fails. Returns the version of the
+-- resulting configuration.
+writeConfigDelta :: ClientId -> ConfigDelta -> WConfdMonad ConfigVersion
+writeConfigDelta ident delta = do
+  checkConfigLock ident L.OwnExclusive
+  logDebug $ "Applying a configuration delta based on serial no "
+             ++ show (cdeltaSerial delta)
+  liftM configVersion $ CW.writeConfigDelta delta
+
 -- | Explicitly run verification of the configuration.
 -- The caller doesn't need to hold the configuration lock.
 verifyConfig :: WConfdMonad ()
@@ -117,6 +136,33 @@ lockConfig
     -> Bool -- ^ set to 'True' if the lock should be shared
     -> WConfdMonad (J.MaybeForJSON ConfigData)
 lockConfig cid shared = do
+  acquired <- tryLockConfig cid shared
+  liftM J.MaybeForJSON $ if acquired
+                           then liftM Just CW.readConfig
+                           else return Nothing
+
+-- | Tries to acquire 'ConfigLock' for the client, like 'lockConfig'.
+--
+-- Instead of the whole configuration, the changes since the version with the
+-- given serial number are returned, if the lock was successfully acquired.
+-- The first component of the result tells whether the lock was acquired; the
+-- second one is 'Nothing' if the version of the caller is no longer known
+-- (see 'readConfigDelta').
+lockConfigDelta
+    :: ClientId
+    -> Bool -- ^ set to 'True' if the lock should be shared
+    -> Int  -- ^ the serial number of the configuration known to the client
+    -> WConfdMonad (Bool, J.MaybeForJSON ConfigDelta)
+lockConfigDelta cid shared serial = do
+  acquired <- tryLockConfig cid shared
+  if acquired
+    then liftM ((,) True) $ readConfigDelta serial
+    else return (False, J.MaybeForJSON Nothing)
+
+-- | Tries to acquire 'ConfigLock' for the client and tells whether it
+-- succeeded.
+tryLockConfig :: ClientId -> Bool -> WConfdMonad Bool
+tryLockConfig cid shared = do
   let reqtype = if shared then ReqShared else ReqExclusive
   -- warn if we already have the lock, this shouldn't happen
   la <- readLockAllocation
@@ -124,9 +170,7 @@ lockConfig cid shared = do
        . failError $ "Client " ++ show cid ++
                      " already holds a config lock"
   waiting <- tryUpdateLocks cid [(ConfigLock, reqtype)]
-  liftM J.MaybeForJSON $ case waiting of
-    []  -> liftM Just CW.readConfig
-    _   -> return Nothing
+  return $ null waiting
 
 -- | Release the config lock, if the client currently holds it.
 unlockConfig
@@ -134,19 +178,35 @@ unlockConfig
 unlockConfig cid = freeLocksLevel cid LevelConfig
 
 -- | Write the configuration, if the config lock is held exclusively,
--- and release the config lock. It the caller does not have the config
--- lock, return False.
-writeConfigAndUnlock :: ClientId -> ConfigData -> WConfdMonad Bool
+-- and release the config lock. Returns the version of the written
+-- configuration, or Nothing if the caller does not have the config lock.
+writeConfigAndUnlock :: ClientId -> ConfigData
+                     -> WConfdMonad (J.MaybeForJSON ConfigVersion)
 writeConfigAndUnlock cid cdata = do
   la <- readLockAllocation
   if L.holdsLock cid ConfigLock L.OwnExclusive la
-    then do
-      CW.writeConfigWithImmediate cdata $ unlockConfig cid
-      return True
+    then liftM (J.MaybeForJSON . Just . configVersion)
+           . CW.writeConfigWithImmediate cdata $ unlockConfig cid
     else do
       logWarning $ show cid ++ " tried writeConfigAndUnlock without owning"
                    ++ " the config lock"
-      return False
+      return $ J.MaybeForJSON Nothing
+
+-- | Apply a set of changes to the configuration, if the config lock is held
+-- exclusively, and release the config lock. Returns the version of the
+-- resulting configuration, or Nothing if the caller does not have the
+-- config lock.
+writeConfigDeltaAndUnlock :: ClientId -> ConfigDelta
+                          -> WConfdMonad (J.MaybeForJSON ConfigVersion)
+writeConfigDeltaAndUnlock cid delta = do
+  la <- readLockAllocation
+  if L.holdsLock cid ConfigLock L.OwnExclusive la
+    then liftM (J.MaybeForJSON . Just . configVersion)
+           . CW.writeConfigDeltaWithImmediate delta $ unlockConfig cid
+    else do
+      logWarning $ show cid ++ " tried writeConfigDeltaAndUnlock without"
+                   ++ " owning the config lock"
+      return $ J.MaybeForJSON Nothing
 
 -- | Force the distribution of configuration without actually modifying it.
 -- It is not necessary to hold a lock for this operation.
@@ -377,11 +437,15 @@ exportedFunctions = [ 'echo
                     , 'prepareClusterDestruction
                     -- config
                     , 'readConfig
+                    , 'readConfigDelta
                     , 'writeConfig
+                    , 'writeConfigDelta
                     , 'verifyConfig
                     , 'lockConfig
+                    , 'lockConfigDelta
                     , 'unlockConfig
                     , 'writeConfigAndUnlock
+                    , 'writeConfigDeltaAndUnlock
                     , 'flushConfig
                     -- temporary reservations (common)
                     , 'dropAllReservations
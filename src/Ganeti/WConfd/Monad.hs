@@ -54,6 +54,7 @@ module Ganeti.WConfd.Monad
   , daemonHandle
   , modifyConfigState
   , modifyConfigStateWithImmediate
+  , modifyConfigStateWithImmediateResult
   , forceConfigStateDistribution
   , readConfigState
   , modifyConfigDataErr_
@@ -216,32 +217,36 @@ readConfigState = liftM dsConfigState . readIORef . dhDaemonState
 
 -- | From a result of a configuration change, determine if the
 -- configuration was changed and if full distribution is needed.
--- If so, also bump the serial number.
+-- If so, also bump the serial number and remember the previous version.
 unpackConfigResult :: ClockTime -> ConfigState
                       -> (a, ConfigState) -> ((a, Bool, Bool), ConfigState)
 unpackConfigResult now cs (r, cs')
                      | cs /= cs' = ( (r, True, needsFullDist cs cs')
-                                   , over csConfigDataL (bumpSerial now) cs'
+                                   , over csConfigDataL (bumpSerial now)
+                                     $ recordHistory cs cs'
                                    )
                      | otherwise = ((r, False, False), cs')
 
 -- | Atomically modifies the configuration state in the WConfdMonad
 -- with a computation that can possibly fail; immediately afterwards,
 -- while config write is still going on, do the followup action. Return
--- only after replication is finished.
-modifyConfigStateErrWithImmediate
+-- only after replication is finished, together with the configuration
+-- resulting from the modification (with its serial number and
+-- modification time updated, if it changed).
+modifyConfigStateErrWithImmediateResult
   :: (TempResState -> ConfigState -> AtomicModifyMonad (a, ConfigState))
   -> WConfdMonad ()
-  -> WConfdMonad a
-modifyConfigStateErrWithImmediate f immediateFollowup = do
+  -> WConfdMonad (a, ConfigData)
+modifyConfigStateErrWithImmediateResult f immediateFollowup = do
   dh <- daemonHandle
   now <- liftIO getClockTime
 
   let modCS ds@(DaemonState { dsTempRes = tr }) =
         mapMOf2
           dsConfigStateL (\cs -> liftM (unpackConfigResult now cs) (f tr cs)) ds
-  (r, modified, distSync) <- atomicModifyIORefErrLog (dhDaemonState dh)
-                                                     (liftM swap . modCS)
+      withConfig (res, ds') = (ds', (res, csConfigData $ dsConfigState ds'))
+  ((r, modified, distSync), cd) <-
+    atomicModifyIORefErrLog (dhDaemonState dh) (liftM withConfig . modCS)
   if modified
     then if distSync
       then do
@@ -261,7 +266,18 @@ modifyConfigStateErrWithImmediate f immediateFollowup = do
         logDebug "Config writer finished with local task"
     else
       immediateFollowup
-  return r
+  return (r, cd)
+
+-- | Atomically modifies the configuration state in the WConfdMonad
+-- with a computation that can possibly fail; immediately afterwards,
+-- while config write is still going on, do the followup action. Return
+-- only after replication is finished.
+modifyConfigStateErrWithImmediate
+  :: (TempResState -> ConfigState -> AtomicModifyMonad (a, ConfigState))
+  -> WConfdMonad ()
+  -> WConfdMonad a
+modifyConfigStateErrWithImmediate f =
+  liftM fst . modifyConfigStateErrWithImmediateResult f
 
 -- | Atomically modifies the configuration state in the WConfdMonad
 -- with a computation that can possibly fail.
@@ -290,6 +306,14 @@ modifyConfigStateWithImmediate :: (ConfigState -> (a, ConfigState))
 modifyConfigStateWithImmediate f =
   modifyConfigStateErrWithImmediate ((return .) . const f)
 
+-- | Like 'modifyConfigStateWithImmediate', but also returns the
+-- configuration resulting from the modification.
+modifyConfigStateWithImmediateResult :: (ConfigState -> (a, ConfigState))
+                                        -> WConfdMonad ()
+                                        -> WConfdMonad (a, ConfigData)
+modifyConfigStateWithImmediateResult f =
+  modifyConfigStateErrWithImmediateResult ((return .) . const f)
+
 -- | Force the distribution of configuration without actually modifying it.
 --
 -- We need a separate call for this operation, because 'modifyConfigState' only
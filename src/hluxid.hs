@@ -47,6 +47,7 @@ options =
   , oSyslogUsage
   , oNoVoting
   , oYesDoIt
+  , oJobProcesses
   ]
 
 -- | Main function.
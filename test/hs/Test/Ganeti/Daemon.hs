@@ -80,6 +80,7 @@ case_wrong_arg =
   mapM_ (passFailOpt defaultOptions assertFailure (return ()))
         [ (oSyslogUsage, "foo", "yes")
         , (oPort 0,      "x",   "10")
+        , (oJobProcesses, "-1", "2")
         ]
 
 -- | Test that the option list supports some common options.
@@ -214,6 +214,23 @@ prop_LoadJobs = monadicIO $ do
                  , counterexample "broken job" (isBad broken)
                  ]
 
+-- | Tests parsing job files with appended segments.
+prop_ParseJobFile :: Property
+prop_ParseJobFile =
+  forAll (resize 5 $ listOf1 genQueuedOpCode) $ \ops ->
+  forAll genJobId $ \jid ->
+  let job = QueuedJob jid ops justNoTs Nothing Nothing Nothing Nothing
+      job' = job { qjStartTimestamp = Just (1, 2) }
+      header = encode job ++ "\n"
+      segment = "{\"job\": {\"start_timestamp\": [1, 2]}}\n"
+      -- a segment still being written
+      partial = "{\"job\": {\"end_time"
+  in conjoin [ parseJobFile header ==? Text.JSON.Ok job
+             , parseJobFile (header ++ segment) ==? Text.JSON.Ok job'
+             , parseJobFile (header ++ segment ++ partial) ==?
+                 Text.JSON.Ok job'
+             ]
+
 -- | Tests computing job directories. Creates random directories,
 -- files and stale symlinks in a directory, and checks that we return
 -- \"the right thing\".
@@ -281,6 +298,7 @@ testSuite "JQueue"
             , 'case_JobStatusPri_py_equiv
             , 'prop_ListJobIDs
             , 'prop_LoadJobs
+            , 'prop_ParseJobFile
             , 'prop_DetermineDirs
             , 'prop_InputOpCode
             , 'prop_extractOpSummary
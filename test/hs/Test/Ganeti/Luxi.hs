@@ -68,6 +68,9 @@ instance Arbitrary Luxi.LuxiOp where
     lreq <- arbitrary
     case lreq of
       Luxi.ReqQuery -> Luxi.Query <$> arbitrary <*> genFields <*> genFilter
+      Luxi.ReqQueryPage -> Luxi.QueryPage <$> arbitrary <*> genFields <*>
+                           genFilter <*> choose (1, 1000) <*>
+                           genMaybe genFQDN
       Luxi.ReqQueryFields -> Luxi.QueryFields <$> arbitrary <*> genFields
       Luxi.ReqQueryNodes -> Luxi.QueryNodes <$> listOf genFQDN <*>
                             genFields <*> arbitrary
@@ -0,0 +1,142 @@
+{-# LANGUAGE TemplateHaskell #-}
+
+{-| Unittests for the query indexes.
+
+-}
+
+{-
+
+Copyright (C) 2015 Google Inc.
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are
+met:
+
+1. Redistributions of source code must retain the above copyright notice,
+this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright
+notice, this list of conditions and the following disclaimer in the
+documentation and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+module Test.Ganeti.Query.Index (testQuery_Index) where
+
+import Test.QuickCheck hiding (Result)
+
+import Control.Applicative
+import Control.Monad (filterM)
+import qualified Data.Map as Map
+import qualified Data.Set as Set
+import System.Time (ClockTime(..))
+
+import Test.Ganeti.TestHelper
+import Test.Ganeti.TestCommon
+import Test.Ganeti.Objects (genEmptyCluster)
+
+import Ganeti.JSON
+import Ganeti.Objects
+import Ganeti.Query.Filter
+import Ganeti.Query.Index
+import qualified Ganeti.Query.Instance as Instance
+import Ganeti.Query.Language
+import Ganeti.Types
+
+-- * Helpers
+
+-- | The tags the generated instances can have.
+instanceTags :: [String]
+instanceTags = ["web", "db", "backup"]
+
+-- | Generates an instance with the given name, on one of the given
+-- nodes (referenced by name, as 'genEmptyCluster' keys them by name).
+genInstanceOn :: [Node] -> String -> Gen Instance
+genInstanceOn nodes name = do
+  pnode <- elements nodes
+  tags <- listOf $ elements instanceTags
+  os <- elements ["debian", "centos"]
+  let epochTime = TOD 0 0
+  return . RealInstance $ RealInstanceData name (nodeName pnode) os Kvm
+    (GenericContainer Map.empty)
+    (PartialBeParams Nothing Nothing Nothing Nothing Nothing Nothing)
+    (GenericContainer Map.empty) (GenericContainer Map.empty)
+    AdminUp AdminSource [] [] False Nothing epochTime epochTime
+    ("uuid-" ++ name) 0 (Set.fromList tags)
+
+-- | Generates a cluster with instances spread over its nodes.
+genClusterWithInstances :: Gen ConfigData
+genClusterWithInstances = do
+  numnodes <- choose (1, maxNodes)
+  cfg <- genEmptyCluster numnodes
+  numinsts <- choose (0, 50)
+  let nodes = Map.elems . fromContainer $ configNodes cfg
+  insts <- mapM (genInstanceOn nodes . ("inst" ++) . show) [1..numinsts]
+  return cfg { configInstances = GenericContainer . Map.fromList
+                                 $ map (\i -> (instUuid i, i)) insts }
+
+-- | Generates an instance filter, mixing indexed and non-indexed
+-- fields.
+genInstanceFilter :: ConfigData -> Gen (Filter FilterField)
+genInstanceFilter cfg =
+  let nnames = map nodeName . Map.elems . fromContainer $ configNodes cfg
+      leaf = oneof
+               [ EQFilter "pnode" . QuotedString <$> elements nnames
+               , ContainsFilter "tags" . QuotedString <$>
+                   elements instanceTags
+               , EQFilter "os" . QuotedString <$> elements ["debian", "suse"]
+               , EQFilter "name" . QuotedString <$>
+                   elements ["inst1", "inst7", "missing"]
+               , return $ TrueFilter "disks_active"
+               ]
+  in oneof [ leaf
+           , OrFilter <$> resize 4 (listOf leaf)
+           , AndFilter <$> resize 4 (listOf leaf)
+           , NotFilter <$> leaf
+           , AndFilter <$> sequence [leaf, OrFilter <$> resize 4 (listOf leaf)]
+           ]
+
+-- * Test cases
+
+-- | Checks that restricting the instances using the indexes doesn't
+-- change the result of a filter, nor the order of the instances.
+prop_instance_candidates :: Property
+prop_instance_candidates =
+  forAll genClusterWithInstances $ \cfg ->
+  forAll (genInstanceFilter cfg) $ \flt ->
+  let oindex = ciInstances $ buildConfigIndex cfg
+      passing insts = do
+        cflt <- compileFilter Instance.fieldsMap flt
+        map instName <$>
+          filterM (\i -> evaluateQueryFilter cfg Nothing i cflt) insts
+  in passing (indexCandidates oindex flt) ==?
+     passing (indexedObjects oindex)
+
+-- | Checks that an equality filter on the primary node only returns
+-- the instances of that node.
+prop_pnode_candidates :: Property
+prop_pnode_candidates =
+  forAll genClusterWithInstances $ \cfg ->
+  forAll (elements . Map.elems . fromContainer $ configNodes cfg) $ \node ->
+  let oindex = ciInstances $ buildConfigIndex cfg
+      expected = filter ((== Just (nodeName node)) . instPrimaryNode)
+                   (indexedObjects oindex)
+  in map instName (indexCandidates oindex
+                   (EQFilter "pnode" . QuotedString $ nodeName node)) ==?
+     map instName expected
+
+testSuite "Query/Index"
+  [ 'prop_instance_candidates
+  , 'prop_pnode_candidates
+  ]
@@ -58,6 +58,7 @@ import Ganeti.JSON
 import Ganeti.Objects
 import Ganeti.Query.Filter
 import qualified Ganeti.Query.Group as Group
+import Ganeti.Query.Index (buildConfigIndex)
 import Ganeti.Query.Language
 import qualified Ganeti.Query.Node as Node
 import Ganeti.Query.Query
@@ -205,6 +206,29 @@ prop_queryNode_filter =
         map (map rentryValue) fdata ==? map (\f -> [Just (showJSON f)]) fqdns
       ]
 
+-- | Checks that retrieving the nodes page by page returns the same
+-- result as a single query.
+prop_queryNode_pages :: Property
+prop_queryNode_pages =
+  forAll (choose (0, maxNodes) >>= genEmptyCluster) $ \cluster ->
+  forAll (choose (1, maxNodes + 1)) $ \limit -> monadicIO $ do
+    let qry = Query (ItemTypeOpCode QRNode) ["name"] EmptyFilter
+        cindex = buildConfigIndex cluster
+        getPages resume = do
+          (QueryResult _ fdata, next) <-
+            run (queryPaged cindex cluster False qry
+                   (Just $ Paging limit resume)) >>= resultProp
+          rest <- maybe (return []) (getPages . Just) next
+          return $ fdata : rest
+    QueryResult _ fdata <- run (query cluster False qry) >>= resultProp
+    pages <- getPages Nothing
+    stop $ conjoin
+      [ counterexample "Page exceeds the limit" $
+        all ((<= limit) . length) pages
+      , counterexample "Pages differ from the full result" $
+        concat pages ==? fdata
+      ]
+
 -- ** Group queries
 
 prop_queryGroup_noUnknown :: Property
@@ -371,6 +395,7 @@ testSuite "Query/Query"
   , 'prop_queryNode_Unknown
   , 'prop_queryNode_types
   , 'prop_queryNode_filter
+  , 'prop_queryNode_pages
   , 'case_queryNode_allfields
   , 'prop_queryGroup_noUnknown
   , 'prop_queryGroup_Unknown
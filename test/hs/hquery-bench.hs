@@ -0,0 +1,143 @@
+{-| Benchmark for the luxid query implementation.
+
+Runs narrow and broad instance queries against a large synthetic
+configuration, once building the configuration indexes for every
+query and once reusing them across queries, as luxid does.
+
+Usage: hquery-bench [nodes [instances [runs]]]
+
+-}
+
+{-
+
+Copyright (C) 2015 Google Inc.
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are
+met:
+
+1. Redistributions of source code must retain the above copyright notice,
+this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright
+notice, this list of conditions and the following disclaimer in the
+documentation and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+module Main (main) where
+
+import Control.DeepSeq (rnf)
+import Control.Exception (evaluate)
+import Control.Monad (forM_, replicateM_)
+import qualified Data.Map as Map
+import qualified Data.Set as Set
+import System.Environment (getArgs)
+import System.Time (ClockTime(..))
+import Text.Printf (printf)
+
+import Test.Ganeti.Objects (genEmptyCluster)
+import Test.Ganeti.TestCommon (genSample)
+
+import Ganeti.BasicTypes
+import Ganeti.Errors (ErrorResult)
+import Ganeti.JSON
+import Ganeti.Objects
+import Ganeti.Query.Index
+import Ganeti.Query.Language
+import Ganeti.Query.Query
+import Ganeti.Types
+import Ganeti.Utils (getCurrentTimeUSec)
+
+-- | Number of distinct tags spread over the instances.
+tagCount :: Int
+tagCount = 10
+
+-- | Builds a synthetic instance on the given node.
+mkInstance :: Node -> Int -> Instance
+mkInstance pnode idx =
+  let name = "inst" ++ show idx
+      epochTime = TOD 0 0
+  in RealInstance $ RealInstanceData name (nodeName pnode) "debian" Kvm
+       (GenericContainer Map.empty)
+       (PartialBeParams Nothing Nothing Nothing Nothing Nothing Nothing)
+       (GenericContainer Map.empty) (GenericContainer Map.empty)
+       AdminUp AdminSource [] [] False Nothing epochTime epochTime
+       ("uuid-" ++ name) 0
+       (Set.singleton $ "tag" ++ show (idx `mod` tagCount))
+
+-- | Builds a synthetic cluster, with the instances spread evenly over
+-- the nodes.
+mkCluster :: Int -> Int -> IO ConfigData
+mkCluster nnodes ninsts = do
+  cfg <- genSample $ genEmptyCluster nnodes
+  let nodes = Map.elems . fromContainer $ configNodes cfg
+      insts = zipWith mkInstance (cycle nodes) [1..ninsts]
+  return cfg { configInstances = GenericContainer . Map.fromList
+                                 $ map (\i -> (instUuid i, i)) insts }
+
+-- | The benchmarked queries, given the cluster nodes.
+benchQueries :: [Node] -> [(String, Query)]
+benchQueries nodes =
+  let instQuery = Query (ItemTypeOpCode QRInstance) ["name", "pnode", "os"]
+      pnodeFilter = EQFilter "pnode" . QuotedString . nodeName
+  in [ ("narrow: pnode ==", instQuery . pnodeFilter $ head nodes)
+     , ("narrow: pnode in", instQuery . OrFilter . map pnodeFilter
+                              $ take 3 nodes)
+     , ("narrow: pnode & tag", instQuery $ AndFilter
+                                 [ pnodeFilter $ head nodes
+                                 , ContainsFilter "tags" $ QuotedString "tag0"
+                                 ])
+     , ("medium: tag", instQuery . ContainsFilter "tags" $
+                         QuotedString "tag1")
+     , ("broad: no filter", instQuery EmptyFilter)
+     , ("broad: not pnode", instQuery . NotFilter . pnodeFilter $ head nodes)
+     , ("broad: regexp", instQuery . RegexpFilter "name" . either error id $
+                           mkRegex "^inst1")
+     ]
+
+-- | Runs a query a number of times, returning the average run time in
+-- milliseconds.
+timeQuery :: Int -> IO (ErrorResult QueryResult) -> IO Double
+timeQuery runs action = do
+  start <- getCurrentTimeUSec
+  replicateM_ runs $ do
+    result <- action
+    case result of
+      Ok qres -> evaluate . rnf $ qresData qres
+      Bad err -> fail $ "Query failed: " ++ show err
+  end <- getCurrentTimeUSec
+  return $ fromIntegral (end - start) / fromIntegral runs / 1000
+
+-- | Main function.
+main :: IO ()
+main = do
+  args <- getArgs
+  let (nnodes, ninsts, runs) =
+        case map read args of
+          [n, i, r] -> (n, i, r)
+          [n, i]    -> (n, i, 10)
+          [n]       -> (n, 20000, 10)
+          _         -> (500, 20000, 10)
+  cfg <- mkCluster nnodes ninsts
+  icache <- newIndexCache
+  let nodes = Map.elems . fromContainer $ configNodes cfg
+  printf "%d nodes, %d instances, %d runs per query\n" nnodes ninsts runs
+  printf "%-22s %14s %14s\n" "query" "uncached (ms)" "cached (ms)"
+  forM_ (benchQueries nodes) $ \(descr, qry) -> do
+    uncached <- timeQuery runs $ query cfg False qry
+    cached <- timeQuery runs $ do
+      cindex <- getConfigIndex icache cfg
+      queryIndexed cindex cfg False qry
+    printf "%-22s %14.2f %14.2f\n" descr uncached cached
@@ -77,6 +77,7 @@ import Test.Ganeti.Objects.BitArray
 import Test.Ganeti.OpCodes
 import Test.Ganeti.Query.Aliases
 import Test.Ganeti.Query.Filter
+import Test.Ganeti.Query.Index
 import Test.Ganeti.Query.Instance
 import Test.Ganeti.Query.Language
 import Test.Ganeti.Query.Network
@@ -152,6 +153,7 @@ allTests =
   , testOpCodes
   , testQuery_Aliases
   , testQuery_Filter
+  , testQuery_Index
   , testQuery_Instance
   , testQuery_Language
   , testQuery_Network
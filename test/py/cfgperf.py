@@ -0,0 +1,266 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2015 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+
+
+"""Script for measuring the cost of opening and closing the configuration
+
+A synthetic configuration is served by an in-process stand-in for WConfd,
+so that only the work done by L{config.ConfigWriter} itself (including
+(de)serialization of the data it exchanges with WConfd) is measured.
+
+"""
+
+import copy
+import optparse
+import time
+
+from ganeti import config
+from ganeti import constants
+from ganeti import objects
+from ganeti import serializer
+from ganeti.config import utils as cfgutils
+
+
+def ParseOptions():
+  """Parses the command line options.
+
+  In case of command line errors, it will show the usage and exit the
+  program.
+
+  @return: the options in a tuple
+
+  """
+  parser = optparse.OptionParser()
+  parser.add_option("-i", dest="instance_count", default=10000, type="int",
+                    help="Number of instances", metavar="NUM")
+  parser.add_option("-n", dest="node_count", default=200, type="int",
+                    help="Number of nodes", metavar="NUM")
+  parser.add_option("-r", dest="repetitions", default=10, type="int",
+                    help="Number of repetitions per measurement",
+                    metavar="NUM")
+
+  (opts, args) = parser.parse_args()
+
+  if opts.node_count < 1 or opts.instance_count < 1:
+    parser.error("At least one node and instance are needed")
+
+  return (opts, args)
+
+
+def BuildConfig(node_count, instance_count):
+  """Builds a synthetic configuration.
+
+  @rtype: dict
+  @return: the serialized configuration
+
+  """
+  group = objects.NodeGroup(uuid="group-uuid", name="default", members=[],
+                            serial_no=1)
+  nodes = {}
+  for idx in range(node_count):
+    uuid = "node-uuid-%d" % idx
+    nodes[uuid] = objects.Node(uuid=uuid, name="node%d.example.com" % idx,
+                               primary_ip="192.0.2.%d" % (idx % 250 + 1),
+                               secondary_ip="198.51.100.%d" % (idx % 250 + 1),
+                               group=group.uuid, serial_no=1,
+                               master_candidate=(idx < 10))
+
+  instances = {}
+  disks = {}
+  for idx in range(instance_count):
+    inst_uuid = "inst-uuid-%d" % idx
+    disk_uuid = "disk-uuid-%d" % idx
+    pnode = "node-uuid-%d" % (idx % node_count)
+    disks[disk_uuid] = objects.Disk(uuid=disk_uuid, dev_type=constants.DT_PLAIN,
+                                    size=1024, iv_name="disk/0",
+                                    logical_id=("xenvg", disk_uuid),
+                                    nodes=[pnode], params={}, serial_no=1)
+    nic = objects.NIC(uuid="nic-uuid-%d" % idx,
+                      mac="aa:00:00:%02x:%02x:%02x" %
+                        ((idx >> 16) & 0xff, (idx >> 8) & 0xff, idx & 0xff),
+                      nicparams={})
+    instances[inst_uuid] = \
+      objects.Instance(uuid=inst_uuid, name="inst%d.example.com" % idx,
+                       primary_node=pnode, os="debian-image",
+                       hypervisor=constants.HT_FAKE, hvparams={}, beparams={},
+                       osparams={}, admin_state=constants.ADMINST_DOWN,
+                       admin_state_source=constants.ADMIN_SOURCE,
+                       nics=[nic], disks=[disk_uuid], disks_active=False,
+                       serial_no=1)
+
+  cluster = objects.Cluster(serial_no=1, rsahostkeypub="",
+                            highest_used_port=(constants.FIRST_DRBD_PORT - 1),
+                            tcpudp_port_pool=set(), mac_prefix="aa:00:00",
+                            volume_group_name="xenvg",
+                            master_node="node-uuid-0",
+                            master_ip="192.0.2.254",
+                            master_netdev=constants.DEFAULT_BRIDGE,
+                            cluster_name="cluster.example.com",
+                            file_storage_dir="/tmp",
+                            enabled_hypervisors=[constants.HT_FAKE],
+                            nicparams={constants.PP_DEFAULT:
+                                         constants.NICC_DEFAULTS},
+                            enabled_disk_templates=[constants.DT_PLAIN],
+                            uid_pool=[])
+
+  data = objects.ConfigData(version=constants.CONFIG_VERSION,
+                            cluster=cluster, nodes=nodes,
+                            nodegroups={group.uuid: group},
+                            instances=instances, networks={}, disks=disks,
+                            filters={}, serial_no=1, ctime=time.time(),
+                            mtime=time.time())
+  data.UpgradeConfig()
+  return data.ToDict()
+
+
+class FakeWConfd(object):
+  """Serves the configuration like WConfd does, without any locking.
+
+  Only the last written delta is remembered, so that a writer can catch up
+  with its own modifications.
+
+  """
+  def __init__(self, data):
+    self._data = data
+    self._last_delta = None
+
+  def _Reply(self, value):
+    """Simulates the round-trip through the JSON transport.
+
+    """
+    return serializer.LoadJson(serializer.DumpJson(value))
+
+  def ReadConfig(self):
+    return self._Reply(self._data)
+
+  def ReadConfigDelta(self, serial):
+    if serial == self._data["serial_no"]:
+      delta = dict((kind, {}) for kind in cfgutils.DELTA_CONTAINERS)
+      delta["serial_no"] = serial
+      delta["mtime"] = self._data["mtime"]
+      return self._Reply(delta)
+    elif self._last_delta is not None and \
+         self._last_delta["serial_no"] == serial:
+      delta = copy.copy(self._last_delta)
+      delta["serial_no"] = self._data["serial_no"]
+      delta["mtime"] = self._data["mtime"]
+      return self._Reply(delta)
+    return None
+
+  def LockConfig(self, _ctx, _shared):
+    return self.ReadConfig()
+
+  def LockConfigDelta(self, _ctx, _shared, serial):
+    return (True, self.ReadConfigDelta(serial))
+
+  def UnlockConfig(self, _ctx):
+    pass
+
+  def _Bump(self):
+    """Updates the version of the configuration after a write.
+
+    """
+    self._data["serial_no"] += 1
+    self._data["mtime"] = time.time()
+    return self._Reply([self._data["serial_no"], self._data["mtime"]])
+
+  def WriteConfigAndUnlock(self, _ctx, data):
+    self._data = self._Reply(data)
+    self._last_delta = None
+    return self._Bump()
+
+  def WriteConfigDeltaAndUnlock(self, _ctx, delta):
+    delta = self._Reply(delta)
+    for kind in cfgutils.DELTA_CONTAINERS:
+      for (uuid, value) in delta[kind].items():
+        if value is None:
+          self._data[kind].pop(uuid, None)
+        else:
+          self._data[kind][uuid] = value
+    if "cluster" in delta:
+      self._data["cluster"] = delta["cluster"]
+    self._last_delta = delta
+    return self._Bump()
+
+  def DropAllReservations(self, _ctx):
+    pass
+
+  def ReleaseDRBDMinors(self, _disk_uuid):
+    pass
+
+
+def Measure(name, fn, repetitions):
+  """Runs a function repeatedly and reports the average wall time.
+
+  """
+  start = time.time()
+  for _ in range(repetitions):
+    fn()
+  duration = time.time() - start
+  print "%-40s %10.2fms" % (name, 1000.0 * duration / repetitions)
+
+
+def main():
+  (opts, _) = ParseOptions()
+
+  start = time.time()
+  wconfd = FakeWConfd(BuildConfig(opts.node_count, opts.instance_count))
+  print ("Built a configuration with %d nodes and %d instances in %0.2fs" %
+         (opts.node_count, opts.instance_count, time.time() - start))
+
+  cfg = config.ConfigWriter(wconfd=wconfd, wconfdcontext=("cfgperf", "", 0))
+  inst_uuid = "inst-uuid-0"
+
+  def _Outdated():
+    cfg.OutDate()
+    cfg.GetInstanceList()
+
+  def _Reread():
+    # forget everything, as if a new process had been started
+    cfg.OutDate()
+    cfg._delta_base = None # pylint: disable=W0212
+    cfg.GetInstanceList()
+
+  def _Modify():
+    cfg.MarkInstanceUp(inst_uuid)
+    cfg.MarkInstanceDown(inst_uuid)
+
+  Measure("Full read (shared)", _Reread, opts.repetitions)
+  Measure("Shared open/close, up to date", cfg.GetInstanceList,
+          opts.repetitions)
+  Measure("Shared open/close, outdated copy", _Outdated, opts.repetitions)
+  Measure("2x exclusive open/close (tracked)", _Modify, opts.repetitions)
+  Measure("Exclusive open/close (full write)",
+          lambda: cfg.AddTcpUdpPort(11000), opts.repetitions)
+
+
+if __name__ == "__main__":
+  main()
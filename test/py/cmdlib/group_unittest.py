@@ -35,6 +35,7 @@
 import itertools
 
 from ganeti import constants
+from ganeti import objects
 from ganeti import opcodes
 from ganeti import query
 
@@ -425,6 +426,47 @@ class TestLUGroupVerifyDisks(CmdlibTestCase):
     self.assertEqual(1, len(offline))
     self.assertEqual(1, len(missing))
 
+  def testWaitForSync(self):
+    node1 = self.cfg.AddNewNode()
+    node2 = self.cfg.AddNewNode()
+    node3 = self.cfg.AddNewNode()
+
+    for (pnode, snode, admin_state) in [
+        (node1, node2, constants.ADMINST_UP),
+        (node2, node3, constants.ADMINST_UP),
+        # the disks of stopped instances aren't waited for
+        (node3, node1, constants.ADMINST_DOWN),
+        ]:
+      disk = self.cfg.CreateDisk(dev_type=constants.DT_DRBD8,
+                                 primary_node=pnode, secondary_node=snode)
+      self.cfg.AddNewInstance(disks=[disk], primary_node=pnode,
+                              admin_state=admin_state)
+
+    synced = (True, objects.BlockDevStatus(sync_percent=None,
+                                           estimated_time=None,
+                                           is_degraded=False))
+    self.rpc.call_blockdev_watch_sync.return_value = \
+      self.RpcResultsBuilder() \
+        .AddSuccessfulNode(node1, [synced]) \
+        .AddSuccessfulNode(node2, [synced]) \
+        .Build()
+    self.rpc.call_lv_list.return_value = self.RpcResultsBuilder().Build()
+    self.rpc.call_drbd_needs_activation.return_value = \
+      self.RpcResultsBuilder().CreateSuccessfulNodeResult(node1, [])
+
+    op = opcodes.OpGroupVerifyDisks(group_name=self.group.name,
+                                    wait_for_sync=True)
+
+    self.ExecOpCode(op)
+
+    # a single call watches the disks on all primary nodes
+    self.assertEqual(self.rpc.call_blockdev_watch_sync.call_count, 1)
+    (node_uuids, node_disks, _, _) = \
+      self.rpc.call_blockdev_watch_sync.call_args[0]
+    self.assertEqual(sorted(node_uuids), sorted([node1.uuid, node2.uuid]))
+    self.assertEqual(sorted(node_disks.keys()), sorted(node_uuids))
+    self.mcpu.assertLogContainsRegex("disks are in sync")
+
 
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
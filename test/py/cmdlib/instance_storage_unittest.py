@@ -38,6 +38,7 @@ from ganeti.cmdlib import instance_storage
 from ganeti import errors
 from ganeti import objects
 from ganeti import opcodes
+from ganeti.rpc import node as rpc
 
 import testutils
 import mock
@@ -194,6 +195,236 @@ class TestCheckComputeDisksInfo(unittest.TestCase):
       self.disks, constants.DT_EXT, self.default_vg, self.ext_params)
 
 
+class TestWaitForSync(unittest.TestCase):
+  def setUp(self):
+    self.disks = {}
+    self.instances = {}
+    for (name, dev_types) in [
+        ("inst1", [constants.DT_DRBD8, constants.DT_DRBD8]),
+        ("inst2", [constants.DT_DRBD8, constants.DT_PLAIN]),
+        ]:
+      self.disks[name] = [objects.Disk(dev_type=dev_type, size=1024,
+                                       iv_name="disk/%d" % idx,
+                                       uuid="%s-disk%d" % (name, idx))
+                          for (idx, dev_type) in enumerate(dev_types)]
+      self.instances[name] = objects.Instance(name=name, uuid=name,
+                                              primary_node="node1")
+
+    self.lu = mock.Mock()
+    self.lu.cfg.GetInstanceDisks.side_effect = lambda uuid: self.disks[uuid]
+    self.lu.cfg.GetNodeName.side_effect = lambda uuid: "%s.example" % uuid
+    self.lu.rpc.call_blockdev_watch_sync.side_effect = self._WatchSync
+
+    # List of payloads, the last one is repeated
+    self.payloads = []
+    self.calls = []
+
+    self._patcher = mock.patch.object(instance_storage.time, "sleep")
+    self.sleep = self._patcher.start()
+
+  def tearDown(self):
+    self._patcher.stop()
+
+  def _WatchSync(self, node_uuids, node_disks, min_progress, timeout):
+    self.assertEqual(node_uuids, ["node1"])
+    self.assertEqual(min_progress, constants.SYNC_WATCH_MIN_PROGRESS)
+    self.assertTrue(0 <= timeout <= constants.SYNC_WATCH_MAX_TIMEOUT)
+    self.calls.append(timeout)
+
+    payload = self.payloads[0]
+    if len(self.payloads) > 1:
+      self.payloads.pop(0)
+
+    if payload is None:
+      result = rpc.RpcResult(failed=True, node="node1")
+    else:
+      self.assertEqual(len(payload), len(node_disks["node1"]))
+      result = rpc.RpcResult(data=(True, payload), node="node1")
+
+    return {"node1": result}
+
+  @staticmethod
+  def _Status(sync_percent=None, estimated_time=None, is_degraded=False):
+    return (True, objects.BlockDevStatus(sync_percent=sync_percent,
+                                         estimated_time=estimated_time,
+                                         is_degraded=is_degraded))
+
+  def testSync(self):
+    self.payloads = [
+      [self._Status(50.0, 5), self._Status()],
+      [self._Status(80.0, 90), self._Status()],
+      [self._Status(), self._Status()],
+      ]
+
+    self.assertTrue(instance_storage.WaitForSync(self.lu,
+                                                 self.instances["inst1"]))
+    # The node waits for the sync instead of the master sleeping
+    self.assertEqual(self.calls, [0, 5, constants.SYNC_WATCH_MAX_TIMEOUT])
+    self.assertFalse(self.sleep.called)
+
+  def testDegraded(self):
+    # inst2 only has one mirrored disk
+    self.payloads = [[self._Status(is_degraded=True)]]
+
+    self.assertFalse(instance_storage.WaitForSync(self.lu,
+                                                  self.instances["inst2"]))
+    self.assertEqual(self.calls, [0] * 11)
+    self.sleep.assert_called_with(1)
+
+  def testOneshot(self):
+    self.payloads = [[self._Status(50.0, 30), self._Status()]]
+
+    self.assertTrue(instance_storage.WaitForSync(self.lu,
+                                                 self.instances["inst1"],
+                                                 oneshot=True))
+    self.assertEqual(len(self.calls), 1)
+
+  def testNodeFailure(self):
+    self.payloads = [None]
+
+    self.assertRaises(errors.RemoteError, instance_storage.WaitForSync,
+                      self.lu, self.instances["inst1"])
+    self.assertEqual(self.calls, [0] * 10)
+    self.sleep.assert_called_with(6)
+
+  def testNoDisks(self):
+    self.assertTrue(instance_storage.WaitForSync(self.lu,
+                                                 self.instances["inst1"],
+                                                 disks=[]))
+    self.assertFalse(self.calls)
+
+
+class TestWaitForInstancesSync(unittest.TestCase):
+  def setUp(self):
+    self.disks = {}
+    self.instances = {}
+    for (name, node_uuid, dev_types) in [
+        ("inst1", "node1", [constants.DT_DRBD8, constants.DT_DRBD8]),
+        ("inst2", "node2", [constants.DT_DRBD8]),
+        ("inst3", "node2", [constants.DT_DRBD8, constants.DT_PLAIN]),
+        ]:
+      self.disks[name] = [objects.Disk(dev_type=dev_type, size=1024,
+                                       iv_name="disk/%d" % idx,
+                                       uuid="%s-disk%d" % (name, idx))
+                          for (idx, dev_type) in enumerate(dev_types)]
+      self.instances[name] = objects.Instance(name=name, uuid=name,
+                                              primary_node=node_uuid)
+
+    self.lu = mock.Mock()
+    self.lu.cfg.GetInstanceDisks.side_effect = lambda uuid: self.disks[uuid]
+    self.lu.cfg.GetNodeName.side_effect = lambda uuid: "%s.example" % uuid
+    self.lu.rpc.call_blockdev_watch_sync.side_effect = self._WatchSync
+
+    # node UUID -> list of payloads, the last one is repeated
+    self.payloads = {}
+    self.calls = []
+
+    self._patcher = mock.patch.object(instance_storage.time, "sleep")
+    self.sleep = self._patcher.start()
+
+  def tearDown(self):
+    self._patcher.stop()
+
+  def _WatchSync(self, node_uuids, node_disks, min_progress, timeout):
+    self.assertEqual(min_progress, constants.SYNC_WATCH_MIN_PROGRESS)
+    self.calls.append((sorted(node_uuids), timeout))
+
+    result = {}
+    for node_uuid in node_uuids:
+      payloads = self.payloads[node_uuid]
+      payload = payloads[0]
+      if len(payloads) > 1:
+        payloads.pop(0)
+
+      if payload is None:
+        result[node_uuid] = rpc.RpcResult(failed=True, node=node_uuid)
+      else:
+        self.assertEqual(len(payload), len(node_disks[node_uuid]))
+        result[node_uuid] = rpc.RpcResult(data=(True, payload),
+                                          node=node_uuid)
+
+    return result
+
+  @staticmethod
+  def _Status(sync_percent=None, estimated_time=None, is_degraded=False):
+    return (True, objects.BlockDevStatus(sync_percent=sync_percent,
+                                         estimated_time=estimated_time,
+                                         is_degraded=is_degraded))
+
+  def testMultipleInstances(self):
+    self.payloads = {
+      "node1": [
+        [self._Status(50.0, 5), self._Status()],
+        [self._Status(80.0, 90), self._Status()],
+        [self._Status(), self._Status()],
+        ],
+      # inst3 only has one mirrored disk
+      "node2": [[self._Status(), self._Status()]],
+      }
+
+    result = instance_storage.WaitForInstancesSync(
+      self.lu, [(self.instances[name], None)
+                for name in ["inst1", "inst2", "inst3"]])
+
+    self.assertEqual(result, {"inst1": True, "inst2": True, "inst3": True})
+    # One call per round to all nodes still syncing
+    self.assertEqual(self.calls, [
+      (["node1", "node2"], 0),
+      (["node1"], 5),
+      (["node1"], constants.SYNC_WATCH_MAX_TIMEOUT),
+      ])
+    self.assertFalse(self.sleep.called)
+
+  def testDegraded(self):
+    self.payloads = {
+      "node2": [
+        [self._Status(), self._Status(is_degraded=True)],
+        [self._Status(is_degraded=True)],
+        ],
+      }
+
+    result = instance_storage.WaitForInstancesSync(
+      self.lu, [(self.instances[name], None) for name in ["inst2", "inst3"]])
+
+    self.assertEqual(result, {"inst2": True, "inst3": False})
+    self.assertEqual(len(self.calls), 11)
+    self.assertEqual(self.calls[-1], (["node2"], 0))
+    self.sleep.assert_called_with(1)
+
+  def testOneshot(self):
+    self.payloads = {
+      "node1": [[self._Status(50.0, 30), self._Status()]],
+      }
+
+    result = instance_storage.WaitForInstancesSync(
+      self.lu, [(self.instances["inst1"], None)], oneshot=True)
+
+    self.assertEqual(result, {"inst1": True})
+    self.assertEqual(len(self.calls), 1)
+
+  def testNodeFailure(self):
+    self.payloads = {
+      "node1": [None],
+      "node2": [[self._Status(), self._Status()]],
+      }
+
+    self.assertRaises(errors.RemoteError,
+                      instance_storage.WaitForInstancesSync, self.lu,
+                      [(self.instances[name], None)
+                       for name in ["inst1", "inst2", "inst3"]])
+
+    self.assertEqual(len(self.calls), 10)
+    self.assertEqual(self.calls[-1], (["node1"], 0))
+    self.sleep.assert_called_with(6)
+
+  def testNoDisks(self):
+    result = instance_storage.WaitForInstancesSync(
+      self.lu, [(self.instances["inst1"], [])])
+
+    self.assertEqual(result, {"inst1": True})
+    self.assertFalse(self.calls)
+
+
 class TestLUInstanceReplaceDisks(CmdlibTestCase):
   """Tests for LUInstanceReplaceDisks."""
 
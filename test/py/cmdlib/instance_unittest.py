@@ -84,6 +84,21 @@ class TestComputeIPolicyInstanceSpecViolation(unittest.TestCase):
                                  1, [constants.DT_PLAIN])
 
 
+def _WatchSyncInSync(test):
+  """Returns a fake C{call_blockdev_watch_sync} reporting all disks in sync.
+
+  """
+  def _WatchSync(node_uuids, node_disks, _, __):
+    builder = test.RpcResultsBuilder()
+    for node_uuid in node_uuids:
+      builder.AddSuccessfulNode(node_uuid,
+                                [(True, objects.BlockDevStatus())
+                                 for _ in node_disks[node_uuid]])
+    return builder.Build()
+
+  return _WatchSync
+
+
 class TestLUInstanceCreate(CmdlibTestCase):
   def _setupOSDiagnose(self):
     os_result = [(self.os.name,
@@ -129,9 +144,7 @@ class TestLUInstanceCreate(CmdlibTestCase):
 
     self._setupOSDiagnose()
 
-    self.rpc.call_blockdev_getmirrorstatus.side_effect = \
-      lambda node, _: self.RpcResultsBuilder() \
-                        .CreateSuccessfulNodeResult(node, [])
+    self.rpc.call_blockdev_watch_sync.side_effect = _WatchSyncInSync(self)
 
     self.iallocator_cls.return_value.result = [self.node1.name, self.node2.name]
 
@@ -1572,43 +1585,103 @@ class _RpcForDiskWipe:
     assert node == self._exp_node
     return rpc.RpcResult(data=self._pause_cb(disks, pause))
 
-  def call_blockdev_wipe(self, node, bdev, offset, size):
+  def call_blockdev_wipe_start(self, node, disks, instance_name, offsets,
+                               parallelism):
     assert node == self._exp_node
-    return rpc.RpcResult(data=self._wipe_cb(bdev, offset, size))
+    return rpc.RpcResult(data=self._wipe_cb.Start(disks, instance_name,
+                                                  offsets, parallelism))
+
+  def call_blockdev_wipe_status(self, node, name):
+    assert node == self._exp_node
+    result = rpc.RpcResult(data=self._wipe_cb.Status(name))
+    if not result.fail_msg:
+      result.payload = [objects.DiskWipeStatus.FromDict(i)
+                        for i in result.payload]
+    return result
+
+  def call_blockdev_wipe_cleanup(self, node, name):
+    assert node == self._exp_node
+    return rpc.RpcResult(data=self._wipe_cb.Cleanup(name))
 
 
 class _DiskWipeProgressTracker:
+  """Simulates a disk wipe running in the background on a node.
+
+  Every status query advances each unfinished disk by one chunk.
+
+  """
+  _NAME = "wipe-test"
+
   def __init__(self, start_offset):
     self._start_offset = start_offset
+    self._disks = None
     self.progress = {}
+    self.cleaned_up = False
 
-  def __call__(self, (disk, _), offset, size):
-    assert isinstance(offset, (long, int))
-    assert isinstance(size, (long, int))
+  def Start(self, (disks, instance), instance_name, offsets, parallelism):
+    assert self._disks is None
+    assert instance.name == instance_name
+    assert len(disks) == len(offsets)
+    assert parallelism == constants.WIPE_DISKS_PARALLELISM
 
-    max_chunk_size = (disk.size / 100.0 * constants.MIN_WIPE_CHUNK_PERCENT)
+    for (disk, offset) in zip(disks, offsets):
+      assert isinstance(offset, (long, int))
+      assert offset == self._start_offset
+      assert offset <= disk.size
+      self.progress[disk.logical_id] = offset
 
-    assert offset >= self._start_offset
-    assert (offset + size) <= disk.size
+    self._disks = disks
 
-    assert size > 0
-    assert size <= constants.MAX_WIPE_CHUNK
-    assert size <= max_chunk_size
+    return (True, self._NAME)
 
-    assert offset == self._start_offset or disk.logical_id in self.progress
+  def _GetStatus(self, disk):
+    offset = self.progress[disk.logical_id]
+    return objects.DiskWipeStatus(offset=offset, size=disk.size,
+                                  method=constants.WIPE_METHOD_DD,
+                                  finished=(offset == disk.size),
+                                  error_message=None)
 
-    # Keep track of progress
-    cur_progress = self.progress.setdefault(disk.logical_id, self._start_offset)
+  def Status(self, name):
+    assert name == self._NAME
+    assert not self.cleaned_up
 
-    assert cur_progress == offset
+    for disk in self._disks:
+      chunk_size = max(1, int(min(constants.MAX_WIPE_CHUNK,
+                                  disk.size / 100.0 *
+                                  constants.MIN_WIPE_CHUNK_PERCENT)))
+      self.progress[disk.logical_id] = \
+        min(disk.size, self.progress[disk.logical_id] + chunk_size)
 
-    # Record progress
-    self.progress[disk.logical_id] += size
+    return (True, [self._GetStatus(disk).ToDict() for disk in self._disks])
 
+  def Cleanup(self, name):
+    assert name == self._NAME
+    self.cleaned_up = True
     return (True, None)
 
 
+class _FailingDiskWipe(_DiskWipeProgressTracker):
+  """Simulates a disk wipe failing immediately on the first disk.
+
+  """
+  def Status(self, name):
+    (success, result) = _DiskWipeProgressTracker.Status(self, name)
+    assert success
+
+    result[0]["finished"] = True
+    result[0]["error_message"] = "Wiping failed"
+
+    return (True, result)
+
+
 class TestWipeDisks(unittest.TestCase):
+  def setUp(self):
+    self._sleep_patcher = mock.patch.object(instance_storage.time, "sleep")
+    self._sleep_patcher.start()
+
+  def tearDown(self):
+    self._sleep_patcher.stop()
+
   def _FailingPauseCb(self, (disks, _), pause):
     self.assertEqual(len(disks), 3)
     self.assertTrue(pause)
@@ -1635,14 +1708,10 @@ class TestWipeDisks(unittest.TestCase):
 
     self.assertRaises(errors.OpExecError, instance_create.WipeDisks, lu, inst)
 
-  def _FailingWipeCb(self, (disk, _), offset, size):
-    # This should only ever be called for the first disk
-    self.assertEqual(disk.logical_id, "disk0")
-    return (False, None)
-
   def testFailingWipe(self):
     node_uuid = "node13445-uuid"
     pt = _DiskPauseTracker()
+    wt = _FailingDiskWipe(0)
 
     disks = [
       objects.Disk(dev_type=constants.DT_PLAIN, logical_id="disk0",
@@ -1653,7 +1722,7 @@ class TestWipeDisks(unittest.TestCase):
                    size=256, uuid="disk2"),
       ]
 
-    lu = _FakeLU(rpc=_RpcForDiskWipe(node_uuid, pt, self._FailingWipeCb),
+    lu = _FakeLU(rpc=_RpcForDiskWipe(node_uuid, pt, wt),
                  cfg=_ConfigForDiskWipe(node_uuid, disks))
 
     inst = objects.Instance(name="inst562",
@@ -1664,10 +1733,17 @@ class TestWipeDisks(unittest.TestCase):
     try:
       instance_create.WipeDisks(lu, inst)
     except errors.OpExecError, err:
-      self.assertTrue(str(err), "Could not wipe disk 0 at offset 0 ")
+      self.assertTrue(str(err).startswith("Could not wipe disk 0: "))
     else:
       self.fail("Did not raise exception")
 
+    # The other disks must have been wiped completely before failing
+    self.assertEqual(wt.progress["disk1"], 500 * 1024)
+    self.assertEqual(wt.progress["disk2"], 256)
+
+    # The background wipe must have been cleaned up
+    self.assertTrue(wt.cleaned_up)
+
     # Check if all disks were paused and resumed
     self.assertEqual(pt.history, [
       ("disk0", 100 * 1024, True),
@@ -1723,6 +1799,7 @@ class TestWipeDisks(unittest.TestCase):
     # Ensure the complete disk has been wiped
     self.assertEqual(progresst.progress,
                      dict((i.logical_id, i.size) for i in disks))
+    self.assertTrue(progresst.cleaned_up)
 
   def testWipeWithStartOffset(self):
     for start_offset in [0, 280, 8895, 1563204]:
@@ -2122,9 +2199,7 @@ class TestLUInstanceSetParams(CmdlibTestCase):
       self.RpcResultsBuilder() \
         .CreateSuccessfulNodeResult(self.master, True)
 
-    self.rpc.call_blockdev_getmirrorstatus.side_effect = \
-      lambda node, _: self.RpcResultsBuilder() \
-                        .CreateSuccessfulNodeResult(node, [])
+    self.rpc.call_blockdev_watch_sync.side_effect = _WatchSyncInSync(self)
 
     self.rpc.call_blockdev_shutdown.side_effect = \
       lambda node, _: self.RpcResultsBuilder() \
@@ -2963,9 +3038,7 @@ class TestLUInstanceSetParams(CmdlibTestCase):
     self.rpc.call_blockdev_shutdown.return_value = \
       self.RpcResultsBuilder() \
         .CreateSuccessfulNodeResult(self.master, True)
-    self.rpc.call_blockdev_getmirrorstatus.return_value = \
-      self.RpcResultsBuilder() \
-        .CreateSuccessfulNodeResult(self.master, [objects.BlockDevStatus()])
+    self.rpc.call_blockdev_watch_sync.side_effect = _WatchSyncInSync(self)
 
     op = self.CopyOpCode(self.op,
                          disk_template=constants.DT_DRBD8,
@@ -2986,9 +3059,7 @@ class TestLUInstanceSetParams(CmdlibTestCase):
     self.rpc.call_blockdev_remove.return_value = \
       self.RpcResultsBuilder() \
         .CreateSuccessfulNodeResult(self.master)
-    self.rpc.call_blockdev_getmirrorstatus.return_value = \
-      self.RpcResultsBuilder() \
-        .CreateSuccessfulNodeResult(self.master, [objects.BlockDevStatus()])
+    self.rpc.call_blockdev_watch_sync.side_effect = _WatchSyncInSync(self)
 
     op = self.CopyOpCode(self.op,
                          disk_template=constants.DT_PLAIN)
@@ -71,6 +71,9 @@ class GanetiContextMock(object):
   def GetWConfdContext(self, _ec_id):
     return (None, None, None)
 
+  def GetWConfdClient(self):
+    return None
+
   def GetConfig(self, _ec_id):
     return self._test_case.cfg
 
@@ -78,6 +78,9 @@ class MockClient(object):
   def PrepareClusterDestruction(self, _cid):
     pass
 
+  def Pipeline(self, calls):
+    return [getattr(self, method)(*args) for (method, args) in calls]
+
 
 class WConfdMock(object):
   """Mock calls to WConfD.
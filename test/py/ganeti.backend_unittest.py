@@ -663,6 +663,156 @@ class TestGetBlockDevSymlinkPath(unittest.TestCase):
       self._Test("inst1.example.com", idx)
 
 
+def _IsProcessRunning(pid):
+  """Checks whether a process exists and isn't a zombie.
+
+  """
+  try:
+    data = utils.ReadFile("/proc/%d/stat" % pid)
+  except EnvironmentError:
+    return False
+  return data.rsplit(")", 1)[1].split()[0] not in ("Z", "X")
+
+
+class TestBlockdevWipeCleanup(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self._patcher = mock.patch.object(pathutils, "DISK_WIPE_DIR", self.tmpdir)
+    self._patcher.start()
+
+  def tearDown(self):
+    self._patcher.stop()
+    shutil.rmtree(self.tmpdir)
+
+  def _WaitForFile(self, path):
+    def _Read():
+      try:
+        data = utils.ReadFile(path).strip()
+      except EnvironmentError:
+        data = None
+      if not data:
+        raise utils.RetryAgain()
+      return int(data)
+
+    return utils.Retry(_Read, 0.05, 10.0)
+
+  def testKillsChildren(self):
+    status_dir = utils.PathJoin(self.tmpdir, "wipe-test")
+    os.mkdir(status_dir)
+    child_pid_file = utils.PathJoin(self.tmpdir, "child.pid")
+
+    # Simulates the wiping tool running dd
+    pid = utils.StartDaemon(["/bin/sh", "-c",
+                             "sleep 300 & echo $! > %s; wait" % child_pid_file],
+                            pidfile=utils.PathJoin(status_dir,
+                                                   backend._WIPE_PID_FILE))
+    child_pid = self._WaitForFile(child_pid_file)
+    self.assertTrue(_IsProcessRunning(pid))
+    self.assertTrue(_IsProcessRunning(child_pid))
+
+    backend.BlockdevWipeCleanup("wipe-test")
+
+    self.assertFalse(os.path.exists(status_dir))
+
+    def _CheckGone():
+      if _IsProcessRunning(pid) or _IsProcessRunning(child_pid):
+        raise utils.RetryAgain()
+
+    utils.Retry(_CheckGone, 0.05, 10.0)
+
+  def testNotRunning(self):
+    status_dir = utils.PathJoin(self.tmpdir, "wipe-done")
+    os.mkdir(status_dir)
+    utils.WriteFile(utils.PathJoin(status_dir, backend._WIPE_PID_FILE),
+                    data="%s\n" % os.getpid())
+
+    # The PID file isn't locked, so nothing may be killed
+    backend.BlockdevWipeCleanup("wipe-done")
+
+    self.assertFalse(os.path.exists(status_dir))
+
+
+class TestBlockdevWatchSync(unittest.TestCase):
+  def setUp(self):
+    self.now = 1000.0
+    self.statuses = []
+    self.queries = 0
+    self._patcher = mock.patch.object(backend,
+                                      "BlockdevGetmirrorstatusMulti",
+                                      side_effect=self._GetStatus)
+    self._patcher.start()
+
+  def tearDown(self):
+    self._patcher.stop()
+
+  def _GetStatus(self, disks):
+    self.assertEqual(disks, ["disk0", "disk1"])
+    status = self.statuses[min(self.queries, len(self.statuses) - 1)]
+    self.queries += 1
+    return status
+
+  def _Sleep(self, duration):
+    self.assertTrue(0 < duration <= constants.SYNC_WATCH_INTERVAL)
+    self.now += duration
+
+  def _Watch(self, min_progress, timeout):
+    return backend.BlockdevWatchSync(["disk0", "disk1"], min_progress, timeout,
+                                     _sleep_fn=self._Sleep,
+                                     _time_fn=lambda: self.now)
+
+  @staticmethod
+  def _Status(*percents):
+    return [(True, objects.BlockDevStatus(sync_percent=percent))
+            for percent in percents]
+
+  def testNotSyncing(self):
+    self.statuses = [self._Status(None, None)]
+    self.assertEqual(self._Watch(5.0, 60), self.statuses[0])
+    self.assertEqual(self.queries, 1)
+    self.assertEqual(self.now, 1000.0)
+
+  def testProgress(self):
+    self.statuses = [
+      self._Status(10.0, None),
+      self._Status(12.0, None),
+      self._Status(14.9, None),
+      self._Status(15.0, None),
+      ]
+    result = self._Watch(5.0, 60)
+    self.assertEqual(result, self.statuses[3])
+    self.assertEqual(self.queries, 4)
+
+  def testFinished(self):
+    self.statuses = [
+      self._Status(99.0, 50.0),
+      self._Status(None, 50.0),
+      ]
+    self.assertEqual(self._Watch(5.0, 60), self.statuses[1])
+
+  def testFailure(self):
+    self.statuses = [
+      self._Status(10.0, 20.0),
+      [(True, objects.BlockDevStatus(sync_percent=10.0)),
+       (False, "Can't find device")],
+      ]
+    self.assertEqual(self._Watch(5.0, 60), self.statuses[1])
+
+  def testTimeout(self):
+    self.statuses = [self._Status(10.0, 20.0)]
+    self.assertEqual(self._Watch(5.0, 30), self.statuses[0])
+    self.assertEqual(self.now, 1030.0)
+
+  def testMaxTimeout(self):
+    self.statuses = [self._Status(10.0, 20.0)]
+    self._Watch(5.0, 10 * constants.SYNC_WATCH_MAX_TIMEOUT)
+    self.assertEqual(self.now, 1000.0 + constants.SYNC_WATCH_MAX_TIMEOUT)
+
+  def testZeroTimeout(self):
+    self.statuses = [self._Status(10.0, 20.0)]
+    self.assertEqual(self._Watch(5.0, 0), self.statuses[0])
+    self.assertEqual(self.queries, 1)
+
+
 class TestGetInstanceList(unittest.TestCase):
 
   def setUp(self):
@@ -1302,6 +1452,91 @@ class TestAddRemoveGenerateNodeSshKey(testutils.GanetiTestCase):
             "Node %s did not receive request to remove public key '%s',"
             " although it should have." % (node_name, key))
 
+  def _FailOnNode(self, failing_node):
+    def _RunCmd(cluster_name, node, *args, **kwargs):
+      if node == failing_node:
+        raise errors.OpExecError("Connection to %s refused" % node)
+    self._run_cmd_mock.side_effect = _RunCmd
+
+  def testAddNodeSshKeyFailingNode(self):
+    new_node_name = "new_node_name"
+    new_node_uuid = "new_node_uuid"
+
+    self._SetupTestData()
+    ssh.AddPublicKey(new_node_name, "new_node_key", key_file=self._pub_key_file)
+    self._ssh_port_map[new_node_name] = self._SSH_PORT
+    self._FailOnNode("node_name_3")
+
+    self.assertRaises(errors.OpExecError, backend.AddNodeSshKey,
+                      new_node_uuid, new_node_name,
+                      self._potential_master_candidates,
+                      self._ssh_port_map,
+                      to_authorized_keys=True,
+                      to_public_keys=True,
+                      get_public_keys=False,
+                      pub_key_file=self._pub_key_file,
+                      ssconf_store=self._ssconf_mock,
+                      noded_cert_file=self.noded_cert_file,
+                      run_cmd_fn=self._run_cmd_mock)
+
+    # All other nodes must have been updated nevertheless
+    calls_per_node = self._GetCallsPerNode()
+    self.assertEqual(set(calls_per_node),
+                     set(self._all_nodes) - set([self._master_node]))
+
+    self._TearDownTestData()
+
+  def testRemoveNodeSshKeyFailingNode(self):
+    node_name = "node_name"
+    node_uuid = "node_uuid"
+
+    self._SetupTestData()
+    ssh.AddPublicKey(node_uuid, "node_key", key_file=self._pub_key_file)
+    self._ssh_port_map[node_name] = self._SSH_PORT
+    self._FailOnNode("node_name_12")
+
+    result_msgs = \
+      backend.RemoveNodeSshKey(node_uuid, node_name,
+                               self._master_candidate_uuids,
+                               self._potential_master_candidates,
+                               self._ssh_port_map,
+                               from_authorized_keys=True,
+                               from_public_keys=False,
+                               clear_authorized_keys=False,
+                               clear_public_keys=False,
+                               pub_key_file=self._pub_key_file,
+                               ssconf_store=self._ssconf_mock,
+                               noded_cert_file=self.noded_cert_file,
+                               run_cmd_fn=self._run_cmd_mock)
+
+    self.assertEqual(len(result_msgs), 1)
+    self.assertTrue("node_name_12" in result_msgs[0])
+
+    calls_per_node = self._GetCallsPerNode()
+    self.assertEqual(set(calls_per_node),
+                     set(self._all_nodes) - set([self._master_node]))
+
+    self._TearDownTestData()
+
+
+class TestRunOnNodesInParallel(unittest.TestCase):
+  def test(self):
+    def _Fn(item):
+      if item % 3 == 0:
+        raise errors.OpExecError("Item %s failed" % item)
+      return item * 2
+
+    results = backend._RunOnNodesInParallel(_Fn, range(10), _max_parallel=4)
+
+    self.assertEqual([result for (result, _) in results],
+                     [None, 2, 4, None, 8, 10, None, 14, 16, None])
+    for (item, (_, err)) in enumerate(results):
+      if item % 3 == 0:
+        self.assertTrue(isinstance(err, errors.OpExecError))
+        self.assertEqual(str(err), "Item %s failed" % item)
+      else:
+        self.assertEqual(err, None)
+
 
 class TestVerifySshSetup(testutils.GanetiTestCase):
 
@@ -48,6 +48,7 @@ from ganeti import serializer
 
 from ganeti.config import TemporaryReservationManager
 
+import cfgperf
 import testutils
 import mocks
 import mock
@@ -357,6 +358,106 @@ class TestConfigRunner(unittest.TestCase):
     self.failUnlessRaises(errors.ConfigurationError, cfg.Update, fake_instance,
                           None)
 
+  def testConfigDelta(self):
+    """Test building and applying deltas of modified objects"""
+    cfg = self._get_object_mock()
+    cfg.AddInstance(self._create_instance(cfg), "my-job")
+    data = cfg._ConfigData()
+    old = objects.ConfigData.FromDict(data.ToDict())
+
+    changes = config.utils.ConfigChanges()
+    data.instances["test-uuid"].admin_state = constants.ADMINST_UP
+    changes.Record("instances", "test-uuid")
+    changes.Record("disks", "no-such-disk")
+    delta = changes.ToDelta(data)
+    self.assertEqual(delta["instances"].keys(), ["test-uuid"])
+    self.assertEqual(delta["disks"], {"no-such-disk": None})
+    self.assertEqual(delta["nodes"], {})
+    self.assertFalse("cluster" in delta)
+
+    new_objects = config.utils.ApplyConfigDelta(old, delta)
+    self.assertEqual(new_objects, [old.instances["test-uuid"]])
+    self.assertEqual(old.ToDict(), data.ToDict())
+
+    # removed objects are represented by None
+    delta["instances"]["test-uuid"] = None
+    config.utils.ApplyConfigDelta(old, delta)
+    self.assertFalse("test-uuid" in old.instances)
+
+  def testOutDate(self):
+    """Test that outdating discards modifications that weren't written"""
+    wconfd = cfgperf.FakeWConfd(cfgperf.BuildConfig(2, 2))
+    cfg = config.ConfigWriter(wconfd=wconfd, wconfdcontext=("cfg", "", 0))
+    other = config.ConfigWriter(wconfd=wconfd, wconfdcontext=("other", "", 0))
+
+    # an object modified in place, but never written
+    inst = cfg.GetInstanceInfo("inst-uuid-0")
+    inst.admin_state = constants.ADMINST_UP
+    # meanwhile, another client modifies a different object
+    other.MarkInstanceUp("inst-uuid-1")
+
+    cfg.OutDate()
+    self.assertEqual(cfg.GetInstanceInfo("inst-uuid-0").admin_state,
+                     constants.ADMINST_DOWN)
+    self.assertEqual(cfg.GetInstanceInfo("inst-uuid-1").admin_state,
+                     constants.ADMINST_UP)
+
+    # a later full write doesn't bring the discarded modification back
+    cfg.GetInstanceInfo("inst-uuid-0").admin_state = constants.ADMINST_UP
+    cfg.OutDate()
+    cfg.AddTcpUdpPort(11000)
+    self.assertEqual(wconfd.ReadConfig()["instances"]["inst-uuid-0"]
+                     ["admin_state"], constants.ADMINST_DOWN)
+
+    # our copy carries the version assigned by WConfd
+    data = cfg._ConfigData()
+    self.assertEqual((data.serial_no, data.mtime),
+                     (wconfd.ReadConfig()["serial_no"],
+                      wconfd.ReadConfig()["mtime"]))
+
+  def testConfigIndex(self):
+    """Test the secondary indexes used for lookups"""
+    cfg = self._get_object_mock()
+    master_uuid = cfg.GetMasterNode()
+    node2 = cfg.AddNewNode(name="node2.example.com")
+    inst = self._create_instance(cfg)
+    disk = objects.Disk(dev_type=constants.DT_DRBD8, size=128,
+                        logical_id=(master_uuid, node2.uuid,
+                                    12300, 0, 0, "secret"),
+                        children=[], iv_name="disk/0", uuid="disk0",
+                        name="mydisk")
+    cfg.AddInstance(inst, "my-job")
+    cfg.AddInstanceDisk(inst.uuid, disk)
+
+    data = cfg._ConfigData()
+    index = config.utils.ConfigIndex(data)
+    self.assertTrue(index.IsCurrent(data))
+    self.assertEqual(index.LookupName("instances", inst.name), [inst.uuid])
+    self.assertEqual(index.LookupName("disks", "mydisk"), ["disk0"])
+    self.assertEqual(index.LookupName("nodes", "no.such.node"), [])
+    self.assertEqual(index.primary_instances[master_uuid], set([inst.uuid]))
+    self.assertEqual(index.secondary_instances[node2.uuid], set([inst.uuid]))
+    self.assertEqual(index.disk_instance, {"disk0": inst.uuid})
+
+    # objects renamed in place are not found under their old name
+    inst.name = "renamed.example.com"
+    self.assertEqual(index.LookupName("instances", "test.example.com"), [])
+
+    data.serial_no += 1
+    self.assertFalse(index.IsCurrent(data))
+
+    self.assertEqual(cfg.GetInstanceInfoByName(inst.name), inst)
+    self.assertEqual(cfg.GetNodeInfoByName(node2.name), node2)
+    self.assertEqual(cfg.GetDiskInfoByName("mydisk").uuid, "disk0")
+    self.assertEqual(cfg.ExpandNodeName("node2"), (node2.uuid, node2.name))
+    self.assertEqual(cfg.ExpandInstanceName("renamed"),
+                     (inst.uuid, inst.name))
+    self.assertEqual(cfg.ExpandInstanceName("test"), (None, None))
+    self.assertEqual(cfg.GetNodeInstances(node2.uuid), ([], [inst.uuid]))
+    self.assertEqual(cfg.GetInstanceForDisk("disk0"), inst.uuid)
+    self.assertEqual(cfg.GetNodeGroupInstances(node2.group),
+                     frozenset([inst.uuid]))
+
   def testUpgradeSave(self):
     """Test that any modification done during upgrading is saved back"""
     cfg = self._get_object()
@@ -36,6 +36,7 @@ import os
 import time
 import tempfile
 import os.path
+import mock
 
 from ganeti import errors
 from ganeti import opcodes
@@ -193,6 +194,51 @@ class TestHooksRunner(unittest.TestCase):
       expect.sort()
       self.failUnlessEqual(self.hr.RunHooks(self.hpath, phase, {}), expect)
 
+  def testParallel(self):
+    """Test concurrent execution keeps the ordering"""
+    for phase in (constants.HOOKS_PHASE_PRE, constants.HOOKS_PHASE_POST):
+      marker = "%s/%s" % (self.ph_dirs[phase], constants.HOOKS_PARALLEL_MARKER)
+      f = open(marker, "w")
+      f.close()
+      self.torm.append((marker, False))
+
+      expect = []
+      for (fbase, script, rs) in [("80slow", "sleep 0.5", HKR_SUCCESS),
+                                  ("00fail", "exit 1", HKR_FAIL),
+                                  ("10fast", "exit 0", HKR_SUCCESS),
+                                  ("20inv.", "exit 0", HKR_SKIP),
+                                  ]:
+        fname = "%s/%s" % (self.ph_dirs[phase], fbase)
+        f = open(fname, "w")
+        f.write("#!/bin/sh\n%s\n" % script)
+        f.close()
+        self.torm.append((fname, False))
+        os.chmod(fname, 0700)
+        expect.append((self._rname(fname), rs, ""))
+      expect.sort()
+      self.failUnlessEqual(self.hr.RunHooks(self.hpath, phase, {}), expect)
+
+  def testParallelTimeout(self):
+    """Test scripts exceeding the timeout fail"""
+    phase = constants.HOOKS_PHASE_PRE
+    marker = "%s/%s" % (self.ph_dirs[phase], constants.HOOKS_PARALLEL_MARKER)
+    f = open(marker, "w")
+    f.close()
+    self.torm.append((marker, False))
+
+    # The script handles SIGTERM and exits successfully
+    fname = "%s/%s" % (self.ph_dirs[phase], "50stuck")
+    f = open(fname, "w")
+    f.write("#!/bin/sh\ntrap 'exit 0' TERM\nwhile :; do sleep 0.1; done\n")
+    f.close()
+    self.torm.append((fname, False))
+    os.chmod(fname, 0700)
+
+    with mock.patch.object(constants, "HOOKS_SCRIPT_TIMEOUT", 1):
+      self.failUnlessEqual(self.hr.RunHooks(self.hpath, phase, {}),
+                           [(self._rname(fname), HKR_FAIL,
+                             "Hook script timed out after 1 seconds")])
+
   def testEnv(self):
     """Test environment execution"""
     for phase in (constants.HOOKS_PHASE_PRE, constants.HOOKS_PHASE_POST):
@@ -32,6 +32,10 @@
 
 
 import os
+import mmap
+import errno
+import signal
+import socket
 import unittest
 import time
 import tempfile
@@ -120,6 +124,71 @@ class TestMisc(unittest.TestCase):
                   "Digest realm=secure foo=\"x,y\""))
 
 
+class TestMessageWriter(unittest.TestCase):
+  def setUp(self):
+    (self.sock, self.peer) = socket.socketpair()
+
+  def tearDown(self):
+    self.sock.close()
+    self.peer.close()
+
+  def _Write(self, version, body):
+    msg = http.HttpMessage()
+    msg.start_line = http.HttpServerToClientStartLine(version, http.HTTP_OK,
+                                                      "OK")
+    msg.headers = {}
+    msg.body = body
+
+    http.HttpMessageWriter(self.sock, msg, 10)
+    self.sock.shutdown(socket.SHUT_WR)
+
+    data = []
+    while True:
+      buf = self.peer.recv(4096)
+      if not buf:
+        break
+      data.append(buf)
+
+    return "".join(data).split("\r\n\r\n", 1)
+
+  @staticmethod
+  def _Chunks():
+    yield "Hello"
+    yield ""
+    yield " World"
+
+  def testString(self):
+    (headers, body) = self._Write(http.HTTP_1_1, "Hello World")
+    self.assertTrue("%s: 11" % http.HTTP_CONTENT_LENGTH in headers)
+    self.assertEqual(body, "Hello World")
+
+  def testChunked(self):
+    (headers, body) = self._Write(http.HTTP_1_1, self._Chunks())
+    self.assertTrue("%s: chunked" % http.HTTP_TRANSFER_ENCODING in headers)
+    self.assertFalse(http.HTTP_CONTENT_LENGTH in headers)
+    self.assertEqual(body, "5\r\nHello\r\n6\r\n World\r\n0\r\n\r\n")
+
+  def testStreamedBodyHttp10(self):
+    (headers, body) = self._Write(http.HTTP_1_0, self._Chunks())
+    self.assertFalse(http.HTTP_TRANSFER_ENCODING in headers)
+    self.assertTrue("%s: 11" % http.HTTP_CONTENT_LENGTH in headers)
+    self.assertEqual(body, "Hello World")
+
+  def testChunkedError(self):
+    def _Fail():
+      yield "Hello"
+      raise Exception("Generator failed")
+
+    msg = http.HttpMessage()
+    msg.start_line = http.HttpServerToClientStartLine(http.HTTP_1_1,
+                                                      http.HTTP_OK, "OK")
+    msg.headers = {}
+    msg.body = _Fail()
+
+    self.assertRaises(http.HttpError, http.HttpMessageWriter, self.sock, msg,
+                      10)
+
+
 class _FakeRequestAuth(http.auth.HttpServerRequestAuthentication):
   def __init__(self, realm, authreq, authenticate_fn):
     http.auth.HttpServerRequestAuthentication.__init__(self)
@@ -756,5 +825,240 @@ class TestProcessRequests(unittest.TestCase):
                       _curl_multi=NotImplemented, _curl_process=NotImplemented)
 
 
+class _FakePooledCurl(_FakeCurl):
+  def __init__(self):
+    _FakeCurl.__init__(self)
+    self.closed = False
+
+  def close(self):
+    assert not self.closed
+    self.closed = True
+
+
+class TestCurlPool(unittest.TestCase):
+  def setUp(self):
+    self.now = 1000.0
+    self.pid = 123
+
+  def _NewPool(self, **kwargs):
+    return http.client.CurlPool(_curl=_FakePooledCurl,
+                                _time_fn=lambda: self.now,
+                                _getpid_fn=lambda: self.pid, **kwargs)
+
+  def testReuse(self):
+    pool = self._NewPool()
+    curl = pool.Get("node1", 1811)
+    self.assertTrue(isinstance(curl, _FakePooledCurl))
+    pool.Put("node1", 1811, curl)
+
+    # Other destinations get new objects
+    other = pool.Get("node2", 1811)
+    self.assertFalse(other is curl)
+    self.assertFalse(pool.Get("node1", 1812) is curl)
+
+    self.assertTrue(pool.Get("node1", 1811) is curl)
+    self.assertFalse(pool.Get("node1", 1811) is curl)
+    self.assertFalse(curl.closed)
+
+  def testLimits(self):
+    pool = self._NewPool(max_idle_per_host=2, max_idle=3)
+    handles = [pool.Get("node1", 1811) for _ in range(3)]
+    for curl in handles:
+      pool.Put("node1", 1811, curl)
+    self.assertEqual([curl.closed for curl in handles], [False, False, True])
+
+    other = [pool.Get("node2", 1811) for _ in range(2)]
+    for curl in other:
+      pool.Put("node2", 1811, curl)
+    self.assertEqual([curl.closed for curl in other], [False, True])
+
+    pool.Close()
+    self.assertTrue(compat.all(curl.closed for curl in handles + other))
+
+  def testIdleTimeout(self):
+    pool = self._NewPool(idle_timeout=10)
+    curl = pool.Get("node1", 1811)
+    pool.Put("node1", 1811, curl)
+    self.now += 11
+    self.assertFalse(pool.Get("node1", 1811) is curl)
+    self.assertTrue(curl.closed)
+
+  def testFork(self):
+    pool = self._NewPool()
+    curl = pool.Get("node1", 1811)
+    pool.Put("node1", 1811, curl)
+    self.pid += 1
+    self.assertFalse(pool.Get("node1", 1811) is curl)
+    pool.Close()
+    self.assertFalse(curl.closed)
+
+  def testProcessRequests(self):
+    pool = self._NewPool()
+
+    def _Process(multi, handles):
+      for curl in handles:
+        curl.info = {
+          pycurl.RESPONSE_CODE: http.HTTP_OK,
+          }
+        yield (curl, None)
+
+    used = []
+    for _ in range(3):
+      req = http.client.HttpClientRequest("node1", 1811, "POST", "/version")
+      http.client.ProcessRequests([req], curl_pool=pool,
+                                  _curl=NotImplemented,
+                                  _curl_multi=NotImplemented,
+                                  _curl_process=_Process)
+      self.assertTrue(req.success)
+      (_, curl) = pool._idle[("node1", 1811)][-1]
+      used.append(curl)
+      if hasattr(pycurl, "SSL_SESSIONID_CACHE"):
+        self.assertTrue(curl.opts[pycurl.SSL_SESSIONID_CACHE])
+      # Options are set again for every request
+      curl.opts.clear()
+
+    self.assertTrue(used[0] is used[1] and used[1] is used[2])
+
+
+class TestServerKeepAlive(unittest.TestCase):
+  def _Read(self, data, **kwargs):
+    (client, server) = socket.socketpair()
+    try:
+      client.sendall(data)
+      msg = http.HttpMessage()
+      reader = http.server._HttpClientToServerMessageReader(server, msg, 10,
+                                                            **kwargs)
+    finally:
+      client.close()
+      server.close()
+    return reader
+
+  def testInitialData(self):
+    request = ("POST /version HTTP/1.1\r\nHost: node1\r\n"
+               "Content-Length: 2\r\n\r\n{}")
+    reader = self._Read(request[10:], initial_data=request[:10])
+    self.assertEqual(reader.msg.start_line.path, "/version")
+    self.assertEqual(reader.msg.body, "{}")
+    self.assertTrue(http.server._CanKeepAlive(reader))
+
+  def testCanKeepAlive(self):
+    for (request, keep_alive) in [
+      ("POST / HTTP/1.1\r\nContent-Length: 2\r\n\r\n{}", True),
+      ("POST / HTTP/1.1\r\nConnection: close\r\n"
+       "Content-Length: 2\r\n\r\n{}", False),
+      ("POST / HTTP/1.0\r\nContent-Length: 2\r\n\r\n{}", False),
+      # Without a length, the reader reads until the connection is closed
+      ("POST / HTTP/1.1\r\n\r\n{}", False),
+      # Pipelined requests would be lost
+      ("POST / HTTP/1.1\r\nContent-Length: 2\r\n\r\n{}"
+       "POST / HTTP/1.1\r\n", False),
+      ]:
+      self.assertEqual(http.server._CanKeepAlive(self._Read(request)),
+                       keep_alive)
+    self.assertFalse(http.server._CanKeepAlive(None))
+
+
+class TestServerWorkers(unittest.TestCase):
+  def _MakeServer(self, workers, keep_alive_timeout=15):
+    server = object.__new__(http.server.HttpServer)
+    server.keep_alive_timeout = keep_alive_timeout
+    server._children = []
+    server._worker_count = workers
+    server._worker_states = None
+    if workers:
+      server._worker_states = mmap.mmap(-1, workers)
+    return server
+
+  def testKeepAliveForkPerConnection(self):
+    server = self._MakeServer(0)
+    self.assertTrue(server.CanKeepAlive())
+    server._children = range(http.server.HttpServer.MAX_KEEP_ALIVE_CHILDREN)
+    self.assertFalse(server.CanKeepAlive())
+
+  def testKeepAliveWorkers(self):
+    server = self._MakeServer(4)
+    self.assertTrue(server.CanKeepAlive())
+    server._worker_states[0] = http.server._WORKER_BUSY
+    server._worker_states[1] = http.server._WORKER_BUSY
+    self.assertTrue(server.CanKeepAlive())
+    server._worker_states[2] = http.server._WORKER_BUSY
+    self.assertFalse(server.CanKeepAlive())
+    server._worker_states[0] = http.server._WORKER_IDLE
+    self.assertTrue(server.CanKeepAlive())
+
+  def testKeepAliveDisabled(self):
+    self.assertFalse(self._MakeServer(4, keep_alive_timeout=0).CanKeepAlive())
+    self.assertFalse(self._MakeServer(0, keep_alive_timeout=0).CanKeepAlive())
+
+
+class _FakeListeningSocket(object):
+  def __init__(self, accept_fn):
+    self._accept_fn = accept_fn
+    self.timeout = None
+
+  def settimeout(self, timeout):
+    self.timeout = timeout
+
+  def accept(self):
+    return self._accept_fn()
+
+
+class _FakeExecutor(object):
+  def __init__(self, server, handler, connection, client_addr):
+    self.request_count = 1
+    server.connections.append((connection, client_addr))
+
+
+class TestServerWorkerTermination(unittest.TestCase):
+  def _MakeServer(self, accept_fn):
+    server = object.__new__(http.server.HttpServer)
+    server.socket = _FakeListeningSocket(accept_fn)
+    server.handler = NotImplemented
+    server.request_executor = _FakeExecutor
+    server.worker_max_requests = 100
+    server.connections = []
+    server._worker_states = mmap.mmap(-1, 1)
+    server._worker_exit = False
+    return server
+
+  def _Serve(self, server):
+    try:
+      return server._ServeWorkerConnections(0)
+    finally:
+      signal.siginterrupt(signal.SIGTERM, False)
+
+  def testTerminateWhileAccepting(self):
+    accepted = []
+
+    def _Accept():
+      self.assertFalse(accepted, msg="Accepted after termination")
+      accepted.append(True)
+      # Signal arrives after accept() returned
+      server._HandleWorkerTermination(signal.SIGTERM, None)
+      return ("conn", ("192.0.2.1", 1234))
+
+    server = self._MakeServer(_Accept)
+    self.assertEqual(self._Serve(server), 1)
+    self.assertEqual(server.connections, [("conn", ("192.0.2.1", 1234))])
+    self.assertEqual(server.socket.timeout,
+                     http.server.HttpServer.WORKER_ACCEPT_TIMEOUT)
+    self.assertEqual(server._worker_states[0], http.server._WORKER_IDLE)
+
+  def testTerminateIdle(self):
+    calls = []
+
+    def _Accept():
+      calls.append(True)
+      if len(calls) == 1:
+        raise socket.timeout("timed out")
+      server._HandleWorkerTermination(signal.SIGTERM, None)
+      raise socket.error(errno.EINTR, "Interrupted system call")
+
+    server = self._MakeServer(_Accept)
+    self.assertEqual(self._Serve(server), 0)
+    self.assertEqual(len(calls), 2)
+    self.assertFalse(server.connections)
+
+
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
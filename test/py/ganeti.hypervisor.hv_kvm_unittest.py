@@ -572,5 +572,207 @@ class TestKvmRuntime(testutils.GanetiTestCase):
     self.mocks['run_cmd'].side_effect = RunCmd
     hypervisor.StartInstance(self.instance, [], False)
 
+
+class TestMonitorCommands(testutils.GanetiTestCase):
+  def setUp(self):
+    super(TestMonitorCommands, self).setUp()
+    kvm_class = "ganeti.hypervisor.hv_kvm.KVMHypervisor"
+    self.MockOut(mock.patch("ganeti.utils.EnsureDirs"))
+    self.MockOut("get_qmp", mock.patch(kvm_class + "._GetQmpConnection"))
+    self.MockOut("call_monitor",
+                 mock.patch(kvm_class + "._CallMonitorCommand"))
+    self.hv = hv_kvm.KVMHypervisor()
+
+  def testNativeQmpCommand(self):
+    qmp = self.mocks["get_qmp"].return_value
+    qmp.supported_commands = frozenset(["balloon", "human-monitor-command"])
+    self.hv._RunMonitorCommand("inst1", "balloon 128", "balloon",
+                               {"value": 128 * 1024 * 1024})
+    qmp.Execute.assert_called_once_with("balloon",
+                                        {"value": 128 * 1024 * 1024})
+    self.assertFalse(self.mocks["call_monitor"].called)
+
+  def testHumanMonitorOverQmp(self):
+    qmp = self.mocks["get_qmp"].return_value
+    qmp.supported_commands = frozenset(["human-monitor-command"])
+    self.hv._RunMonitorCommand("inst1", "drive_del hotdisk-123")
+    qmp.Execute.assert_called_once_with("human-monitor-command",
+                                        {"command-line":
+                                           "drive_del hotdisk-123"})
+    self.assertFalse(self.mocks["call_monitor"].called)
+
+  def testNoQmp(self):
+    self.mocks["get_qmp"].return_value = None
+    self.mocks["call_monitor"].return_value = mock.Mock(stdout="out")
+    self.assertEqual(self.hv._RunMonitorCommand("inst1", "stop", "stop",
+                                                timeout=10),
+                     "out")
+    self.mocks["call_monitor"].assert_called_once_with("inst1", "stop",
+                                                       timeout=10)
+
+
+class TestQmpConnectionReuse(testutils.GanetiTestCase):
+  def setUp(self):
+    super(TestQmpConnectionReuse, self).setUp()
+    kvm_class = "ganeti.hypervisor.hv_kvm.KVMHypervisor"
+    self.MockOut(mock.patch("ganeti.utils.EnsureDirs"))
+    self.MockOut("qmp", mock.patch("ganeti.hypervisor.hv_kvm.QmpConnection"))
+    self.socket_file = tempfile.NamedTemporaryFile()
+    self.MockOut(mock.patch(kvm_class + "._InstanceQmpMonitor",
+                            return_value=self.socket_file.name))
+    self.hv = hv_kvm.KVMHypervisor()
+
+  def testReuse(self):
+    qmp = self.hv._GetQmpConnection("inst1")
+    self.assertEqual(self.hv._GetQmpConnection("inst1"), qmp)
+    self.assertEqual(self.mocks["qmp"].call_count, 1)
+    qmp.connect.assert_called_once_with()
+
+  def testReconnectClosed(self):
+    qmp = self.hv._GetQmpConnection("inst1")
+    qmp.is_alive.return_value = False
+    self.hv._GetQmpConnection("inst1")
+    qmp.close.assert_called_once_with()
+    self.assertEqual(self.mocks["qmp"].call_count, 2)
+
+  def testNoSocket(self):
+    qmp = self.hv._GetQmpConnection("inst1")
+    self.socket_file.close()
+    self.assertEqual(self.hv._GetQmpConnection("inst1"), None)
+    qmp.close.assert_called_once_with()
+
+
+class _PciQmpStub(QmpStub):
+  _SUPPORTED_COMMANDS = {
+    "return": [
+      {"name": "query-pci"},
+    ]
+  }
+
+
+class TestHotplugSharedConnection(testutils.GanetiTestCase):
+  _QUERY_PCI_RESPONSE = (
+    '{"return": [{"bus": 0, "devices": ['
+    '{"qdev_id": "hotnic-1", "slot": 5}]}]}\r\n')
+
+  def setUp(self):
+    super(TestHotplugSharedConnection, self).setUp()
+    kvm_class = "ganeti.hypervisor.hv_kvm.KVMHypervisor"
+    self.MockOut(mock.patch("ganeti.utils.EnsureDirs"))
+
+    socket_file = tempfile.NamedTemporaryFile()
+    os.remove(socket_file.name)
+    self.socket_filename = socket_file.name
+    self.qmp_stub = _PciQmpStub(self.socket_filename,
+                                [self._QUERY_PCI_RESPONSE] * 2)
+    self.qmp_stub.start()
+
+    self.MockOut(mock.patch(kvm_class + "._InstanceQmpMonitor",
+                            return_value=self.socket_filename))
+    self.hv = hv_kvm.KVMHypervisor()
+
+  def tearDown(self):
+    for (qmp, _) in self.hv._qmp_connections.values():
+      qmp.close()
+    self.qmp_stub.join()
+    os.remove(self.socket_filename)
+    super(TestHotplugSharedConnection, self).tearDown()
+
+  def test(self):
+    instance = objects.Instance(name="inst1.example.com")
+    nic = objects.NIC(pci=5)
+
+    # Both checks run over the same, already connected QMP connection
+    for _ in range(2):
+      self.hv._VerifyHotplugCommand(instance, nic, "hotnic-1", True)
+
+    self.assertEqual(len(self.hv._qmp_connections), 1)
+
+
+class TestGetAllInstancesInfo(testutils.GanetiTestCase):
+  PIDS = {
+    "inst1.example.com": 100,
+    "inst2.example.com": 200,
+    }
+
+  def setUp(self):
+    super(TestGetAllInstancesInfo, self).setUp()
+    kvm_class = "ganeti.hypervisor.hv_kvm.KVMHypervisor"
+    self.pids = self.PIDS.copy()
+    self.MockOut(mock.patch("ganeti.utils.EnsureDirs"))
+    self.MockOut(mock.patch("os.listdir",
+                            side_effect=lambda _: sorted(self.pids)))
+    self.MockOut(mock.patch(kvm_class + "._InstancePidFile",
+                            side_effect=lambda name: name))
+    self.MockOut(mock.patch("ganeti.utils.ReadPidFile",
+                            side_effect=lambda name: self.pids[name]))
+    self.MockOut(mock.patch(kvm_class + "._InstancePidInfo",
+                            side_effect=self._PidInfo))
+    self.MockOut(mock.patch(kvm_class + "._IsUserShutdown",
+                            return_value=False))
+    self.MockOut("query", mock.patch(kvm_class + "._QueryInstanceInfoForBulk",
+                                     side_effect=self._Query))
+    self.hv = hv_kvm.KVMHypervisor()
+
+  def _PidInfo(self, pid):
+    for (name, other_pid) in self.pids.items():
+      if pid == other_pid:
+        return (name, 512, 1)
+    raise errors.HypervisorError("Cannot get info for pid %s" % pid)
+
+  def _Query(self, name):
+    if name == "inst2.example.com":
+      # No ballooning
+      return (None, 4)
+    return (1024, 2)
+
+  def _Info(self):
+    return sorted(self.hv.GetAllInstancesInfo())
+
+  def test(self):
+    running = hv_kvm.hv_base.HvInstanceState.RUNNING
+    self.assertEqual(self._Info(), [
+      ("inst1.example.com", 100, 1024, 2, running, 0),
+      ("inst2.example.com", 200, 512, 4, running, 0),
+      ])
+
+  def testNotCached(self):
+    # Changes done by other processes, e.g. ballooning, must be seen
+    self._Info()
+    self._Info()
+    self.assertEqual(self.mocks["query"].call_count, 4)
+
+  def testStopped(self):
+    self._Info()
+    del self.pids["inst2.example.com"]
+    self.assertEqual([info[0] for info in self._Info()],
+                     ["inst1.example.com"])
+    self.assertEqual(self.mocks["query"].call_count, 3)
+    self.mocks["query"].assert_called_with("inst1.example.com")
+
+  def testQueryFailure(self):
+    self.mocks["query"].side_effect = lambda _: None
+    running = hv_kvm.hv_base.HvInstanceState.RUNNING
+    # The values from the command line are used instead
+    self.assertEqual(self._Info(), [
+      ("inst1.example.com", 100, 512, 1, running, 0),
+      ("inst2.example.com", 200, 512, 1, running, 0),
+      ])
+
+  def testQueryException(self):
+    def _Query(name):
+      if name == "inst2.example.com":
+        raise ValueError("Unexpected reply")
+      return self._Query(name)
+
+    self.mocks["query"].side_effect = _Query
+    running = hv_kvm.hv_base.HvInstanceState.RUNNING
+    # Only the failing instance falls back to the command line values
+    self.assertEqual(self._Info(), [
+      ("inst1.example.com", 100, 1024, 2, running, 0),
+      ("inst2.example.com", 200, 512, 1, running, 0),
+      ])
+
+
 if __name__ == "__main__":
   testutils.GanetiTestProgram()
@@ -135,6 +135,36 @@ class TestLXCHypervisorGetInstanceInfo(LXCHypervisorTestCase):
     self.assertEqual(self.hv.GetInstanceInfo("inst1"), None)
 
 
+class TestLXCHypervisorGetAllInstancesInfo(LXCHypervisorTestCase):
+  def setUp(self):
+    super(TestLXCHypervisorGetAllInstancesInfo, self).setUp()
+    self.instance_dir = tempfile.mkdtemp(dir=temp_dir)
+    for name in ["inst1", "inst2", "inst3"]:
+      os.mkdir(utils.PathJoin(self.instance_dir, name))
+    self.hv._INSTANCE_DIR = self.instance_dir
+    self.hv._GetCgroupSubsysDirs = mock.Mock(return_value={})
+    self.hv._GetCgroupCpuList = mock.Mock(return_value=[1, 3])
+    self.hv._GetCgroupMemoryLimit = mock.Mock(return_value=128*(1024**2))
+    self.hv._GetCgroupCpuUsage = mock.Mock(return_value=5.01)
+
+  @patch_object(utils, "RunCmd")
+  def testSingleScan(self, runcmd_mock):
+    runcmd_mock.return_value = RunResultOk("inst1 inst3 other")
+    self.assertEqual(sorted(self.hv.GetAllInstancesInfo()), [
+      ("inst1", 0, 128, 2, hv_base.HvInstanceState.RUNNING, 5.01),
+      ("inst3", 0, 128, 2, hv_base.HvInstanceState.RUNNING, 5.01),
+      ])
+    self.assertEqual(runcmd_mock.call_count, 1)
+    self.assertEqual(self.hv._GetCgroupSubsysDirs.call_count, 1)
+    self.assertEqual(sorted(self.hv.ListInstances()), ["inst1", "inst3"])
+
+  @patch_object(utils, "RunCmd")
+  def testNoneRunning(self, runcmd_mock):
+    runcmd_mock.return_value = RunResultOk("")
+    self.assertEqual(self.hv.GetAllInstancesInfo(), [])
+    self.assertFalse(self.hv._GetCgroupSubsysDirs.called)
+
+
 class TestCgroupMount(LXCHypervisorTestCase):
   @patch_object(utils, "GetMounts")
   @patch_object(LXCHypervisor, "_MountCgroupSubsystem")
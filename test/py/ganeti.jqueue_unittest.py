@@ -39,6 +39,8 @@ import errno
 import itertools
 import random
 import operator
+import threading
+import time
 
 try:
   # pylint: disable=E0611
@@ -50,11 +52,13 @@ from ganeti import constants
 from ganeti import utils
 from ganeti import errors
 from ganeti import jqueue
+from ganeti import jstore
 from ganeti import opcodes
 from ganeti import compat
 from ganeti import mcpu
 from ganeti import query
 from ganeti import workerpool
+from ganeti import serializer
 
 import testutils
 
@@ -169,6 +173,46 @@ class TestQueuedJob(unittest.TestCase):
     _Check(job2)
     self.assertEqual(job1.Serialize(), job2.Serialize())
 
+  def testSerializeChanges(self):
+    job = jqueue._QueuedJob(None, 8171, [opcodes.OpTestDelay(),
+                                         opcodes.OpTestDelay()], True)
+    data = serializer.DumpJson(job.Serialize())
+    job.MarkWritten()
+    self.assertTrue(job.SerializeChanges() is None)
+
+    job.start_timestamp = jqueue.TimeStampNow()
+    job.ops[0].status = constants.OP_STATUS_RUNNING
+    for msg in ["first", "second"]:
+      job.log_serial += 1
+      job.ops[0].log.append((job.log_serial, jqueue.TimeStampNow(),
+                             constants.ELOG_MESSAGE, msg))
+    segment = job.SerializeChanges()
+    self.assertEqual(set(segment.keys()), set(["job", "ops", "log"]))
+    self.assertEqual(segment["job"].keys(), ["start_timestamp"])
+    self.assertEqual(segment["ops"],
+                     [(0, {"status": constants.OP_STATUS_RUNNING})])
+    self.assertEqual([entry[3] for (_, entry) in segment["log"]],
+                     ["first", "second"])
+    data += serializer.DumpJson(segment)
+
+    # Only new log entries are included
+    job.log_serial += 1
+    job.ops[1].log.append((job.log_serial, jqueue.TimeStampNow(),
+                           constants.ELOG_MESSAGE, "third"))
+    segment = job.SerializeChanges()
+    self.assertEqual(segment.keys(), ["log"])
+    self.assertEqual([(idx, entry[3]) for (idx, entry) in segment["log"]],
+                     [(1, "third")])
+    data += serializer.DumpJson(segment)
+
+    self.assertTrue(job.SerializeChanges() is None)
+
+    restored = jqueue._QueuedJob.Restore(None, jstore.ParseJobFile(data),
+                                         True, False)
+    self.assertEqual(restored.log_serial, job.log_serial)
+    self.assertEqual(serializer.LoadJson(serializer.DumpJson(job.Serialize())),
+                     restored.Serialize())
+
   def testWritable(self):
     job = jqueue._QueuedJob(None, 1, [opcodes.OpTestDelay()], False)
     self.assertFalse(job.writable)
@@ -1878,6 +1922,107 @@ class _IdOnlyFakeJob:
     return self._priority
 
 
+class TestJobFileReplicator(unittest.TestCase):
+  def setUp(self):
+    self.batches = []
+    self.replicator = jqueue._JobFileReplicator(self._Send)
+
+  def _Send(self, updates):
+    self.batches.append(updates)
+
+  def testSequential(self):
+    self.replicator.Replicate("job-1", "data1", False)
+    self.replicator.Replicate("job-1", "data2", True)
+    self.replicator.Replicate("job-2", "data3", False)
+    self.assertEqual(self.batches, [
+      {"job-1": (False, "data1")},
+      {"job-1": (True, "data2")},
+      {"job-2": (False, "data3")},
+      ])
+
+  def testCoalescing(self):
+    threads = []
+
+    def _SendFirst(updates):
+      self.replicator._send_fn = self._Send
+      self._Send(updates)
+
+      # Further updates arrive while the first batch is being sent
+      expected = 0
+      for args in [("job-1", "seg1", True), ("job-2", "data2", False),
+                   ("job-1", "seg2", True), ("job-3", "data3", False),
+                   ("job-3", "seg3", True)]:
+        thread = threading.Thread(target=self.replicator.Replicate, args=args)
+        thread.start()
+        threads.append(thread)
+
+        # Wait for the update to be added, keeping the order
+        expected += len(args[1])
+        while expected > sum(len(content) for (_, content) in
+                             self.replicator._pending.values()):
+          time.sleep(0.001)
+
+    self.replicator._send_fn = _SendFirst
+    self.replicator.Replicate("job-1", "data", False)
+
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual(self.batches, [
+      {"job-1": (False, "data")},
+      {"job-1": (True, "seg1seg2"),
+       "job-2": (False, "data2"),
+       "job-3": (False, "data3seg3"),
+      },
+      ])
+
+  def testFailure(self):
+    threads = []
+    results = {}
+
+    def _Replicate(file_name):
+      try:
+        self.replicator.Replicate(file_name, "data", False)
+      except errors.OpExecError, err:
+        results[file_name] = err
+      else:
+        results[file_name] = None
+
+    def _SendFirst(updates):
+      self.replicator._send_fn = _SendFailing
+      self._Send(updates)
+
+      # Both updates end up in the failing batch
+      for file_name in ["job-2", "job-3"]:
+        thread = threading.Thread(target=_Replicate, args=(file_name, ))
+        thread.start()
+        threads.append(thread)
+      while len(self.replicator._pending) < 2:
+        time.sleep(0.001)
+
+    def _SendFailing(updates):
+      self.replicator._send_fn = self._Send
+      self._Send(updates)
+      raise errors.OpExecError("Replication failed")
+
+    self.replicator._send_fn = _SendFirst
+    self.replicator.Replicate("job-1", "data", False)
+
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual(len(self.batches), 2)
+    self.assertEqual(sorted(self.batches[1].keys()), ["job-2", "job-3"])
+    self.assertTrue(isinstance(results["job-2"], errors.OpExecError))
+    self.assertTrue(results["job-2"] is results["job-3"])
+    self.assertFalse(self.replicator._errors)
+    self.assertFalse(self.replicator._waiting)
+
+    # Later updates aren't affected
+    self.replicator.Replicate("job-4", "data", False)
+    self.assertEqual(self.batches[2], {"job-4": (False, "data")})
+
+
 class TestJobDependencyManager(unittest.TestCase):
   def setUp(self):
     self._status = []
@@ -39,6 +39,7 @@ from ganeti import utils
 from ganeti import compat
 from ganeti import errors
 from ganeti import jstore
+from ganeti import serializer
 
 import testutils
 
@@ -87,6 +88,43 @@ class TestParseJobId(testutils.GanetiTestCase):
     self.assertRaises(errors.ParameterError, jstore.ParseJobId, [])
 
 
+class TestParseJobFile(unittest.TestCase):
+  def test(self):
+    header = serializer.DumpJson({
+      "id": 1,
+      "start_timestamp": None,
+      "ops": [
+        {"status": "running", "log": [[1, [0, 0], "message", "first"]]},
+        {"status": "queued", "log": []},
+        ],
+      })
+    segments = [
+      {"job": {"start_timestamp": [1, 0]},
+       "log": [[0, [2, [0, 1], "message", "second"]]]},
+      {"ops": [[0, {"status": "success"}], [1, {"status": "running"}]],
+       "log": [[1, [3, [0, 2], "message", "third"]]]},
+      ]
+    data = header + "".join(map(serializer.DumpJson, segments))
+
+    expected = {
+      "id": 1,
+      "start_timestamp": [1, 0],
+      "ops": [
+        {"status": "success", "log": [[1, [0, 0], "message", "first"],
+                                      [2, [0, 1], "message", "second"]]},
+        {"status": "running", "log": [[3, [0, 2], "message", "third"]]},
+        ],
+      }
+    self.assertEqual(jstore.ParseJobFile(data), expected)
+
+    # A segment still being written is ignored
+    self.assertEqual(jstore.ParseJobFile(data + "{\"ops\": [[1, {"), expected)
+
+  def testHeaderOnly(self):
+    for data in ["{\"id\": 1}", "{\"id\": 1}\n"]:
+      self.assertEqual(jstore.ParseJobFile(data), {"id": 1})
+
+
 class TestReadNumericFile(testutils.GanetiTestCase):
   def testNonExistingFile(self):
     result = jstore._ReadNumericFile("/tmp/this/file/does/not/exist")
@@ -33,6 +33,7 @@
 
 import unittest
 import itertools
+import threading
 
 from ganeti import compat
 from ganeti import mcpu
@@ -91,6 +92,49 @@ class TestLockAttemptTimeoutStrategy(unittest.TestCase):
       self.assert_(strat.NextAttempt() is None)
 
 
+class TestLockNotification(unittest.TestCase):
+  def setUp(self):
+    self.notification = mcpu.LockNotification()
+
+  def testNoNotification(self):
+    self.assertFalse(self.notification.Clear())
+    self.assertFalse(self.notification.Wait(0.01))
+
+  def testNotify(self):
+    for _ in range(10):
+      self.notification.Notify()
+    self.assertTrue(self.notification.Wait(0))
+    # All notifications have been consumed
+    self.assertFalse(self.notification.Wait(0))
+
+  def testClear(self):
+    self.notification.Notify()
+    self.assertTrue(self.notification.Clear())
+    self.assertFalse(self.notification.Clear())
+
+  def testNotifyFromThread(self):
+    thread = threading.Thread(target=self.notification.Notify)
+    thread.start()
+    try:
+      self.assertTrue(self.notification.Wait(60.0))
+    finally:
+      thread.join()
+
+
+class TestGetLockNotification(unittest.TestCase):
+  def setUp(self):
+    self._saved = mcpu._lockNotification
+    mcpu._lockNotification = None
+
+  def tearDown(self):
+    mcpu._lockNotification = self._saved
+
+  def test(self):
+    notification = mcpu.GetLockNotification()
+    self.assertTrue(isinstance(notification, mcpu.LockNotification))
+    self.assertTrue(mcpu.GetLockNotification() is notification)
+
+
 class TestDispatchTable(unittest.TestCase):
   def test(self):
     for opcls in opcodes.OP_MAPPING.values():
@@ -731,6 +731,30 @@ class TestDisk(unittest.TestCase):
       self.assertEqual(dev_type, disk.children[0].dev_type)
 
 
+class TestQueryPageResponse(unittest.TestCase):
+  def _Create(self, next_page):
+    fdef = objects.QueryFieldDefinition(name="name", title="Name",
+                                        kind=constants.QFT_TEXT, doc="Name")
+    return objects.QueryPageResponse(fields=[fdef], data=[],
+                                     next=next_page)
+
+  def testNextPage(self):
+    data = self._Create("node9").ToDict()
+    self.assertEqual(data["next"], "node9")
+    self.assertEqual(data["fields"][0]["name"], "name")
+
+    page = objects.QueryPageResponse.FromDict(data)
+    self.assertEqual(page.next, "node9")
+
+  def testLastPage(self):
+    data = self._Create(None).ToDict()
+    self.assertTrue("next" in data)
+    self.assertTrue(data["next"] is None)
+
+    page = objects.QueryPageResponse.FromDict(data)
+    self.assertTrue(page.next is None)
+
+
 class TestSimpleFillOS(unittest.TestCase):
     # We have to make sure that:
     #  * From within the configuration, variants override defaults
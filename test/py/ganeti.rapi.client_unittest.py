@@ -1416,6 +1416,47 @@ class GanetiRapiClientTests(testutils.GanetiTestCase):
           self.assertEqual(data["qfilter"], qfilter)
         self.assertEqual(self.rapi.CountPending(), 0)
 
+  def testQueryPage(self):
+    resp = serializer.DumpJson({
+      "fields": [],
+      "data": [],
+      "next": "node9",
+      })
+
+    self.rapi.AddResponse(resp)
+    result = self.client.Query(constants.QR_NODE, ["name"], limit=10,
+                               resume="node4")
+    self.assertEqual(result["next"], "node9")
+    self.assertItems([constants.QR_NODE])
+    self.assertHandler(rlib2.R_2_query)
+    self.assertEqual(self.rapi.GetLastHandler().queryargs, {
+      "limit": ["10"],
+      "resume": ["node4"],
+      })
+    self.assertEqual(self.rapi.CountPending(), 0)
+
+  def testQueryIter(self):
+    self.rapi.AddResponse(serializer.DumpJson({
+      "fields": [],
+      "data": [[[0, "node1"]], [[0, "node2"]]],
+      "next": "node2",
+      }))
+    # The last page may come without a token
+    self.rapi.AddResponse(serializer.DumpJson({
+      "fields": [],
+      "data": [[[0, "node3"]]],
+      }))
+
+    result = list(self.client.QueryIter(constants.QR_NODE, ["name"],
+                                        page_size=2))
+    self.assertEqual([value for [(_, value)] in result],
+                     ["node1", "node2", "node3"])
+    self.assertEqual(self.rapi.GetLastHandler().queryargs, {
+      "limit": ["2"],
+      "resume": ["node2"],
+      })
+    self.assertEqual(self.rapi.CountPending(), 0)
+
   def testQueryFields(self):
     exp_result = objects.QueryFieldsResponse(fields=[
       objects.QueryFieldDefinition(name="pnode", title="PNode",
@@ -43,6 +43,8 @@ from ganeti import compat
 from ganeti import ht
 from ganeti import http
 from ganeti import query
+from ganeti import objects
+from ganeti import serializer
 import ganeti.rpc.errors as rpcerr
 from ganeti import errors
 from ganeti import rapi
@@ -1482,6 +1484,87 @@ class TestInstancesMultiAlloc(unittest.TestCase):
     ))
 
 
+class _FakeQueryClient:
+  def __init__(self, address=None):
+    self._names = ["node%s" % i for i in range(1, 8)]
+    self.calls = []
+
+  def QueryPage(self, what, fields, qfilter, limit, resume):
+    self.calls.append((what, fields, qfilter, limit, resume))
+
+    if resume is None:
+      start = 0
+    else:
+      start = self._names.index(resume) + 1
+
+    names = self._names[start:(start + limit)]
+
+    if start + limit < len(self._names):
+      next_page = names[-1]
+    else:
+      next_page = None
+
+    fdef = objects.QueryFieldDefinition(name="name", title="Name",
+                                        kind=constants.QFT_TEXT, doc="Name")
+
+    return objects.QueryPageResponse(fields=[fdef],
+                                     data=[[(constants.RS_NORMAL, name)]
+                                           for name in names],
+                                     next=next_page)
+
+
+class TestQuery(unittest.TestCase):
+  def setUp(self):
+    self.clfactory = _FakeClientFactory(_FakeQueryClient)
+
+  def _Handler(self, queryargs):
+    queryargs = dict(queryargs, fields=["name"])
+    return _CreateHandler(rlib2.R_2_query, [constants.QR_NODE], queryargs,
+                          None, self.clfactory)
+
+  def testPage(self):
+    handler = self._Handler({ "limit": ["3"], "resume": ["node3"], })
+    result = handler.GET()
+    self.assertEqual(result["next"], "node6")
+    self.assertEqual([row[0][1] for row in result["data"]],
+                     ["node4", "node5", "node6"])
+
+    cl = self.clfactory.GetNextClient()
+    self.assertEqual(cl.calls, [(constants.QR_NODE, ["name"], None, 3,
+                                 "node3")])
+
+  def testLastPage(self):
+    handler = self._Handler({ "limit": ["3"], "resume": ["node6"], })
+    result = handler.GET()
+    self.assertTrue("next" in result)
+    self.assertTrue(result["next"] is None)
+    self.assertEqual(serializer.LoadJson(serializer.DumpJson(result))["next"],
+                     None)
+    self.assertEqual([row[0][1] for row in result["data"]], ["node7"])
+
+  def testStream(self):
+    handler = self._Handler({ "stream": ["1"], "limit": ["2"], })
+    result = handler.GET()
+    self.assertTrue(http.IsStreamedBody(result))
+
+    data = serializer.LoadJson("".join(result))
+    self.assertEqual([fdef["name"] for fdef in data["fields"]], ["name"])
+    self.assertEqual([row[0][1] for row in data["data"]],
+                     ["node%s" % i for i in range(1, 8)])
+
+    cl = self.clfactory.GetNextClient()
+    self.assertEqual([resume for (_, _, _, _, resume) in cl.calls],
+                     [None, "node2", "node4", "node6"])
+
+  def testInvalidLimit(self):
+    handler = self._Handler({ "limit": ["-1"], })
+    self.assertRaises(http.HttpBadRequest, handler.GET)
+
+  def testResumeWithoutLimit(self):
+    handler = self._Handler({ "resume": ["node1"], })
+    self.assertRaises(http.HttpBadRequest, handler.GET)
+
+
 class TestPermissions(unittest.TestCase):
   def testEquality(self):
     self.assertEqual(rlib2.R_2_query.GET_ACCESS, rlib2.R_2_query.PUT_ACCESS)
@@ -150,6 +150,10 @@ class TestInputTestClient(unittest.TestCase):
     result = self.cl.Query(constants.QR_NODE, ["name"])
     self.assertTrue(result is NotImplemented)
 
+  def testQueryPage(self):
+    result = self.cl.Query(constants.QR_NODE, ["name"], limit=10)
+    self.assertTrue(result is NotImplemented)
+
   def testQueryFields(self):
     result = self.cl.QueryFields(constants.QR_INSTANCE)
     self.assertTrue(result is NotImplemented)
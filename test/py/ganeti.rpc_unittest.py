@@ -602,6 +602,74 @@ class TestRpcClientBase(unittest.TestCase):
         self.assertEqual(serializer.LoadJson(res.payload),
                          ["foo", hex(num), hash("Hello%s" % num)])
 
+  def testNodeIndependentArguments(self):
+    resolver = rpc._StaticResolver([
+      "192.0.2.7",
+      "192.0.2.8",
+      "192.0.2.9",
+      ])
+
+    nodes = [
+      "node7.example.com",
+      "node8.example.com",
+      "node9.example.com",
+      ]
+
+    AT_NODE = "node-dependent"
+    calls = []
+
+    def _Encode(kind, node, value):
+      calls.append((kind, node))
+      if kind == AT_NODE:
+        return "%s@%s" % (value, node)
+      return value.upper()
+
+    encoders = {
+      rpc_defs.ED_COMPRESS: compat.partial(_Encode, rpc_defs.ED_COMPRESS),
+      AT_NODE: compat.partial(_Encode, AT_NODE),
+      }
+
+    bodies = []
+
+    def _VerifyRequest(req):
+      bodies.append(req.post_data)
+      req.success = True
+      req.resp_status_code = http.HTTP_OK
+      req.resp_body = serializer.DumpJson((True, req.post_data))
+
+    http_proc = _FakeRequestProcessor(_VerifyRequest)
+    client = rpc._RpcClientBase(resolver, encoders.get,
+                                _req_process_fn=http_proc)
+
+    # all arguments are node-independent, the body is shared
+    cdef = ("test_call", NotImplemented, None, constants.RPC_TMO_NORMAL, [
+      ("arg0", None, NotImplemented),
+      ("arg1", rpc_defs.ED_COMPRESS, NotImplemented),
+      ], None, None, NotImplemented)
+    result = client._Call(cdef, nodes, ["foo", "bar"])
+    self.assertEqual(len(result), len(nodes))
+    for res in result.values():
+      self.assertFalse(res.fail_msg)
+      self.assertEqual(serializer.LoadJson(res.payload), ["foo", "BAR"])
+    self.assertEqual(calls, [(rpc_defs.ED_COMPRESS, None)])
+    self.assertEqual(len(bodies), len(nodes))
+    self.assertTrue(compat.all(body is bodies[0] for body in bodies))
+
+    # node-dependent arguments are still encoded for every node
+    del calls[:]
+    cdef = ("test_call", NotImplemented, None, constants.RPC_TMO_NORMAL, [
+      ("arg0", rpc_defs.ED_COMPRESS, NotImplemented),
+      ("arg1", AT_NODE, NotImplemented),
+      ], None, None, NotImplemented)
+    result = client._Call(cdef, nodes, ["foo", "bar"])
+    self.assertEqual(len(result), len(nodes))
+    for (node, res) in result.items():
+      self.assertFalse(res.fail_msg)
+      self.assertEqual(serializer.LoadJson(res.payload),
+                       ["FOO", "bar@%s" % node])
+    self.assertEqual(len(calls), 1 + len(nodes))
+    self.assertEqual(calls.count((rpc_defs.ED_COMPRESS, None)), 1)
+
   def testPostProc(self):
     def _VerifyRequest(nums, req):
       req.success = True
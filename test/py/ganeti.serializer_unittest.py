@@ -34,6 +34,8 @@
 import doctest
 import unittest
 
+from cStringIO import StringIO
+
 from ganeti import errors
 from ganeti import ht
 from ganeti import objects
@@ -85,6 +87,36 @@ class TestSerializer(testutils.GanetiTestCase):
   def testSignedJson(self):
     self._TestSigned(serializer.DumpSignedJson, serializer.LoadSignedJson)
 
+  def testJsonToFile(self):
+    for data in self._TESTDATA:
+      buf = StringIO()
+      serializer.DumpJsonToFile(
+        data, buf, private_encoder=serializer.EncodeWithPrivateFields)
+      self.assertEqual(buf.getvalue(), serializer.DumpJson(
+        data, private_encoder=serializer.EncodeWithPrivateFields))
+
+  def testNoTrailingWhitespace(self):
+    for data in self._TESTDATA:
+      txt = serializer.DumpJson(data)
+      self.assertTrue(txt.endswith("\n"))
+      for line in txt.splitlines():
+        self.assertEqual(line, line.rstrip())
+
+  def testLoadWrapsPrivateFields(self):
+    data = serializer.LoadJson(serializer.DumpJson([{
+      "osparams_private": {"password": "foo"},
+      "osparams_private_cluster": {"debian": {"password": "bar"}},
+      "other": {"osparams_secret": {"key": "baz"}, "osparams": {"a": "b"}},
+      }]))
+    self.assertTrue(isinstance(data[0]["osparams_private"],
+                               serializer.PrivateDict))
+    self.assertEqual(data[0]["osparams_private"].GetPrivate("password"), "foo")
+    self.assertTrue(isinstance(data[0]["osparams_private_cluster"]["debian"],
+                               serializer.PrivateDict))
+    self.assertTrue(isinstance(data[0]["other"]["osparams_secret"]["key"],
+                               serializer.Private))
+    self.assertEqual(data[0]["other"]["osparams"], {"a": "b"})
+
   def _TestSigned(self, dump_fn, load_fn):
     _dump_fn = lambda *args, **kwargs: dump_fn(
       *args,
@@ -267,6 +267,53 @@ class TestSimpleStore(unittest.TestCase):
       self.assertEqual(value, result[key])
 
 
+class TestSimpleStoreCache(unittest.TestCase):
+  def setUp(self):
+    self._tmpdir = tempfile.mkdtemp()
+    lockfile = utils.PathJoin(self._tmpdir, "lock")
+
+    self.sstore = ssconf.SimpleStore(cfg_location=self._tmpdir,
+                                     _lockfile=lockfile, cache=True)
+    self.filename = self.sstore.KeyToFilename(constants.SS_CLUSTER_NAME)
+
+  def tearDown(self):
+    shutil.rmtree(self._tmpdir)
+
+  def testCached(self):
+    utils.WriteFile(self.filename, data="cluster.example.com\n")
+    self.assertEqual(self.sstore.GetClusterName(), "cluster.example.com")
+
+    with mock.patch("ganeti.utils.ReadFile") as read_fn:
+      self.assertEqual(self.sstore.GetClusterName(), "cluster.example.com")
+      self.assertFalse(read_fn.called)
+
+  def testReplacedFile(self):
+    utils.WriteFile(self.filename, data="cluster.example.com\n")
+    self.assertEqual(self.sstore.GetClusterName(), "cluster.example.com")
+
+    utils.WriteFile(self.filename, data="other.example.com\n")
+    self.assertEqual(self.sstore.GetClusterName(), "other.example.com")
+
+  def testRemovedFile(self):
+    utils.WriteFile(self.filename, data="cluster.example.com\n")
+    self.assertEqual(self.sstore.GetClusterName(), "cluster.example.com")
+
+    utils.RemoveFile(self.filename)
+    self.assertRaises(errors.ConfigurationError, self.sstore.GetClusterName)
+    self.assertEqual(self.sstore._ReadFile(constants.SS_CLUSTER_NAME,
+                                           default="x.example.com"),
+                     "x.example.com")
+
+  def testSharedCache(self):
+    utils.WriteFile(self.filename, data="cluster.example.com\n")
+    self.assertEqual(self.sstore.GetClusterName(), "cluster.example.com")
+
+    other = ssconf.SimpleStore(cfg_location=self._tmpdir, cache=True)
+    with mock.patch("ganeti.utils.ReadFile") as read_fn:
+      self.assertEqual(other.GetClusterName(), "cluster.example.com")
+      self.assertFalse(read_fn.called)
+
+
 class TestVerifyClusterName(unittest.TestCase):
   def setUp(self):
     self.tmpdir = tempfile.mkdtemp()
@@ -41,6 +41,7 @@ from ganeti import errors
 from ganeti import objects
 from ganeti import utils
 from ganeti.storage import bdev
+from ganeti.storage import statecache
 
 import testutils
 
@@ -322,6 +323,51 @@ class TestLogicalVolume(unittest.TestCase):
       multi_res = bdev.LogicalVolume._GetLvInfo("fake_path", _run_cmd=fake_cmd)
       self.assertEqual(multi_res, one_res)
 
+  def testGetAllLvInfo(self):
+    """Tests for LogicalVolume._GetAllLvInfo."""
+    self.assertEqual(bdev.LogicalVolume._GetAllLvInfo(
+                       _run_cmd=self._FakeRunCmd(False, "Fake error msg")),
+                     None)
+    self.assertEqual(bdev.LogicalVolume._GetAllLvInfo(
+                       _run_cmd=self._FakeRunCmd(True, "xenvg|BadStdOut")),
+                     None)
+    self.assertEqual(bdev.LogicalVolume._GetAllLvInfo(
+                       _run_cmd=self._FakeRunCmd(True, "")),
+                     {})
+
+    fake_cmd = self._FakeRunCmd(True,
+      "  xenvg|lv1|-wi-ao|253|3|4096.00|2|/dev/sda(20)\n"
+      "  xenvg|lv1|-wi-ao|253|3|4096.00|2|/dev/sdb(50),/dev/sdc(0)\n"
+      "  othervg|lv2|-wi-a-|253|4|4096.00|1|/dev/sdd(0)")
+    all_info = bdev.LogicalVolume._GetAllLvInfo(_run_cmd=fake_cmd)
+    self.assertEqual(sorted(all_info.keys()),
+                     ["/dev/othervg/lv2", "/dev/xenvg/lv1"])
+    fake_cmd = self._FakeRunCmd(True,
+      "  -wi-ao|253|3|4096.00|2|/dev/sda(20),/dev/sdb(50),/dev/sdc(0)")
+    one_res = bdev.LogicalVolume._GetLvInfo("fake_path", _run_cmd=fake_cmd)
+    self.assertEqual(all_info["/dev/xenvg/lv1"], one_res)
+
+  def testGetLvInfoSnapshot(self):
+    calls = []
+    def _RunCmd(cmd):
+      calls.append(cmd)
+      return utils.RunResult(0, None,
+                             "  xenvg|lv1|-wi-ao|253|3|4096.00|2|/dev/sda(20)\n"
+                             "  xenvg|lv2|-wi-ao|253|4|4096.00|1|/dev/sdb(0)",
+                             "", cmd, utils.process._TIMEOUT_NONE, 5)
+
+    with statecache.Snapshot():
+      (_, _, minor1, _, _, _) = \
+        bdev.LogicalVolume._GetLvInfo("/dev/xenvg/lv1", _run_cmd=_RunCmd)
+      (_, _, minor2, _, _, _) = \
+        bdev.LogicalVolume._GetLvInfo("/dev/xenvg/lv2", _run_cmd=_RunCmd)
+      self.assertRaises(errors.BlockDeviceError,
+                        bdev.LogicalVolume._GetLvInfo, "/dev/xenvg/lv3",
+                        _run_cmd=_RunCmd)
+
+    self.assertEqual((minor1, minor2), (3, 4))
+    self.assertEqual(len(calls), 1)
+
   @testutils.patch_object(bdev.LogicalVolume, "Attach")
   def testLogicalVolumeImport(self, attach_mock):
     """Tests for bdev.LogicalVolume.Import()"""
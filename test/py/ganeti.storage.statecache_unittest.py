@@ -0,0 +1,90 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2015 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Script for unittesting the storage.statecache module"""
+
+
+import unittest
+
+from ganeti.storage import statecache
+
+import testutils
+
+
+class _Counter(object):
+  def __init__(self):
+    self.count = 0
+
+  def __call__(self):
+    self.count += 1
+    return self.count
+
+
+class TestSnapshot(unittest.TestCase):
+  def testInactive(self):
+    fn = _Counter()
+    self.assertFalse(statecache.IsActive())
+    self.assertEqual(statecache.GetCached("key", fn), 1)
+    self.assertEqual(statecache.GetCached("key", fn), 2)
+
+  def testActive(self):
+    fn = _Counter()
+    other_fn = _Counter()
+    with statecache.Snapshot():
+      self.assertTrue(statecache.IsActive())
+      self.assertEqual(statecache.GetCached("key", fn), 1)
+      self.assertEqual(statecache.GetCached("key", fn), 1)
+      self.assertEqual(statecache.GetCached("other", other_fn), 1)
+    self.assertFalse(statecache.IsActive())
+
+    # A new snapshot reads the values again
+    with statecache.Snapshot():
+      self.assertEqual(statecache.GetCached("key", fn), 2)
+
+  def testNested(self):
+    fn = _Counter()
+    with statecache.Snapshot():
+      self.assertEqual(statecache.GetCached("key", fn), 1)
+      with statecache.Snapshot():
+        self.assertEqual(statecache.GetCached("key", fn), 1)
+      self.assertTrue(statecache.IsActive())
+      self.assertEqual(statecache.GetCached("key", fn), 1)
+    self.assertFalse(statecache.IsActive())
+
+  def testException(self):
+    def _Fail():
+      with statecache.Snapshot():
+        raise ValueError()
+    self.assertRaises(ValueError, _Fail)
+    self.assertFalse(statecache.IsActive())
+
+
+if __name__ == "__main__":
+  testutils.GanetiTestProgram()
@@ -0,0 +1,219 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2015 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Script for testing ganeti.tools.wipe_disks"""
+
+import unittest
+import shutil
+import tempfile
+
+from ganeti import compat
+from ganeti import constants
+from ganeti import objects
+from ganeti import serializer
+from ganeti import utils
+from ganeti.tools import wipe_disks
+
+import testutils
+
+
+class TestGetChunkSize(unittest.TestCase):
+  def test(self):
+    self.assertEqual(wipe_disks.GetChunkSize(1), 1)
+    self.assertEqual(wipe_disks.GetChunkSize(0), 1)
+    self.assertEqual(wipe_disks.GetChunkSize(100 * 1024),
+                     int(min(constants.MAX_WIPE_CHUNK,
+                             1024 * constants.MIN_WIPE_CHUNK_PERCENT)))
+    self.assertEqual(wipe_disks.GetChunkSize(1024 * 1024 * 1024),
+                     constants.MAX_WIPE_CHUNK)
+
+
+class TestSupportsWriteZeroes(testutils.GanetiTestCase):
+  def setUp(self):
+    testutils.GanetiTestCase.setUp(self)
+    self.tmpdir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    testutils.GanetiTestCase.tearDown(self)
+    shutil.rmtree(self.tmpdir)
+
+  def _WriteMaxBytes(self, name, value):
+    queue_dir = utils.PathJoin(self.tmpdir, name, "queue")
+    utils.Makedirs(queue_dir)
+    utils.WriteFile(utils.PathJoin(queue_dir, "write_zeroes_max_bytes"),
+                    data=value)
+
+  def test(self):
+    self._WriteMaxBytes("sda", "33550336\n")
+    self._WriteMaxBytes("sdb", "0\n")
+    self._WriteMaxBytes("sdc", "garbage\n")
+
+    self.assertTrue(wipe_disks._SupportsWriteZeroes("/dev/sda",
+                                                    _sysfs_dir=self.tmpdir))
+    self.assertFalse(wipe_disks._SupportsWriteZeroes("/dev/sdb",
+                                                     _sysfs_dir=self.tmpdir))
+    self.assertFalse(wipe_disks._SupportsWriteZeroes("/dev/sdc",
+                                                     _sysfs_dir=self.tmpdir))
+    self.assertFalse(wipe_disks._SupportsWriteZeroes("/dev/sdd",
+                                                     _sysfs_dir=self.tmpdir))
+
+
+class TestWipeDisk(unittest.TestCase):
+  def setUp(self):
+    self.tmpfile = tempfile.NamedTemporaryFile()
+    self.zeroed = []
+    self.written = []
+    self.reports = []
+
+  def _ZeroOut(self, fd, offset, size):
+    self.assertTrue(isinstance(fd, int))
+    self.zeroed.append((offset, size))
+
+  def _FailingZeroOut(self, fd, offset, size):
+    raise EnvironmentError(95, "Operation not supported")
+
+  def _WriteZeroes(self, path, offset, size):
+    self.assertEqual(path, self.tmpfile.name)
+    self.written.append((offset, size))
+
+  def _Report(self, offset, method):
+    self.reports.append((offset, method))
+
+  def _Wipe(self, offset, size, supports_zeroes, zero_out_fn=None):
+    if zero_out_fn is None:
+      zero_out_fn = self._ZeroOut
+
+    wipe_disks.WipeDisk(self.tmpfile.name, offset, size, self._Report,
+                        _supports_zeroes_fn=lambda _: supports_zeroes,
+                        _zero_out_fn=zero_out_fn,
+                        _write_zeroes_fn=self._WriteZeroes)
+
+  def _CheckChunks(self, chunks, offset, size):
+    self.assertTrue(chunks)
+    self.assertEqual(chunks[0][0], offset)
+    for ((cur_offset, cur_size), (next_offset, _)) in zip(chunks, chunks[1:]):
+      self.assertEqual(cur_offset + cur_size, next_offset)
+    self.assertEqual(sum(chunk_size for (_, chunk_size) in chunks),
+                     size - offset)
+    self.assertTrue(compat.all(chunk_size <= wipe_disks.GetChunkSize(size)
+                               for (_, chunk_size) in chunks))
+
+  def testZeroOut(self):
+    self._Wipe(0, 1024, True)
+    self.assertFalse(self.written)
+    self._CheckChunks(self.zeroed, 0, 1024)
+    self.assertEqual(self.reports[-1], (1024, constants.WIPE_METHOD_ZEROOUT))
+
+  def testWriteZeroes(self):
+    self._Wipe(280, 8895, False)
+    self.assertFalse(self.zeroed)
+    self._CheckChunks(self.written, 280, 8895)
+    self.assertEqual(self.reports[-1], (8895, constants.WIPE_METHOD_DD))
+
+  def testFallback(self):
+    self._Wipe(0, 512, True, zero_out_fn=self._FailingZeroOut)
+    self.assertFalse(self.zeroed)
+    self._CheckChunks(self.written, 0, 512)
+    self.assertTrue(compat.all(method == constants.WIPE_METHOD_DD
+                               for (_, method) in self.reports))
+
+  def testNothingToDo(self):
+    self._Wipe(128, 128, False)
+    self.assertFalse(self.written)
+    self.assertFalse(self.reports)
+
+
+class TestWipeDisks(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.status_file = utils.PathJoin(self.tmpdir, "status")
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def _ReadStatus(self):
+    return [objects.DiskWipeStatus.FromDict(i)
+            for i in serializer.LoadJson(utils.ReadFile(self.status_file))]
+
+  def _FakeWipeDisk(self, path, offset, size, report_fn):
+    if path == "/dev/fail":
+      raise wipe_disks.WipeError("Disk is broken")
+    while offset < size:
+      offset += 1
+      report_fn(offset, constants.WIPE_METHOD_DD)
+
+  def _Run(self, disks):
+    data = {
+      "parallelism": 2,
+      "disks": disks,
+      }
+    self.assertTrue(wipe_disks._DATA_CHECK(data))
+
+    orig_fn = wipe_disks.WipeDisk
+    wipe_disks.WipeDisk = self._FakeWipeDisk
+    try:
+      return wipe_disks.WipeDisks(data, self.status_file)
+    finally:
+      wipe_disks.WipeDisk = orig_fn
+
+  def testSuccess(self):
+    disks = [{"path": "/dev/disk%s" % i, "offset": i, "size": 10}
+             for i in range(5)]
+
+    self.assertTrue(self._Run(disks))
+
+    status = self._ReadStatus()
+    self.assertEqual(len(status), len(disks))
+    for i in status:
+      self.assertTrue(i.finished)
+      self.assertEqual(i.offset, 10)
+      self.assertEqual(i.size, 10)
+      self.assertEqual(i.method, constants.WIPE_METHOD_DD)
+      self.assertEqual(i.error_message, None)
+
+  def testFailure(self):
+    disks = [
+      {"path": "/dev/disk0", "offset": 0, "size": 10},
+      {"path": "/dev/fail", "offset": 3, "size": 10},
+      ]
+
+    self.assertFalse(self._Run(disks))
+
+    (ok, failed) = self._ReadStatus()
+    self.assertTrue(ok.finished)
+    self.assertEqual(ok.offset, 10)
+    self.assertEqual(ok.error_message, None)
+    self.assertTrue(failed.finished)
+    self.assertEqual(failed.offset, 3)
+    self.assertEqual(failed.error_message, "Disk is broken")
+
+
+if __name__ == "__main__":
+  testutils.GanetiTestProgram()
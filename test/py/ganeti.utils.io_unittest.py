@@ -436,6 +436,31 @@ class TestWriteFile(testutils.GanetiTestCase):
                     keep_perms=utils.KP_IF_EXISTS)
     self.assertFileMode(target, 0400)
 
+class TestAppendFile(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def test(self):
+    path = utils.PathJoin(self.tmpdir, "file")
+    utils.WriteFile(path, data="Hello\n")
+    utils.AppendFile(path, "World\n")
+    utils.AppendFile(path, "")
+    self.assertEqual(utils.ReadFile(path), "Hello\nWorld\n")
+
+  def testMissingFile(self):
+    path = utils.PathJoin(self.tmpdir, "file")
+    try:
+      utils.AppendFile(path, "data")
+    except EnvironmentError, err:
+      self.assertEqual(err.errno, errno.ENOENT)
+    else:
+      self.fail("Missing file was created")
+    self.assertFalse(os.path.exists(path))
+
+
 class TestFileID(testutils.GanetiTestCase):
   def testEquality(self):
     name = self._CreateTempFile()
@@ -455,6 +455,23 @@ class TestRunCmd(testutils.GanetiTestCase):
                       [], output=self.fname, input_fd=open(self.fname))
 
 
+class TestRunInParallel(unittest.TestCase):
+  def test(self):
+    items = range(50)
+    self.assertEqual(utils.RunInParallel(lambda i: i * 2, items, 4),
+                     [i * 2 for i in items])
+
+  def testEmpty(self):
+    self.assertEqual(utils.RunInParallel(lambda i: i, [], 4), [])
+
+  def testFailure(self):
+    def _Fn(i):
+      if i == 1:
+        raise errors.GenericError("failed")
+      return i
+    self.assertEqual(utils.RunInParallel(_Fn, [0, 1, 2], 1), [0, None, 2])
+
+
 class TestRunParts(testutils.GanetiTestCase):
   """Testing case for the RunParts function"""
 
@@ -586,6 +603,36 @@ class TestRunParts(testutils.GanetiTestCase):
     nosuchdir = utils.PathJoin(self.rundir, "no/such/directory")
     self.assertEqual(utils.RunParts(nosuchdir), [])
 
+  def testParallel(self):
+    names = ["00slow", "10fast", "20skip.", "30fail"]
+    for (name, script) in zip(names, ["sleep 0.5; echo -n slow",
+                                      "echo -n fast", "exit 0", "exit 1"]):
+      fname = os.path.join(self.rundir, name)
+      utils.WriteFile(fname, data="#!/bin/sh\n\n%s" % script)
+      os.chmod(fname, stat.S_IREAD | stat.S_IEXEC)
+
+    results = utils.RunParts(self.rundir, reset_env=True, max_parallel=4)
+
+    self.assertEqual([relname for (relname, _, _) in results], names)
+    self.assertEqual([status for (_, status, _) in results],
+                     [constants.RUNPARTS_RUN, constants.RUNPARTS_RUN,
+                      constants.RUNPARTS_SKIP, constants.RUNPARTS_RUN])
+    self.assertEqual(results[0][2].output, "slow")
+    self.assertEqual(results[1][2].output, "fast")
+    self.assertTrue(results[3][2].failed)
+
+  def testTimeout(self):
+    fname = os.path.join(self.rundir, "00test")
+    utils.WriteFile(fname, data="#!/bin/sh\n\nexec sleep 60")
+    os.chmod(fname, stat.S_IREAD | stat.S_IEXEC)
+
+    (relname, status, runresult) = \
+      utils.RunParts(self.rundir, reset_env=True, timeout=0.1)[0]
+    self.assertEqual(relname, "00test")
+    self.assertEqual(status, constants.RUNPARTS_RUN)
+    self.assertTrue(runresult.failed)
+    self.assertTrue(runresult.failed_by_timeout)
+
 
 class TestStartDaemon(testutils.GanetiTestCase):
   def setUp(self):
@@ -575,6 +575,55 @@ class TestLineSplitter(unittest.TestCase):
                              "", "x"])
 
 
+class TestMessageBuffer(unittest.TestCase):
+  def _Pop(self, buf):
+    messages = []
+    while True:
+      msg = buf.PopMessage()
+      if msg is None:
+        return messages
+      messages.append(msg)
+
+  def test(self):
+    buf = utils.MessageBuffer("\3")
+    self.assertTrue(buf.PopMessage() is None)
+    buf.Feed("Hello")
+    buf.Feed(" World\3\3Foo")
+    self.assertEqual(self._Pop(buf), ["Hello World", ""])
+    buf.Feed("Bar\3Baz\3")
+    self.assertEqual(self._Pop(buf), ["FooBar", "Baz"])
+
+  def testSplitTerminator(self):
+    buf = utils.MessageBuffer("\r\n")
+    for chunk in ["{}\r", "\n{\r", "}\r", "\n", "\r", "\n\r\n\r"]:
+      buf.Feed(chunk)
+    self.assertEqual(self._Pop(buf), ["{}", "{\r}", "", ""])
+    buf.Feed("\n")
+    self.assertEqual(self._Pop(buf), [""])
+
+  def testLongTerminator(self):
+    buf = utils.MessageBuffer("EOM")
+    for char in "aEObEOMcEEOM":
+      buf.Feed(char)
+    self.assertEqual(self._Pop(buf), ["aEOb", "cE"])
+
+  def testLargeMessage(self):
+    buf = utils.MessageBuffer("\3")
+    chunk = "x" * 4096
+    for _ in range(1024):
+      buf.Feed(chunk)
+    self.assertTrue(buf.PopMessage() is None)
+    buf.Feed("\3")
+    self.assertEqual(buf.PopMessage(), chunk * 1024)
+
+  def testClear(self):
+    buf = utils.MessageBuffer("\3")
+    buf.Feed("a\3b")
+    buf.Clear()
+    buf.Feed("c\3")
+    self.assertEqual(self._Pop(buf), ["c"])
+
+
 class TestIsValidShellParam(unittest.TestCase):
   def test(self):
     for val, result in [
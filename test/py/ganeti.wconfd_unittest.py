@@ -0,0 +1,127 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2015 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+
+"""Script for unittesting the wconfd module"""
+
+
+import time
+import unittest
+
+from ganeti import wconfd
+from ganeti.rpc import client
+from ganeti.rpc import errors
+
+import testutils
+
+
+class _FakeTransport(object):
+  """Transport answering each request with its method and arguments.
+
+  """
+  def __init__(self, address, timeouts=None): # pylint: disable=W0613
+    self.events = []
+    self.closed = False
+    self._pending = []
+
+  def Send(self, msg):
+    (method, args, _) = client.ParseRequest(msg)
+    self.events.append(("send", method))
+    self._pending.append((method, args))
+
+  def Recv(self):
+    (method, args) = self._pending.pop(0)
+    self.events.append(("recv", method))
+    if method == "fail":
+      return client.FormatResponse(False, "request failed")
+    return client.FormatResponse(True, [method, args])
+
+  def Close(self):
+    self.closed = True
+
+
+class TestPersistentClient(unittest.TestCase):
+  def setUp(self):
+    self.client = wconfd.PersistentClient(transport=_FakeTransport)
+
+  def testReuseConnection(self):
+    transport = self.client.transport
+    self.assertEqual(self.client.Echo("foo"), ["echo", ["foo"]])
+    self.assertEqual(self.client.HasPendingRequest(["ctx"]),
+                     ["hasPendingRequest", [["ctx"]]])
+    self.assertTrue(self.client.transport is transport)
+    self.assertFalse(transport.closed)
+
+  def testReconnectWhenIdle(self):
+    transport = self.client.transport
+    self.client.Echo("foo")
+    # pylint: disable=W0212
+    self.client._last_use = time.time() - wconfd._MAX_IDLE_TIME - 1
+    self.assertEqual(self.client.Echo("bar"), ["echo", ["bar"]])
+    self.assertTrue(transport.closed)
+    self.assertFalse(self.client.transport is transport)
+    self.assertEqual(self.client.transport.events,
+                     [("send", "echo"), ("recv", "echo")])
+
+  def testPipeline(self):
+    result = self.client.Pipeline([
+      ("UpdateLocksWaiting", [["ctx"], 0, []]),
+      ("HasPendingRequest", [["ctx"]]),
+      ])
+    self.assertEqual(result, [
+      ["updateLocksWaiting", [["ctx"], 0, []]],
+      ["hasPendingRequest", [["ctx"]]],
+      ])
+    # All requests are sent before waiting for the first response
+    self.assertEqual(self.client.transport.events, [
+      ("send", "updateLocksWaiting"),
+      ("send", "hasPendingRequest"),
+      ("recv", "updateLocksWaiting"),
+      ("recv", "hasPendingRequest"),
+      ])
+
+  def testPipelineError(self):
+    self.assertRaises(errors.RequestError, self.client.Pipeline,
+                      [("Fail", []), ("Echo", ["foo"])])
+    # The responses of all requests have been consumed
+    self.assertEqual(len(self.client.transport.events), 4)
+    self.assertEqual(self.client.Echo("bar"), ["echo", ["bar"]])
+
+
+class TestSharedClient(unittest.TestCase):
+  def test(self):
+    persistent = wconfd.PersistentClient(transport=_FakeTransport)
+    shared = wconfd.SharedClient(persistent)
+    self.assertTrue(shared.Client() is persistent)
+    self.assertTrue(shared.Client() is shared.Client())
+
+
+if __name__ == "__main__":
+  testutils.GanetiTestProgram()
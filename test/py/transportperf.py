@@ -0,0 +1,173 @@
+#!/usr/bin/python
+#
+
+# Copyright (C) 2015 Google Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED
+# TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+
+"""Script for measuring the cost of receiving large RPC messages
+
+Messages of the given sizes are sent over a Unix socket and a pipe, and
+received through L{transport.Transport} and L{transport.FdTransport}
+respectively.
+
+"""
+
+import os
+import optparse
+import shutil
+import socket
+import tempfile
+import threading
+import time
+
+from ganeti import constants
+from ganeti import utils
+from ganeti.rpc import transport
+
+
+def ParseOptions():
+  """Parses the command line options.
+
+  In case of command line errors, it will show the usage and exit the
+  program.
+
+  @return: the options in a tuple
+
+  """
+  parser = optparse.OptionParser()
+  parser.add_option("-s", dest="sizes", default="1,10,100",
+                    help="Comma-separated list of message sizes in MiB",
+                    metavar="LIST")
+  parser.add_option("-r", dest="repetitions", default=3, type="int",
+                    help="Number of messages per size", metavar="NUM")
+  parser.add_option("-c", dest="chunk_size", default=65536, type="int",
+                    help="Size of the chunks the sender writes",
+                    metavar="BYTES")
+
+  (opts, args) = parser.parse_args()
+
+  try:
+    opts.sizes = [int(i) for i in opts.sizes.split(",")]
+  except ValueError:
+    parser.error("Invalid list of message sizes")
+
+  if opts.repetitions < 1 or opts.chunk_size < 1:
+    parser.error("Repetitions and chunk size must be positive")
+
+  return (opts, args)
+
+
+def _SendMessages(write_fn, close_fn, message, count, chunk_size):
+  """Writes a message several times, in chunks.
+
+  """
+  data = message + constants.LUXI_EOM
+  try:
+    for _ in range(count):
+      for offset in range(0, len(data), chunk_size):
+        write_fn(data[offset:offset + chunk_size])
+  finally:
+    close_fn()
+
+
+def _Measure(trans, message, count):
+  """Receives a message several times.
+
+  @return: the average time in seconds needed to receive a message
+
+  """
+  start = time.time()
+  for _ in range(count):
+    received = trans.Recv()
+    assert len(received) == len(message)
+  return (time.time() - start) / count
+
+
+def BenchSocket(message, count, chunk_size):
+  """Measures L{transport.Transport} on a Unix socket.
+
+  """
+  tmpdir = tempfile.mkdtemp()
+  try:
+    address = utils.PathJoin(tmpdir, "socket")
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(address)
+    server.listen(1)
+
+    def _Serve():
+      (conn, _) = server.accept()
+      _SendMessages(conn.sendall, conn.close, message, count, chunk_size)
+
+    thread = threading.Thread(target=_Serve)
+    thread.start()
+    trans = transport.Transport(address, timeouts=(10, 600))
+    try:
+      return _Measure(trans, message, count)
+    finally:
+      trans.Close()
+      thread.join()
+      server.close()
+  finally:
+    shutil.rmtree(tmpdir)
+
+
+def BenchPipe(message, count, chunk_size):
+  """Measures L{transport.FdTransport} on a pipe.
+
+  """
+  (read_fd, write_fd) = os.pipe()
+  (unused_fd, other_fd) = os.pipe()
+  wstream = os.fdopen(write_fd, "wb", 0)
+
+  thread = threading.Thread(target=_SendMessages,
+                            args=(wstream.write, wstream.close, message,
+                                  count, chunk_size))
+  thread.start()
+  trans = transport.FdTransport((read_fd, other_fd))
+  try:
+    return _Measure(trans, message, count)
+  finally:
+    trans.Close()
+    thread.join()
+    os.close(unused_fd)
+
+
+def main():
+  (opts, _) = ParseOptions()
+
+  for size in opts.sizes:
+    message = "x" * (size * 1024 * 1024)
+    for (name, fn) in [("Transport", BenchSocket),
+                       ("FdTransport", BenchPipe)]:
+      duration = fn(message, opts.repetitions, opts.chunk_size)
+      print ("%-11s %5d MiB: %8.3fs per message, %8.1f MiB/s" %
+             (name, size, duration, size / max(duration, 1e-9)))
+
+
+if __name__ == "__main__":
+  main()